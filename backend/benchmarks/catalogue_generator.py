@@ -0,0 +1,117 @@
+import argparse
+import json
+import random
+from typing import Any, Dict, Iterator, List, Tuple
+
+from ..geo import LOCATION_TABLE_PATH, get_location_table
+
+# Seeded synthetic catalogues in the seed_listings.json schema, at any scale.
+# Listings are generated one at a time (and written as they are generated), so a million-listing file
+# needs no more memory than a small one. The same seed always yields the same file.
+#
+# The distributions are loosely modelled on the Dutch rental market: locations are the places of
+# data/locations.json (weighted towards the large cities; some listings carry a 4-digit postcode),
+# rent grows with size and city, and a share of the listings is advertised above its legal maximum.
+#
+#   python -m backend.benchmarks.catalogue_generator --listings 100000 --output /tmp/listings_100k.json
+#   python -m backend.benchmarks.catalogue_generator --listings 1000000 --format ndjson --output /tmp/listings_1m.ndjson
+
+# City -> (weight, rent per m² in EUR)
+CITY_PROFILES: Dict[str, Tuple[float, float]] = {
+    "Amsterdam": (0.30, 27.0), "Rotterdam": (0.15, 19.0), "Den Haag": (0.12, 20.0), "Utrecht": (0.12, 23.0),
+    "Haarlem": (0.04, 22.0), "Leiden": (0.04, 21.0), "Delft": (0.03, 20.0), "Eindhoven": (0.05, 17.0),
+    "Groningen": (0.04, 16.0), "Nijmegen": (0.03, 16.0), "Arnhem": (0.02, 15.0), "Tilburg": (0.02, 15.0),
+    "Breda": (0.01, 15.0), "Maastricht": (0.01, 16.0), "Amersfoort": (0.01, 17.0), "Zwolle": (0.01, 15.0),
+}
+
+ENERGY_LABELS = ["A++", "A+", "A", "B", "C", "D", "E", "F", "G"]
+ENERGY_LABEL_WEIGHTS = [2, 5, 25, 20, 18, 12, 8, 6, 4]
+
+AMENITIES = [
+    ("Balcony", "fas fa-sun"), ("Elevator", "fas fa-elevator"), ("Garden", "fas fa-leaf"), ("Parking", "fas fa-car"),
+    ("Dishwasher", "fas fa-sink"), ("Washer", "fas fa-tshirt"), ("Furnished", "fas fa-couch"), ("Storage", "fas fa-box"),
+    ("Wi-Fi Included", "fas fa-wifi"), ("Central Heating", "fas fa-thermometer-half"), ("Canal View", "fas fa-water"),
+    ("Modern Kitchen", "fas fa-utensils"), ("Roof Terrace", "fas fa-umbrella-beach"), ("Bicycle Storage", "fas fa-bicycle"),
+]
+
+PROPERTY_TYPES = ["Apartment", "Studio", "Loft", "Family Home", "Penthouse", "Maisonette", "Canal House Flat"]
+ADJECTIVES = ["Bright", "Spacious", "Cosy", "Modern", "Renovated", "Charming", "Quiet", "Stylish", "Sunny", "Classic"]
+DESCRIPTION_WORDS = (
+    "bright spacious quiet renovated apartment near the park station shops restaurants with balcony kitchen "
+    "bathroom bedroom living room light view canal city centre public transport floor heating storage garden "
+    "neighbourhood university schools supermarket cycling distance available immediately furnished unfurnished"
+).split()
+
+def _places_by_city() -> Dict[str, List[str]]:
+    """City -> its place names in data/locations.json (the city and its districts, as they are written there)."""
+    with open(LOCATION_TABLE_PATH, "r", encoding="utf-8") as f:
+        names = list(json.load(f).get("places", {}))
+    return {city: [name for name in names if name == city or name.startswith(city + " ")] for city in CITY_PROFILES}
+
+def generate_source_listings(count: int, seed: int = 42, start_id: int = 1) -> Iterator[Dict[str, Any]]:
+    """`count` listings in the seed_listings.json schema (ids from `start_id`), deterministic for a seed."""
+    rng = random.Random(seed)
+    places = _places_by_city()
+    cities = list(CITY_PROFILES)
+    city_weights = [CITY_PROFILES[city][0] for city in cities]
+    postcodes = sorted(get_location_table().postcodes)
+    for listing_id in range(start_id, start_id + count):
+        city = rng.choices(cities, city_weights)[0]
+        location = rng.choice(places[city] or [city])
+        rooms = rng.choices([1, 2, 3, 4, 5, 6], [18, 32, 27, 14, 6, 3])[0]
+        size = max(14, int(rng.gauss(22 + rooms * 19, 9)))
+        energy_label = rng.choices(ENERGY_LABELS, ENERGY_LABEL_WEIGHTS)[0] if rng.random() > 0.05 else None
+        rent_per_m2 = CITY_PROFILES[city][1]
+        # Most rents are near the market rate; some are well above it (the overpriced listings)
+        markup = rng.uniform(1.2, 1.8) if rng.random() < 0.2 else rng.uniform(0.75, 1.1)
+        advertised_rent = int(round(size * rent_per_m2 * markup / 5.0) * 5)
+        woz_value = int(round(size * rent_per_m2 * rng.uniform(230, 330), -3)) if rng.random() > 0.03 else None
+        property_type = PROPERTY_TYPES[0] if rooms > 1 and rng.random() < 0.6 else rng.choice(PROPERTY_TYPES)
+        listing: Dict[str, Any] = {
+            "id": listing_id,
+            "title": f"{rng.choice(ADJECTIVES)} {rooms}-Room {property_type} in {location}",
+            "location": location,
+            "images": [f"https://images.example.com/listings/{listing_id}/{n}.jpg" for n in range(rng.randint(1, 5))],
+            "advertised_rent": advertised_rent,
+            "size": size,
+            "rooms": rooms,
+            "description": " ".join(rng.choice(DESCRIPTION_WORDS) for _ in range(rng.randint(25, 90))).capitalize() + ".",
+            "amenities": [{"name": name, "icon": icon} for name, icon in rng.sample(AMENITIES, rng.randint(0, 7))],
+            "wws_input_data": {
+                "surface_area": size,
+                "energy_label": energy_label,
+                "woz_value": woz_value,
+                "room_count": rooms,
+            },
+        }
+        if city == "Amsterdam" and postcodes and rng.random() < 0.3:
+            listing["postcode"] = f"{rng.choice(postcodes)} {rng.choice('ABCDEFGHJKLMNPRSTVWXZ')}{rng.choice('ABCDEFGHJKLMNPRSTVWXZ')}"
+        yield listing
+
+def write_catalogue(path: str, count: int, seed: int = 42, output_format: str = "json") -> int:
+    """Writes a generated catalogue as a JSON array ("json", like seed_listings.json) or NDJSON; returns the characters written."""
+    if output_format not in ("json", "ndjson"):
+        raise ValueError(f"Unknown output format '{output_format}'. Expected json or ndjson.")
+    written = 0
+    with open(path, "w", encoding="utf-8") as f:
+        if output_format == "json":
+            written += f.write("[\n")
+        for position, listing in enumerate(generate_source_listings(count, seed)):
+            line = json.dumps(listing, ensure_ascii=False, separators=(",", ":"))
+            if output_format == "json":
+                written += f.write(("," if position else "") + line + "\n")
+            else:
+                written += f.write(line + "\n")
+        if output_format == "json":
+            written += f.write("]\n")
+    return written
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write a seeded synthetic catalogue in the seed_listings.json schema.")
+    parser.add_argument("--listings", type=int, default=10000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--format", dest="output_format", choices=["json", "ndjson"], default="json")
+    parser.add_argument("--output", required=True)
+    arguments = parser.parse_args()
+    size = write_catalogue(arguments.output, arguments.listings, arguments.seed, arguments.output_format)
+    print(f"Wrote {arguments.listings} listings ({size / 1e6:,.1f}M characters) to {arguments.output}.")
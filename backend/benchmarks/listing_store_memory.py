@@ -0,0 +1,150 @@
+import argparse
+import gc
+import inspect
+import os
+import random
+import tracemalloc
+from typing import Callable, Dict, Iterator, List, Tuple
+
+from ..listing_store import ColumnarListingStore
+from ..models import Amenity, Listing, WWSInputData
+from ..repository import InMemoryListingRepository
+from ..response_cache import ListingResponseCache
+from ..wws_calculator import calculate_wws_points
+
+# Resident memory of the in-memory catalogue, in bytes per listing:
+# - the listing store alone: a dict of Pydantic models (plus their WWS inputs), as the repository kept it
+#   before, versus the ColumnarListingStore;
+# - the whole InMemoryListingRepository, broken down per component (store, response bodies, search index,
+#   column indexes, ...). Allocations are attributed to the component module innermost in their traceback;
+#   the full-catalogue bodies (ListingResponseCache.catalogue, kept once requested) are reported apart.
+#
+#   python -m backend.benchmarks.listing_store_memory --listings 50000
+
+LOCATIONS = [f"{city} {district}" for city in ("Amsterdam", "Rotterdam", "Utrecht", "Den Haag", "Eindhoven")
+             for district in ("Centrum", "Noord", "Oost", "Zuid", "West")]
+AMENITIES = [("Balcony", "fas fa-sun"), ("Elevator", "fas fa-elevator"), ("Garden", "fas fa-leaf"), ("Parking", "fas fa-car"),
+             ("Dishwasher", "fas fa-sink"), ("Washing machine", "fas fa-tshirt"), ("Furnished", "fas fa-couch"), ("Storage", "fas fa-box")]
+ENERGY_LABELS = ["A++", "A+", "A", "B", "C", "D", None]
+
+def generate_listings(count: int, seed: int = 42) -> Iterator[Tuple[Listing, WWSInputData]]:
+    """Synthetic, validated (listing, WWS input) pairs; one at a time, so only the store keeps them."""
+    rng = random.Random(seed)
+    for listing_id in range(1, count + 1):
+        size_m2 = float(rng.randint(25, 160))
+        rooms = rng.randint(1, 6)
+        wws_input = WWSInputData(size_m2=size_m2, rooms=rooms, energy_label=rng.choice(ENERGY_LABELS), woz_value=float(rng.randrange(150_000, 900_000, 1000)))
+        points, breakdown = calculate_wws_points(wws_input)
+        listing = Listing(
+            id=listing_id,
+            title=f"{rooms}-room apartment, {size_m2:.0f} m² #{listing_id}",
+            location=rng.choice(LOCATIONS),
+            images=[f"https://images.example.com/listings/{listing_id}/{n}.jpg" for n in range(rng.randint(1, 4))],
+            advertised_rent=float(rng.randrange(700, 3500, 5)),
+            size_m2=size_m2,
+            rooms=rooms,
+            description=" ".join(rng.choice(("Bright", "spacious", "quiet", "renovated", "apartment", "near", "the", "park", "station", "with", "balcony"))
+                                 for _ in range(rng.randint(20, 60))),
+            energy_label=wws_input.energy_label,
+            woz_value=wws_input.woz_value,
+            wws_points=points,
+            max_legal_rent=points * 7.5 + 50.0,
+            amenities=[Amenity(name=name, icon=icon) for name, icon in rng.sample(AMENITIES, rng.randint(0, 5))],
+            wws_breakdown=breakdown,
+        )
+        yield listing, wws_input
+
+def _retained_bytes(build: Callable[[], object]) -> Tuple[int, object]:
+    gc.collect()
+    tracemalloc.start()
+    baseline = tracemalloc.get_traced_memory()[0]
+    store = build()
+    gc.collect()
+    retained = tracemalloc.get_traced_memory()[0] - baseline
+    tracemalloc.stop()
+    return retained, store
+
+def build_model_dicts(count: int):
+    listings, wws_inputs = {}, {}
+    for listing, wws_input in generate_listings(count):
+        listings[listing.id] = listing
+        wws_inputs[listing.id] = wws_input
+    return listings, wws_inputs
+
+def build_columnar_store(count: int) -> ColumnarListingStore:
+    store = ColumnarListingStore()
+    for listing, wws_input in generate_listings(count):
+        store.put(listing, wws_input)
+    return store
+
+# Module of a repository component -> its name in the report (in the order reported)
+COMPONENTS: Dict[str, str] = {
+    "listing_store.py": "ColumnarListingStore",
+    "response_cache.py": "ListingResponseCache (listing bodies)",
+    "search_index.py": "SearchIndex",
+    "listing_index.py": "ListingIndex (column indexes)",
+    "overcharge_index.py": "OverchargeIndex",
+    "market_stats.py": "MarketStats",
+}
+OTHER = "Other"
+CATALOGUE_BODIES = "Full-catalogue bodies"
+TRACEBACK_FRAMES = 16 # Deep enough to reach the component frame from pydantic or json internals
+
+def _source_lines(function) -> Tuple[str, range]:
+    lines, start = inspect.getsourcelines(function)
+    return os.path.basename(inspect.getsourcefile(function)), range(start, start + len(lines))
+
+_CATALOGUE_LINES = _source_lines(ListingResponseCache.catalogue)
+
+def _component_of(traceback: tracemalloc.Traceback) -> str:
+    filename, lines = _CATALOGUE_LINES
+    if any(os.path.basename(frame.filename) == filename and frame.lineno in lines for frame in traceback):
+        return CATALOGUE_BODIES
+    for frame in reversed(traceback): # Innermost frame first
+        component = COMPONENTS.get(os.path.basename(frame.filename))
+        if component is not None:
+            return component
+    return OTHER
+
+def measure_repository(count: int) -> Dict[str, int]:
+    """Bytes held by an InMemoryListingRepository of `count` listings, per component (plus "Total")."""
+    entries: List[Tuple[Listing, WWSInputData]] = list(generate_listings(count)) # Built before tracing starts
+    gc.collect()
+    tracemalloc.start(TRACEBACK_FRAMES)
+    try:
+        repository = InMemoryListingRepository()
+        for listing, wws_input in entries:
+            repository.store(listing, wws_input)
+        repository.rebuild_index()
+        repository.response_cache.catalogue()
+        repository.response_cache.catalogue(summary=True)
+        gc.collect()
+        snapshot = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+    breakdown: Dict[str, int] = {name: 0 for name in [*COMPONENTS.values(), CATALOGUE_BODIES, OTHER]}
+    for trace in snapshot.traces:
+        breakdown[_component_of(trace.traceback)] += trace.size
+    breakdown["Total"] = sum(breakdown.values())
+    return breakdown
+
+def run(count: int):
+    models_bytes, _ = _retained_bytes(lambda: build_model_dicts(count))
+    columnar_bytes, _ = _retained_bytes(lambda: build_columnar_store(count))
+    print(f"Listings: {count}")
+    print("Listing store")
+    print(f"  Dict of Pydantic models:  {models_bytes / count:10,.0f} bytes/listing")
+    print(f"  ColumnarListingStore:     {columnar_bytes / count:10,.0f} bytes/listing")
+    print(f"  Reduction:                {models_bytes / columnar_bytes:10.1f}x")
+
+    breakdown = measure_repository(count)
+    total = breakdown["Total"]
+    print("InMemoryListingRepository")
+    for name, size in breakdown.items():
+        print(f"  {name + ':':40} {size / count:10,.0f} bytes/listing {100 * size / total:6.1f}%")
+    return models_bytes / count, columnar_bytes / count, {name: size / count for name, size in breakdown.items()}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the memory per listing of the in-memory catalogue representations.")
+    parser.add_argument("--listings", type=int, default=20000)
+    run(parser.parse_args().listings)
@@ -0,0 +1,272 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from . import wws_scoring
+from .catalogue_generator import write_catalogue
+
+# Benchmark suite of the backend hot paths, at several catalogue sizes.
+# Every scale gets a generated catalogue (catalogue_generator.py, same seed -> same listings) and runs:
+#   wws   - WWS scoring per listing (wws_scoring.py)
+#   load  - CatalogueLoader from the source file, then from its snapshot (the in-memory backend's startup)
+#   seed  - import_listings into a fresh SQLite file (the database backend's seeding)
+#   http  - latency percentiles and throughput of the API endpoints through TestClient (in-memory backend)
+# Results are written as JSON; --compare reports the metrics that got worse than a previous result file by
+# more than --threshold (and exits with status 1), so two commits can be compared on the same machine.
+#
+#   python -m backend.benchmarks.suite --scales 10000,100000 --output bench-$(git rev-parse --short HEAD).json
+#   python -m backend.benchmarks.suite --scales 10000 --output new.json --compare bench-main.json
+#
+# Metric names end in their unit: *_per_s is better when higher; *_ms, *_us and *_s when lower.
+
+RESULTS_FORMAT = 1
+CASES = ("wws", "load", "seed", "http")
+DEFAULT_SCALES = (10_000, 100_000)
+DEFAULT_REQUESTS = 200
+DEFAULT_THRESHOLD = 0.15
+FULL_CATALOGUE_MAX_LISTINGS = 100_000 # Whole-catalogue responses are only timed up to this size
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(__file__), capture_output=True, text=True, check=True,
+        ).stdout.strip() or None
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def environment() -> Dict[str, Any]:
+    """Where the results were measured; only results from the same machine are comparable."""
+    return {
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "cpu_count": os.cpu_count(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+def _percentile(sorted_values: Sequence[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+def _latency_metrics(prefix: str, seconds: List[float]) -> Dict[str, float]:
+    ordered = sorted(seconds)
+    return {
+        f"{prefix}.p50_ms": _percentile(ordered, 0.50) * 1e3,
+        f"{prefix}.p95_ms": _percentile(ordered, 0.95) * 1e3,
+        f"{prefix}.p99_ms": _percentile(ordered, 0.99) * 1e3,
+        f"{prefix}.requests_per_s": len(seconds) / sum(seconds) if sum(seconds) > 0 else 0.0,
+    }
+
+# --- Cases --- #
+
+def bench_wws(count: int, repeat: int = 3) -> Dict[str, float]:
+    names = {
+        "get_wws_details(dict)": "get_wws_details_dict_us",
+        "score_wws_input": "score_wws_input_us",
+        "score_wws_input + to_details": "score_wws_input_to_details_us",
+        "batch (vectorized)": "batch_us",
+    }
+    # Scoring cost per listing hardly depends on the scale; more than 100k inputs only lengthens the run
+    return {f"wws.{names[name]}": value for name, value in wws_scoring.measure(min(count, 100_000), repeat).items()}
+
+def bench_load(count: int, source_path: str, workdir: str) -> Dict[str, float]:
+    from ..catalogue_loader import CatalogueLoader
+    from ..repository import InMemoryListingRepository
+
+    snapshot_dir = os.path.join(workdir, "snapshots")
+    started = time.perf_counter()
+    loaded = CatalogueLoader(InMemoryListingRepository(), source_path, snapshot_dir=snapshot_dir).run()
+    from_source = time.perf_counter() - started # Includes writing the snapshot
+    started = time.perf_counter()
+    restorer = CatalogueLoader(InMemoryListingRepository(), source_path, snapshot_dir=snapshot_dir)
+    restored = restorer.run()
+    from_snapshot = time.perf_counter() - started
+    if loaded != count or restored != count or restorer.progress.loaded_from != "snapshot":
+        raise RuntimeError(f"Load benchmark loaded {loaded} / restored {restored} of {count} listings.")
+    return {
+        "load.source_s": from_source,
+        "load.source_listings_per_s": count / from_source,
+        "load.snapshot_s": from_snapshot,
+        "load.snapshot_listings_per_s": count / from_snapshot,
+    }
+
+def bench_seed(count: int, source_path: str, workdir: str) -> Dict[str, float]:
+    from .. import database
+    from ..seed_db import import_listings
+
+    previous_url = database.engine.url.render_as_string(hide_password=False)
+    database.configure_database(f"sqlite:///{os.path.join(workdir, 'bench.db')}")
+    try:
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()): # import_listings reports every chunk
+            imported = import_listings(source_path, resume=False, replace=True)
+        elapsed = time.perf_counter() - started
+    finally:
+        database.configure_database(previous_url)
+    if imported != count:
+        raise RuntimeError(f"Seed benchmark imported {imported} of {count} listings.")
+    return {"seed.import_s": elapsed, "seed.listings_per_s": count / elapsed}
+
+def _http_requests(count: int, rng: random.Random) -> List[Tuple[str, Callable[[], Tuple[str, str, Dict[str, Any]]]]]:
+    """(name, request factory) pairs; a factory returns (method, url, keyword arguments for the client)."""
+    search_terms = ["amsterdam", "balcony", "canal", "quiet", "station", "renovated", "utrecht centrum", "spac"]
+    requests = [
+        ("listing_by_id", lambda: ("GET", f"/api/listings/{rng.randint(1, count)}", {})),
+        ("listings_filtered_page", lambda: ("GET", "/api/listings", {"params": {
+            "min_rent": rng.randrange(600, 2500, 50), "min_rooms": rng.randint(1, 3), "sort": "-overpriced", "limit": 50,
+        }})),
+        ("listings_summary_page", lambda: ("GET", "/api/listings", {"params": {"view": "summary", "sort": "rent", "limit": 200}})),
+        ("listings_near", lambda: ("GET", "/api/listings", {"params": {
+            "near": f"{52.37 + rng.uniform(-0.03, 0.03):.4f},{4.89 + rng.uniform(-0.05, 0.05):.4f}", "radius_km": 2, "limit": 50,
+        }})),
+        ("search", lambda: ("GET", "/api/search", {"params": {"q": rng.choice(search_terms), "limit": 20}})),
+        ("batch_lookup", lambda: ("GET", "/api/listings/batch", {"params": {"ids": ",".join(str(rng.randint(1, count)) for _ in range(50))}})),
+        ("wws_calculate", lambda: ("POST", "/api/wws/calculate", {"json": {
+            "size_m2": rng.randint(20, 150), "rooms": rng.randint(1, 5), "energy_label": rng.choice("ABCDE"), "woz_value": rng.randrange(150_000, 900_000, 1000),
+        }})),
+    ]
+    if count <= FULL_CATALOGUE_MAX_LISTINGS:
+        requests.append(("catalogue_summary", lambda: ("GET", "/api/listings", {"params": {"view": "summary"}})))
+    return requests
+
+def bench_http(count: int, source_path: str, requests_per_endpoint: int = DEFAULT_REQUESTS, seed: int = 42) -> Dict[str, float]:
+    from fastapi.testclient import TestClient
+    from .. import main
+    from ..catalogue_loader import CatalogueLoader
+
+    # The app's own repository, filled with the generated catalogue; the client is not entered as a context
+    # manager, so the startup event (which would load seed_listings.json instead) does not run.
+    if main.LISTINGS_BACKEND != "memory":
+        raise RuntimeError("The HTTP benchmark runs against the in-memory backend (unset RENTRIGHT_LISTINGS_BACKEND).")
+    CatalogueLoader(main._MEMORY_REPOSITORY, source_path, snapshot_dir=None).run()
+    client = TestClient(main.app)
+    rng = random.Random(seed)
+    metrics: Dict[str, float] = {}
+    try:
+        for name, make_request in _http_requests(count, rng):
+            rounds = requests_per_endpoint if name != "catalogue_summary" else max(1, requests_per_endpoint // 20)
+            method, url, arguments = make_request()
+            client.request(method, url, **arguments) # Warm-up (fills lazily built caches)
+            seconds: List[float] = []
+            for _ in range(rounds):
+                method, url, arguments = make_request()
+                started = time.perf_counter()
+                response = client.request(method, url, **arguments)
+                seconds.append(time.perf_counter() - started)
+                if response.status_code not in (200, 404): # 404: ids are drawn at random
+                    raise RuntimeError(f"{method} {url} returned {response.status_code}: {response.text[:200]}")
+            metrics.update(_latency_metrics(f"http.{name}", seconds))
+    finally:
+        main._MEMORY_REPOSITORY.clear()
+    return metrics
+
+# --- Suite and comparison --- #
+
+def run_suite(
+    scales: Sequence[int],
+    cases: Sequence[str] = CASES,
+    requests_per_endpoint: int = DEFAULT_REQUESTS,
+    seed: int = 42,
+    repeat: int = 3,
+    log: Callable[[str], None] = print,
+) -> Dict[str, Any]:
+    """Runs `cases` at every scale; returns the results document (see RESULTS_FORMAT)."""
+    unknown = set(cases) - set(CASES)
+    if unknown:
+        raise ValueError(f"Unknown cases: {', '.join(sorted(unknown))}. Expected some of: {', '.join(CASES)}.")
+    results: Dict[str, Dict[str, float]] = {}
+    for count in scales:
+        with tempfile.TemporaryDirectory(prefix="rentright-bench-") as workdir:
+            source_path = os.path.join(workdir, "listings.json")
+            started = time.perf_counter()
+            write_catalogue(source_path, count, seed)
+            log(f"[{count}] generated the catalogue in {time.perf_counter() - started:.1f}s")
+            metrics: Dict[str, float] = {}
+            for case in cases:
+                started = time.perf_counter()
+                if case == "wws":
+                    metrics.update(bench_wws(count, repeat))
+                elif case == "load":
+                    metrics.update(bench_load(count, source_path, workdir))
+                elif case == "seed":
+                    metrics.update(bench_seed(count, source_path, workdir))
+                else:
+                    metrics.update(bench_http(count, source_path, requests_per_endpoint, seed))
+                log(f"[{count}] {case} done in {time.perf_counter() - started:.1f}s")
+            results[str(count)] = metrics
+    return {
+        "format": RESULTS_FORMAT,
+        "environment": environment(),
+        "parameters": {"scales": list(scales), "cases": list(cases), "requests_per_endpoint": requests_per_endpoint, "seed": seed},
+        "results": results,
+    }
+
+def higher_is_better(metric: str) -> bool:
+    return metric.endswith("_per_s")
+
+def compare(baseline: Dict[str, Any], current: Dict[str, Any], threshold: float = DEFAULT_THRESHOLD) -> List[Dict[str, Any]]:
+    """
+    Metrics of `current` that are worse than in `baseline` by more than `threshold` (a fraction), for every scale
+    and metric both documents have. Each entry has the scale, metric, both values and the relative change.
+    """
+    regressions: List[Dict[str, Any]] = []
+    for scale, metrics in current.get("results", {}).items():
+        baseline_metrics = baseline.get("results", {}).get(scale, {})
+        for metric, value in metrics.items():
+            before = baseline_metrics.get(metric)
+            if not before:
+                continue
+            change = (value - before) / before
+            worse = -change if higher_is_better(metric) else change
+            if worse > threshold:
+                regressions.append({"scale": int(scale), "metric": metric, "baseline": before, "current": value, "change": change})
+    return regressions
+
+def _print_results(document: Dict[str, Any]):
+    for scale, metrics in document["results"].items():
+        print(f"\nListings: {scale}")
+        for metric, value in metrics.items():
+            print(f"  {metric:45} {value:14,.3f}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the backend hot paths on generated catalogues.")
+    parser.add_argument("--scales", default=",".join(str(scale) for scale in DEFAULT_SCALES), help="Comma-separated catalogue sizes, e.g. 10000,100000,1000000")
+    parser.add_argument("--cases", default=",".join(CASES), help=f"Comma-separated cases to run ({', '.join(CASES)})")
+    parser.add_argument("--requests", type=int, default=DEFAULT_REQUESTS, help="Timed requests per HTTP endpoint")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per WWS micro-benchmark (the best is kept)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write the results JSON to this file")
+    parser.add_argument("--compare", help="Results JSON of a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD, help="Relative change reported as a regression")
+    arguments = parser.parse_args()
+
+    document = run_suite(
+        [int(scale) for scale in arguments.scales.split(",") if scale.strip()],
+        [case.strip() for case in arguments.cases.split(",") if case.strip()],
+        arguments.requests, arguments.seed, arguments.repeat,
+    )
+    _print_results(document)
+    if arguments.output:
+        with open(arguments.output, "w", encoding="utf-8") as f:
+            json.dump(document, f, indent=2)
+        print(f"\nWrote {arguments.output}")
+    if arguments.compare:
+        with open(arguments.compare, "r", encoding="utf-8") as f:
+            regressions = compare(json.load(f), document, arguments.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {arguments.threshold:.0%}:")
+            for regression in regressions:
+                print(f"  [{regression['scale']}] {regression['metric']}: {regression['baseline']:,.3f} -> {regression['current']:,.3f} ({regression['change']:+.0%})")
+            sys.exit(1)
+        print(f"\nNo regressions above {arguments.threshold:.0%} against {arguments.compare}.")
@@ -0,0 +1,84 @@
+import argparse
+import random
+import time
+from typing import Callable, Dict, List
+
+from ..models import WWSInputData
+from ..wws_calculator import calculate_wws_points_batch_from_inputs, clear_wws_cache, get_wws_details, score_wws_input
+from ..wws_rules import get_active_rule_set
+
+# Time per listing of the WWS scoring paths: get_wws_details on a model_dump() dict (validation, then
+# WWSDetails/WWSBreakdownItem models; its memo cache is cleared per run, so every input is a miss), the
+# fast path on already-validated inputs (compact WWSScore objects), the same plus conversion to WWSDetails,
+# and the vectorized batch.
+#
+#   python -m backend.benchmarks.wws_scoring --listings 50000
+
+ENERGY_LABELS = ["A++", "A+", "A", "B", "C", "D", "E", None]
+
+def generate_inputs(count: int, seed: int = 42) -> List[WWSInputData]:
+    """Validated WWS inputs with mostly distinct values (so get_wws_details hardly hits its cache)."""
+    rng = random.Random(seed)
+    return [
+        WWSInputData(
+            size_m2=float(rng.randint(2500, 16000)) / 100,
+            rooms=rng.randint(1, 6),
+            energy_label=rng.choice(ENERGY_LABELS),
+            woz_value=float(rng.randrange(150_000, 900_000, 100)),
+        )
+        for _ in range(count)
+    ]
+
+def _seconds(function: Callable[[], object], repeat: int) -> float:
+    """Best wall-clock time of `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def measure(count: int, repeat: int = 3) -> Dict[str, float]:
+    """Microseconds per listing of each scoring path."""
+    inputs = generate_inputs(count)
+    dumped = [data.model_dump() for data in inputs]
+    rules = get_active_rule_set()
+
+    def dict_path():
+        clear_wws_cache()
+        for data in dumped:
+            get_wws_details(data)
+
+    def fast_path():
+        for data in inputs:
+            score_wws_input(data, rules)
+
+    def fast_path_with_models():
+        for data in inputs:
+            score_wws_input(data, rules).to_details()
+
+    # Results are discarded in every path, so retained objects (and GC passes over them) do not skew the timings
+    paths = {
+        "get_wws_details(dict)": dict_path,
+        "score_wws_input": fast_path,
+        "score_wws_input + to_details": fast_path_with_models,
+        "batch (vectorized)": lambda: calculate_wws_points_batch_from_inputs(inputs, rules),
+    }
+    microseconds = {name: _seconds(path, repeat) / count * 1e6 for name, path in paths.items()}
+    clear_wws_cache()
+    return microseconds
+
+def run(count: int, repeat: int = 3) -> Dict[str, float]:
+    microseconds = measure(count, repeat)
+    print(f"Listings: {count}")
+    for name, value in microseconds.items():
+        print(f"{name:30} {value:8.2f} µs/listing")
+    print(f"Speed-up of score_wws_input:   {microseconds['get_wws_details(dict)'] / microseconds['score_wws_input']:8.1f}x")
+    return microseconds
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compare the time per listing of the WWS scoring paths.")
+    parser.add_argument("--listings", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    arguments = parser.parse_args()
+    run(arguments.listings, arguments.repeat)
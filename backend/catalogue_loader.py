@@ -0,0 +1,359 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from .catalogue_snapshot import SNAPSHOT_DIR, open_snapshot, remove_stale_snapshots, snapshot_key, snapshot_path, write_snapshot
+from .geo import listing_coordinates
+from .models import Listing, Amenity, WWSInputData, WWSBreakdownItem
+from .projection import SUMMARY_FIELDS, project
+from .repository import InMemoryListingRepository
+from .response_cache import CachedBody, serialize_listing
+from .seed_db import iter_source_listings
+from .wws_calculator import calculate_wws_points_batch_from_inputs
+from .wws_rules import WWSRuleSet, get_active_rule_set
+
+# Background loading of the in-memory catalogue.
+# The source is streamed in chunks; each chunk is validated, WWS-scored in one batch and turned into Listing
+# models. The first chunk is built in the loader thread (small catalogues never pay for worker start-up),
+# the rest in a process pool, whose workers also serialize the listings' full and summary response bodies.
+# The loader thread stores the chunks in source order as they arrive: the columnar store, the overcharge
+# ranking, the market statistics and the search index are updated per listing there (that part of the load
+# does not run in parallel). A listing can be served by id as soon as its chunk is in; the column indexes are
+# rebuilt whenever the catalogue has doubled since the last rebuild (amortized O(n log n) overall) and once
+# more at the end.
+# A completed load is written as a snapshot (see catalogue_snapshot.py); the next start with the same
+# source file and rule set restores the catalogue from it instead of validating and scoring again: the store's
+# columns and the bodies are mapped from the file, and only the per-listing structures are rebuilt.
+
+logger = logging.getLogger(__name__)
+
+LOAD_CHUNK_SIZE = int(os.getenv("RENTRIGHT_LOAD_CHUNK_SIZE", "5000"))
+# Worker processes for chunk building; 0 builds every chunk in the loader thread
+LOAD_WORKERS = int(os.getenv("RENTRIGHT_LOAD_WORKERS", str(min(os.cpu_count() or 1, 4))))
+
+BuiltListing = Tuple[Listing, Optional[WWSInputData]]
+
+def _adapted_wws_input(listing_data: Dict[str, Any]) -> Optional[WWSInputData]:
+    """Maps the source's wws_input_data (surface_area/room_count) to WWSInputData; None if it can't be scored."""
+    listing_id = listing_data.get('id', 'UNKNOWN')
+    wws_input_data_raw = listing_data.get('wws_input_data', {})
+    adapted_wws_input_dict = {
+        "size_m2": wws_input_data_raw.get("surface_area"),
+        "rooms": wws_input_data_raw.get("room_count"),
+        "energy_label": wws_input_data_raw.get("energy_label"),
+        "woz_value": wws_input_data_raw.get("woz_value"),
+    }
+    if adapted_wws_input_dict["size_m2"] is None or adapted_wws_input_dict["rooms"] is None:
+        logger.warning(f"Missing 'surface_area' or 'rooms' for WWS calculation for listing ID {listing_id}. Skipping WWS calculation.")
+        return None
+    try:
+        return WWSInputData(**adapted_wws_input_dict)
+    except Exception as e_calc:
+        logger.warning(f"Could not calculate WWS for listing ID {listing_id}: {e_calc}", exc_info=True)
+        return None
+
+def build_listings_chunk(raw_listings: List[Dict[str, Any]], rules: Optional[WWSRuleSet] = None) -> List[BuiltListing]:
+    """
+    Validates and scores one chunk of source listings (seed_listings.json format) in a single batch.
+    Returns (listing, validated WWS input or None) pairs; listings that fail validation are logged and left out.
+    Runs in worker processes, so it only depends on its arguments.
+    """
+    # Pass 1: validate WWS inputs and collect them for one batch scoring call
+    validated_wws_inputs: Dict[int, WWSInputData] = {} # position in raw_listings -> validated input
+    for position, listing_data in enumerate(raw_listings):
+        validated_wws_input = _adapted_wws_input(listing_data)
+        if validated_wws_input is not None:
+            validated_wws_inputs[position] = validated_wws_input
+    wws_batch = calculate_wws_points_batch_from_inputs(list(validated_wws_inputs.values()), rules)
+    batch_row_by_position = {position: row for row, position in enumerate(validated_wws_inputs)}
+
+    # Pass 2: build the listing models, materializing breakdown items from the batch result
+    built: List[BuiltListing] = []
+    for position, listing_data in enumerate(raw_listings):
+        listing_payload = listing_data.copy()
+        listing_payload.pop('wws_input_data', None)
+        listing_id = listing_data.get('id', 'UNKNOWN')
+
+        wws_points_val: Optional[int] = None
+        max_legal_rent_val: Optional[float] = None
+        wws_breakdown_val: List[WWSBreakdownItem] = []
+
+        batch_row = batch_row_by_position.get(position)
+        if batch_row is not None:
+            wws_points_val = int(wws_batch.points[batch_row])
+            max_legal_rent_val = float(wws_batch.max_rent[batch_row])
+            wws_breakdown_val = wws_batch.breakdown(batch_row)
+            # Expose the raw WWS inputs on the listing (used by the energy label filter)
+            validated_wws_input = validated_wws_inputs[position]
+            listing_payload.setdefault('energy_label', validated_wws_input.energy_label)
+            listing_payload.setdefault('woz_value', validated_wws_input.woz_value)
+
+        coordinates = listing_coordinates(listing_data)
+        if coordinates is not None:
+            listing_payload['latitude'], listing_payload['longitude'] = coordinates
+
+        listing_payload_for_model = {
+            **listing_payload,
+            "wws_points": wws_points_val,
+            "max_legal_rent": max_legal_rent_val,
+            "wws_breakdown": wws_breakdown_val,
+            "amenities": [Amenity(**a) for a in listing_payload.get('amenities', [])]
+        }
+        try:
+            built.append((Listing(**listing_payload_for_model), validated_wws_inputs.get(position)))
+        except Exception as e_model:
+            logger.error(f"Failed to create Listing for ID {listing_id}: {e_model}", exc_info=True)
+    return built
+
+def build_serialized_chunk(raw_listings: List[Dict[str, Any]], rules: Optional[WWSRuleSet] = None) -> List[Tuple[Listing, Optional[WWSInputData], CachedBody, bytes]]:
+    """
+    build_listings_chunk plus the response bodies of every listing: (listing, WWS input, full body, summary
+    body) entries for InMemoryListingRepository.store. Used by the worker processes, so the loader thread
+    only stores the bodies.
+    """
+    return [
+        (listing, wws_input, serialize_listing(listing), project(listing, SUMMARY_FIELDS))
+        for listing, wws_input in build_listings_chunk(raw_listings, rules)
+    ]
+
+def _iter_chunks(source_path: str, chunk_size: int) -> Iterator[List[Dict[str, Any]]]:
+    chunk: List[Dict[str, Any]] = []
+    for listing_data in iter_source_listings(source_path):
+        chunk.append(listing_data)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+class LoadProgress:
+    """Thread-safe progress of a catalogue load, reported by the readiness endpoint."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.state = "pending" # pending -> loading -> ready | failed
+        self.loaded_from: Optional[str] = None # "source" or "snapshot"
+        self.listings_read = 0
+        self.listings_loaded = 0
+        self.chunks_loaded = 0
+        self.error: Optional[str] = None
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    def start(self):
+        with self._lock:
+            self.state = "loading"
+            self.listings_read = self.listings_loaded = self.chunks_loaded = 0
+            self.error = None
+            self.loaded_from = None
+            self._started = time.perf_counter()
+            self._finished = None
+
+    def chunk_loaded(self, read: int, loaded: int):
+        with self._lock:
+            self.listings_read += read
+            self.listings_loaded += loaded
+            self.chunks_loaded += 1
+
+    def finish(self, error: Optional[str] = None):
+        with self._lock:
+            self._finish_locked(error)
+
+    def finish_unless(self, stale: Callable[[], bool]) -> bool:
+        """Marks the load ready unless `stale()` holds, checked atomically with the state change; returns whether it did."""
+        with self._lock:
+            if stale():
+                return False
+            self._finish_locked(None)
+            return True
+
+    def _finish_locked(self, error: Optional[str]):
+        self.state = "failed" if error else "ready"
+        self.error = error
+        self._finished = time.perf_counter()
+
+    @property
+    def ready(self) -> bool:
+        return self.state == "ready"
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            if self._started is None:
+                elapsed = 0.0
+            else:
+                elapsed = (self._finished or time.perf_counter()) - self._started
+            return {
+                "ready": self.state == "ready",
+                "state": self.state,
+                "listings_read": self.listings_read,
+                "listings_loaded": self.listings_loaded,
+                "chunks_loaded": self.chunks_loaded,
+                "loaded_from": self.loaded_from,
+                "elapsed_seconds": round(elapsed, 3),
+                "error": self.error,
+            }
+
+class CatalogueLoader:
+    """Loads a source file into an InMemoryListingRepository, in the background (`start`) or inline (`run`)."""
+
+    def __init__(
+        self,
+        repository: InMemoryListingRepository,
+        source_path: str,
+        chunk_size: int = LOAD_CHUNK_SIZE,
+        workers: int = LOAD_WORKERS,
+        snapshot_dir: Optional[str] = SNAPSHOT_DIR, # None or "" disables snapshots
+    ):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        self.repository = repository
+        self.source_path = source_path
+        self.chunk_size = chunk_size
+        self.workers = workers
+        self.snapshot_dir = snapshot_dir or None
+        self.progress = LoadProgress()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> threading.Thread:
+        """Starts loading in a daemon thread and returns immediately."""
+        self.progress.start()
+        self._thread = threading.Thread(target=self._run_loading, name="catalogue-loader", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until a background load finished; returns whether the catalogue is ready."""
+        if self._thread is not None:
+            self._thread.join(timeout)
+        return self.progress.ready
+
+    def run(self) -> int:
+        """Loads synchronously; returns the number of listings loaded."""
+        self.progress.start()
+        self._run_loading()
+        return self.progress.listings_loaded
+
+    def _store_chunk(self, read: int, built: List[tuple], indexed_size: int) -> int:
+        # Entries are (listing, WWS input) pairs, plus both bodies when built by the workers
+        for entry in built:
+            self.repository.store(*entry)
+        self.progress.chunk_loaded(read, len(built))
+        if len(self.repository) >= 2 * max(indexed_size, 1):
+            self.repository.rebuild_index()
+            return len(self.repository)
+        return indexed_size
+
+    def _run_loading(self):
+        started = time.perf_counter()
+        rules = get_active_rule_set()
+        self.repository.clear()
+        key: Optional[str] = None
+        try:
+            if self.snapshot_dir is not None:
+                key = snapshot_key(self.source_path, rules)
+                if self._restore_snapshot(key):
+                    self.progress.loaded_from = "snapshot"
+                else:
+                    self.progress.loaded_from = "source"
+                    self._load_chunks(rules)
+            else:
+                self.progress.loaded_from = "source"
+                self._load_chunks(rules)
+        except FileNotFoundError:
+            logger.error(f"Mock data file not found at {self.source_path}. API will return empty data.")
+            self.repository.clear()
+            self.progress.finish(f"Source file not found: {self.source_path}")
+            return
+        except ValueError as e: # Includes json.JSONDecodeError
+            logger.error(f"Could not decode JSON from {self.source_path}. Ensure it is valid JSON.", exc_info=True)
+            self.repository.clear()
+            self.progress.finish(f"Invalid source file: {e}")
+            return
+        except Exception as e:
+            logger.error(f"An unexpected error occurred while loading mock data: {e}", exc_info=True)
+            self.repository.clear()
+            self.progress.finish(f"Unexpected error: {e}")
+            return
+
+        self.repository.rebuild_index() # Column indexes + full catalogue body of the complete catalogue
+        if get_active_rule_set() is rules and key is not None and self.progress.loaded_from == "source" and len(self.repository):
+            self._write_snapshot(key)
+        # Rule switches before the load is marked ready are left to the loader (main.rescore_catalogue skips them
+        # while loading), so it only finishes once the rule set it scored with is still the active one: the check
+        # and the state change are atomic, and a switch after them is re-scored by rescore_catalogue.
+        while not self.progress.finish_unless(lambda: get_active_rule_set() is not rules):
+            rules = get_active_rule_set()
+            self.repository.rescore(rules)
+        snapshot = self.progress.snapshot()
+        logger.info(
+            f"Successfully loaded and processed {snapshot['listings_loaded']} listings into in-memory DB "
+            f"in {time.perf_counter() - started:.2f}s ({snapshot['chunks_loaded']} chunks)."
+        )
+        if snapshot['listings_loaded'] != snapshot['listings_read']:
+            logger.warning(f"Attempted to load {snapshot['listings_read']} listings, but only {snapshot['listings_loaded']} were successfully processed.")
+
+    def _restore_snapshot(self, key: str) -> bool:
+        """
+        Fills the repository from the snapshot of `key`; False if there is no usable snapshot.
+        The store's columns and the cached bodies stay views onto the mapping; the per-listing structures
+        (search index, market statistics, overcharge ranking, body lookups) are filled chunk by chunk.
+        """
+        snapshot = open_snapshot(key, self.snapshot_dir)
+        if snapshot is None:
+            return False
+        logger.info(f"Restoring the catalogue from snapshot {snapshot.path}.")
+        self.repository.restore(snapshot.listing_store())
+        chunk: List[tuple] = []
+        for entry in snapshot.iter_bodies():
+            chunk.append(entry)
+            if len(chunk) >= self.chunk_size:
+                self.repository.store_restored(chunk)
+                self.progress.chunk_loaded(len(chunk), len(chunk))
+                chunk = []
+        if chunk:
+            self.repository.store_restored(chunk)
+            self.progress.chunk_loaded(len(chunk), len(chunk))
+        return True
+
+    def _write_snapshot(self, key: str):
+        path = snapshot_path(key, self.snapshot_dir)
+        try:
+            write_snapshot(path, key, self.repository.listings, self.repository.response_cache)
+            remove_stale_snapshots(key, self.snapshot_dir)
+            logger.info(f"Wrote catalogue snapshot {path}.")
+        except OSError as e: # A missing snapshot only costs the next start time
+            logger.warning(f"Could not write catalogue snapshot {path}: {e}")
+
+    def _load_chunks(self, rules: WWSRuleSet):
+        chunks = _iter_chunks(self.source_path, self.chunk_size)
+        indexed_size = 0
+
+        # The first chunk is built inline: small catalogues are done before a pool could even start
+        first_chunk = next(chunks, None)
+        if first_chunk is None:
+            return
+        indexed_size = self._store_chunk(len(first_chunk), build_listings_chunk(first_chunk, rules), indexed_size)
+
+        if self.workers < 1:
+            for chunk in chunks:
+                indexed_size = self._store_chunk(len(chunk), build_listings_chunk(chunk, rules), indexed_size)
+            return
+
+        # "spawn" workers only import this module and its dependencies, never the web app
+        with ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            # Results are stored in submission order (later duplicates of an id win, as in a sequential load);
+            # at most two chunks per worker are in flight so memory stays bounded.
+            in_flight: Deque[Tuple[int, Future]] = deque()
+            for chunk in chunks:
+                in_flight.append((len(chunk), pool.submit(build_serialized_chunk, chunk, rules)))
+                if len(in_flight) >= 2 * self.workers:
+                    read, future = in_flight.popleft()
+                    indexed_size = self._store_chunk(read, future.result(), indexed_size)
+            while in_flight:
+                read, future = in_flight.popleft()
+                indexed_size = self._store_chunk(read, future.result(), indexed_size)
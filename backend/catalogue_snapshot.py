@@ -0,0 +1,218 @@
+import hashlib
+import json
+import mmap
+import os
+import re
+import struct
+import tempfile
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .geo import get_location_table
+from .listing_store import BUFFER_COLUMNS, ROW_COLUMNS, ColumnarListingStore
+from .response_cache import CachedBody, ListingResponseCache
+from .wws_rules import WWSRuleSet
+
+# Binary snapshot of a fully computed in-memory catalogue, for fast warm restarts.
+# The file holds a JSON header (with the intern tables of the store) followed by 8-byte aligned sections:
+# the columns, shared buffers and text of the ColumnarListingStore (see listing_store.py), the body offsets
+# and ETag digests, and two blobs with the serialized full and summary bodies.
+# It is opened with mmap, so the columns are zero-copy views and every worker on a host shares the
+# same page-cache copy: a restored store reads its columns from the mapping, and the cached bodies are
+# views onto it, so nothing is parsed or validated per listing. A snapshot is named after the hash of the source file, the location lookup table
+# and the WWS rule set fingerprint, so a changed source, table or rule set never loads a stale catalogue.
+#
+# Layout: MAGIC (8 bytes) | header length (uint64, little endian) | header JSON | padding | sections
+
+MAGIC = b"RRSNAP01"
+FORMAT_VERSION = 2
+SNAPSHOT_DIR = os.getenv("RENTRIGHT_SNAPSHOT_DIR", os.path.join(os.path.dirname(__file__), "data", "snapshots"))
+_HASH_BLOCK_SIZE = 1 << 20
+_ETAG_DIGEST_SIZE = 16 # blake2b digest size of make_etag
+
+def _align(offset: int) -> int:
+    return (offset + 7) & ~7
+
+def source_digest(source_path: str) -> str:
+    """SHA-256 of the source file contents."""
+    digest = hashlib.sha256()
+    with open(source_path, "rb") as f:
+        for block in iter(lambda: f.read(_HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+def snapshot_key(source_path: str, rules: WWSRuleSet) -> str:
+    """File-name safe key of the catalogue computed from `source_path` under `rules`."""
+    rules_part = re.sub(r"[^A-Za-z0-9_.-]", "-", rules.fingerprint)
+    return f"{source_digest(source_path)[:24]}-{get_location_table().digest[:8]}-{rules_part}"
+
+def snapshot_path(key: str, snapshot_dir: Optional[str] = None) -> str:
+    return os.path.join(snapshot_dir or SNAPSHOT_DIR, f"catalogue-{key}.bin")
+
+def _offsets(bodies: Sequence[bytes]) -> np.ndarray:
+    offsets = np.zeros(len(bodies) + 1, dtype=np.int64)
+    np.cumsum([len(body) for body in bodies], out=offsets[1:])
+    return offsets
+
+def _column_array(column) -> np.ndarray:
+    # Store columns are arrays, memoryviews or the text bytearray; bytes() copies each one in a single call
+    dtype = np.dtype(getattr(column, "typecode", None) or getattr(column, "format", "B"))
+    return np.frombuffer(bytes(column), dtype=dtype)
+
+def write_snapshot(path: str, key: str, listings: ColumnarListingStore, response_cache: ListingResponseCache):
+    """
+    Writes the store columns of `listings` and the cached full and summary bodies of its listings as a
+    snapshot at `path`.
+    The file is written next to its destination and renamed into place, so readers never see a partial file.
+    """
+    columns, tables = listings.export_columns()
+    ids = list(columns["_ids"])
+    cached_bodies = [response_cache.listing(listing_id) for listing_id in ids]
+    bodies = [bytes(cached.body) for cached in cached_bodies]
+    summaries = [bytes(response_cache.summary(listing_id)) for listing_id in ids]
+
+    arrays = {f"store{name}": _column_array(column) for name, column in columns.items()}
+    arrays["body_offsets"] = _offsets(bodies)
+    arrays["etags"] = np.frombuffer(b"".join(bytes.fromhex(cached.etag.strip('"')) for cached in cached_bodies), dtype=np.uint8)
+    arrays["summary_offsets"] = _offsets(summaries)
+    blobs = {"bodies": bodies, "summaries": summaries}
+    sections: Dict[str, Any] = {}
+    offset = 0
+    for name, array in arrays.items():
+        sections[name] = {"offset": offset, "dtype": array.dtype.str, "length": int(array.size)}
+        offset = _align(offset + array.nbytes)
+    for name, blob in blobs.items():
+        length = sum(len(body) for body in blob)
+        sections[name] = {"offset": offset, "dtype": "|u1", "length": length}
+        offset = _align(offset + length)
+
+    header = json.dumps({
+        "format": FORMAT_VERSION,
+        "key": key,
+        "count": len(ids),
+        "max_id": listings.max_id,
+        "tables": tables,
+        "sections": sections,
+    }, separators=(",", ":")).encode("utf-8")
+    data_start = _align(len(MAGIC) + 8 + len(header))
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary_path = tempfile.mkstemp(dir=directory, prefix=".catalogue-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(MAGIC + struct.pack("<Q", len(header)) + header)
+            for name, array in arrays.items():
+                f.seek(data_start + sections[name]["offset"])
+                f.write(array.tobytes())
+            for name, blob in blobs.items():
+                f.seek(data_start + sections[name]["offset"])
+                for body in blob:
+                    f.write(body)
+        os.replace(temporary_path, path)
+    except BaseException:
+        if os.path.exists(temporary_path):
+            os.remove(temporary_path)
+        raise
+
+class CatalogueSnapshot:
+    """A read-only, memory-mapped snapshot. Columns are NumPy views onto the mapping."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if self._mmap[:len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a catalogue snapshot")
+            (header_length,) = struct.unpack_from("<Q", self._mmap, len(MAGIC))
+            header_start = len(MAGIC) + 8
+            header = json.loads(self._mmap[header_start:header_start + header_length])
+            if header.get("format") != FORMAT_VERSION:
+                raise ValueError(f"Unsupported snapshot format {header.get('format')!r} in {path}")
+            data_start = _align(header_start + header_length)
+            self.key: str = header["key"]
+            self._max_id: int = header["max_id"]
+            self._tables: Dict[str, List] = header["tables"]
+            self._columns: Dict[str, np.ndarray] = {}
+            for name, section in header["sections"].items():
+                start = data_start + section["offset"]
+                count = section["length"]
+                dtype = np.dtype(section["dtype"])
+                if not dtype.isnative: # Written on a host with the other byte order
+                    raise ValueError(f"Snapshot {path} has a foreign byte order")
+                if start + count * dtype.itemsize > len(self._mmap):
+                    raise ValueError(f"Truncated snapshot {path}")
+                self._columns[name] = np.frombuffer(self._mmap, dtype=dtype, count=count, offset=start)
+        except (KeyError, TypeError, struct.error, json.JSONDecodeError) as e:
+            self.close()
+            raise ValueError(f"Corrupt snapshot {path}: {e}") from e
+        except ValueError:
+            self.close()
+            raise
+        self.ids = self._columns["store_ids"]
+        self._body_offsets = self._columns["body_offsets"]
+        self._bodies = self._columns["bodies"]
+        self._etags = self._columns["etags"]
+        self._summary_offsets = self._columns["summary_offsets"]
+        self._summaries = self._columns["summaries"]
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def body(self, row: int) -> CachedBody:
+        """The serialized listing of `row`: a zero-copy view onto the mapping, with its ETag."""
+        start, end = int(self._body_offsets[row]), int(self._body_offsets[row + 1])
+        digest = self._etags[row * _ETAG_DIGEST_SIZE:(row + 1) * _ETAG_DIGEST_SIZE].tobytes().hex()
+        return CachedBody(memoryview(self._bodies[start:end]), f'"{digest}"')
+
+    def summary(self, row: int) -> memoryview:
+        """The serialized summary view of `row` (a zero-copy view onto the mapping)."""
+        start, end = int(self._summary_offsets[row]), int(self._summary_offsets[row + 1])
+        return memoryview(self._summaries[start:end])
+
+    def listing_store(self) -> ColumnarListingStore:
+        """The columnar store of the catalogue; its columns are zero-copy views onto the mapping."""
+        columns = {name: memoryview(self._columns[f"store{name}"]) for name in (*ROW_COLUMNS, *BUFFER_COLUMNS, "_text")}
+        return ColumnarListingStore.from_columns(columns, self._tables, self._max_id)
+
+    def iter_bodies(self) -> Iterator[Tuple[int, CachedBody, memoryview]]:
+        """Yields (listing id, cached full body, summary body) per row, in the row order of `listing_store()`."""
+        for row, listing_id in enumerate(self.ids.tolist()):
+            yield listing_id, self.body(row), self.summary(row)
+
+    def close(self):
+        # Views handed out keep the mapping alive; it is unmapped once they are gone
+        self._columns = {}
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass
+
+def open_snapshot(key: str, snapshot_dir: Optional[str] = None) -> Optional[CatalogueSnapshot]:
+    """Opens the snapshot for `key`, or returns None if there is none (or it is unreadable)."""
+    path = snapshot_path(key, snapshot_dir)
+    if not os.path.exists(path):
+        return None
+    try:
+        snapshot = CatalogueSnapshot(path)
+    except (OSError, ValueError):
+        return None
+    if snapshot.key != key:
+        snapshot.close()
+        return None
+    return snapshot
+
+def remove_stale_snapshots(keep_key: str, snapshot_dir: Optional[str] = None):
+    """Deletes snapshots of other keys (workers still mapping one keep their mapping until they exit)."""
+    directory = snapshot_dir or SNAPSHOT_DIR
+    if not os.path.isdir(directory):
+        return
+    keep_name = os.path.basename(snapshot_path(keep_key, directory))
+    for name in os.listdir(directory):
+        if name.startswith("catalogue-") and name.endswith(".bin") and name != keep_name:
+            try:
+                os.remove(os.path.join(directory, name))
+            except OSError:
+                pass
@@ -0,0 +1,197 @@
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+# Change feed shared by the worker processes of one deployment (uvicorn/gunicorn --workers N), without
+# external services: a small SQLite file next to the data that every process appends its changes to
+# (listing writes, WWS rule set switches) and polls for the changes of the others.
+# The log is compacted by key: publishing a change for a key (a listing id, the active rule set) replaces
+# the previous change for it, so the file stays as large as the set of changed keys, and a worker that
+# starts later replays exactly the latest state. Every process applies every change, its own included,
+# in sequence order, so all workers converge on the last write per key.
+# Polls are cheap when nothing changed: SQLite's data_version tells whether another connection committed
+# since the last check. A change reaches every worker within one poll interval (plus applying it).
+
+logger = logging.getLogger(__name__)
+
+# Path of the change log; empty (the default) disables the feed, e.g. for a single process
+CHANGE_LOG_PATH = os.getenv("RENTRIGHT_CHANGE_LOG_PATH", "")
+CHANGE_POLL_INTERVAL_SECONDS = float(os.getenv("RENTRIGHT_CHANGE_POLL_INTERVAL_SECONDS", "0.2"))
+
+class Change(NamedTuple):
+    seq: int
+    origin: str
+    kind: str
+    key: str
+    payload: Any # JSON value; None for a deletion
+
+Handler = Callable[[List[Change]], None]
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    origin TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    key TEXT NOT NULL,
+    payload TEXT,
+    published_at REAL NOT NULL,
+    UNIQUE (kind, key)
+);
+CREATE TABLE IF NOT EXISTS counters (
+    name TEXT PRIMARY KEY,
+    value INTEGER NOT NULL
+);
+"""
+
+class ChangeFeed:
+    """One process's connection to the change log: `publish` changes, `poll` (or `start`) to apply everyone's."""
+
+    def __init__(self, path: str, poll_interval: float = CHANGE_POLL_INTERVAL_SECONDS, origin: Optional[str] = None):
+        self.path = path
+        self.poll_interval = poll_interval
+        self.origin = origin or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._handlers: Dict[str, Handler] = {}
+        self._connection: Optional[sqlite3.Connection] = None
+        self._connection_lock = threading.Lock()
+        self._poll_lock = threading.Lock() # Changes are applied by one thread at a time, in sequence order
+        self._last_seq = 0
+        self._data_version: Optional[int] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"published": 0, "applied": 0, "failed": 0, "polls": 0}
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the last change applied by this process."""
+        return self._last_seq
+
+    def stats(self) -> Dict[str, int]:
+        return {**self._stats, "last_seq": self._last_seq}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL") # Readers do not block the publishing process
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(_SCHEMA)
+            self._connection = connection
+        return self._connection
+
+    def subscribe(self, kind: str, handler: Handler):
+        """Registers the handler applying changes of `kind` (one call per run of consecutive changes of that kind)."""
+        self._handlers[kind] = handler
+
+    def publish(self, kind: str, entries: Iterable[Tuple[str, Any]]) -> int:
+        """Appends (key, payload) changes in one transaction, replacing earlier changes of the same keys; returns the last sequence number."""
+        rows = [(self.origin, kind, str(key), json.dumps(payload, separators=(",", ":")) if payload is not None else None, time.time()) for key, payload in entries]
+        with self._connection_lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                connection.executemany(
+                    "INSERT OR REPLACE INTO changes (origin, kind, key, payload, published_at) VALUES (?, ?, ?, ?, ?)", rows
+                )
+                last_seq = connection.execute("SELECT max(seq) FROM changes").fetchone()[0] or 0
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        self._stats["published"] += len(rows)
+        return last_seq
+
+    def reserve(self, name: str, count: int, floor: int = 0) -> int:
+        """
+        Reserves `count` values of the shared counter `name` for this process: returns the last value before
+        them (the reserved values follow it). The counter never goes below `floor` (e.g. the largest id in use).
+        """
+        with self._connection_lock:
+            connection = self._connect()
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                row = connection.execute("SELECT value FROM counters WHERE name = ?", (name,)).fetchone()
+                last = max(row[0] if row else 0, floor)
+                connection.execute("INSERT OR REPLACE INTO counters (name, value) VALUES (?, ?)", (name, last + count))
+                connection.execute("COMMIT")
+            except Exception:
+                connection.execute("ROLLBACK")
+                raise
+        return last
+
+    def _read_since(self, seq: int, force: bool) -> List[Change]:
+        with self._connection_lock:
+            connection = self._connect()
+            data_version = connection.execute("PRAGMA data_version").fetchone()[0]
+            if not force and data_version == self._data_version:
+                return [] # Nobody else committed since the last poll
+            self._data_version = data_version
+            rows = connection.execute(
+                "SELECT seq, origin, kind, key, payload FROM changes WHERE seq > ? ORDER BY seq", (seq,)
+            ).fetchall()
+        return [Change(seq, origin, kind, key, json.loads(payload) if payload is not None else None) for seq, origin, kind, key, payload in rows]
+
+    def poll(self, force: bool = False) -> int:
+        """
+        Applies the changes published since the last poll, by any process, in sequence order; returns their number.
+        `force` reads the log even if no other process committed (used right after publishing).
+        """
+        with self._poll_lock:
+            self._stats["polls"] += 1
+            changes = self._read_since(self._last_seq, force)
+            position = 0
+            while position < len(changes):
+                # Runs of consecutive changes of one kind are applied together (one batch per handler call)
+                end = position
+                while end < len(changes) and changes[end].kind == changes[position].kind:
+                    end += 1
+                run = changes[position:end]
+                handler = self._handlers.get(run[0].kind)
+                try:
+                    if handler is not None:
+                        handler(run)
+                    self._stats["applied"] += len(run)
+                except Exception as e: # A change that cannot be applied must not stop the feed
+                    self._stats["failed"] += len(run)
+                    logger.error(f"Applying {len(run)} '{run[0].kind}' changes from the change feed failed: {e}", exc_info=True)
+                self._last_seq = run[-1].seq
+                position = end
+            return len(changes)
+
+    def publish_and_apply(self, kind: str, entries: Iterable[Tuple[str, Any]]) -> int:
+        """Publishes changes and applies everything up to them in this process before returning."""
+        self.publish(kind, entries)
+        return self.poll(force=True)
+
+    def start(self) -> threading.Thread:
+        """Replays the log, then keeps polling in a background thread."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="change-feed", daemon=True)
+            self._thread.start()
+        return self._thread
+
+    def _run(self):
+        force = True # The first poll replays the whole log
+        while not self._stop.is_set():
+            try:
+                self.poll(force=force)
+                force = False
+            except sqlite3.Error as e: # E.g. the file is locked for longer than the timeout; retry next interval
+                logger.warning(f"Polling the change feed {self.path} failed: {e}")
+            self._stop.wait(self.poll_interval)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        with self._connection_lock:
+            if self._connection is not None:
+                self._connection.close()
+                self._connection = None
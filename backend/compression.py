@@ -0,0 +1,87 @@
+import gzip
+import zlib
+from typing import Dict, List, Optional
+
+try:
+    import brotli # Optional (pip install Brotli); without it only gzip is offered
+except ImportError: # pragma: no cover - depends on the environment
+    brotli = None
+
+# Content-Encoding negotiation and compression of API responses.
+# Bodies are compressed with brotli ("br", when the Brotli package is installed) or gzip, whichever the
+# client prefers (ties go to br, the smaller one). Small bodies are sent as they are: below MIN_COMPRESS_SIZE
+# the headers cost more than the compression saves. Bodies cached for many requests (the full catalogue)
+# are compressed once at a higher level; everything else at a level that keeps up with the response path.
+
+MIN_COMPRESS_SIZE = 1024
+RESPONSE_LEVELS: Dict[str, int] = {"br": 5, "gzip": 6} # Per-response compression
+CACHED_LEVELS: Dict[str, int] = {"br": 9, "gzip": 9} # Compressed once, served many times
+
+def supported_encodings() -> List[str]:
+    """Encodings this server can produce, most preferred first."""
+    return ["br", "gzip"] if brotli is not None else ["gzip"]
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Picks the Content-Encoding for a request from its Accept-Encoding header (RFC 9110, with q-values),
+    or None to send the body unencoded.
+    """
+    if not accept_encoding:
+        return None
+    qualities: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, parameters = part.strip().partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for parameter in parameters.split(";"):
+            key, _, value = parameter.strip().partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name] = quality
+    wildcard = qualities.get("*", 0.0)
+    best: Optional[str] = None
+    best_quality = 0.0
+    for encoding in supported_encodings():
+        quality = qualities.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+def compress(body: bytes, encoding: str, level: Optional[int] = None) -> bytes:
+    """Compresses a whole body with `encoding` ("br" or "gzip")."""
+    if encoding == "br":
+        return brotli.compress(body, quality=level if level is not None else RESPONSE_LEVELS["br"])
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=level if level is not None else RESPONSE_LEVELS["gzip"], mtime=0)
+    raise ValueError(f"Unsupported content encoding '{encoding}'")
+
+class StreamCompressor:
+    """
+    Incremental compressor for streamed responses: feed chunks with `compress`, end with `flush`.
+    Every chunk is flushed through, so the client can decode it as soon as it arrives.
+    """
+
+    def __init__(self, encoding: str, level: Optional[int] = None):
+        self.encoding = encoding
+        level = level if level is not None else RESPONSE_LEVELS[encoding]
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=level)
+        elif encoding == "gzip":
+            self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31) # wbits 31: gzip container
+        else:
+            raise ValueError(f"Unsupported content encoding '{encoding}'")
+
+    def compress(self, chunk: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(chunk) + self._compressor.flush()
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def flush(self) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush()
@@ -1,5 +1,8 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Text, ForeignKey, JSON
+from sqlalchemy import create_engine, event, inspect, text, Column, Computed, Index, Integer, String, Float, Text, ForeignKey, JSON
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker, relationship, DeclarativeBase
+from sqlalchemy.pool import QueuePool, StaticPool
+from sqlalchemy.schema import CreateIndex
 # from sqlalchemy.ext.declarative import declarative_base # Old style, not used with DeclarativeBase
 from typing import List, Optional, Any # Any for JSON type hint
 import os
@@ -10,38 +13,124 @@ DATABASE_FILE_PATH = os.path.join(os.path.dirname(__file__), "data", "listings.d
 # This assumes `DATABASE_FILE_PATH` is an absolute path (e.g., "/var/data/app.db" or a variable evaluating to such).
 # This correction ensures that the path is interpreted as an absolute path by SQLite (e.g. `sqlite:////var/data/app.db`),
 # resolving the 'unable to open database file' error.
-DATABASE_URL = f"sqlite:///{DATABASE_FILE_PATH}"
+# RENTRIGHT_DATABASE_URL overrides the default file, e.g. "sqlite://" for a throwaway in-memory database in tests.
+DATABASE_URL = os.getenv("RENTRIGHT_DATABASE_URL", f"sqlite:///{DATABASE_FILE_PATH}")
+IN_MEMORY_DATABASE_URL = "sqlite://"
+
+# Connection pool sizing (QueuePool). SQLite in WAL mode allows concurrent readers, so a small pool
+# of persistent connections avoids re-opening the file (and re-running the pragmas) per request.
+DB_POOL_SIZE = int(os.getenv("RENTRIGHT_DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("RENTRIGHT_DB_MAX_OVERFLOW", "10"))
+DB_POOL_TIMEOUT_SECONDS = 30
+
+# Applied to every new SQLite connection
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL", # Readers don't block the writer and vice versa
+    "synchronous": "NORMAL", # Safe with WAL, far fewer fsyncs than FULL
+    "foreign_keys": "ON",
+    "cache_size": "-65536", # 64 MiB page cache per connection (negative = KiB)
+    "temp_store": "MEMORY",
+    "mmap_size": "268435456", # Memory-map up to 256 MiB of the database file
+    "busy_timeout": "5000", # Wait up to 5 s for a lock instead of failing immediately
+}
 
 # Ensure the data directory exists
 os.makedirs(os.path.join(os.path.dirname(__file__), "data"), exist_ok=True)
 
-engine = create_engine(
-    DATABASE_URL, connect_args={"check_same_thread": False} # check_same_thread is for SQLite only
-)
+def _is_in_memory_sqlite(url: str) -> bool:
+    return url in (IN_MEMORY_DATABASE_URL, "sqlite:///:memory:") or "mode=memory" in url
+
+def create_engine_for_url(url: str) -> Engine:
+    """
+    Creates an engine with a tuned connection pool.
+    SQLite connections get SQLITE_PRAGMAS; an in-memory SQLite database uses a single shared
+    connection (StaticPool) so every session sees the same data.
+    """
+    if not url.startswith("sqlite"):
+        return create_engine(
+            url, poolclass=QueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT_SECONDS, pool_pre_ping=True, pool_recycle=1800,
+        )
+
+    in_memory = _is_in_memory_sqlite(url)
+    if in_memory:
+        sqlite_engine = create_engine(url, connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    else:
+        sqlite_engine = create_engine(
+            url, connect_args={"check_same_thread": False}, # check_same_thread is for SQLite only
+            poolclass=QueuePool, pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW, pool_timeout=DB_POOL_TIMEOUT_SECONDS,
+        )
+
+    @event.listens_for(sqlite_engine, "connect")
+    def _apply_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in SQLITE_PRAGMAS.items():
+            if in_memory and name in ("journal_mode", "mmap_size"):
+                continue # Not applicable to in-memory databases
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+    return sqlite_engine
+
+engine = create_engine_for_url(DATABASE_URL)
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+def configure_database(url: str) -> Engine:
+    """Points the module engine and SessionLocal at another database (e.g. IN_MEMORY_DATABASE_URL in tests)."""
+    global engine
+    engine.dispose()
+    engine = create_engine_for_url(url)
+    SessionLocal.configure(bind=engine)
+    return engine
+
 class Base(DeclarativeBase):
     pass
 
+# Expressions of the generated sort key columns of the listings table
+_OVERCHARGE_SQL = "advertised_rent - max_legal_rent"
+_PRICE_PER_M2_SQL = "advertised_rent / NULLIF(size_m2, 0)"
+
 # SQLAlchemy ORM Models
 class ListingORM(Base):
     __tablename__ = "listings"
 
     id = Column(Integer, primary_key=True, index=True)
     title = Column(String, index=True)
-    location = Column(String)
+    location = Column(String, index=True)
     images = Column(JSON) # Store list of image URLs as JSON
-    advertised_rent = Column(Float)
-    size_m2 = Column(Float) # Field name matches WWSInputData and internal consistency
-    rooms = Column(Integer)
+    # Indexed columns back the filters and sort keys of /api/listings
+    advertised_rent = Column(Float, index=True)
+    size_m2 = Column(Float, index=True) # Field name matches WWSInputData and internal consistency
+    rooms = Column(Integer, index=True)
     description = Column(Text)
-    wws_points = Column(Integer, nullable=True)
+    wws_points = Column(Integer, nullable=True, index=True)
     max_legal_rent = Column(Float, nullable=True)
     # Raw data for WWS, if stored
-    energy_label = Column(String, nullable=True)
+    energy_label = Column(String, nullable=True, index=True)
     woz_value = Column(Float, nullable=True)
     raw_wws_inputs = Column(JSON, nullable=True) # Added field to store raw inputs for WWS
+    content_hash = Column(String(64), nullable=True) # Hash of the source listing (incl. WWS inputs), used by seed_db.sync_listings
+    # Fingerprint of the WWS rule set the row was scored under; rows of another rule set are swept up by seed_db.rescore_listings
+    rule_fingerprint = Column(String, nullable=True, index=True)
+    # Coordinates resolved through geo.py; the composite index serves the bounding box of radius queries
+    latitude = Column(Float, nullable=True)
+    longitude = Column(Float, nullable=True)
+    # Derived sort keys (sort=overpriced / price_per_m2 and /api/listings/overpriced) as generated columns, so they
+    # can be indexed: a sorted page is read in index order instead of computing and sorting every row
+    overcharge = Column(Float, Computed(_OVERCHARGE_SQL))
+    price_per_m2 = Column(Float, Computed(_PRICE_PER_M2_SQL))
+
+    __table_args__ = (
+        Index("ix_listings_latitude_longitude", "latitude", "longitude"),
+        Index("ix_listings_overcharge", "overcharge"), # Range scan of the positive overcharges, largest first
+        # Sorted pages order by (value IS NULL, value, id): missing values last in both directions. One index per
+        # direction; the descending one is scanned backwards.
+        Index("ix_listings_overcharge_sort", overcharge.is_(None), overcharge),
+        Index("ix_listings_overcharge_sort_desc", overcharge.is_(None).desc(), overcharge),
+        Index("ix_listings_price_per_m2_sort", price_per_m2.is_(None), price_per_m2),
+        Index("ix_listings_price_per_m2_sort_desc", price_per_m2.is_(None).desc(), price_per_m2),
+    )
 
     amenities = relationship("AmenityORM", back_populates="listing", cascade="all, delete-orphan")
     wws_breakdown = relationship("WWSBreakdownItemORM", back_populates="listing", cascade="all, delete-orphan") # Corrected relationship name to match seed_db.py usage
@@ -52,7 +141,7 @@ class AmenityORM(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String)
     icon = Column(String)
-    listing_id = Column(Integer, ForeignKey("listings.id"))
+    listing_id = Column(Integer, ForeignKey("listings.id"), index=True) # Indexed for eager loading by listing id
 
     listing = relationship("ListingORM", back_populates="amenities")
 
@@ -62,12 +151,137 @@ class WWSBreakdownItemORM(Base):
     id = Column(Integer, primary_key=True, index=True)
     item = Column(String) # e.g., "Surface Area (75 m\texttwosuperior)"
     points = Column(Integer)
-    listing_id = Column(Integer, ForeignKey("listings.id"))
+    listing_id = Column(Integer, ForeignKey("listings.id"), index=True) # Indexed for eager loading by listing id
 
     listing = relationship("ListingORM", back_populates="wws_breakdown")
 
+class ImportCheckpointORM(Base):
+    # Progress of a streaming import (seed_db.import_listings), committed together with each chunk
+    __tablename__ = "import_checkpoints"
+
+    source = Column(String, primary_key=True) # Absolute path of the imported file
+    fingerprint = Column(String) # Size + modification time; a changed file restarts the import
+    rows_committed = Column(Integer, default=0)
+    completed = Column(Integer, default=0) # 1 once the whole file was imported
+
+class ListingChangeORM(Base):
+    # Change log of the figures behind the market statistics, written by triggers (see _CHANGE_LOG_DDL):
+    # one row per listing inserted (+1) or deleted (-1), two per update (old figures -1, new figures +1)
+    __tablename__ = "listing_changes"
+    __table_args__ = {"sqlite_autoincrement": True} # seq is never reused, also after pruning
+
+    seq = Column(Integer, primary_key=True)
+    listing_id = Column(Integer, nullable=False)
+    sign = Column(Integer, nullable=False)
+    location = Column(String)
+    advertised_rent = Column(Float)
+    size_m2 = Column(Float)
+    wws_points = Column(Integer)
+    max_legal_rent = Column(Float)
+
+# Columns added after the first release; create_all only creates missing tables, so existing
+# databases get these through ALTER TABLE (table -> column -> SQL type).
+_ADDED_COLUMNS = {
+    "listings": {
+        "content_hash": "VARCHAR(64)", "latitude": "FLOAT", "longitude": "FLOAT", "rule_fingerprint": "VARCHAR",
+        # SQLite can only add VIRTUAL generated columns (computed on read; the indexes store the values)
+        "overcharge": f"FLOAT GENERATED ALWAYS AS ({_OVERCHARGE_SQL}) VIRTUAL",
+        "price_per_m2": f"FLOAT GENERATED ALWAYS AS ({_PRICE_PER_M2_SQL}) VIRTUAL",
+    },
+}
+
+def _add_missing_columns():
+    inspector = inspect(engine)
+    for table_name, columns in _ADDED_COLUMNS.items():
+        if not inspector.has_table(table_name):
+            continue
+        existing = {column["name"] for column in inspector.get_columns(table_name)}
+        with engine.begin() as connection:
+            for column_name, column_type in columns.items():
+                if column_name not in existing:
+                    connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {column_type}"))
+    # Indexes over added columns (create_all skips every index of an existing table). IF NOT EXISTS instead of
+    # checkfirst: the SQLite inspector does not report expression indexes.
+    with engine.begin() as connection:
+        for index in ListingORM.__table__.indexes:
+            connection.execute(CreateIndex(index, if_not_exists=True))
+
+# Full-text search (SQLite FTS5) over listing titles, locations and descriptions.
+# listings_fts is an external-content index of the listings table, kept in sync by triggers, and
+# listings_fts_vocab exposes its terms (with document counts) for prefix autocomplete. The tokenizer
+# matches search_index.tokenize used by the in-memory backend.
+_SEARCH_INDEX_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS listings_fts USING fts5(
+        title, location, description,
+        content='listings', content_rowid='id', tokenize='unicode61 remove_diacritics 2', prefix='2 3'
+    )""",
+    "CREATE VIRTUAL TABLE IF NOT EXISTS listings_fts_vocab USING fts5vocab(listings_fts, 'row')",
+    """CREATE TRIGGER IF NOT EXISTS listings_fts_insert AFTER INSERT ON listings BEGIN
+        INSERT INTO listings_fts(rowid, title, location, description) VALUES (new.id, new.title, new.location, new.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS listings_fts_delete AFTER DELETE ON listings BEGIN
+        INSERT INTO listings_fts(listings_fts, rowid, title, location, description) VALUES ('delete', old.id, old.title, old.location, old.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS listings_fts_update AFTER UPDATE OF title, location, description ON listings BEGIN
+        INSERT INTO listings_fts(listings_fts, rowid, title, location, description) VALUES ('delete', old.id, old.title, old.location, old.description);
+        INSERT INTO listings_fts(rowid, title, location, description) VALUES (new.id, new.title, new.location, new.description);
+    END""",
+]
+
+def create_search_index(bind: Engine):
+    """Creates the FTS5 search index (SQLite only); an index added to an existing database is built from its listings."""
+    if bind.dialect.name != "sqlite":
+        return
+    with bind.begin() as connection:
+        existed = connection.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'listings_fts'")).first() is not None
+        for statement in _SEARCH_INDEX_DDL:
+            connection.execute(text(statement))
+        if not existed:
+            connection.execute(text("INSERT INTO listings_fts(listings_fts) VALUES ('rebuild')"))
+
+# Change log of the listings table for the market statistics (repository.SqlMarketStats): every write,
+# whoever makes it (API ingestion, re-scoring, seed_db, another worker process), appends the figures it
+# removed and added, so a process holding the aggregates only replays the changes since it last looked.
+# Only the last CHANGE_LOG_SIZE changes are kept; a reader that fell further behind rebuilds from the table.
+CHANGE_LOG_SIZE = 100_000
+_FIGURES = "location, advertised_rent, size_m2, wws_points, max_legal_rent"
+_CHANGE_LOG_DDL = [
+    f"""CREATE TRIGGER IF NOT EXISTS listing_changes_insert AFTER INSERT ON listings BEGIN
+        INSERT INTO listing_changes(listing_id, sign, {_FIGURES})
+        VALUES (new.id, 1, new.location, new.advertised_rent, new.size_m2, new.wws_points, new.max_legal_rent);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS listing_changes_delete AFTER DELETE ON listings BEGIN
+        INSERT INTO listing_changes(listing_id, sign, {_FIGURES})
+        VALUES (old.id, -1, old.location, old.advertised_rent, old.size_m2, old.wws_points, old.max_legal_rent);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS listing_changes_update AFTER UPDATE OF {_FIGURES} ON listings
+    WHEN old.location IS NOT new.location OR old.advertised_rent IS NOT new.advertised_rent OR old.size_m2 IS NOT new.size_m2
+        OR old.wws_points IS NOT new.wws_points OR old.max_legal_rent IS NOT new.max_legal_rent
+    BEGIN
+        INSERT INTO listing_changes(listing_id, sign, {_FIGURES})
+        VALUES (old.id, -1, old.location, old.advertised_rent, old.size_m2, old.wws_points, old.max_legal_rent);
+        INSERT INTO listing_changes(listing_id, sign, {_FIGURES})
+        VALUES (new.id, 1, new.location, new.advertised_rent, new.size_m2, new.wws_points, new.max_legal_rent);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS listing_changes_prune AFTER INSERT ON listing_changes WHEN new.seq % 1000 = 0 BEGIN
+        DELETE FROM listing_changes WHERE seq <= new.seq - {CHANGE_LOG_SIZE};
+    END""",
+]
+
+def create_change_log(bind: Engine):
+    """Creates the listing_changes log and its triggers (SQLite only)."""
+    if bind.dialect.name != "sqlite":
+        return
+    ListingChangeORM.__table__.create(bind=bind, checkfirst=True)
+    with bind.begin() as connection:
+        for statement in _CHANGE_LOG_DDL:
+            connection.execute(text(statement))
+
 def create_db_and_tables():
     Base.metadata.create_all(bind=engine)
+    _add_missing_columns()
+    create_search_index(engine)
+    create_change_log(engine)
 
 # Dependency to get DB session for FastAPI routes
 def get_db():
@@ -0,0 +1,171 @@
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Coordinates for listings and radius queries around a point.
+# Listings only carry a free-text location, so their coordinates are resolved offline through the
+# lookup table in data/locations.json (places, neighbourhoods and 4-digit postcode areas) - no
+# geocoding service is involved. GeoGrid indexes resolved listings in fixed-size latitude/longitude
+# cells, so a radius query only measures the listings in the cells overlapping the search circle.
+#
+# Distances are great-circle (haversine) distances. Longitudes are not wrapped around the antimeridian,
+# which is irrelevant for a catalogue of Dutch listings.
+
+LOCATION_TABLE_PATH = os.path.join(os.path.dirname(__file__), "data", "locations.json")
+EARTH_RADIUS_KM = 6371.0088
+GRID_CELL_DEGREES = 0.05 # About 5.5 km north-south and 3.4 km east-west at Dutch latitudes
+MAX_RADIUS_KM = 500.0
+
+Coordinates = Tuple[float, float] # (latitude, longitude)
+
+_POSTCODE_PATTERN = re.compile(r"\b([1-9][0-9]{3})(?:\s?[a-z]{2})?\b")
+
+def _normalize_place(value: str) -> str:
+    """Case-, accent- and punctuation-insensitive key of a place name ("Oud-West" == "oud west")."""
+    decomposed = unicodedata.normalize("NFKD", value.lower())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return " ".join(re.findall(r"[^\W_]+", stripped))
+
+def haversine_km(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance between two points in km."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = math.sin((phi2 - phi1) / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+def parse_near(value: str) -> Coordinates:
+    """Parses a "lat,lon" query value. Raises ValueError if it is malformed or out of range."""
+    parts = value.split(",")
+    if len(parts) != 2:
+        raise ValueError(f"Invalid near value {value!r}: expected 'lat,lon'.")
+    try:
+        latitude, longitude = float(parts[0]), float(parts[1])
+    except ValueError:
+        raise ValueError(f"Invalid near value {value!r}: expected 'lat,lon'.") from None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError(f"Invalid near value {value!r}: latitude must be within [-90, 90] and longitude within [-180, 180].")
+    return latitude, longitude
+
+class LocationTable:
+    """Place and postcode lookup table, loaded from a locations.json file."""
+
+    def __init__(self, document: Dict[str, Any]):
+        self.places: Dict[str, Coordinates] = {
+            _normalize_place(name): (float(latitude), float(longitude)) for name, (latitude, longitude) in document.get("places", {}).items()
+        }
+        self.postcodes: Dict[str, Coordinates] = {
+            str(postcode): (float(latitude), float(longitude)) for postcode, (latitude, longitude) in document.get("postcodes", {}).items()
+        }
+        canonical = json.dumps([sorted(self.places.items()), sorted(self.postcodes.items())], separators=(",", ":"))
+        self.digest = hashlib.sha256(canonical.encode("utf-8")).hexdigest()[:16]
+
+    def resolve(self, location: Optional[str], postcode: Optional[str] = None) -> Optional[Coordinates]:
+        """
+        Coordinates for a listing location: its postcode area (given, or a Dutch postcode in the location text)
+        if known, else the most specific known place - the full name, then with trailing words dropped
+        ("Amsterdam Oud-West" -> "Amsterdam"). Comma-separated parts are tried last to first.
+        """
+        for text in (postcode, location):
+            match = _POSTCODE_PATTERN.search(text.lower()) if text else None
+            if match and match.group(1) in self.postcodes:
+                return self.postcodes[match.group(1)]
+        if not location:
+            return None
+        for part in reversed([location, *location.split(",")] if "," in location else [location]):
+            words = _normalize_place(part).split()
+            for end in range(len(words), 0, -1):
+                coordinates = self.places.get(" ".join(words[:end]))
+                if coordinates is not None:
+                    return coordinates
+        return None
+
+def load_location_table(path: Optional[str] = None) -> LocationTable:
+    with open(path or LOCATION_TABLE_PATH, "r", encoding="utf-8") as f:
+        return LocationTable(json.load(f))
+
+_default_table: Optional[LocationTable] = None
+_default_table_lock = threading.Lock()
+
+def get_location_table() -> LocationTable:
+    """The shipped lookup table, loaded on first use."""
+    global _default_table
+    if _default_table is None:
+        with _default_table_lock:
+            if _default_table is None:
+                _default_table = load_location_table()
+    return _default_table
+
+def listing_coordinates(listing_data: Dict[str, Any]) -> Optional[Coordinates]:
+    """
+    Coordinates of a source listing (seed_listings.json format): explicit latitude/longitude if present,
+    otherwise resolved from its postcode and location through the lookup table.
+    """
+    latitude, longitude = listing_data.get("latitude"), listing_data.get("longitude")
+    if latitude is not None and longitude is not None:
+        return float(latitude), float(longitude)
+    return get_location_table().resolve(listing_data.get("location"), listing_data.get("postcode"))
+
+def bounding_box(latitude: float, longitude: float, radius_km: float) -> Tuple[float, float, float, float]:
+    """(min lat, max lat, min lon, max lon) of a box containing the circle of `radius_km` around the point."""
+    lat_delta = math.degrees(radius_km / EARTH_RADIUS_KM)
+    widest = min(89.9, abs(latitude) + lat_delta) # The circle is widest on its side nearest to the pole
+    lon_delta = min(180.0, lat_delta / math.cos(math.radians(widest)))
+    return latitude - lat_delta, latitude + lat_delta, longitude - lon_delta, longitude + lon_delta
+
+class GeoGrid:
+    """Listing positions bucketed in GRID_CELL_DEGREES cells, for radius queries."""
+
+    def __init__(self, points: Iterable[Tuple[int, float, float]], cell_degrees: float = GRID_CELL_DEGREES):
+        self.cell_degrees = cell_degrees
+        self._cells: Dict[Tuple[int, int], List[Tuple[int, float, float]]] = {}
+        self._count = 0
+        for listing_id, latitude, longitude in points:
+            self.add(listing_id, latitude, longitude)
+
+    def __len__(self) -> int:
+        return self._count
+
+    def add(self, listing_id: int, latitude: float, longitude: float):
+        self._cells.setdefault(self._cell(latitude, longitude), []).append((listing_id, latitude, longitude))
+        self._count += 1
+
+    def remove(self, listing_id: int, latitude: float, longitude: float) -> bool:
+        """Removes a listing added at this position; False if it is not there. Only its cell is searched."""
+        cell = self._cell(latitude, longitude)
+        points = self._cells.get(cell, [])
+        for position, point in enumerate(points):
+            if point[0] == listing_id:
+                del points[position]
+                if not points:
+                    del self._cells[cell]
+                self._count -= 1
+                return True
+        return False
+
+    def _cell(self, latitude: float, longitude: float) -> Tuple[int, int]:
+        return math.floor(latitude / self.cell_degrees), math.floor(longitude / self.cell_degrees)
+
+    def within(self, latitude: float, longitude: float, radius_km: float) -> Dict[int, float]:
+        """Listing id -> distance in km of every listing within `radius_km` of the point."""
+        min_lat, max_lat, min_lon, max_lon = bounding_box(latitude, longitude, radius_km)
+        (low_row, low_column), (high_row, high_column) = self._cell(min_lat, min_lon), self._cell(max_lat, max_lon)
+        box_cells = (high_row - low_row + 1) * (high_column - low_column + 1)
+        if box_cells <= len(self._cells):
+            cells = (self._cells.get((row, column)) for row in range(low_row, high_row + 1) for column in range(low_column, high_column + 1))
+        else:
+            # Large radius over a sparse grid: walk the occupied cells instead of the box
+            cells = (
+                points for (row, column), points in self._cells.items()
+                if low_row <= row <= high_row and low_column <= column <= high_column
+            )
+        distances: Dict[int, float] = {}
+        for points in cells:
+            for listing_id, point_latitude, point_longitude in points or ():
+                distance = haversine_km(latitude, longitude, point_latitude, point_longitude)
+                if distance <= radius_km:
+                    distances[listing_id] = distance
+        return distances
@@ -0,0 +1,189 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, List, NamedTuple, Optional, Sequence
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from .catalogue_loader import build_listings_chunk
+from .database import ListingORM
+from .models import ListingCreate
+from .repository import InMemoryListingRepository
+from .seed_db import rescore_stale_listings, write_listing_changes
+from .wws_rules import get_active_rule_set
+
+# Write path of the listings API (POST/PUT/DELETE /api/listings).
+# Requests are validated and acknowledged right away; the changes are queued and applied by a small pool of
+# background workers. A worker takes the changes that arrived within a short window (up to a batch size),
+# keeps the last change per listing, scores the batch in one vectorized call and applies it in one
+# transaction (or as per-listing index updates to the in-memory catalogue). Listings are sharded over the
+# workers by id, so the changes of one listing are always applied in submission order.
+# The queue is bounded: when a submission does not fit, it is rejected (HTTP 503 with Retry-After) rather
+# than queued, so acknowledged writes are applied within a bounded delay.
+
+logger = logging.getLogger(__name__)
+
+INGEST_QUEUE_CAPACITY = int(os.getenv("RENTRIGHT_INGEST_QUEUE_CAPACITY", "10000")) # Changes queued or being applied
+INGEST_WORKERS = int(os.getenv("RENTRIGHT_INGEST_WORKERS", "2"))
+INGEST_BATCH_SIZE = int(os.getenv("RENTRIGHT_INGEST_BATCH_SIZE", "500"))
+INGEST_BATCH_WINDOW_MS = float(os.getenv("RENTRIGHT_INGEST_BATCH_WINDOW_MS", "50"))
+
+class IngestionQueueFullError(RuntimeError):
+    """Raised when a submission does not fit in the queue; the client should retry later."""
+
+class ListingChange(NamedTuple):
+    listing_id: int
+    listing: Optional[Dict[str, Any]] # Source listing (seed_listings.json format); None deletes the listing
+
+def to_source_listing(listing_id: int, data: ListingCreate) -> Dict[str, Any]:
+    """A validated listing in the seed_listings.json format that the load and seed paths score and store."""
+    source: Dict[str, Any] = {
+        "id": listing_id,
+        "title": data.title,
+        "location": data.location,
+        "images": list(data.images),
+        "advertised_rent": data.advertised_rent,
+        "size": data.size_m2,
+        "rooms": data.rooms,
+        "description": data.description,
+        "amenities": [amenity.model_dump() for amenity in data.amenities],
+        "wws_input_data": {
+            "surface_area": data.size_m2,
+            "energy_label": data.energy_label,
+            "woz_value": data.woz_value,
+            "room_count": data.rooms,
+        },
+    }
+    if data.latitude is not None and data.longitude is not None:
+        source["latitude"], source["longitude"] = data.latitude, data.longitude
+    return source
+
+def coalesce(changes: Sequence[ListingChange]) -> List[ListingChange]:
+    """The last change of every listing, in the order of those last changes."""
+    latest: Dict[int, ListingChange] = {}
+    for change in changes:
+        latest.pop(change.listing_id, None) # Re-insert so the dict keeps the order of the last changes
+        latest[change.listing_id] = change
+    return list(latest.values())
+
+class IngestionQueue:
+    """Bounded queue of listing changes, applied in batches by `workers` background threads."""
+
+    def __init__(
+        self,
+        apply: Callable[[List[ListingChange]], None],
+        capacity: int = INGEST_QUEUE_CAPACITY,
+        workers: int = INGEST_WORKERS,
+        batch_size: int = INGEST_BATCH_SIZE,
+        batch_window_ms: float = INGEST_BATCH_WINDOW_MS,
+    ):
+        self.apply = apply
+        self.capacity = capacity
+        self.batch_size = max(1, batch_size)
+        self.batch_window = batch_window_ms / 1000.0
+        self._shards: List[Deque[ListingChange]] = [deque() for _ in range(max(1, workers))]
+        self._condition = threading.Condition()
+        self._pending = 0 # Queued or being applied
+        self._threads: List[threading.Thread] = []
+        self._stats = {"accepted": 0, "rejected": 0, "applied": 0, "failed": 0, "batches": 0}
+
+    @property
+    def depth(self) -> int:
+        """Changes queued or being applied."""
+        return self._pending
+
+    def stats(self) -> Dict[str, int]:
+        with self._condition:
+            return {**self._stats, "depth": self._pending, "capacity": self.capacity}
+
+    def _start_workers(self):
+        # Started on first use, so importing the app starts no threads
+        for shard in range(len(self._shards)):
+            thread = threading.Thread(target=self._work, args=(shard,), name=f"listing-ingest-{shard}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, changes: Sequence[ListingChange]) -> int:
+        """
+        Queues `changes` (all or none); returns the queue depth after queuing.
+        Raises IngestionQueueFullError if they do not fit.
+        """
+        with self._condition:
+            if self._pending + len(changes) > self.capacity:
+                self._stats["rejected"] += len(changes)
+                raise IngestionQueueFullError(
+                    f"The ingestion queue is full ({self._pending} of {self.capacity} changes pending); retry later."
+                )
+            if not self._threads:
+                self._start_workers()
+            for change in changes:
+                self._shards[change.listing_id % len(self._shards)].append(change)
+            self._pending += len(changes)
+            self._stats["accepted"] += len(changes)
+            self._condition.notify_all()
+            return self._pending
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until every change submitted so far has been applied (or failed); False on timeout."""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._pending == 0, timeout)
+
+    def _next_batch(self, shard: Deque[ListingChange]) -> List[ListingChange]:
+        with self._condition:
+            self._condition.wait_for(lambda: len(shard) > 0)
+            # Give the batch a short window to fill up; a full batch is taken right away
+            deadline = time.monotonic() + self.batch_window
+            while len(shard) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._condition.wait(remaining):
+                    break
+            return [shard.popleft() for _ in range(min(self.batch_size, len(shard)))]
+
+    def _work(self, shard_index: int):
+        shard = self._shards[shard_index]
+        while True:
+            batch = self._next_batch(shard)
+            failed = 0
+            try:
+                self.apply(coalesce(batch))
+            except Exception as e:
+                failed = len(batch)
+                logger.error(f"Applying {len(batch)} listing changes failed: {e}", exc_info=True)
+            with self._condition:
+                self._pending -= len(batch)
+                self._stats["batches"] += 1
+                self._stats["applied"] += len(batch) - failed
+                self._stats["failed"] += failed
+                self._condition.notify_all()
+
+# --- Appliers --- #
+
+def apply_to_memory(repository: InMemoryListingRepository, changes: List[ListingChange]):
+    """Scores the upserts in one batch (as the catalogue loader does) and applies the batch to the in-memory catalogue."""
+    upserts = [change.listing for change in changes if change.listing is not None]
+    deleted_ids = [change.listing_id for change in changes if change.listing is None]
+    built = build_listings_chunk(upserts, get_active_rule_set()) if upserts else []
+    repository.apply_changes(built, deleted_ids)
+
+def apply_to_database(db: Session, changes: List[ListingChange]):
+    """
+    Writes the batch to the database in one transaction (WWS scored in one batch by insert_listings).
+    If the WWS rule set was switched while the batch was being written, its rows are then re-scored under the
+    new rules: the background re-scoring may already have passed them.
+    """
+    upserts = [change.listing for change in changes if change.listing is not None]
+    try:
+        write_listing_changes(db, upserts, [change.listing_id for change in changes if change.listing is None])
+        db.commit()
+        if upserts:
+            # One primary key lookup of the batch; it matches rows only after a rule switch
+            rescore_stale_listings(db, [listing_data['id'] for listing_data in upserts])
+    except Exception:
+        db.rollback()
+        raise
+
+def max_database_listing_id(db: Session) -> int:
+    return db.execute(select(func.max(ListingORM.id))).scalar() or 0
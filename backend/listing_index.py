@@ -0,0 +1,376 @@
+import base64
+import binascii
+import json
+import threading
+from bisect import bisect_left, bisect_right, insort
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .geo import Coordinates, GeoGrid, haversine_km
+from .models import Listing
+
+# In-memory, column-oriented indexes over the listing catalogue.
+# Numeric columns are kept as sorted (value, listing_id) keys so a range filter is two bisects
+# plus the matching slice (O(log n + k)), and categorical columns map a normalized value to the
+# listing ids carrying it. Listing coordinates sit in a GeoGrid for radius queries. A query starts from
+# the most selective index and checks the remaining predicates against the per-row columns, so it never
+# scans every listing.
+# The index is built in one pass at load time and then updated per listing (upsert / remove): a write
+# re-inserts the listing's keys with a bisect per column instead of re-sorting the catalogue.
+
+# Public sort keys -> internal column names
+SORT_KEYS: Dict[str, str] = {
+    "id": "id",
+    "rent": "advertised_rent",
+    "size": "size_m2",
+    "rooms": "rooms",
+    "price_per_m2": "price_per_m2",
+    "wws_points": "wws_points",
+    "max_legal_rent": "max_legal_rent",
+    "overpriced": "overcharge", # advertised_rent - max_legal_rent
+    "distance": "distance", # km from the `near` point of the query; not a stored column
+}
+
+NUMERIC_COLUMNS = ("id", "advertised_rent", "size_m2", "rooms", "price_per_m2", "wws_points", "max_legal_rent", "overcharge")
+
+SortKey = Tuple[float, int] # (column value, listing id); the id breaks ties so the order is total
+
+def _discard_sorted(values: list, value) -> bool:
+    """Removes `value` from the sorted list `values`; False if it is not there."""
+    position = bisect_left(values, value)
+    if position < len(values) and values[position] == value:
+        del values[position]
+        return True
+    return False
+
+def _column_values(listing: Listing) -> Dict[str, Optional[float]]:
+    """Derives the indexed numeric values of one listing. None means the value is not available."""
+    price_per_m2 = listing.advertised_rent / listing.size_m2 if listing.size_m2 else None
+    overcharge = listing.advertised_rent - listing.max_legal_rent if listing.max_legal_rent is not None else None
+    return {
+        "id": listing.id,
+        "advertised_rent": listing.advertised_rent,
+        "size_m2": listing.size_m2,
+        "rooms": listing.rooms,
+        "price_per_m2": price_per_m2,
+        "wws_points": listing.wws_points,
+        "max_legal_rent": listing.max_legal_rent,
+        "overcharge": overcharge,
+    }
+
+def normalize_location(value: Optional[str]) -> Optional[str]:
+    """Case- and whitespace-insensitive key used for location lookups."""
+    return value.strip().lower() if value and value.strip() else None
+
+def _normalize_label(value: Optional[str]) -> Optional[str]:
+    return value.strip().upper() if value and value.strip() else None
+
+def encode_cursor(value: Optional[float], listing_id: int) -> str:
+    """Encodes the position after (value, listing_id) as an opaque URL-safe cursor."""
+    raw = json.dumps([value, listing_id], separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[Optional[float], int]:
+    """Decodes a cursor produced by `encode_cursor`. Raises ValueError if it is malformed."""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        value, listing_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (binascii.Error, ValueError, TypeError, UnicodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+    if not isinstance(listing_id, int) or (value is not None and not isinstance(value, (int, float))):
+        raise ValueError(f"Invalid cursor: {cursor!r}")
+    return value, listing_id
+
+def check_query_arguments(sort_key: str, near: Optional[Coordinates], radius_km: Optional[float]):
+    """Validates the sort key and the distance arguments of a query. Raises ValueError."""
+    if sort_key not in SORT_KEYS:
+        raise ValueError(f"Unknown sort key '{sort_key}'. Expected one of: {', '.join(SORT_KEYS)}.")
+    if near is None and (radius_km is not None or sort_key == "distance"):
+        raise ValueError("radius_km and sorting by distance require near=lat,lon.")
+    if radius_km is not None and radius_km <= 0:
+        raise ValueError("radius_km must be positive.")
+
+def paginate(
+    keys: List[SortKey],
+    missing: List[int],
+    descending: bool,
+    after: Optional[Tuple[Optional[float], int]],
+    limit: Optional[int],
+) -> Tuple[List[int], Optional[str], int]:
+    """
+    Walks the ordered sequence "keys (asc or desc), then missing ids (asc)" starting after the cursor.
+    Only the returned page is touched, so an unfiltered page costs O(log n + limit).
+    """
+    total = len(keys) + len(missing)
+
+    # Remaining part of the sequence after the cursor, as slices of keys and missing
+    if after is None:
+        key_slice = (0, len(keys))
+        missing_start = 0
+    elif after[0] is None:
+        key_slice = (0, 0)
+        missing_start = bisect_right(missing, after[1])
+    elif descending:
+        key_slice = (0, bisect_left(keys, (after[0], after[1])))
+        missing_start = 0
+    else:
+        key_slice = (bisect_right(keys, (after[0], after[1])), len(keys))
+        missing_start = 0
+
+    remaining = (key_slice[1] - key_slice[0]) + (len(missing) - missing_start)
+    page_size = remaining if limit is None else min(limit, remaining)
+
+    page: List[Tuple[Optional[float], int]] = []
+    take_keys = min(page_size, key_slice[1] - key_slice[0])
+    if descending:
+        page.extend(reversed(keys[key_slice[1] - take_keys:key_slice[1]]))
+    else:
+        page.extend(keys[key_slice[0]:key_slice[0] + take_keys])
+    take_missing = page_size - take_keys
+    page.extend((None, listing_id) for listing_id in missing[missing_start:missing_start + take_missing])
+
+    next_cursor = None
+    if page and page_size < remaining:
+        next_cursor = encode_cursor(page[-1][0], page[-1][1])
+    return [listing_id for _, listing_id in page], next_cursor, total
+
+class SortedColumn:
+    """Sorted (value, listing_id) keys for one numeric column, plus the ids whose value is missing."""
+
+    def __init__(self, keys: List[SortKey], missing: List[int]):
+        keys.sort()
+        missing.sort()
+        self.keys = keys
+        self.missing = missing
+
+    def range_bounds(self, low: Optional[float], high: Optional[float]) -> Tuple[int, int]:
+        """Returns the [start, end) slice of `keys` whose value lies in [low, high]."""
+        start = 0 if low is None else bisect_left(self.keys, (low, float("-inf")))
+        end = len(self.keys) if high is None else bisect_right(self.keys, (high, float("inf")))
+        return start, max(start, end)
+
+    def range_ids(self, low: Optional[float], high: Optional[float]) -> List[int]:
+        start, end = self.range_bounds(low, high)
+        return [listing_id for _, listing_id in self.keys[start:end]]
+
+    def add(self, value: Optional[float], listing_id: int):
+        if value is None:
+            insort(self.missing, listing_id)
+        else:
+            insort(self.keys, (value, listing_id))
+
+    def discard(self, value: Optional[float], listing_id: int):
+        if value is None:
+            _discard_sorted(self.missing, listing_id)
+        else:
+            _discard_sorted(self.keys, (value, listing_id))
+
+class ListingIndex:
+    """
+    Column-oriented index over a set of listings, built once at load time and updated per listing.
+    Takes Listing models or any objects with the same indexed attributes (e.g. listing_store.ListingRow).
+    `query` filters, sorts and paginates and returns listing ids; callers resolve them to models.
+    """
+
+    def __init__(self, listings: Iterable[Listing]):
+        self._lock = threading.Lock() # Queries read several structures that a write updates together
+        self._position: Dict[int, int] = {} # listing id -> row position in the columns
+        self._columns: Dict[str, List[Optional[float]]] = {name: [] for name in NUMERIC_COLUMNS}
+        self._locations: List[Optional[str]] = [] # normalized, per row
+        self._energy_labels: List[Optional[str]] = [] # normalized, per row
+        self._coordinates: List[Optional[Coordinates]] = [] # per row
+        self._by_location: Dict[str, List[int]] = {} # sorted ids
+        self._by_energy_label: Dict[str, List[int]] = {} # sorted ids
+        self._grid = GeoGrid([])
+
+        for listing in listings:
+            self._append_row(listing)
+            if self._locations[-1]:
+                self._by_location.setdefault(self._locations[-1], []).append(listing.id)
+            if self._energy_labels[-1]:
+                self._by_energy_label.setdefault(self._energy_labels[-1], []).append(listing.id)
+            if self._coordinates[-1] is not None:
+                self._grid.add(listing.id, *self._coordinates[-1])
+        for ids in [*self._by_location.values(), *self._by_energy_label.values()]:
+            ids.sort()
+
+        self._sorted: Dict[str, SortedColumn] = {}
+        listing_ids = list(self._position.keys())
+        for name, values in self._columns.items():
+            keys: List[SortKey] = []
+            missing: List[int] = []
+            for listing_id, value in zip(listing_ids, values):
+                if value is None:
+                    missing.append(listing_id)
+                else:
+                    keys.append((value, listing_id))
+            self._sorted[name] = SortedColumn(keys, missing)
+
+    def __len__(self) -> int:
+        return len(self._position)
+
+    def _append_row(self, listing: Listing):
+        """Adds the per-row columns of a listing that is not indexed yet (not the sorted or lookup structures)."""
+        self._position[listing.id] = len(self._locations)
+        for name, value in _column_values(listing).items():
+            self._columns[name].append(value)
+        self._locations.append(normalize_location(listing.location))
+        self._energy_labels.append(_normalize_label(listing.energy_label))
+        has_coordinates = listing.latitude is not None and listing.longitude is not None
+        self._coordinates.append((listing.latitude, listing.longitude) if has_coordinates else None)
+
+    def upsert(self, listing: Listing):
+        """Adds or re-indexes one listing: O(log n) bisects plus the list insertions, no re-sort."""
+        with self._lock:
+            self._remove_locked(listing.id)
+            self._append_row(listing)
+            position = self._position[listing.id]
+            for name, values in self._columns.items():
+                self._sorted[name].add(values[position], listing.id)
+            if self._locations[position]:
+                insort(self._by_location.setdefault(self._locations[position], []), listing.id)
+            if self._energy_labels[position]:
+                insort(self._by_energy_label.setdefault(self._energy_labels[position], []), listing.id)
+            if self._coordinates[position] is not None:
+                self._grid.add(listing.id, *self._coordinates[position])
+
+    def remove(self, listing_id: int) -> bool:
+        """Removes one listing; False if it is not indexed."""
+        with self._lock:
+            return self._remove_locked(listing_id)
+
+    def _remove_locked(self, listing_id: int) -> bool:
+        position = self._position.pop(listing_id, None)
+        if position is None:
+            return False
+        for name, values in self._columns.items():
+            self._sorted[name].discard(values[position], listing_id)
+        for lookup, key in ((self._by_location, self._locations[position]), (self._by_energy_label, self._energy_labels[position])):
+            if key:
+                ids = lookup[key]
+                _discard_sorted(ids, listing_id)
+                if not ids:
+                    del lookup[key]
+        if self._coordinates[position] is not None:
+            self._grid.remove(listing_id, *self._coordinates[position])
+
+        # Move the last row into the freed position, so the per-row columns stay dense
+        last = len(self._locations) - 1
+        if position != last:
+            self._position[int(self._columns["id"][last])] = position
+        for values in [*self._columns.values(), self._locations, self._energy_labels, self._coordinates]:
+            values[position] = values[last]
+            values.pop()
+        return True
+
+    def value(self, column: str, listing_id: int) -> Optional[float]:
+        """Returns the indexed value of `column` for one listing."""
+        with self._lock:
+            return self._columns[column][self._position[listing_id]]
+
+    def query(
+        self,
+        *,
+        min_rent: Optional[float] = None,
+        max_rent: Optional[float] = None,
+        min_size: Optional[float] = None,
+        max_size: Optional[float] = None,
+        min_rooms: Optional[int] = None,
+        max_rooms: Optional[int] = None,
+        location: Optional[str] = None,
+        energy_label: Optional[str] = None,
+        min_wws_points: Optional[int] = None,
+        max_wws_points: Optional[int] = None,
+        near: Optional[Coordinates] = None,
+        radius_km: Optional[float] = None,
+        sort: str = "id",
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+    ) -> Tuple[List[int], Optional[str], int]:
+        """
+        Filters, sorts and paginates the catalogue.
+        `near` (latitude, longitude) with `radius_km` keeps the listings within that distance; `near` also
+        enables the "distance" sort key. `sort` is one of SORT_KEYS, prefixed with '-' for descending order.
+        Listings without a value for the sort key come last. Returns (listing ids of this page, next cursor
+        or None, total matches). Raises ValueError for an unknown sort key, a malformed cursor or a
+        distance filter or sort without `near`.
+        """
+        descending = sort.startswith("-")
+        sort_key = sort[1:] if descending else sort
+        check_query_arguments(sort_key, near, radius_km)
+        sort_column = SORT_KEYS[sort_key]
+        after = decode_cursor(cursor) if cursor else None
+
+        with self._lock:
+            ranges: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+            for column, low, high in (
+                ("advertised_rent", min_rent, max_rent),
+                ("size_m2", min_size, max_size),
+                ("rooms", min_rooms, max_rooms),
+                ("wws_points", min_wws_points, max_wws_points),
+            ):
+                if low is not None or high is not None:
+                    ranges[column] = (low, high)
+
+            # Candidate sources: (number of ids, producer). The smallest one drives the query.
+            sources: List[Tuple[int, Callable[[], List[int]]]] = []
+            if location is not None:
+                ids = self._by_location.get(normalize_location(location) or "", [])
+                sources.append((len(ids), lambda ids=ids: ids))
+            if energy_label is not None:
+                ids = self._by_energy_label.get(_normalize_label(energy_label) or "", [])
+                sources.append((len(ids), lambda ids=ids: ids))
+            for column, (low, high) in ranges.items():
+                start, end = self._sorted[column].range_bounds(low, high)
+                sources.append((end - start, lambda column=column, low=low, high=high: self._sorted[column].range_ids(low, high)))
+            distances: Optional[Dict[int, float]] = None
+            if near is not None and radius_km is not None:
+                distances = self._grid.within(near[0], near[1], radius_km)
+                sources.append((len(distances), lambda: list(distances)))
+
+            if not sources and sort_column != "distance":
+                ordered = self._sorted[sort_column]
+                return paginate(ordered.keys, ordered.missing, descending, after, limit)
+
+            if sources:
+                _, smallest = min(sources, key=lambda source: source[0])
+            else:
+                smallest = lambda: list(self._position) # Distance sort over the whole catalogue
+            normalized_location = normalize_location(location) if location is not None else None
+            normalized_label = _normalize_label(energy_label) if energy_label is not None else None
+
+            keys: List[SortKey] = []
+            missing: List[int] = []
+            sort_values = self._columns.get(sort_column)
+            for listing_id in smallest():
+                position = self._position[listing_id]
+                if distances is not None and listing_id not in distances:
+                    continue
+                if location is not None and self._locations[position] != normalized_location:
+                    continue
+                if energy_label is not None and self._energy_labels[position] != normalized_label:
+                    continue
+                if not all(self._in_range(self._columns[column][position], low, high) for column, (low, high) in ranges.items()):
+                    continue
+                if sort_values is not None:
+                    value = sort_values[position]
+                elif distances is not None:
+                    value = distances[listing_id]
+                else:
+                    value = self._distance(position, near)
+                if value is None:
+                    missing.append(listing_id)
+                else:
+                    keys.append((value, listing_id))
+            keys.sort()
+            missing.sort()
+            return paginate(keys, missing, descending, after, limit)
+
+    def _distance(self, position: int, near: Coordinates) -> Optional[float]:
+        coordinates = self._coordinates[position]
+        return haversine_km(near[0], near[1], *coordinates) if coordinates is not None else None
+
+    @staticmethod
+    def _in_range(value: Optional[float], low: Optional[float], high: Optional[float]) -> bool:
+        if value is None:
+            return False
+        return (low is None or value >= low) and (high is None or value <= high)
@@ -0,0 +1,370 @@
+import math
+from array import array
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+from .models import Amenity, Listing, WWSBreakdownItem, WWSInputData
+
+# Compact, column-oriented storage of the in-memory catalogue.
+# Instead of one Pydantic object graph per listing, every field lives in a typed array (one slot per row):
+# numbers as machine doubles/ints (NaN marks a missing optional value), repeated strings (locations,
+# energy labels, image URLs, amenities, breakdown labels) as codes into shared intern tables, free text as
+# UTF-8 in one byte buffer, and the variable-length lists (images, amenities, WWS breakdown) as
+# (start, count) slices of shared code arrays. Listing models are only materialized when a response
+# needs them.
+#
+# Writes only append: replacing a listing appends a new row and then points its id at it (one dict
+# assignment), so concurrent readers see either the old or the new row, never a half-written one.
+# Replaced and removed rows stay allocated until `compacted()` copies the live rows into a new store.
+#
+# A store restored from a catalogue snapshot (see catalogue_snapshot.py) reads its columns straight from the
+# file mapping, shared by every worker on the host; only the first write copies them into this process.
+
+MISSING_CODE = -1
+
+# Column attribute -> array typecode.
+# Per-row columns hold one value per row:
+ROW_COLUMNS: Dict[str, str] = {
+    "_ids": "q",
+    "_advertised_rent": "d",
+    "_size_m2": "d",
+    "_rooms": "q",
+    "_wws_points": "d", # NaN: not scored
+    "_max_legal_rent": "d", # NaN: not scored
+    "_woz_value": "d", # NaN: unknown
+    "_latitude": "d", # NaN: location not resolved
+    "_longitude": "d",
+    "_location": "i",
+    "_energy_label": "i",
+    "_title": "q", # Start offset in _text; the length is in _title_length
+    "_title_length": "i",
+    "_description": "q",
+    "_description_length": "i",
+    "_images_start": "q",
+    "_images_count": "i",
+    "_amenities_start": "q",
+    "_amenities_count": "i",
+    "_breakdown_start": "q",
+    "_breakdown_count": "i",
+    # WWS inputs, kept to re-score under other rule sets
+    "_wws_present": "b",
+    "_wws_size_m2": "d",
+    "_wws_rooms": "q",
+    "_wws_energy_label": "i",
+    "_wws_woz_value": "d",
+}
+# Shared buffers, addressed by the (start, count) columns:
+BUFFER_COLUMNS: Dict[str, str] = {
+    "_image_codes": "i",
+    "_amenity_codes": "i",
+    "_breakdown_labels": "i",
+    "_breakdown_points": "q",
+}
+# Intern tables (_amenities holds (name, icon) pairs, the others strings):
+INTERN_TABLES = ("_locations", "_energy_labels", "_images", "_amenities", "_breakdown_items")
+
+class InternTable:
+    """Maps hashable values to dense integer codes and back."""
+
+    def __init__(self):
+        self._codes: Dict[Hashable, int] = {}
+        self.values: List = []
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def code(self, value) -> int:
+        if value is None:
+            return MISSING_CODE
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+    def value(self, code: int):
+        return None if code == MISSING_CODE else self.values[code]
+
+    @classmethod
+    def of(cls, values: Iterable[Hashable]) -> "InternTable":
+        """A table holding `values`, coded in that order."""
+        table = cls()
+        table.values = list(values)
+        table._codes = {value: code for code, value in enumerate(table.values)}
+        return table
+
+class ListingRow(NamedTuple):
+    """The indexed fields of one row (what ListingIndex reads), without materializing a Listing."""
+    id: int
+    advertised_rent: float
+    size_m2: float
+    rooms: int
+    wws_points: Optional[int]
+    max_legal_rent: Optional[float]
+    location: str
+    energy_label: Optional[str]
+    latitude: Optional[float]
+    longitude: Optional[float]
+
+def _optional_float(value: float) -> Optional[float]:
+    return None if math.isnan(value) else value
+
+def _nan_if_none(value: Optional[float]) -> float:
+    return math.nan if value is None else float(value)
+
+class ColumnarListingStore:
+    """
+    Listings in typed column arrays, addressed by listing id.
+    Behaves like a read-only mapping of id -> Listing (`store[id]`, `get`, `in`, `len`, iteration over ids);
+    writes go through `put` and `remove`.
+    """
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self._row_by_id: Dict[int, int] = {}
+        self.max_id = 0 # Highest id ever stored (removals do not lower it, so new ids are never reused)
+        for name, typecode in (*ROW_COLUMNS.items(), *BUFFER_COLUMNS.items()):
+            setattr(self, name, array(typecode))
+        self._text = bytearray() # UTF-8 titles and descriptions
+        for name in INTERN_TABLES:
+            setattr(self, name, InternTable())
+        self._borrowed = False # True while the columns are read-only views (see from_columns)
+
+    def __len__(self) -> int:
+        return len(self._row_by_id)
+
+    def __contains__(self, listing_id: int) -> bool:
+        return listing_id in self._row_by_id
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(list(self._row_by_id))
+
+    def __getitem__(self, listing_id: int) -> Listing:
+        return self._materialize(self._row_by_id[listing_id])
+
+    def get(self, listing_id: int) -> Optional[Listing]:
+        row = self._row_by_id.get(listing_id)
+        return self._materialize(row) if row is not None else None
+
+    # --- Writes --- #
+
+    def _own_columns(self):
+        # The first write to a store restored from a snapshot copies its columns into arrays of this process
+        for name, typecode in (*ROW_COLUMNS.items(), *BUFFER_COLUMNS.items()):
+            setattr(self, name, array(typecode, getattr(self, name).tobytes()))
+        self._text = bytearray(self._text)
+        self._borrowed = False
+
+    def _append_text(self, value: str) -> Tuple[int, int]:
+        encoded = value.encode("utf-8")
+        start = len(self._text)
+        self._text += encoded
+        return start, len(encoded)
+
+    def put(self, listing: Listing, wws_input: Optional[WWSInputData] = None):
+        """Stores or replaces a listing (and the WWS inputs it was scored from, if any)."""
+        if self._borrowed:
+            self._own_columns()
+        title = self._append_text(listing.title)
+        description = self._append_text(listing.description)
+        images_start = len(self._image_codes)
+        self._image_codes.extend(self._images.code(image) for image in listing.images)
+        amenities_start = len(self._amenity_codes)
+        self._amenity_codes.extend(self._amenities.code((amenity.name, amenity.icon)) for amenity in listing.amenities)
+        breakdown_start = len(self._breakdown_labels)
+        self._breakdown_labels.extend(self._breakdown_items.code(item.item) for item in listing.wws_breakdown)
+        self._breakdown_points.extend(item.points for item in listing.wws_breakdown)
+
+        values = (
+            (self._ids, listing.id),
+            (self._advertised_rent, listing.advertised_rent),
+            (self._size_m2, listing.size_m2),
+            (self._rooms, listing.rooms),
+            (self._wws_points, _nan_if_none(listing.wws_points)),
+            (self._max_legal_rent, _nan_if_none(listing.max_legal_rent)),
+            (self._woz_value, _nan_if_none(listing.woz_value)),
+            (self._latitude, _nan_if_none(listing.latitude)),
+            (self._longitude, _nan_if_none(listing.longitude)),
+            (self._location, self._locations.code(listing.location)),
+            (self._energy_label, self._energy_labels.code(listing.energy_label)),
+            (self._title, title[0]),
+            (self._title_length, title[1]),
+            (self._description, description[0]),
+            (self._description_length, description[1]),
+            (self._images_start, images_start),
+            (self._images_count, len(listing.images)),
+            (self._amenities_start, amenities_start),
+            (self._amenities_count, len(listing.amenities)),
+            (self._breakdown_start, breakdown_start),
+            (self._breakdown_count, len(listing.wws_breakdown)),
+            (self._wws_present, 1 if wws_input is not None else 0),
+            (self._wws_size_m2, wws_input.size_m2 if wws_input is not None else 0.0),
+            (self._wws_rooms, wws_input.rooms if wws_input is not None else 0),
+            (self._wws_energy_label, self._energy_labels.code(wws_input.energy_label) if wws_input is not None else MISSING_CODE),
+            (self._wws_woz_value, _nan_if_none(wws_input.woz_value) if wws_input is not None else math.nan),
+        )
+        for column, value in values:
+            column.append(value)
+        self._row_by_id[listing.id] = len(self._ids) - 1
+        self.max_id = max(self.max_id, listing.id)
+
+    def remove(self, listing_id: int) -> bool:
+        """Forgets a listing; its row stays allocated (unreachable) until the store is compacted."""
+        return self._row_by_id.pop(listing_id, None) is not None
+
+    @property
+    def dead_rows(self) -> int:
+        """Rows left behind by replaced or removed listings."""
+        return len(self._ids) - len(self._row_by_id)
+
+    def compacted(self) -> "ColumnarListingStore":
+        """A new store holding only the live rows (in insertion order); this store is left unchanged."""
+        compacted = ColumnarListingStore()
+        for listing_id in list(self._row_by_id):
+            compacted.put(self[listing_id], self.wws_input(listing_id))
+        compacted.max_id = max(compacted.max_id, self.max_id)
+        return compacted
+
+    # --- Reads --- #
+
+    def _text_at(self, start: int, length: int) -> str:
+        return str(self._text[start:start + length], "utf-8")
+
+    def _materialize(self, row: int) -> Listing:
+        # Every value comes from a validated Listing, so the models are constructed without re-validation
+        images_start = self._images_start[row]
+        amenities_start = self._amenities_start[row]
+        images = self._images.values
+        amenities = self._amenities.values
+        wws_points = self._wws_points[row]
+        return Listing.model_construct(
+            id=self._ids[row],
+            title=self._text_at(self._title[row], self._title_length[row]),
+            location=self._locations.value(self._location[row]),
+            images=[images[code] for code in self._image_codes[images_start:images_start + self._images_count[row]]],
+            advertised_rent=self._advertised_rent[row],
+            size_m2=self._size_m2[row],
+            rooms=self._rooms[row],
+            description=self._text_at(self._description[row], self._description_length[row]),
+            energy_label=self._energy_labels.value(self._energy_label[row]),
+            woz_value=_optional_float(self._woz_value[row]),
+            latitude=_optional_float(self._latitude[row]),
+            longitude=_optional_float(self._longitude[row]),
+            wws_points=None if math.isnan(wws_points) else int(wws_points),
+            max_legal_rent=_optional_float(self._max_legal_rent[row]),
+            amenities=[
+                Amenity.model_construct(name=amenities[code][0], icon=amenities[code][1])
+                for code in self._amenity_codes[amenities_start:amenities_start + self._amenities_count[row]]
+            ],
+            wws_breakdown=[WWSBreakdownItem.model_construct(item=item, points=points) for item, points in self._breakdown_rows(row)],
+        )
+
+    def _breakdown_rows(self, row: int) -> List[Tuple[str, int]]:
+        start = self._breakdown_start[row]
+        end = start + self._breakdown_count[row]
+        labels = self._breakdown_items.values
+        return [(labels[code], points) for code, points in zip(self._breakdown_labels[start:end], self._breakdown_points[start:end])]
+
+    def breakdown_rows(self, listing_id: int) -> List[Tuple[str, int]]:
+        """(label, points) pairs of a listing's WWS breakdown."""
+        return self._breakdown_rows(self._row_by_id[listing_id])
+
+    def wws_result(self, listing_id: int) -> Tuple[Optional[int], Optional[float]]:
+        """(wws_points, max_legal_rent) of a listing."""
+        row = self._row_by_id[listing_id]
+        wws_points = self._wws_points[row]
+        return (None if math.isnan(wws_points) else int(wws_points)), _optional_float(self._max_legal_rent[row])
+
+    def wws_input(self, listing_id: int) -> Optional[WWSInputData]:
+        row = self._row_by_id[listing_id]
+        if not self._wws_present[row]:
+            return None
+        return WWSInputData.model_construct(
+            size_m2=self._wws_size_m2[row],
+            rooms=self._wws_rooms[row],
+            energy_label=self._energy_labels.value(self._wws_energy_label[row]),
+            woz_value=_optional_float(self._wws_woz_value[row]),
+        )
+
+    def wws_input_columns(self) -> Tuple[List[int], List[float], List[int], List[Optional[str]], List[Optional[float]]]:
+        """(listing ids, size_m2, rooms, energy_label, woz_value) of every listing with WWS inputs, for batch scoring."""
+        rows = [(listing_id, row) for listing_id, row in list(self._row_by_id.items()) if self._wws_present[row]]
+        return (
+            [listing_id for listing_id, _ in rows],
+            [self._wws_size_m2[row] for _, row in rows],
+            [self._wws_rooms[row] for _, row in rows],
+            [self._energy_labels.value(self._wws_energy_label[row]) for _, row in rows],
+            [_optional_float(self._wws_woz_value[row]) for _, row in rows],
+        )
+
+    def text_fields(self, listing_id: int) -> Tuple[str, str, str]:
+        """(title, location, description) of a listing, for the search index."""
+        row = self._row_by_id[listing_id]
+        return (
+            self._text_at(self._title[row], self._title_length[row]),
+            self._locations.value(self._location[row]),
+            self._text_at(self._description[row], self._description_length[row]),
+        )
+
+    def row(self, listing_id: int) -> ListingRow:
+        row = self._row_by_id[listing_id]
+        wws_points = self._wws_points[row]
+        return ListingRow(
+            id=self._ids[row],
+            advertised_rent=self._advertised_rent[row],
+            size_m2=self._size_m2[row],
+            rooms=self._rooms[row],
+            wws_points=None if math.isnan(wws_points) else int(wws_points),
+            max_legal_rent=_optional_float(self._max_legal_rent[row]),
+            location=self._locations.value(self._location[row]),
+            energy_label=self._energy_labels.value(self._energy_label[row]),
+            latitude=_optional_float(self._latitude[row]),
+            longitude=_optional_float(self._longitude[row]),
+        )
+
+    def rows(self) -> List[ListingRow]:
+        """Indexed fields of every listing, in insertion order."""
+        return [self.row(listing_id) for listing_id in list(self._row_by_id)]
+
+    def nbytes(self) -> int:
+        """
+        Approximate memory held by the columns, buffers and intern tables (excluding interpreter overhead).
+        Columns that are views onto a snapshot count in full, although their pages are shared between workers.
+        """
+        columns = [getattr(self, name) for name in (*ROW_COLUMNS, *BUFFER_COLUMNS)]
+        total = sum(len(column) * column.itemsize for column in columns) + len(self._text)
+        for table in (self._locations, self._energy_labels, self._images, self._breakdown_items):
+            total += sum(len(value.encode("utf-8")) for value in table.values)
+        total += sum(len(name.encode("utf-8")) + len(icon.encode("utf-8")) for name, icon in self._amenities.values)
+        return total
+
+    # --- Snapshots --- #
+
+    def export_columns(self) -> Tuple[Dict[str, Sequence], Dict[str, List]]:
+        """
+        ({column attribute: column}, {intern table attribute: values}) of the live rows, in insertion order,
+        for writing a snapshot. The columns include the shared buffers and "_text".
+        """
+        if self.dead_rows:
+            return self.compacted().export_columns()
+        columns = {name: getattr(self, name) for name in (*ROW_COLUMNS, *BUFFER_COLUMNS, "_text")}
+        return columns, {name: list(getattr(self, name).values) for name in INTERN_TABLES}
+
+    @classmethod
+    def from_columns(cls, columns: Dict[str, Sequence], tables: Dict[str, Iterable[Any]], max_id: int = 0) -> "ColumnarListingStore":
+        """
+        A store over exported columns without copying them, e.g. read-only memoryviews onto a snapshot
+        mapping (their item sizes must match the column typecodes). The columns stay views until the first
+        write, which copies them into arrays.
+        """
+        store = cls()
+        for name in (*ROW_COLUMNS, *BUFFER_COLUMNS, "_text"):
+            setattr(store, name, columns[name])
+        for name in INTERN_TABLES:
+            values = tables[name]
+            setattr(store, name, InternTable.of(map(tuple, values)) if name == "_amenities" else InternTable.of(values))
+        store._row_by_id = {listing_id: row for row, listing_id in enumerate(store._ids)}
+        store.max_id = max(max_id, max(store._row_by_id, default=0))
+        store._borrowed = True
+        return store
@@ -1,15 +1,38 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request, Depends
+from fastapi.responses import JSONResponse, PlainTextResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 # FileResponse removed as it's not used
-from typing import List, Dict, Any, Optional # Any kept for flexibility, though not explicitly used in this file
+from typing import List, Dict, Any, Optional, Iterator # Any kept for flexibility, though not explicitly used in this file
 import json
+from pydantic_core import to_json
 import os
 import logging # Added for better logging practice
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 # Import models from .models and .wws_calculator
-from .models import Listing as PydanticListing, Amenity as PydanticAmenity, WWSInputData, WWSDetails, WWSBreakdownItem as PydanticWWSBreakdownItem
-from .wws_calculator import get_wws_details
+from .models import (
+    Listing as PydanticListing, ListingBatch, ListingBatchRequest, OverpricedListing, WWSRulesStatus, WWSRulesActivation, LoadStatus,
+    ListingBulkRequest, ListingCreate, ListingWriteAccepted, MarketStatsSummary,
+    WWSBatchCalculationRequest, WWSCalculationResult, WWSDetails, WWSInputData,
+)
+from .wws_rules import UnknownRuleSetError, WWSRuleSet, activate_rule_set, add_rule_set_listener, available_rule_versions, get_active_rule_set
+from .geo import MAX_RADIUS_KM, parse_near
+from .projection import parse_projection
+from .response_cache import cached_json_response, json_response
+from .streaming import NDJSON_MEDIA_TYPE, STREAM_FORMATS, streamed_json_response
+from .repository import ListingRepository, InMemoryListingRepository, SqlListingRepository
+from .catalogue_loader import CatalogueLoader
+from .database import SessionLocal, create_db_and_tables
+from .seed_db import rescore_listings
+from .wws_batching import WWSMicroBatcher, calculate_wws_rows
+from .ingestion import (
+    IngestionQueue, IngestionQueueFullError, ListingChange, apply_to_database, apply_to_memory, max_database_listing_id, to_source_listing,
+)
+from .change_feed import CHANGE_LOG_PATH, Change, ChangeFeed
+from .metrics import PROMETHEUS_CONTENT_TYPE, REGISTRY, MetricsMiddleware
+from .profiler import MAX_PROFILE_SECONDS, PROFILING_ENABLED, ProfilerBusyError, SamplingProfiler, folded
+from .static_files import PrecompressedStaticFiles
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -34,86 +57,135 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=origins,
     allow_credentials=True,
-    allow_methods=["GET"], # Restrict to GET if only GET is needed for these endpoints
-    allow_headers=["Content-Type"], # Be specific about allowed headers if possible
+    allow_methods=["GET", "POST", "PUT", "DELETE"], # POST: batch lookups, WWS calculations and listing writes
+    allow_headers=["Accept", "Content-Type", "If-None-Match"], # Be specific about allowed headers if possible
+    expose_headers=["ETag", "X-Next-Cursor", "X-Total-Count", "X-Error-Count", "Location", "Retry-After"], # Caching and pagination headers of /api/listings, batch error counts, queued writes
 )
 
-# --- Mock Database --- #
-_MOCK_LISTINGS_DB: Dict[int, PydanticListing] = {}
+# --- Metrics Middleware --- #
+# Per-route request counts, latency and response size histograms and in-flight requests (see metrics.py, GET /metrics)
+app.add_middleware(MetricsMiddleware)
+
+# --- Listing Store --- #
+# "memory": the catalogue is loaded from seed_listings.json into process memory at startup (default).
+# "database": listings are read from the SQLAlchemy store (see database.py; seed it with `python -m backend.seed_db`).
+LISTINGS_BACKEND = os.getenv("RENTRIGHT_LISTINGS_BACKEND", "memory").lower()
+
+# In-memory catalogue with its indexes, overcharge ranking and pre-serialized response bodies
+_MEMORY_REPOSITORY = InMemoryListingRepository()
+
+def get_listing_repository() -> Iterator[ListingRepository]:
+    """FastAPI dependency returning the configured listing store (one pooled session per request for the database)."""
+    if LISTINGS_BACKEND == "database":
+        db = SessionLocal()
+        try:
+            yield SqlListingRepository(db)
+        finally:
+            db.close()
+    else:
+        yield _MEMORY_REPOSITORY
+
+# Background loader of the in-memory catalogue (see catalogue_loader.py)
+SEED_LISTINGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'seed_listings.json')
+_CATALOGUE_LOADER = CatalogueLoader(_MEMORY_REPOSITORY, SEED_LISTINGS_PATH)
 
 def load_mock_data():
-    global _MOCK_LISTINGS_DB
-    # Use absolute path for data file to be robust
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    data_file_path = os.path.join(base_dir, 'data', 'seed_listings.json')
-    
+    """Loads seed_listings.json into the in-memory catalogue synchronously (startup loads it in the background)."""
+    _CATALOGUE_LOADER.run()
+
+# --- WWS Rule Set Switching --- #
+# Activating another rule set (PUT /api/wws/rules/active) swaps the tables atomically; the listings are then
+# re-scored on a single background worker, so requests keep being served (with the previous scores until a
+# listing's new result is stored). Jobs run one at a time, and a job whose rule set was superseded is skipped.
+_RESCORE_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="wws-rescore")
+# Re-scoring and ingestion batches (see Listing Writes) write the in-memory catalogue one at a time
+_MEMORY_WRITE_LOCK = threading.Lock()
+_PENDING_RESCORES = 0
+_PENDING_RESCORES_LOCK = threading.Lock()
+
+def rescore_catalogue(rules: WWSRuleSet) -> int:
+    """Re-scores the configured listing store under `rules`; returns the number of changed listings."""
+    if get_active_rule_set() is not rules:
+        logger.info(f"Skipping re-scoring for superseded WWS rule set {rules.version}.")
+        return 0
+    if LISTINGS_BACKEND == "database":
+        stats = rescore_listings(rules)
+        changed = stats.changed
+        if stats.skipped:
+            logger.warning(f"Re-scoring under WWS rule set {rules.version} skipped {stats.skipped} listings without valid WWS inputs.")
+    elif _CATALOGUE_LOADER.progress.state == "loading":
+        # The loader re-scores the catalogue itself once it is complete (see CatalogueLoader)
+        logger.info(f"Catalogue is still loading; it will be re-scored under WWS rule set {rules.version} when complete.")
+        return 0
+    else:
+        with _MEMORY_WRITE_LOCK:
+            changed = _MEMORY_REPOSITORY.rescore(rules)
+    logger.info(f"Re-scored listings under WWS rule set {rules.version}: {changed} changed.")
+    return changed
+
+def _run_rescore(rules: WWSRuleSet):
+    global _PENDING_RESCORES
     try:
-        with open(data_file_path, 'r', encoding='utf-8') as f:
-            raw_listings_data = json.load(f)
-            processed_listings_count = 0
-            for listing_data_from_json in raw_listings_data:
-                listing_payload = listing_data_from_json.copy()
-                listing_id = listing_data_from_json.get('id', 'UNKNOWN')
-
-                wws_input_data_raw = listing_payload.pop('wws_input_data', {})
-                
-                adapted_wws_input_dict = {
-                    "size_m2": wws_input_data_raw.get("surface_area"),
-                    "rooms": wws_input_data_raw.get("room_count"),
-                    "energy_label": wws_input_data_raw.get("energy_label"),
-                    "woz_value": wws_input_data_raw.get("woz_value"),
-                }
-                
-                wws_points_val: Optional[int] = None
-                max_legal_rent_val: Optional[float] = None
-                wws_breakdown_val: List[PydanticWWSBreakdownItem] = []
-
-                if adapted_wws_input_dict["size_m2"] is not None and adapted_wws_input_dict["rooms"] is not None:
-                    try:
-                        validated_wws_input = WWSInputData(**adapted_wws_input_dict)
-                        wws_details_result: WWSDetails = get_wws_details(validated_wws_input.model_dump())
-                        wws_points_val = wws_details_result.points
-                        max_legal_rent_val = wws_details_result.max_rent
-                        wws_breakdown_val = wws_details_result.breakdown
-                    except Exception as e_calc:
-                        logger.warning(f"Could not calculate WWS for listing ID {listing_id}: {e_calc}", exc_info=True)
-                else:
-                    logger.warning(f"Missing 'surface_area' or 'rooms' for WWS calculation for listing ID {listing_id}. Skipping WWS calculation.")
-
-                listing_payload_for_model = {
-                    **listing_payload,
-                    "wws_points": wws_points_val,
-                    "max_legal_rent": max_legal_rent_val,
-                    "wws_breakdown": wws_breakdown_val,
-                    "amenities": [PydanticAmenity(**a) for a in listing_payload.get('amenities', [])]
-                }
-                
-                try:
-                    listing_obj = PydanticListing(**listing_payload_for_model)
-                    _MOCK_LISTINGS_DB[listing_obj.id] = listing_obj
-                    processed_listings_count += 1
-                except Exception as e_model:
-                     logger.error(f"Failed to create PydanticListing for ID {listing_id}: {e_model}", exc_info=True)
-
-            logger.info(f"Successfully loaded and processed {processed_listings_count} listings into in-memory DB.")
-            if processed_listings_count != len(raw_listings_data):
-                logger.warning(f"Attempted to load {len(raw_listings_data)} listings, but only {processed_listings_count} were successfully processed.")
-
-    except FileNotFoundError:
-        logger.error(f"Mock data file not found at {data_file_path}. API will return empty data.")
-        _MOCK_LISTINGS_DB = {}
-    except json.JSONDecodeError:
-        logger.error(f"Could not decode JSON from {data_file_path}. Ensure it is valid JSON.", exc_info=True)
-        _MOCK_LISTINGS_DB = {}
+        return rescore_catalogue(rules)
     except Exception as e:
-        logger.error(f"An unexpected error occurred while loading mock data: {e}", exc_info=True)
-        _MOCK_LISTINGS_DB = {}
+        logger.error(f"Re-scoring under WWS rule set {rules.version} failed: {e}", exc_info=True)
+    finally:
+        with _PENDING_RESCORES_LOCK:
+            _PENDING_RESCORES -= 1
+
+def _schedule_rescore(old_rules: WWSRuleSet, new_rules: WWSRuleSet):
+    global _PENDING_RESCORES
+    if LISTINGS_BACKEND == "database" and getattr(_APPLYING_FEED_CHANGE, "active", False):
+        # Another worker switched the rule set and re-scores the shared database itself
+        logger.info(f"WWS rule set switched from {old_rules.version} to {new_rules.version} by another worker.")
+        return None
+    logger.info(f"WWS rule set switched from {old_rules.version} to {new_rules.version}; re-scoring in the background.")
+    with _PENDING_RESCORES_LOCK:
+        _PENDING_RESCORES += 1
+    return _RESCORE_EXECUTOR.submit(_run_rescore, new_rules)
+
+add_rule_set_listener(_schedule_rescore)
+
+# --- Cross-worker Change Feed --- #
+# With several worker processes (uvicorn/gunicorn --workers N), RENTRIGHT_CHANGE_LOG_PATH names a change log
+# shared by all of them (see change_feed.py). Rule set switches, and listing writes of the in-memory
+# catalogue, are published there and applied by every worker in the same order; ids of new listings are
+# reserved from a counter in the same file. Without it, every process is on its own (the default).
+_CHANGE_FEED: Optional[ChangeFeed] = ChangeFeed(CHANGE_LOG_PATH) if CHANGE_LOG_PATH else None
+_APPLYING_FEED_CHANGE = threading.local() # Set while a change published by the feed is being applied
+
+def _apply_feed_rules_changes(changes: List[Change]):
+    version = changes[-1].payload["version"] # The log keeps one "active" entry; the last one wins anyway
+    if get_active_rule_set().version == version:
+        return # Switched by this worker (or already applied)
+    _APPLYING_FEED_CHANGE.active = True
+    try:
+        activate_rule_set(version)
+    finally:
+        _APPLYING_FEED_CHANGE.active = False
 
 @app.on_event("startup")
 async def startup_event():
-    logger.info("Application startup: loading mock data...")
-    load_mock_data()
-    logger.info("Mock data loading complete.")
+    if LISTINGS_BACKEND == "database":
+        logger.info("Application startup: serving listings from the database.")
+        create_db_and_tables() # Idempotent; the data itself comes from seed_db
+        return
+    # Loading runs in the background: requests are accepted right away and listings are served as their
+    # chunk is loaded. /api/ready reports the progress.
+    logger.info("Application startup: loading mock data in the background...")
+    _CATALOGUE_LOADER.start()
+
+@app.on_event("startup")
+async def start_change_feed():
+    if _CHANGE_FEED is not None:
+        # Replays the log (the rule set and listing writes other workers published), then keeps polling it
+        logger.info(f"Following the change feed {_CHANGE_FEED.path} as {_CHANGE_FEED.origin}.")
+        _CHANGE_FEED.start()
+
+@app.on_event("shutdown")
+async def stop_change_feed():
+    if _CHANGE_FEED is not None:
+        _CHANGE_FEED.stop()
 
 # --- API Endpoints (Define before SPA mount) --- #
 
@@ -121,20 +193,438 @@ async def startup_event():
 async def read_api_root():
     return {"message": "Welcome to the RentRightNL API. Visit /docs for API documentation."}
 
+@app.get("/api/ready", response_model=LoadStatus)
+def read_readiness():
+    """
+    Readiness probe: 200 once the catalogue is completely loaded, 503 while it is loading (or failed),
+    with the load progress in both cases. Listings already loaded are served during the load.
+    """
+    if LISTINGS_BACKEND == "database":
+        return LoadStatus(ready=True, state="ready", listings_read=0, listings_loaded=0, chunks_loaded=0, elapsed_seconds=0.0)
+    status = LoadStatus(**_CATALOGUE_LOADER.progress.snapshot())
+    if not status.ready:
+        return JSONResponse(status_code=503, content=status.model_dump())
+    return status
+
+FIELDS_DESCRIPTION = "Comma-separated fields to return (JSON names, plus 'image': the first image URL); id is always included"
+VIEW_DESCRIPTION = "'summary': the fields of a listing card (id, title, location, image, advertisedRent, size, rooms, wwsPoints, maxLegalRent)"
+
+# The listing endpoints are plain `def` so FastAPI runs them in its threadpool: with the database backend
+# they perform blocking queries, which must not stall the event loop.
+
 @app.get("/api/listings", response_model=List[PydanticListing], response_model_by_alias=True)
-async def get_all_listings():
-    """Retrieve all available apartment listings."""
-    if not _MOCK_LISTINGS_DB:
-        return [] 
-    return list(_MOCK_LISTINGS_DB.values())
+def get_all_listings(
+    request: Request,
+    repository: ListingRepository = Depends(get_listing_repository),
+    min_rent: Optional[float] = Query(None, ge=0, description="Minimum advertised rent (EUR/month)"),
+    max_rent: Optional[float] = Query(None, ge=0, description="Maximum advertised rent (EUR/month)"),
+    min_size: Optional[float] = Query(None, ge=0, description="Minimum size in m²"),
+    max_size: Optional[float] = Query(None, ge=0, description="Maximum size in m²"),
+    min_rooms: Optional[int] = Query(None, ge=0),
+    max_rooms: Optional[int] = Query(None, ge=0),
+    location: Optional[str] = Query(None, description="Exact location, case-insensitive (e.g. 'Amsterdam Centrum')"),
+    energy_label: Optional[str] = Query(None, description="Energy label, e.g. 'A' or 'B'"),
+    min_wws_points: Optional[int] = Query(None, ge=0),
+    max_wws_points: Optional[int] = Query(None, ge=0),
+    near: Optional[str] = Query(None, description="'lat,lon' of a point; enables radius_km and the distance sort (the default with near)"),
+    radius_km: Optional[float] = Query(None, gt=0, le=MAX_RADIUS_KM, description="Keep listings within this distance of `near`"),
+    sort: Optional[str] = Query(None, description="rent, size, rooms, price_per_m2, wws_points, max_legal_rent, overpriced, distance or id; prefix with '-' for descending"),
+    cursor: Optional[str] = Query(None, description="Opaque cursor from the X-Next-Cursor header of the previous page"),
+    limit: Optional[int] = Query(None, ge=1, le=1000, description="Page size; all matches are returned when omitted"),
+    response_format: Optional[str] = Query(
+        None, alias="format", pattern="^(json|ndjson|json-stream)$",
+        description="json (default), or a streamed ndjson / json-stream response; 'Accept: application/x-ndjson' also selects ndjson",
+    ),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    view: Optional[str] = Query(None, description=VIEW_DESCRIPTION),
+):
+    """
+    Retrieve apartment listings, optionally filtered, sorted and paginated.
+    The next page cursor (if any) is returned in the X-Next-Cursor header, the number of matches in X-Total-Count.
+    Bodies are served from pre-serialized bytes with an ETag; a matching If-None-Match yields 304.
+    The streamed formats write listings as they are produced (no ETag or X-Next-Cursor).
+    Responses are gzip/brotli compressed as negotiated through Accept-Encoding.
+    `fields` or `view=summary` return only some fields of every listing; /api/listings/{id} has them all.
+    """
+    if response_format is None:
+        response_format = "ndjson" if NDJSON_MEDIA_TYPE in request.headers.get("accept", "") else "json"
+    try:
+        projection = parse_projection(fields, view)
+        near_point = parse_near(near) if near is not None else None
+        filters = dict(
+            min_rent=min_rent, max_rent=max_rent,
+            min_size=min_size, max_size=max_size,
+            min_rooms=min_rooms, max_rooms=max_rooms,
+            location=location, energy_label=energy_label,
+            min_wws_points=min_wws_points, max_wws_points=max_wws_points,
+            near=near_point, radius_km=radius_km,
+            sort=sort or ("distance" if near_point is not None else "id"), cursor=cursor, limit=limit,
+        )
+        if response_format in STREAM_FORMATS:
+            bodies, total = repository.stream_bodies(projection, **filters)
+            return streamed_json_response(request, bodies, response_format, {"X-Total-Count": str(total)})
+        cached, next_cursor, total = repository.query_body(projection, **filters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    headers = {"X-Total-Count": str(total)}
+    if next_cursor:
+        headers["X-Next-Cursor"] = next_cursor
+    return cached_json_response(request, cached, headers)
+
+@app.get("/api/listings/overpriced", response_model=List[OverpricedListing], response_model_by_alias=True)
+def get_overpriced_listings(
+    limit: int = Query(10, ge=1, le=1000, description="Number of listings to return (top K)"),
+    location: Optional[str] = Query(None, description="Restrict the ranking to one location, case-insensitive"),
+    repository: ListingRepository = Depends(get_listing_repository),
+):
+    """Retrieve the listings whose advertised rent exceeds the maximum legal rent the most, largest overcharge first."""
+    return [
+        OverpricedListing(**listing.model_dump(), overcharge=round(overcharge, 2))
+        for listing, overcharge in repository.top_overpriced(limit, location)
+    ]
+
+@app.get("/api/search", response_model=List[PydanticListing], response_model_by_alias=True)
+def search_listings(
+    request: Request,
+    q: str = Query(..., min_length=1, max_length=200, description="Search terms; the last one also matches as a prefix"),
+    limit: int = Query(20, ge=1, le=1000),
+    offset: int = Query(0, ge=0),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    view: Optional[str] = Query(None, description=VIEW_DESCRIPTION),
+    repository: ListingRepository = Depends(get_listing_repository),
+):
+    """
+    Full-text search over listing titles, locations and descriptions, best matches first.
+    The number of matches is returned in the X-Total-Count header.
+    """
+    try:
+        projection = parse_projection(fields, view)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    cached, total = repository.search_body(q, limit, offset, projection)
+    return cached_json_response(request, cached, {"X-Total-Count": str(total)})
+
+@app.get("/api/search/suggest", response_model=List[str])
+def suggest_search_terms(
+    q: str = Query(..., min_length=1, max_length=200, description="Text typed so far"),
+    limit: int = Query(10, ge=1, le=50),
+    repository: ListingRepository = Depends(get_listing_repository),
+):
+    """Autocomplete: indexed terms starting with the last word of `q`, most frequent first."""
+    return repository.suggest(q, limit)
+
+@app.get("/api/stats", response_model=MarketStatsSummary, response_model_by_alias=True)
+def get_market_stats(
+    location: Optional[str] = Query(None, description="Comma-separated locations; `overall` then covers these locations together"),
+    min_listings: int = Query(1, ge=1, description="Leave out locations with fewer listings"),
+    repository: ListingRepository = Depends(get_listing_repository),
+):
+    """
+    Market statistics per location: listing count, rent and rent per m² (mean, median, percentiles),
+    average WWS points and the share of listings advertised above their maximum legal rent.
+    """
+    locations = [part.strip() for part in location.split(",") if part.strip()] if location is not None else None
+    return repository.market_stats(locations, min_listings)
+
+MAX_BATCH_IDS = 1000
+
+def _parse_listing_ids(ids: str) -> List[int]:
+    """Listing ids of a comma-separated `ids` query value. Raises ValueError if one is not an integer."""
+    try:
+        return [int(part) for part in ids.split(",") if part.strip()]
+    except ValueError:
+        raise ValueError(f"Invalid ids value {ids!r}: expected comma-separated listing ids.") from None
+
+def _listing_batch_response(request: Request, repository: ListingRepository, listing_ids: List[int], fields: Optional[str], view: Optional[str]):
+    listing_ids = list(dict.fromkeys(listing_ids)) # Duplicates are looked up (and returned) once
+    if not listing_ids:
+        raise HTTPException(status_code=400, detail="No listing ids given.")
+    if len(listing_ids) > MAX_BATCH_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IDS} listing ids per batch.")
+    try:
+        projection = parse_projection(fields, view)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    cached, _ = repository.batch_body(listing_ids, projection)
+    return cached_json_response(request, cached)
+
+@app.get("/api/listings/batch", response_model=ListingBatch, response_model_by_alias=True)
+def get_listings_batch(
+    request: Request,
+    ids: str = Query(..., description=f"Comma-separated listing ids (at most {MAX_BATCH_IDS})"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    view: Optional[str] = Query(None, description=VIEW_DESCRIPTION),
+    repository: ListingRepository = Depends(get_listing_repository),
+):
+    """
+    Retrieve many listings by id in one request: the listings found, in request order, and the ids not found
+    (a partial result is still a 200). Served with an ETag like the other listing responses.
+    """
+    try:
+        listing_ids = _parse_listing_ids(ids)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return _listing_batch_response(request, repository, listing_ids, fields, view)
+
+@app.post("/api/listings/batch", response_model=ListingBatch, response_model_by_alias=True)
+def post_listings_batch(
+    batch: ListingBatchRequest,
+    request: Request,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    view: Optional[str] = Query(None, description=VIEW_DESCRIPTION),
+    repository: ListingRepository = Depends(get_listing_repository),
+):
+    """Same as GET /api/listings/batch, with the ids in a JSON body (`{"ids": [...]}`) for lists too long for a URL."""
+    return _listing_batch_response(request, repository, batch.ids, fields, view)
+
+# --- Listing Writes --- #
+# Writes are validated, acknowledged with 202 and applied in the background in batched transactions
+# (see ingestion.py); they are visible to reads once their batch is applied. A saturated queue answers
+# 503 with Retry-After instead of queuing more.
+MAX_BULK_CHANGES = 5000
+INGEST_RETRY_AFTER_SECONDS = 1
+
+def _apply_memory_changes(changes: List[ListingChange]):
+    _CATALOGUE_LOADER.wait() # A load replaces the catalogue, so writes are applied once it is complete
+    with _MEMORY_WRITE_LOCK:
+        apply_to_memory(_MEMORY_REPOSITORY, changes)
+
+def _apply_listing_changes(changes: List[ListingChange]):
+    if LISTINGS_BACKEND == "database":
+        # The database is shared by all workers, so nothing needs to be published
+        db = SessionLocal()
+        try:
+            apply_to_database(db, changes)
+        finally:
+            db.close()
+    elif _CHANGE_FEED is not None:
+        # Every worker holds its own catalogue: the batch is applied here and by the others from the feed
+        _CHANGE_FEED.publish_and_apply("listings", [(str(change.listing_id), change.listing) for change in changes])
+    else:
+        _apply_memory_changes(changes)
+
+def _apply_feed_listing_changes(changes: List[Change]):
+    if LISTINGS_BACKEND != "database":
+        _apply_memory_changes([ListingChange(int(change.key), change.payload) for change in changes])
+
+if _CHANGE_FEED is not None:
+    _CHANGE_FEED.subscribe("rules", _apply_feed_rules_changes)
+    _CHANGE_FEED.subscribe("listings", _apply_feed_listing_changes)
+
+_INGESTION_QUEUE = IngestionQueue(_apply_listing_changes)
+
+# Ids of new listings: above every stored id and every id already handed out or queued
+_LISTING_IDS_LOCK = threading.Lock()
+_LAST_LISTING_ID = 0
+
+def _stored_max_listing_id() -> int:
+    if LISTINGS_BACKEND == "database":
+        db = SessionLocal()
+        try:
+            return max_database_listing_id(db)
+        finally:
+            db.close()
+    if _CATALOGUE_LOADER.progress.state == "loading":
+        # Ids of listings not loaded yet are unknown
+        raise HTTPException(status_code=503, detail="The catalogue is loading; retry later.", headers={"Retry-After": str(INGEST_RETRY_AFTER_SECONDS)})
+    return _MEMORY_REPOSITORY.listings.max_id
+
+def _reserve_listing_ids(new_count: int, explicit_ids: List[int]) -> List[int]:
+    """Allocates `new_count` new listing ids and records `explicit_ids` as taken."""
+    global _LAST_LISTING_ID
+    with _LISTING_IDS_LOCK:
+        last_id = max([_LAST_LISTING_ID, *explicit_ids])
+        if new_count:
+            last_id = max(last_id, _stored_max_listing_id())
+        if _CHANGE_FEED is not None:
+            last_id = _CHANGE_FEED.reserve("listing_id", new_count, last_id) # Shared by all workers
+        new_ids = list(range(last_id + 1, last_id + 1 + new_count))
+        _LAST_LISTING_ID = new_ids[-1] if new_ids else last_id
+        return new_ids
+
+def _queue_listing_changes(changes: List[ListingChange]) -> int:
+    try:
+        return _INGESTION_QUEUE.submit(changes)
+    except IngestionQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(INGEST_RETRY_AFTER_SECONDS)})
+
+def _write_accepted(ids: List[int], deleted: List[int], queue_depth: int, location: Optional[str] = None) -> JSONResponse:
+    accepted = ListingWriteAccepted(ids=ids, deleted=deleted, queue_depth=queue_depth)
+    headers = {"Location": location} if location else None
+    return JSONResponse(status_code=202, content=accepted.model_dump(by_alias=True), headers=headers)
+
+@app.post("/api/listings", response_model=ListingWriteAccepted, response_model_by_alias=True, status_code=202)
+def create_listing(listing: ListingCreate):
+    """Creates a listing with a new id (returned, with its URL in Location); WWS scoring and storage happen in the background."""
+    listing_id = _reserve_listing_ids(1, [])[0]
+    depth = _queue_listing_changes([ListingChange(listing_id, to_source_listing(listing_id, listing))])
+    return _write_accepted([listing_id], [], depth, f"/api/listings/{listing_id}")
+
+@app.post("/api/listings/bulk", response_model=ListingWriteAccepted, response_model_by_alias=True, status_code=202)
+def write_listings_bulk(bulk: ListingBulkRequest):
+    """
+    Creates or replaces `upserts` (with an `id`: replace, without: create) and deletes `deletes`, up to
+    MAX_BULK_CHANGES changes per request. The request is queued as a whole or rejected as a whole.
+    """
+    if not bulk.upserts and not bulk.deletes:
+        raise HTTPException(status_code=400, detail="No changes given.")
+    if len(bulk.upserts) + len(bulk.deletes) > MAX_BULK_CHANGES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_CHANGES} changes per request.")
+    explicit_ids = [item.id for item in bulk.upserts if item.id is not None]
+    new_ids = iter(_reserve_listing_ids(len(bulk.upserts) - len(explicit_ids), explicit_ids))
+    changes: List[ListingChange] = []
+    for item in bulk.upserts:
+        listing_id = item.id if item.id is not None else next(new_ids)
+        changes.append(ListingChange(listing_id, to_source_listing(listing_id, item)))
+    changes.extend(ListingChange(listing_id, None) for listing_id in bulk.deletes)
+    depth = _queue_listing_changes(changes)
+    return _write_accepted([change.listing_id for change in changes if change.listing is not None], list(bulk.deletes), depth)
+
+@app.put("/api/listings/{listing_id}", response_model=ListingWriteAccepted, response_model_by_alias=True, status_code=202)
+def replace_listing(listing_id: int, listing: ListingCreate):
+    """Creates or replaces the listing with this id (applied in the background)."""
+    _reserve_listing_ids(0, [listing_id])
+    depth = _queue_listing_changes([ListingChange(listing_id, to_source_listing(listing_id, listing))])
+    return _write_accepted([listing_id], [], depth, f"/api/listings/{listing_id}")
+
+@app.delete("/api/listings/{listing_id}", response_model=ListingWriteAccepted, response_model_by_alias=True, status_code=202)
+def delete_listing(listing_id: int):
+    """Deletes the listing with this id (applied in the background; deleting an unknown id is a no-op)."""
+    depth = _queue_listing_changes([ListingChange(listing_id, None)])
+    return _write_accepted([], [listing_id], depth)
 
 @app.get("/api/listings/{listing_id}", response_model=PydanticListing, response_model_by_alias=True)
-async def get_listing_by_id(listing_id: int):
-    """Retrieve a specific apartment listing by its ID."""
-    listing = _MOCK_LISTINGS_DB.get(listing_id)
-    if not listing:
+def get_listing_by_id(listing_id: int, request: Request, repository: ListingRepository = Depends(get_listing_repository)):
+    """Retrieve a specific apartment listing by its ID (served from its pre-serialized body when available, with ETag)."""
+    cached = repository.get_body(listing_id)
+    if not cached:
         raise HTTPException(status_code=404, detail="Listing not found")
-    return listing
+    return cached_json_response(request, cached)
+
+def _wws_rules_status() -> WWSRulesStatus:
+    rules = get_active_rule_set()
+    with _PENDING_RESCORES_LOCK:
+        rescoring = _PENDING_RESCORES > 0
+    return WWSRulesStatus(active_version=rules.version, fingerprint=rules.fingerprint, available_versions=available_rule_versions(), rescoring=rescoring)
+
+@app.get("/api/wws/rules", response_model=WWSRulesStatus, response_model_by_alias=True)
+def get_wws_rules():
+    """The active WWS rule set version and the versions available in data/wws_rules/."""
+    return _wws_rules_status()
+
+@app.put("/api/wws/rules/active", response_model=WWSRulesStatus, response_model_by_alias=True, status_code=202)
+def activate_wws_rules(activation: WWSRulesActivation):
+    """
+    Switches to another WWS rule set version (read from data/wws_rules/<version>.json, so new files need no restart).
+    Listings are re-scored in the background; `rescoring` in the response shows whether that is still running.
+    """
+    try:
+        activate_rule_set(activation.version)
+    except UnknownRuleSetError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except ValueError as e: # The file exists but is not a valid rule set
+        raise HTTPException(status_code=422, detail=str(e))
+    if _CHANGE_FEED is not None: # The other workers switch within a poll interval
+        _CHANGE_FEED.publish_and_apply("rules", [("active", {"version": activation.version})])
+    return _wws_rules_status()
+
+# --- On-demand WWS Calculations --- #
+# Single calculations arriving within a few milliseconds of each other are scored together (see wws_batching.py)
+_WWS_MICRO_BATCHER = WWSMicroBatcher()
+MAX_WWS_BATCH_ROWS = 10000
+
+@app.post("/api/wws/calculate", response_model=WWSDetails)
+def calculate_wws(data: WWSInputData):
+    """WWS points, maximum legal rent and breakdown of a (hypothetical) unit under the active rule set."""
+    return _WWS_MICRO_BATCHER.calculate(data).to_details()
+
+@app.post("/api/wws/calculate-batch", response_model=List[WWSCalculationResult])
+def calculate_wws_batch(batch: WWSBatchCalculationRequest, request: Request):
+    """
+    Scores up to MAX_WWS_BATCH_ROWS units in one request, under one rule set. Results are returned in input order;
+    a row that is not valid WWS input gets its validation `errors` instead of `details` (the others are still scored).
+    The number of invalid rows is returned in the X-Error-Count header.
+    """
+    if len(batch.inputs) > MAX_WWS_BATCH_ROWS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_WWS_BATCH_ROWS} inputs per batch.")
+    results = calculate_wws_rows(batch.inputs)
+    error_count = sum(1 for result in results if result["errors"] is not None)
+    return json_response(request, to_json(results), {"X-Error-Count": str(error_count)})
+
+# --- Metrics and Profiling --- #
+
+def _catalogue_metrics():
+    """Startup load of the in-memory catalogue, reported from the loader's progress at scrape time."""
+    if LISTINGS_BACKEND == "database":
+        return []
+    progress = _CATALOGUE_LOADER.progress.snapshot()
+    source = {"loaded_from": progress["loaded_from"] or ""}
+    return [
+        ("rentright_catalogue_ready", "gauge", "1 once the catalogue is completely loaded.", [("rentright_catalogue_ready", {}, 1 if progress["ready"] else 0)]),
+        ("rentright_catalogue_listings_loaded", "gauge", "Listings loaded into memory.", [("rentright_catalogue_listings_loaded", {}, progress["listings_loaded"])]),
+        ("rentright_catalogue_load_seconds", "gauge", "Duration of the catalogue load (so far, while loading).", [("rentright_catalogue_load_seconds", source, progress["elapsed_seconds"])]),
+    ]
+
+def _wws_micro_batch_metrics():
+    stats = _WWS_MICRO_BATCHER.stats()
+    return [
+        ("rentright_wws_micro_batches", "counter", "Micro-batches scored by /api/wws/calculate.", [("rentright_wws_micro_batches_total", {}, stats["batches"])]),
+        ("rentright_wws_micro_batch_calculations", "counter", "Calculations scored in micro-batches.", [("rentright_wws_micro_batch_calculations_total", {}, stats["calculations"])]),
+    ]
+
+def _ingestion_metrics():
+    stats = _INGESTION_QUEUE.stats()
+    counters = [
+        (f"rentright_ingest_{name}", "counter", f"Listing changes {name} by the ingestion queue.", [(f"rentright_ingest_{name}_total", {}, stats[name])])
+        for name in ("accepted", "rejected", "applied", "failed")
+    ]
+    return counters + [
+        ("rentright_ingest_batches", "counter", "Batches applied by the ingestion workers.", [("rentright_ingest_batches_total", {}, stats["batches"])]),
+        ("rentright_ingest_queue_depth", "gauge", "Listing changes queued or being applied.", [("rentright_ingest_queue_depth", {}, stats["depth"])]),
+        ("rentright_ingest_queue_capacity", "gauge", "Capacity of the ingestion queue.", [("rentright_ingest_queue_capacity", {}, stats["capacity"])]),
+    ]
+
+def _change_feed_metrics():
+    if _CHANGE_FEED is None:
+        return []
+    stats = _CHANGE_FEED.stats()
+    return [
+        ("rentright_change_feed_published", "counter", "Changes this worker published to the change feed.", [("rentright_change_feed_published_total", {}, stats["published"])]),
+        ("rentright_change_feed_applied", "counter", "Changes applied from the change feed.", [("rentright_change_feed_applied_total", {}, stats["applied"])]),
+        ("rentright_change_feed_failed", "counter", "Changes from the change feed that could not be applied.", [("rentright_change_feed_failed_total", {}, stats["failed"])]),
+        ("rentright_change_feed_last_seq", "gauge", "Sequence number of the last change applied.", [("rentright_change_feed_last_seq", {}, stats["last_seq"])]),
+    ]
+
+REGISTRY.add_collector(_catalogue_metrics)
+REGISTRY.add_collector(_change_feed_metrics)
+REGISTRY.add_collector(_ingestion_metrics)
+REGISTRY.add_collector(_wws_micro_batch_metrics)
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    """Prometheus scrape endpoint (text exposition format)."""
+    return Response(REGISTRY.render(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+# Opt-in (RENTRIGHT_PROFILING=1): samples the stacks of all threads while live traffic is served
+_PROFILER = SamplingProfiler()
+
+@app.get("/api/debug/profile", response_class=PlainTextResponse, include_in_schema=False)
+def read_profile(
+    seconds: float = Query(10.0, gt=0, le=MAX_PROFILE_SECONDS),
+    interval_ms: float = Query(5.0, ge=1, le=1000),
+    include_idle: bool = Query(False, description="Include threads waiting for work"),
+):
+    """
+    Samples the process for `seconds` and returns the profile in the folded format
+    (flamegraph.pl, speedscope, inferno). 404 unless profiling is enabled; 409 while another profile runs.
+    """
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Profiling is disabled. Set RENTRIGHT_PROFILING=1 to enable it.")
+    try:
+        counts = _PROFILER.profile(seconds, interval_ms / 1000.0, include_idle)
+    except ProfilerBusyError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return PlainTextResponse(folded(counts))
 
 # --- Serve Static React App (Define this last) --- #
 # Path to the React build directory, relative to this file (backend/main.py)
@@ -143,7 +633,24 @@ STATIC_FILES_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..",
 
 if os.path.exists(STATIC_FILES_DIR) and os.path.isdir(STATIC_FILES_DIR):
     logger.info(f"Serving static files from: {STATIC_FILES_DIR}")
-    app.mount("/", StaticFiles(directory=STATIC_FILES_DIR, html=True), name="spa")
+    # Precompressed, long-cacheable assets and the index.html fallback for client-side routes (see static_files.py)
+    _SPA_FILES = PrecompressedStaticFiles(directory=STATIC_FILES_DIR)
+    app.mount("/", _SPA_FILES, name="spa")
+
+    @app.on_event("startup")
+    def index_static_files():
+        _SPA_FILES.load() # Compresses what the build did not, before the first page load instead of during it
+        stats = _SPA_FILES.stats()
+        logger.info(f"Indexed {stats['files']} static files ({stats['precompressed']} precompressed, {stats['memory_bytes']} bytes in memory).")
+
+    def _static_files_metrics():
+        stats = _SPA_FILES.stats()
+        return [
+            ("rentright_static_files", "gauge", "Files of the frontend build being served.", [("rentright_static_files", {}, stats["files"])]),
+            ("rentright_static_memory_bytes", "gauge", "Bytes of static files and their compressed variants held in memory.", [("rentright_static_memory_bytes", {}, stats["memory_bytes"])]),
+        ]
+
+    REGISTRY.add_collector(_static_files_metrics)
 else:
     logger.warning(f"Frontend build directory not found at {STATIC_FILES_DIR}. Frontend will not be served.")
     @app.get("/")
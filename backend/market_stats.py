@@ -0,0 +1,241 @@
+import math
+import threading
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Sequence
+
+from .listing_index import normalize_location
+
+# Market analytics per location (GET /api/stats): listing count, rent and rent per m² distributions,
+# average WWS points and the share of overpriced listings.
+# Like the overcharge ranking, the aggregates are updated per listing on insert, update and delete, so a
+# dashboard query costs the same for ten listings or ten million. The database backend keeps them in process
+# too, replaying the listing_changes log written by triggers (see repository.SqlMarketStats).
+# Sums give the exact means; percentiles come from log-bucketed quantile sketches (DDSketch-style): every
+# estimate is within RELATIVE_ACCURACY of a true value of that rank, buckets can be decremented (listings
+# are removed and updated) and sketches merge by adding bucket counts (statistics over several locations).
+
+RELATIVE_ACCURACY = 0.01
+PERCENTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+
+class QuantileSketch:
+    """Mergeable quantile sketch of positive values with relative accuracy `relative_accuracy`."""
+
+    __slots__ = ("relative_accuracy", "_log_gamma", "_buckets", "_zeros", "count")
+
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self._log_gamma = math.log((1 + relative_accuracy) / (1 - relative_accuracy))
+        self._buckets: Dict[int, int] = {} # bucket index -> count; bucket i holds (gamma^(i-1), gamma^i]
+        self._zeros = 0 # Values <= 0 (e.g. a rent of 0) are counted apart
+        self.count = 0
+
+    def _index(self, value: float) -> int:
+        return math.ceil(math.log(value) / self._log_gamma)
+
+    def add(self, value: float, count: int = 1):
+        """Adds `count` occurrences of `value`; a negative count removes previously added occurrences."""
+        if value <= 0:
+            self._zeros += count
+        else:
+            index = self._index(value)
+            remaining = self._buckets.get(index, 0) + count
+            if remaining > 0:
+                self._buckets[index] = remaining
+            else:
+                self._buckets.pop(index, None)
+        self.count += count
+
+    def remove(self, value: float):
+        self.add(value, -1)
+
+    def merge(self, other: "QuantileSketch"):
+        """Adds the values of `other` (a sketch with the same accuracy) to this sketch."""
+        if other.relative_accuracy != self.relative_accuracy:
+            raise ValueError("Only sketches with the same relative accuracy can be merged.")
+        for index, count in other._buckets.items():
+            self._buckets[index] = self._buckets.get(index, 0) + count
+        self._zeros += other._zeros
+        self.count += other.count
+
+    def quantiles(self, qs: Sequence[float]) -> List[Optional[float]]:
+        """Estimates of the `qs` quantiles (0..1) in one pass over the buckets; None for an empty sketch."""
+        if self.count <= 0:
+            return [None] * len(qs)
+        gamma = math.exp(self._log_gamma)
+        ranks = sorted((q * (self.count - 1), position) for position, q in enumerate(qs))
+        results: List[Optional[float]] = [None] * len(qs)
+        next_rank = 0
+        cumulative = self._zeros
+        while next_rank < len(ranks) and ranks[next_rank][0] < cumulative:
+            results[ranks[next_rank][1]] = 0.0
+            next_rank += 1
+        for index in sorted(self._buckets):
+            cumulative += self._buckets[index]
+            # The midpoint (in relative terms) of the bucket is within the relative accuracy of all its values
+            estimate = 2 * gamma ** index / (gamma + 1)
+            while next_rank < len(ranks) and ranks[next_rank][0] < cumulative:
+                results[ranks[next_rank][1]] = estimate
+                next_rank += 1
+        return results
+
+class ListingFigures(NamedTuple):
+    # What one listing contributes to the aggregates of its location
+    advertised_rent: float
+    rent_per_m2: Optional[float] # None without a (positive) size
+    wws_points: Optional[int]
+    max_legal_rent: Optional[float]
+
+class LocationAggregate:
+    """Sums and sketches of the listings of one location (or of the whole catalogue)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.count = 0
+        self.rent_sum = 0.0
+        self.rent_per_m2_sum = 0.0
+        self.rent_per_m2_count = 0
+        self.wws_points_sum = 0
+        self.scored = 0 # Listings with a max legal rent
+        self.overcharged = 0
+        self.rent = QuantileSketch()
+        self.rent_per_m2 = QuantileSketch()
+
+    def add(self, figures: ListingFigures, sign: int = 1):
+        """Adds (sign 1) or removes (sign -1) the contribution of one listing."""
+        self.count += sign
+        self.rent_sum += sign * figures.advertised_rent
+        self.rent.add(figures.advertised_rent, sign)
+        if figures.rent_per_m2 is not None:
+            self.rent_per_m2_sum += sign * figures.rent_per_m2
+            self.rent_per_m2_count += sign
+            self.rent_per_m2.add(figures.rent_per_m2, sign)
+        if figures.max_legal_rent is not None:
+            self.scored += sign
+            self.wws_points_sum += sign * (figures.wws_points or 0)
+            if figures.advertised_rent > figures.max_legal_rent:
+                self.overcharged += sign
+
+    def merge(self, other: "LocationAggregate"):
+        self.count += other.count
+        self.rent_sum += other.rent_sum
+        self.rent_per_m2_sum += other.rent_per_m2_sum
+        self.rent_per_m2_count += other.rent_per_m2_count
+        self.wws_points_sum += other.wws_points_sum
+        self.scored += other.scored
+        self.overcharged += other.overcharged
+        self.rent.merge(other.rent)
+        self.rent_per_m2.merge(other.rent_per_m2)
+
+    def summary(self, percentiles: Sequence[float] = PERCENTILES) -> Dict[str, Any]:
+        """The statistics of this aggregate (the fields of models.LocationStats)."""
+        def distribution(sketch: QuantileSketch, total: float, count: int) -> Dict[str, Any]:
+            qs = list(percentiles) + [0.5]
+            estimates = sketch.quantiles(qs)
+            return {
+                "mean": round(total / count, 2) if count else None,
+                "median": _rounded(estimates[-1]),
+                "percentiles": {f"p{round(q * 100):g}": _rounded(value) for q, value in zip(percentiles, estimates) if value is not None},
+            }
+
+        return {
+            "location": self.name,
+            "listing_count": self.count,
+            "rent": distribution(self.rent, self.rent_sum, self.count),
+            "rent_per_m2": distribution(self.rent_per_m2, self.rent_per_m2_sum, self.rent_per_m2_count),
+            "average_wws_points": round(self.wws_points_sum / self.scored, 2) if self.scored else None,
+            "overcharged_share": round(self.overcharged / self.scored, 4) if self.scored else None,
+        }
+
+def _rounded(value: Optional[float]) -> Optional[float]:
+    return round(value, 2) if value is not None else None
+
+def listing_figures(advertised_rent: float, size_m2: Optional[float], wws_points: Optional[int], max_legal_rent: Optional[float]) -> ListingFigures:
+    rent_per_m2 = advertised_rent / size_m2 if size_m2 and size_m2 > 0 else None
+    return ListingFigures(advertised_rent, rent_per_m2, wws_points, max_legal_rent)
+
+class MarketStats:
+    """Incrementally maintained aggregates per location and for the whole catalogue."""
+
+    def __init__(self):
+        self._lock = threading.Lock() # Summaries iterate the sketches, so they must not interleave with writes
+        self._overall = LocationAggregate("")
+        self._by_location: Dict[str, LocationAggregate] = {}
+        self._entries: Dict[int, tuple] = {} # listing id -> (location key, figures)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def upsert(self, listing_id: int, location: Optional[str], advertised_rent: float, size_m2: Optional[float], wws_points: Optional[int], max_legal_rent: Optional[float]):
+        """Adds a listing, or replaces its previous contribution."""
+        figures = listing_figures(advertised_rent, size_m2, wws_points, max_legal_rent)
+        location_key = normalize_location(location)
+        with self._lock:
+            self._remove_locked(listing_id)
+            self._add_locked(location_key, location, figures, 1)
+            self._entries[listing_id] = (location_key, figures)
+
+    def apply(self, location: Optional[str], advertised_rent: float, size_m2: Optional[float], wws_points: Optional[int], max_legal_rent: Optional[float], sign: int = 1):
+        """
+        Adds (sign 1) or removes (sign -1) the contribution of a listing that is not tracked by id: the caller
+        removes exactly the figures it added before (e.g. when replaying the database's change log).
+        """
+        figures = listing_figures(advertised_rent, size_m2, wws_points, max_legal_rent)
+        with self._lock:
+            self._add_locked(normalize_location(location), location, figures, sign)
+
+    def remove(self, listing_id: int):
+        """Removes a listing's contribution; unknown ids are ignored."""
+        with self._lock:
+            self._remove_locked(listing_id)
+
+    def _add_locked(self, location_key: Optional[str], location: Optional[str], figures: ListingFigures, sign: int):
+        self._overall.add(figures, sign)
+        if location_key:
+            aggregate = self._by_location.get(location_key)
+            if aggregate is None:
+                aggregate = self._by_location[location_key] = LocationAggregate(location.strip())
+            aggregate.add(figures, sign)
+            if aggregate.count == 0:
+                del self._by_location[location_key]
+
+    def _remove_locked(self, listing_id: int):
+        entry = self._entries.pop(listing_id, None)
+        if entry is None:
+            return
+        location_key, figures = entry
+        self._add_locked(location_key, None, figures, -1)
+
+    def clear(self):
+        with self._lock:
+            self._overall = LocationAggregate("")
+            self._by_location.clear()
+            self._entries.clear()
+
+    def summary(self, location: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Statistics of one location (None if it has no listings), or of the whole catalogue."""
+        with self._lock:
+            if location is None:
+                return self._overall.summary()
+            aggregate = self._by_location.get(normalize_location(location) or "")
+            return aggregate.summary() if aggregate is not None else None
+
+    def summaries(self, locations: Optional[Iterable[str]] = None, min_listings: int = 1) -> List[Dict[str, Any]]:
+        """Statistics of `locations` (all locations by default) with at least `min_listings` listings, largest first."""
+        with self._lock:
+            if locations is None:
+                aggregates = list(self._by_location.values())
+            else:
+                keys = dict.fromkeys(normalize_location(location) for location in locations)
+                aggregates = [self._by_location[key] for key in keys if key in self._by_location]
+            aggregates = [aggregate for aggregate in aggregates if aggregate.count >= min_listings]
+            aggregates.sort(key=lambda aggregate: (-aggregate.count, aggregate.name.lower()))
+            return [aggregate.summary() for aggregate in aggregates]
+
+    def combined(self, locations: Iterable[str]) -> Dict[str, Any]:
+        """Statistics of the listings of several locations together (their aggregates merged)."""
+        combined = LocationAggregate("")
+        with self._lock:
+            for key in dict.fromkeys(normalize_location(location) for location in locations):
+                aggregate = self._by_location.get(key or "")
+                if aggregate is not None:
+                    combined.merge(aggregate)
+        return combined.summary()
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import List, Optional
+from typing import Any, Dict, List, Optional, Union
 
 # Pydantic models for API requests and responses
 # These models define the structure of data exchanged with the frontend
@@ -24,11 +24,17 @@ class ListingBase(BaseModel):
     energy_label: Optional[str] = None
     woz_value: Optional[float] = None
     # ... other raw WWS input fields could be added here
+    # Resolved from the location through the offline lookup table (geo.py); None if the location is unknown
+    latitude: Optional[float] = None
+    longitude: Optional[float] = None
 
 class ListingCreate(ListingBase):
-    # Fields required to create a new listing
-    # WWS points and max legal rent might be calculated upon creation
-    pass
+    # Fields required to create a new listing (POST/PUT /api/listings)
+    # WWS points and max legal rent are calculated when the write is applied
+    amenities: List[Amenity] = []
+
+    class Config:
+        populate_by_name = True
 
 class Listing(ListingBase):
     id: int
@@ -41,6 +47,75 @@ class Listing(ListingBase):
         from_attributes = True # Enables ORM mode (Pydantic V2)
         populate_by_name = True # Allows using alias for field population
 
+class ListingSummary(BaseModel):
+    # Fieldset of a listing card (view=summary on the list endpoints; see projection.py)
+    id: int
+    title: str
+    location: str
+    image: Optional[str] = None # First image URL
+    advertised_rent: float = Field(..., alias="advertisedRent")
+    size_m2: float = Field(..., alias="size")
+    rooms: int
+    wws_points: Optional[int] = Field(None, alias="wwsPoints")
+    max_legal_rent: Optional[float] = Field(None, alias="maxLegalRent")
+
+    class Config:
+        populate_by_name = True
+
+class ListingBatch(BaseModel):
+    # Response of /api/listings/batch: the listings found (in request order) and the ids that were not
+    listings: List[Listing]
+    not_found: List[int] = Field(..., alias="notFound")
+
+    class Config:
+        populate_by_name = True
+
+class ListingBatchRequest(BaseModel):
+    ids: List[int]
+
+class ListingBulkItem(ListingCreate):
+    id: Optional[int] = None # Replaces the listing with this id; None creates a new listing
+
+class ListingBulkRequest(BaseModel):
+    # Body of POST /api/listings/bulk: listings to create or replace, and ids to delete
+    upserts: List[ListingBulkItem] = []
+    deletes: List[int] = []
+
+class ListingWriteAccepted(BaseModel):
+    # Acknowledgement of a queued write (202): the changes are applied in the background
+    ids: List[int] = [] # Created or replaced listings
+    deleted: List[int] = []
+    queue_depth: int = Field(..., alias="queueDepth") # Changes pending, including these
+
+    class Config:
+        populate_by_name = True
+
+class Distribution(BaseModel):
+    # Mean (exact), median and percentiles ("p10", "p25", ...; estimated within 1%) of a value
+    mean: Optional[float] = None
+    median: Optional[float] = None
+    percentiles: Dict[str, float] = {}
+
+class LocationStats(BaseModel):
+    location: str # Empty for the overall statistics
+    listing_count: int = Field(..., alias="listingCount")
+    rent: Distribution
+    rent_per_m2: Distribution = Field(..., alias="rentPerM2")
+    average_wws_points: Optional[float] = Field(None, alias="averageWwsPoints")
+    overcharged_share: Optional[float] = Field(None, alias="overchargedShare") # Of the listings with a max legal rent
+
+    class Config:
+        populate_by_name = True
+
+class MarketStatsSummary(BaseModel):
+    # Response of /api/stats
+    overall: LocationStats
+    locations: List[LocationStats]
+
+class OverpricedListing(Listing):
+    # Listing returned by the overcharge ranking, with the amount above the maximum legal rent
+    overcharge: float
+
 # Model for WWS Calculation input data, separate from Listing model if needed for calculator utility
 class WWSInputData(BaseModel):
     size_m2: float
@@ -57,3 +132,43 @@ class WWSDetails(BaseModel):
     points: int
     max_rent: float
     breakdown: List[WWSBreakdownItem]
+
+# Batch WWS calculation (/api/wws/calculate-batch): one result per input row
+class WWSInputError(BaseModel):
+    # One validation error of a WWS input row, as reported by pydantic
+    loc: List[Union[str, int]]
+    msg: str
+    type: str
+
+class WWSCalculationResult(BaseModel):
+    # One row of /api/wws/calculate-batch: `details` if the row is valid, its `errors` otherwise
+    index: int
+    details: Optional[WWSDetails] = None
+    errors: Optional[List[WWSInputError]] = None
+
+class WWSBatchCalculationRequest(BaseModel):
+    inputs: List[Any] # Objects parsable as WWSInputData; invalid rows are reported per item
+
+# Active WWS rule set and the versions available in data/wws_rules/
+class WWSRulesStatus(BaseModel):
+    active_version: str = Field(..., alias="activeVersion")
+    fingerprint: str
+    available_versions: List[str] = Field(..., alias="availableVersions")
+    rescoring: bool # True while listings are being re-scored after a switch
+
+    class Config:
+        populate_by_name = True
+
+class WWSRulesActivation(BaseModel):
+    version: str
+
+# Progress of the in-memory catalogue load, reported by /api/ready
+class LoadStatus(BaseModel):
+    ready: bool
+    state: str # pending, loading, ready or failed
+    listings_read: int
+    listings_loaded: int
+    chunks_loaded: int
+    loaded_from: Optional[str] = None # "source" or "snapshot"
+    elapsed_seconds: float
+    error: Optional[str] = None
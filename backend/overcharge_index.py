@@ -0,0 +1,72 @@
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+from .listing_index import normalize_location
+
+# Ranking of listings whose advertised rent exceeds the maximum legal rent (the "overcharge").
+# Entries are kept as sorted (-overcharge, listing_id) keys, globally and per location, so the
+# top-K offenders are simply the first K keys. The structure is updated per listing on insert,
+# update and delete instead of re-sorting the catalogue for every request.
+
+RankKey = Tuple[float, int] # (-overcharge, listing id): ascending order == largest overcharge first
+
+class OverchargeIndex:
+    """Incrementally maintained top-K index of overpriced listings, globally and per location."""
+
+    def __init__(self):
+        self._global: List[RankKey] = []
+        self._by_location: Dict[str, List[RankKey]] = {}
+        self._entries: Dict[int, Tuple[Optional[str], RankKey]] = {} # listing id -> (location key, rank key)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def upsert(self, listing_id: int, location: Optional[str], advertised_rent: float, max_legal_rent: Optional[float]):
+        """
+        Adds or updates one listing. Listings that are not overpriced (or have no max legal rent)
+        are removed from the ranking.
+        """
+        self.remove(listing_id)
+        if max_legal_rent is None:
+            return
+        overcharge = advertised_rent - max_legal_rent
+        if overcharge <= 0:
+            return
+        location_key = normalize_location(location)
+        rank_key: RankKey = (-overcharge, listing_id)
+        insort(self._global, rank_key)
+        if location_key:
+            insort(self._by_location.setdefault(location_key, []), rank_key)
+        self._entries[listing_id] = (location_key, rank_key)
+
+    def remove(self, listing_id: int):
+        """Removes a listing from the ranking; unknown ids are ignored."""
+        entry = self._entries.pop(listing_id, None)
+        if entry is None:
+            return
+        location_key, rank_key = entry
+        self._discard(self._global, rank_key)
+        if location_key:
+            bucket = self._by_location[location_key]
+            self._discard(bucket, rank_key)
+            if not bucket:
+                del self._by_location[location_key]
+
+    def top(self, limit: int, location: Optional[str] = None) -> List[Tuple[int, float]]:
+        """Returns up to `limit` (listing_id, overcharge) pairs, largest overcharge first."""
+        if location is None:
+            keys = self._global
+        else:
+            keys = self._by_location.get(normalize_location(location) or "", [])
+        return [(listing_id, -negative_overcharge) for negative_overcharge, listing_id in keys[:limit]]
+
+    def clear(self):
+        self._global.clear()
+        self._by_location.clear()
+        self._entries.clear()
+
+    @staticmethod
+    def _discard(keys: List[RankKey], rank_key: RankKey):
+        position = bisect_left(keys, rank_key)
+        if position < len(keys) and keys[position] == rank_key:
+            del keys[position]
@@ -0,0 +1,85 @@
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+# Opt-in sampling profiler for live traffic (GET /api/debug/profile, enabled with RENTRIGHT_PROFILING=1).
+# While a profile is taken, the stacks of all threads are sampled every `interval` seconds and counted
+# in the "folded" format of flamegraph.pl / speedscope / inferno: one line per distinct stack,
+# "thread;outermost;...;innermost count". Nothing runs between profiles, so a disabled (or idle)
+# profiler costs nothing; sampling itself only takes the GIL briefly per interval.
+
+PROFILING_ENABLED = os.getenv("RENTRIGHT_PROFILING", "").lower() in ("1", "true", "yes")
+MAX_PROFILE_SECONDS = 60.0
+MIN_INTERVAL_SECONDS = 0.001
+
+# Leaf frames in these files are threads waiting for work (thread pools, the event loop's selector, locks)
+_IDLE_FILES = ("threading.py", "selectors.py", "queue.py", os.path.join("concurrent", "futures", "thread.py"))
+
+class ProfilerBusyError(RuntimeError):
+    """Raised when a profile is requested while another one is being taken."""
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    # ";" separates frames in the folded format (the count follows the last space, so spaces are fine)
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+
+def _is_idle(frame) -> bool:
+    return frame.f_code.co_filename.endswith(_IDLE_FILES)
+
+class SamplingProfiler:
+    """Samples the stacks of every thread of the process for a window of time, one profile at a time."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = False
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def _sample(self, counts: Counter, include_idle: bool):
+        own_thread = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread or (not include_idle and _is_idle(frame)):
+                continue
+            stack: List[str] = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.append(names.get(thread_id, f"thread-{thread_id}").replace(";", ":"))
+            counts[";".join(reversed(stack))] += 1
+
+    def profile(self, seconds: float, interval: float = 0.005, include_idle: bool = False) -> Dict[str, int]:
+        """
+        Samples for `seconds` (at most MAX_PROFILE_SECONDS) every `interval` seconds in the calling thread;
+        returns folded stack -> number of samples. Raises ProfilerBusyError if a profile is already running.
+        """
+        seconds = min(max(seconds, 0.0), MAX_PROFILE_SECONDS)
+        interval = max(interval, MIN_INTERVAL_SECONDS)
+        with self._lock:
+            if self._running:
+                raise ProfilerBusyError("A profile is already being taken.")
+            self._running = True
+        try:
+            counts: Counter = Counter()
+            deadline = time.perf_counter() + seconds
+            while True:
+                self._sample(counts, include_idle)
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                time.sleep(min(interval, remaining))
+            return dict(counts)
+        finally:
+            self._running = False
+
+def folded(counts: Dict[str, int], limit: Optional[int] = None) -> str:
+    """Folded-format text of a profile, most sampled stacks first."""
+    stacks = sorted(counts.items(), key=lambda item: (-item[1], item[0]))
+    if limit is not None:
+        stacks = stacks[:limit]
+    return "".join(f"{stack} {count}\n" for stack, count in stacks)
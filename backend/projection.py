@@ -0,0 +1,69 @@
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+from pydantic_core import to_json
+
+from .models import Listing
+
+# Sparse fieldsets for the listing list endpoints (`fields=` / `view=summary`).
+# Field names are the public (JSON) names of Listing, plus "image": the first image URL, which is all a
+# listing card shows. Projected bodies follow Listing's field order (id first) and serialize values like the
+# full bodies do. The summary view is the fieldset of a listing card; the in-memory store keeps its bodies
+# pre-serialized, the database backend loads only its columns.
+
+def _public_name(name: str) -> str:
+    alias = Listing.model_fields[name].alias
+    return alias or name
+
+# Public field name -> attribute of Listing (and of ListingORM, which uses the same attribute names)
+FIELD_ATTRIBUTES: Dict[str, str] = {}
+for _name in Listing.model_fields:
+    FIELD_ATTRIBUTES[_public_name(_name)] = _name
+    if _name == "images":
+        FIELD_ATTRIBUTES["image"] = "images"
+del _name
+
+# Fields in the order they are serialized
+PROJECTABLE_FIELDS: Tuple[str, ...] = ("id", *(name for name in FIELD_ATTRIBUTES if name != "id"))
+
+SUMMARY_FIELDS: Tuple[str, ...] = ("id", "title", "location", "image", "advertisedRent", "size", "rooms", "wwsPoints", "maxLegalRent")
+
+VIEWS: Dict[str, Optional[Tuple[str, ...]]] = {"full": None, "summary": SUMMARY_FIELDS}
+
+def parse_projection(fields: Optional[str] = None, view: Optional[str] = None) -> Optional[Tuple[str, ...]]:
+    """
+    The fieldset requested by a `fields` (comma-separated public names) or `view` query value, in
+    serialization order and always including "id"; None for the full listing.
+    Raises ValueError for unknown fields or views, or if both are given.
+    """
+    if fields is not None and view is not None:
+        raise ValueError("Use either fields or view, not both.")
+    if view is not None:
+        if view not in VIEWS:
+            raise ValueError(f"Unknown view '{view}'. Expected one of: {', '.join(VIEWS)}.")
+        return VIEWS[view]
+    if fields is None:
+        return None
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(PROJECTABLE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(sorted(unknown))}. Expected names from: {', '.join(PROJECTABLE_FIELDS)}.")
+    requested.add("id")
+    return tuple(name for name in PROJECTABLE_FIELDS if name in requested)
+
+def _field_value(source: Any, name: str) -> Any:
+    value = getattr(source, FIELD_ATTRIBUTES[name])
+    if name == "image":
+        return value[0] if value else None
+    if name == "amenities":
+        return [{"name": amenity.name, "icon": amenity.icon} for amenity in value]
+    if name == "wwsBreakdown":
+        return [{"item": item.item, "points": item.points} for item in value]
+    return value
+
+def project(source: Any, fields: Sequence[str]) -> bytes:
+    """Serialized fieldset of a listing; `source` is a Listing or any object with its attributes (e.g. ListingORM)."""
+    return to_json({name: _field_value(source, name) for name in fields})
+
+def orm_attributes(fields: Sequence[str]) -> Tuple[str, ...]:
+    """Attributes to load for a fieldset (without duplicates, e.g. for "image" and "images")."""
+    return tuple(dict.fromkeys(FIELD_ATTRIBUTES[name] for name in fields))
@@ -0,0 +1,641 @@
+import threading
+import weakref
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from sqlalchemy import and_, case, func, or_, select, text, true
+from sqlalchemy.engine import Engine
+from pydantic_core import to_json
+from sqlalchemy.orm import Session, load_only, selectinload
+
+from .database import ListingChangeORM, ListingORM
+from .geo import Coordinates, bounding_box, haversine_km
+from .listing_index import ListingIndex, SORT_KEYS, check_query_arguments, decode_cursor, encode_cursor, normalize_location, paginate
+from .listing_store import ColumnarListingStore
+from .market_stats import MarketStats
+from .models import Listing, WWSInputData
+from .overcharge_index import OverchargeIndex
+from .projection import SUMMARY_FIELDS, orm_attributes, project
+from .response_cache import CachedBody, ListingResponseCache, make_etag
+from .search_index import SearchIndex, tokenize
+from .wws_calculator import calculate_wws_points_batch
+from .wws_rules import WWSRuleSet
+
+# Read-side access to the listing catalogue, independent of where it is stored.
+# InMemoryListingRepository serves the catalogue loaded from seed_listings.json (with its indexes and
+# pre-serialized bodies); SqlListingRepository serves it from the SQLAlchemy store (listings.db).
+# Both implement the same filters, sort keys and cursor format.
+
+QueryResult = Tuple[List[Listing], Optional[str], int] # (listings of this page, next cursor, total matches)
+SearchResult = Tuple[List[Listing], int] # (listings of this page, total matches)
+
+STREAM_BATCH_SIZE = 500 # Listings fetched per query while streaming from a store without pre-serialized bodies
+
+def _serialize(listing: Listing, fields: Optional[Sequence[str]] = None) -> bytes:
+    """JSON body of a listing, or of its fieldset (see projection.py)."""
+    return listing.model_dump_json(by_alias=True).encode("utf-8") if fields is None else project(listing, fields)
+
+def _json_array(bodies: Iterable[bytes]) -> CachedBody:
+    body = b"[" + b",".join(bodies) + b"]"
+    return CachedBody(body, make_etag(body))
+
+def _market_stats_summary(stats: MarketStats, locations: Optional[Sequence[str]], min_listings: int) -> Dict[str, Any]:
+    overall = stats.summary() if locations is None else stats.combined(locations)
+    return {"overall": overall, "locations": stats.summaries(locations, min_listings)}
+
+def _batch_body(bodies: Iterable[bytes], not_found: List[int]) -> CachedBody:
+    """Body of a batch lookup: the listings found, and the requested ids that were not."""
+    body = b'{"listings":[' + b",".join(bodies) + b'],"notFound":' + to_json(not_found) + b"}"
+    return CachedBody(body, make_etag(body))
+
+class ListingRepository:
+    """Common interface of the listing stores used by the API endpoints."""
+
+    def get(self, listing_id: int) -> Optional[Listing]:
+        raise NotImplementedError
+
+    def get_many(self, listing_ids: Sequence[int]) -> List[Listing]:
+        """The listings of `listing_ids` that exist, in the order of `listing_ids`."""
+        return [listing for listing in map(self.get, listing_ids) if listing is not None]
+
+    def query(self, **filters) -> QueryResult:
+        """Filters, sorts and paginates; accepts the keyword arguments of `ListingIndex.query`."""
+        raise NotImplementedError
+
+    def top_overpriced(self, limit: int, location: Optional[str] = None) -> List[Tuple[Listing, float]]:
+        """Returns up to `limit` (listing, overcharge) pairs, largest overcharge first."""
+        raise NotImplementedError
+
+    def search(self, query: str, limit: Optional[int] = None, offset: int = 0) -> SearchResult:
+        """Full-text search over title, location and description; the last query term also matches as a prefix."""
+        raise NotImplementedError
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        """Completions of the last term of `prefix`, most frequent first."""
+        raise NotImplementedError
+
+    # The *_body methods serialize on demand; stores with pre-serialized bodies override them.
+    # `fields` selects a fieldset (projection.parse_projection); None serializes full listings.
+    def get_body(self, listing_id: int) -> Optional[CachedBody]:
+        listing = self.get(listing_id)
+        if listing is None:
+            return None
+        body = _serialize(listing)
+        return CachedBody(body, make_etag(body))
+
+    def query_body(self, fields: Optional[Sequence[str]] = None, **filters) -> Tuple[CachedBody, Optional[str], int]:
+        listings, next_cursor, total = self.query(**filters)
+        return _json_array(_serialize(listing, fields) for listing in listings), next_cursor, total
+
+    def search_body(self, query: str, limit: Optional[int] = None, offset: int = 0, fields: Optional[Sequence[str]] = None) -> Tuple[CachedBody, int]:
+        listings, total = self.search(query, limit, offset)
+        return _json_array(_serialize(listing, fields) for listing in listings), total
+
+    def batch_body(self, listing_ids: Sequence[int], fields: Optional[Sequence[str]] = None) -> Tuple[CachedBody, List[int]]:
+        """Batch lookup body (`{"listings": [...], "notFound": [...]}`) of `listing_ids`, plus the ids not found."""
+        listings = self.get_many(listing_ids)
+        found = {listing.id for listing in listings}
+        not_found = [listing_id for listing_id in listing_ids if listing_id not in found]
+        return _batch_body((_serialize(listing, fields) for listing in listings), not_found), not_found
+
+    def market_stats(self, locations: Optional[Sequence[str]] = None, min_listings: int = 1) -> Dict[str, Any]:
+        """
+        Market statistics (see market_stats.py): `overall` for the catalogue (or for `locations` together) and
+        `locations`, the statistics per location with at least `min_listings` listings, largest first.
+        """
+        raise NotImplementedError
+
+    def _next_batch(self, filters: Dict[str, Any], cursor: Optional[str], limit: int) -> Tuple[List[Listing], Optional[str]]:
+        """One batch of a streamed query; stores override it to skip work only the first page needs."""
+        listings, next_cursor, _ = self.query(**filters, cursor=cursor, limit=limit)
+        return listings, next_cursor
+
+    def stream_bodies(self, fields: Optional[Sequence[str]] = None, **filters) -> Tuple[Iterator[bytes], int]:
+        """
+        The serialized listings (or fieldsets) matching `filters` (the keyword arguments of `query`), one body
+        per listing in result order, plus the total number of matches. Listings are fetched in batches of
+        STREAM_BATCH_SIZE as the iterator is consumed, so memory stays bounded by one batch. `limit` caps the
+        number of listings and `cursor` starts after a previous page, as in `query`.
+        """
+        limit = filters.pop("limit", None)
+        cursor = filters.pop("cursor", None)
+        first_batch, next_cursor, total = self.query(**filters, cursor=cursor, limit=min(STREAM_BATCH_SIZE, limit or STREAM_BATCH_SIZE))
+
+        def generate() -> Iterator[bytes]:
+            listings, batch_cursor, remaining = first_batch, next_cursor, limit
+            while True:
+                for listing in listings:
+                    yield _serialize(listing, fields)
+                if remaining is not None:
+                    remaining -= len(listings)
+                if batch_cursor is None or remaining == 0:
+                    return
+                listings, batch_cursor = self._next_batch(filters, batch_cursor, min(STREAM_BATCH_SIZE, remaining or STREAM_BATCH_SIZE))
+
+        return generate(), total
+
+class InMemoryListingRepository(ListingRepository):
+    """
+    The catalogue held in process memory in a ColumnarListingStore (Listing models are materialized per
+    response), plus the structures built on top of it: the column indexes (built per load, then updated per
+    listing by `apply_changes`), the overcharge ranking, the market statistics, the full-text search index
+    and the response cache (all per listing).
+    """
+
+    # Compact the store once dead rows (left by re-scoring) outnumber the live ones
+    COMPACT_DEAD_ROW_RATIO = 1.0
+
+    def __init__(self):
+        self.listings = ColumnarListingStore() # Also holds the WWS inputs, to re-score under new rules
+        self.index = ListingIndex([])
+        self.overcharge_index = OverchargeIndex()
+        self.market_stats_index = MarketStats()
+        self.response_cache = ListingResponseCache()
+        self.search_index = SearchIndex()
+
+    def __len__(self) -> int:
+        return len(self.listings)
+
+    def store(self, listing: Listing, wws_input: Optional[WWSInputData] = None, cached: Optional[CachedBody] = None, summary: Optional[bytes] = None):
+        """
+        Stores or replaces one listing and updates the incrementally maintained structures.
+        `cached` and `summary` are the listing's already serialized full and summary bodies (e.g. from a
+        snapshot or a loader worker), if available.
+        """
+        self.listings.put(listing, wws_input)
+        self.overcharge_index.upsert(listing.id, listing.location, listing.advertised_rent, listing.max_legal_rent)
+        self.market_stats_index.upsert(listing.id, listing.location, listing.advertised_rent, listing.size_m2, listing.wws_points, listing.max_legal_rent)
+        self.response_cache.set_listing(listing, cached, summary)
+        self.search_index.add(listing.id, listing.title, listing.location, listing.description)
+
+    def rebuild_index(self):
+        """Rebuilds the column indexes and pre-serializes the catalogue; the new index is swapped in when complete."""
+        # rows() snapshots the ids first, so a concurrent store() (e.g. a background load) is safe
+        self.index = ListingIndex(self.listings.rows())
+        self.response_cache.catalogue()
+
+    def restore(self, listings: ColumnarListingStore):
+        """
+        Replaces the catalogue with an already built store (e.g. restored from a snapshot). The incrementally
+        maintained structures are filled by `store_restored`, the column indexes by `rebuild_index`.
+        """
+        self.clear()
+        self.listings = listings
+
+    def store_restored(self, bodies: Iterable[Tuple[int, CachedBody, Union[bytes, memoryview]]]):
+        """
+        Updates the incrementally maintained structures for (listing id, full body, summary body) of listings
+        already in the store; they are filled from the store's columns, so no Listing is materialized.
+        """
+        for listing_id, cached, summary in bodies:
+            row = self.listings.row(listing_id)
+            self.overcharge_index.upsert(listing_id, row.location, row.advertised_rent, row.max_legal_rent)
+            self.market_stats_index.upsert(listing_id, row.location, row.advertised_rent, row.size_m2, row.wws_points, row.max_legal_rent)
+            self.response_cache.set_bodies(listing_id, cached, summary)
+            self.search_index.add(listing_id, *self.listings.text_fields(listing_id))
+
+    def rescore(self, rules: Optional[WWSRuleSet] = None) -> int:
+        """
+        Re-scores every listing with WWS inputs under `rules` (the active rule set by default) in one batch
+        and re-stores only the listings whose points, max rent or breakdown changed.
+        The index is rebuilt (and swapped in) once if anything changed. Returns the number of changed listings.
+        """
+        # The WWS input columns feed the batch scorer directly; only changed listings are materialized
+        listing_ids, size_m2, rooms, energy_label, woz_value = self.listings.wws_input_columns()
+        wws_batch = calculate_wws_points_batch(size_m2, rooms, energy_label, woz_value, rules)
+        changed = 0
+        for row, listing_id in enumerate(listing_ids):
+            points = int(wws_batch.points[row])
+            max_rent = float(wws_batch.max_rent[row])
+            breakdown_rows = wws_batch.breakdown_rows(row)
+            if self.listings.wws_result(listing_id) == (points, max_rent) and self.listings.breakdown_rows(listing_id) == breakdown_rows:
+                continue
+            listing = self.listings[listing_id]
+            rescored = listing.model_copy(update={"wws_points": points, "max_legal_rent": max_rent, "wws_breakdown": wws_batch.breakdown(row)})
+            self.store(rescored, self.listings.wws_input(listing_id))
+            changed += 1
+        if changed:
+            self._compact_if_needed()
+            self.rebuild_index()
+        return changed
+
+    def remove(self, listing_id: int) -> bool:
+        """Removes one listing from the store, the column indexes and the incrementally maintained structures."""
+        self.index.remove(listing_id)
+        self.overcharge_index.remove(listing_id)
+        self.market_stats_index.remove(listing_id)
+        self.search_index.remove(listing_id)
+        self.response_cache.remove_listing(listing_id)
+        return self.listings.remove(listing_id)
+
+    def apply_changes(self, stored: Iterable[Tuple[Listing, Optional[WWSInputData]]], removed_ids: Iterable[int]) -> int:
+        """
+        Stores and removes a batch of listings, updating the column indexes per listing (no rebuild). The
+        catalogue bodies are only invalidated; they are rebuilt by the next request that needs them.
+        Returns the number of listings stored or removed.
+        """
+        changed = 0
+        for listing, wws_input in stored:
+            self.store(listing, wws_input)
+            self.index.upsert(listing)
+            changed += 1
+        for listing_id in removed_ids:
+            changed += self.remove(listing_id)
+        if changed:
+            self._compact_if_needed()
+        return changed
+
+    def _compact_if_needed(self):
+        if self.listings.dead_rows > self.COMPACT_DEAD_ROW_RATIO * len(self.listings):
+            self.listings = self.listings.compacted()
+
+    def clear(self):
+        self.listings.clear()
+        self.index = ListingIndex([])
+        self.overcharge_index.clear()
+        self.market_stats_index.clear()
+        self.response_cache.clear()
+        self.search_index.clear()
+
+    def get(self, listing_id: int) -> Optional[Listing]:
+        return self.listings.get(listing_id)
+
+    def _listings_of(self, listing_ids: Iterable[int]) -> List[Listing]:
+        # Listings removed since the index lookup (a concurrent write) are skipped
+        return [listing for listing in map(self.listings.get, listing_ids) if listing is not None]
+
+    def query(self, **filters) -> QueryResult:
+        listing_ids, next_cursor, total = self.index.query(**filters)
+        return self._listings_of(listing_ids), next_cursor, total
+
+    def top_overpriced(self, limit: int, location: Optional[str] = None) -> List[Tuple[Listing, float]]:
+        ranked = [(self.listings.get(listing_id), overcharge) for listing_id, overcharge in self.overcharge_index.top(limit, location)]
+        return [(listing, overcharge) for listing, overcharge in ranked if listing is not None]
+
+    def get_body(self, listing_id: int) -> Optional[CachedBody]:
+        return self.response_cache.listing(listing_id)
+
+    def market_stats(self, locations: Optional[Sequence[str]] = None, min_listings: int = 1) -> Dict[str, Any]:
+        # Maintained per listing: O(number of locations reported), independent of the catalogue size
+        return _market_stats_summary(self.market_stats_index, locations, min_listings)
+
+    def _body(self, listing_id: int, fields: Optional[Sequence[str]]) -> Optional[bytes]:
+        """Body of a listing: pre-serialized for the full and summary views, projected otherwise. None if it does not exist."""
+        if fields is None:
+            cached = self.response_cache.listing(listing_id)
+            return bytes(cached.body) if cached is not None else None
+        if fields == SUMMARY_FIELDS:
+            summary = self.response_cache.summary(listing_id)
+            return bytes(summary) if summary is not None else None
+        listing = self.listings.get(listing_id)
+        return project(listing, fields) if listing is not None else None
+
+    def _bodies(self, listing_ids: Iterable[int], fields: Optional[Sequence[str]]) -> Iterator[bytes]:
+        for listing_id in listing_ids:
+            body = self._body(listing_id, fields)
+            if body is not None: # None: removed since the query
+                yield body
+
+    def batch_body(self, listing_ids: Sequence[int], fields: Optional[Sequence[str]] = None) -> Tuple[CachedBody, List[int]]:
+        # Dictionary lookups of pre-serialized bodies; nothing is materialized for the full and summary views
+        bodies: List[bytes] = []
+        not_found: List[int] = []
+        for listing_id in listing_ids:
+            body = self._body(listing_id, fields)
+            if body is None:
+                not_found.append(listing_id)
+            else:
+                bodies.append(body)
+        return _batch_body(bodies, not_found), not_found
+
+    def query_body(self, fields: Optional[Sequence[str]] = None, **filters) -> Tuple[CachedBody, Optional[str], int]:
+        pre_serialized = fields is None or fields == SUMMARY_FIELDS
+        if pre_serialized and all(value is None for key, value in filters.items() if key != "sort") and filters.get("sort", "id") == "id":
+            return self.response_cache.catalogue(summary=fields is not None), None, len(self.response_cache)
+        listing_ids, next_cursor, total = self.index.query(**filters)
+        if pre_serialized:
+            return self.response_cache.listings(listing_ids, summary=fields is not None), next_cursor, total
+        return _json_array(self._bodies(listing_ids, fields)), next_cursor, total
+
+    def stream_bodies(self, fields: Optional[Sequence[str]] = None, **filters) -> Tuple[Iterator[bytes], int]:
+        # Only the matching ids are collected; bodies are yielded one at a time
+        listing_ids, _, total = self.index.query(**filters)
+        return self._bodies(listing_ids, fields), total
+
+    def search(self, query: str, limit: Optional[int] = None, offset: int = 0) -> SearchResult:
+        listing_ids, total = self.search_index.search(query, limit, offset)
+        return self._listings_of(listing_ids), total
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        return self.search_index.suggest(prefix, limit)
+
+    def search_body(self, query: str, limit: Optional[int] = None, offset: int = 0, fields: Optional[Sequence[str]] = None) -> Tuple[CachedBody, int]:
+        listing_ids, total = self.search_index.search(query, limit, offset)
+        return _json_array(self._bodies(listing_ids, fields)), total
+
+def _fts_match_expression(query: str) -> Optional[str]:
+    """FTS5 MATCH expression for `query`: every term quoted (no query syntax), the last one as a prefix."""
+    terms = tokenize(query)
+    if not terms:
+        return None
+    return " ".join(f'"{term}"' for term in terms) + "*"
+
+_RELATIONSHIPS = ("amenities", "wws_breakdown")
+
+# bm25 weights of the listings_fts columns (title, location, description), as search_index.FIELD_WEIGHTS
+_BM25_RANK = "bm25(listings_fts, 3.0, 2.0, 1.0)"
+
+def _sort_expression(column_name: str):
+    """SQL column for one of the internal column names of SORT_KEYS (the derived ones are generated columns)."""
+    return getattr(ListingORM, column_name)
+
+class SqlMarketStats:
+    """
+    MarketStats of one database, held in process: built with one scan of the listings table, then brought up
+    to date by replaying the listing_changes log (see database.create_change_log) from the last change
+    applied. A dashboard query reads only the changes made since the previous one, not the catalogue.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock() # Changes are replayed in log order, by one request at a time
+        self._stats: Optional[MarketStats] = None
+        self._seq = 0 # Last change applied
+
+    def current(self, db: Session) -> MarketStats:
+        with self._lock:
+            if self._stats is not None:
+                changes = db.execute(
+                    select(ListingChangeORM.seq, ListingChangeORM.sign, *_figure_columns(ListingChangeORM))
+                    .where(ListingChangeORM.seq > self._seq).order_by(ListingChangeORM.seq)
+                ).all()
+                if changes and changes[0].seq != self._seq + 1:
+                    self._stats = None # The log was pruned past the last change applied
+                else:
+                    for seq, sign, *figures in changes:
+                        self._stats.apply(*figures, sign=sign)
+                        self._seq = seq
+            if self._stats is None:
+                self._build(db)
+            return self._stats
+
+    def _build(self, db: Session):
+        # One statement, so the listings and the position in the log come from the same snapshot. The outer join
+        # yields the position (with NULL listing columns) for an empty table too.
+        position = select(func.coalesce(func.max(ListingChangeORM.seq), 0).label("seq")).subquery()
+        rows = db.execute(
+            select(position.c.seq, ListingORM.id, *_figure_columns(ListingORM)).select_from(position).outerjoin(ListingORM, true())
+        ).all()
+        stats = MarketStats()
+        for _, listing_id, *figures in rows:
+            if listing_id is not None:
+                stats.apply(*figures)
+        self._stats, self._seq = stats, rows[0].seq
+
+def _figure_columns(table) -> tuple:
+    # The arguments of MarketStats.apply, in order
+    return table.location, table.advertised_rent, table.size_m2, table.wws_points, table.max_legal_rent
+
+_SQL_MARKET_STATS: "weakref.WeakKeyDictionary[Engine, SqlMarketStats]" = weakref.WeakKeyDictionary()
+_SQL_MARKET_STATS_LOCK = threading.Lock()
+
+def sql_market_stats(bind: Engine) -> SqlMarketStats:
+    """The SqlMarketStats of a database engine, created on first use."""
+    with _SQL_MARKET_STATS_LOCK:
+        stats = _SQL_MARKET_STATS.get(bind)
+        if stats is None:
+            stats = _SQL_MARKET_STATS[bind] = SqlMarketStats()
+        return stats
+
+class SqlListingRepository(ListingRepository):
+    """
+    The catalogue served from the SQLAlchemy store. Amenities and breakdown items are eager-loaded with
+    selectinload (one extra IN query per relationship for the whole page instead of one per listing).
+    Fieldset queries load only the columns (and relationships) of the requested fields.
+    """
+
+    def __init__(self, db: Session):
+        self.db = db
+
+    @staticmethod
+    def _with_children(statement):
+        return statement.options(selectinload(ListingORM.amenities), selectinload(ListingORM.wws_breakdown))
+
+    @classmethod
+    def _with_fields(cls, statement, fields: Optional[Sequence[str]]):
+        """Loads the full listing, or only what the fieldset `fields` needs."""
+        if fields is None:
+            return cls._with_children(statement)
+        attributes = orm_attributes(fields)
+        options = [load_only(*(getattr(ListingORM, name) for name in attributes if name not in _RELATIONSHIPS))]
+        options.extend(selectinload(getattr(ListingORM, name)) for name in attributes if name in _RELATIONSHIPS)
+        return statement.options(*options)
+
+    @staticmethod
+    def _to_model(listing_orm: ListingORM) -> Listing:
+        return Listing.model_validate(listing_orm, from_attributes=True)
+
+    def get(self, listing_id: int) -> Optional[Listing]:
+        listing_orm = self.db.execute(self._with_children(select(ListingORM).where(ListingORM.id == listing_id))).scalar_one_or_none()
+        return self._to_model(listing_orm) if listing_orm is not None else None
+
+    def get_many(self, listing_ids: Sequence[int]) -> List[Listing]:
+        # One IN query (plus one per relationship) for the whole batch
+        return [self._to_model(listing_orm) for listing_orm in self._load_in_order(list(listing_ids))]
+
+    def batch_body(self, listing_ids: Sequence[int], fields: Optional[Sequence[str]] = None) -> Tuple[CachedBody, List[int]]:
+        if fields is None:
+            return super().batch_body(listing_ids)
+        rows = self._load_in_order(list(listing_ids), fields)
+        found = {listing_orm.id for listing_orm in rows}
+        not_found = [listing_id for listing_id in listing_ids if listing_id not in found]
+        return _batch_body((project(listing_orm, fields) for listing_orm in rows), not_found), not_found
+
+    def query(self, *, count_total: bool = True, **filters) -> QueryResult:
+        """Same as ListingIndex.query; with `count_total=False` the COUNT query is skipped and the total is -1."""
+        rows, next_cursor, total = self._query_orm(count_total=count_total, **filters)
+        return [self._to_model(listing_orm) for listing_orm in rows], next_cursor, total
+
+    def query_body(self, fields: Optional[Sequence[str]] = None, **filters) -> Tuple[CachedBody, Optional[str], int]:
+        if fields is None:
+            return super().query_body(**filters)
+        rows, next_cursor, total = self._query_orm(fields=fields, **filters)
+        return _json_array(project(listing_orm, fields) for listing_orm in rows), next_cursor, total
+
+    def _query_orm(
+        self,
+        *,
+        fields: Optional[Sequence[str]] = None,
+        min_rent: Optional[float] = None,
+        max_rent: Optional[float] = None,
+        min_size: Optional[float] = None,
+        max_size: Optional[float] = None,
+        min_rooms: Optional[int] = None,
+        max_rooms: Optional[int] = None,
+        location: Optional[str] = None,
+        energy_label: Optional[str] = None,
+        min_wws_points: Optional[int] = None,
+        max_wws_points: Optional[int] = None,
+        near: Optional[Coordinates] = None,
+        radius_km: Optional[float] = None,
+        sort: str = "id",
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        count_total: bool = True,
+    ) -> Tuple[List[ListingORM], Optional[str], int]:
+        """The ORM rows of a query page, with the columns of `fields` (all when None) loaded."""
+        descending = sort.startswith("-")
+        sort_key = sort[1:] if descending else sort
+        check_query_arguments(sort_key, near, radius_km)
+        after = decode_cursor(cursor) if cursor else None
+
+        conditions = []
+        for column, low, high in (
+            (ListingORM.advertised_rent, min_rent, max_rent),
+            (ListingORM.size_m2, min_size, max_size),
+            (ListingORM.rooms, min_rooms, max_rooms),
+            (ListingORM.wws_points, min_wws_points, max_wws_points),
+        ):
+            if low is not None:
+                conditions.append(column >= low)
+            if high is not None:
+                conditions.append(column <= high)
+        if location is not None:
+            conditions.append(func.lower(func.trim(ListingORM.location)) == (normalize_location(location) or ""))
+        if energy_label is not None:
+            conditions.append(func.upper(func.trim(ListingORM.energy_label)) == energy_label.strip().upper())
+        if near is not None:
+            return self._query_near(conditions, near, radius_km, SORT_KEYS[sort_key], descending, after, limit, fields)
+        sort_column = _sort_expression(SORT_KEYS[sort_key])
+
+        total = self.db.execute(select(func.count(ListingORM.id)).where(*conditions)).scalar_one() if count_total else -1
+
+        # Same order as ListingIndex: values asc/desc with the id as tie-breaker, missing values last (by id asc)
+        missing = sort_column.is_(None)
+        if descending:
+            order_by = [missing, sort_column.desc(), case((missing, ListingORM.id), else_=-ListingORM.id)]
+        else:
+            order_by = [missing, sort_column, ListingORM.id]
+
+        page_conditions = list(conditions)
+        if after is not None:
+            value, listing_id = after
+            if value is None:
+                page_conditions.append(and_(missing, ListingORM.id > listing_id))
+            elif descending:
+                page_conditions.append(or_(sort_column < value, and_(sort_column == value, ListingORM.id < listing_id), missing))
+            else:
+                page_conditions.append(or_(sort_column > value, and_(sort_column == value, ListingORM.id > listing_id), missing))
+
+        statement = self._with_fields(select(ListingORM, sort_column).where(*page_conditions).order_by(*order_by), fields)
+        if limit is not None:
+            statement = statement.limit(limit + 1) # One extra row tells whether there is a next page
+        rows = self.db.execute(statement).all()
+
+        next_cursor = None
+        if limit is not None and len(rows) > limit:
+            rows = rows[:limit]
+            last_listing, last_value = rows[-1]
+            next_cursor = encode_cursor(last_value, last_listing.id)
+        return [listing_orm for listing_orm, _ in rows], next_cursor, total
+
+    def _next_batch(self, filters: Dict[str, Any], cursor: Optional[str], limit: int) -> Tuple[List[Listing], Optional[str]]:
+        listings, next_cursor, _ = self.query(**filters, cursor=cursor, limit=limit, count_total=False)
+        self.db.expunge_all() # Keep the session small while streaming
+        return listings, next_cursor
+
+    def _query_near(
+        self,
+        conditions: list,
+        near: Coordinates,
+        radius_km: Optional[float],
+        sort_column_name: str,
+        descending: bool,
+        after: Optional[Tuple[Optional[float], int]],
+        limit: Optional[int],
+        fields: Optional[Sequence[str]],
+    ) -> Tuple[List[ListingORM], Optional[str], int]:
+        """
+        Distance-aware query: the bounding box of the radius is matched in SQL (on the latitude/longitude
+        index), exact distances, ordering and pagination are computed over the matching (id, position, sort
+        value) rows like in ListingIndex. Only the returned page is loaded as listings.
+        """
+        conditions = list(conditions)
+        if radius_km is not None:
+            min_latitude, max_latitude, min_longitude, max_longitude = bounding_box(near[0], near[1], radius_km)
+            conditions.append(ListingORM.latitude.between(min_latitude, max_latitude))
+            conditions.append(ListingORM.longitude.between(min_longitude, max_longitude))
+        sort_expression = _sort_expression(sort_column_name) if sort_column_name != "distance" else None
+        columns = [ListingORM.id, ListingORM.latitude, ListingORM.longitude]
+        if sort_expression is not None:
+            columns.append(sort_expression)
+
+        keys: List[Tuple[float, int]] = []
+        missing: List[int] = []
+        for row in self.db.execute(select(*columns).where(*conditions)).all():
+            listing_id, latitude, longitude = row[0], row[1], row[2]
+            distance = haversine_km(near[0], near[1], latitude, longitude) if latitude is not None and longitude is not None else None
+            if radius_km is not None and (distance is None or distance > radius_km):
+                continue
+            value = distance if sort_expression is None else row[3]
+            if value is None:
+                missing.append(listing_id)
+            else:
+                keys.append((value, listing_id))
+        keys.sort()
+        missing.sort()
+        page_ids, next_cursor, total = paginate(keys, missing, descending, after, limit)
+        return self._load_in_order(page_ids, fields), next_cursor, total
+
+    def _load_in_order(self, listing_ids: List[int], fields: Optional[Sequence[str]] = None) -> List[ListingORM]:
+        """Loads the ORM rows (with children, or the columns of `fields`) in the order of `listing_ids`."""
+        if not listing_ids:
+            return []
+        statement = self._with_fields(select(ListingORM).where(ListingORM.id.in_(listing_ids)), fields)
+        listings_by_id = {listing_orm.id: listing_orm for listing_orm in self.db.execute(statement).scalars()}
+        return [listings_by_id[listing_id] for listing_id in listing_ids if listing_id in listings_by_id]
+
+    def top_overpriced(self, limit: int, location: Optional[str] = None) -> List[Tuple[Listing, float]]:
+        overcharge = _sort_expression("overcharge")
+        conditions = [overcharge > 0]
+        if location is not None:
+            conditions.append(func.lower(func.trim(ListingORM.location)) == (normalize_location(location) or ""))
+        statement = self._with_children(
+            select(ListingORM, overcharge).where(*conditions).order_by(overcharge.desc(), ListingORM.id).limit(limit)
+        )
+        return [(self._to_model(listing_orm), value) for listing_orm, value in self.db.execute(statement).all()]
+
+    def market_stats(self, locations: Optional[Sequence[str]] = None, min_listings: int = 1) -> Dict[str, Any]:
+        # Maintained in process from the change log: the cost follows the writes since the last call, not the catalogue
+        stats = sql_market_stats(self.db.get_bind()).current(self.db)
+        return _market_stats_summary(stats, locations, min_listings)
+
+    def _search_ids(self, query: str, limit: Optional[int], offset: int) -> Tuple[List[int], int]:
+        match = _fts_match_expression(query)
+        if match is None:
+            return [], 0
+        total = self.db.execute(text("SELECT count(*) FROM listings_fts WHERE listings_fts MATCH :match"), {"match": match}).scalar_one()
+        # bm25 is lower for better matches
+        page = self.db.execute(
+            text(f"SELECT rowid FROM listings_fts WHERE listings_fts MATCH :match ORDER BY {_BM25_RANK}, rowid LIMIT :limit OFFSET :offset"),
+            {"match": match, "limit": -1 if limit is None else limit, "offset": offset},
+        ).scalars().all()
+        return list(page), total
+
+    def search(self, query: str, limit: Optional[int] = None, offset: int = 0) -> SearchResult:
+        listing_ids, total = self._search_ids(query, limit, offset)
+        return [self._to_model(listing_orm) for listing_orm in self._load_in_order(listing_ids)], total
+
+    def search_body(self, query: str, limit: Optional[int] = None, offset: int = 0, fields: Optional[Sequence[str]] = None) -> Tuple[CachedBody, int]:
+        if fields is None:
+            return super().search_body(query, limit, offset)
+        listing_ids, total = self._search_ids(query, limit, offset)
+        return _json_array(project(listing_orm, fields) for listing_orm in self._load_in_order(listing_ids, fields)), total
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        terms = tokenize(prefix)
+        if not terms:
+            return []
+        # The vocabulary table is ordered by term, so the range scan only visits terms sharing the prefix
+        return list(self.db.execute(
+            text("SELECT term FROM listings_fts_vocab WHERE term >= :start AND term < :end ORDER BY doc DESC, term LIMIT :limit"),
+            {"start": terms[-1], "end": terms[-1] + "\U0010ffff", "limit": limit},
+        ).scalars())
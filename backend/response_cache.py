@@ -0,0 +1,145 @@
+import hashlib
+from typing import Dict, Iterable, NamedTuple, Optional, Union
+
+from fastapi import Request, Response
+
+from .compression import CACHED_LEVELS, MIN_COMPRESS_SIZE, compress, negotiate_encoding
+from .models import Listing
+from .projection import SUMMARY_FIELDS, project
+
+# Pre-serialized JSON bodies for the listing endpoints.
+# Each listing is serialized (by alias) once when it is stored, and list responses are assembled by
+# joining those bytes, so the hot read path skips response_model validation and re-serialization.
+# Every body carries a strong ETag (a content hash) for If-None-Match / 304 handling.
+# Responses are compressed as negotiated with the client (see compression.py); a body cached with a
+# `compressed` dict (the full catalogue) keeps its compressed variants, so it is compressed once per
+# encoding instead of once per request.
+
+JSON_MEDIA_TYPE = "application/json"
+
+class CachedBody(NamedTuple):
+    body: Union[bytes, memoryview] # memoryview: a zero-copy view into a catalogue snapshot
+    etag: str
+    compressed: Optional[Dict[str, bytes]] = None # Content-Encoding -> compressed body, filled on demand
+
+def representation_etag(etag: str, encoding: Optional[str]) -> str:
+    """ETag of the body sent with `encoding` (each encoding is a different representation)."""
+    return etag if encoding is None else f'{etag[:-1]}-{encoding}"'
+
+def make_etag(body: bytes) -> str:
+    """Strong ETag derived from the response bytes."""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+def serialize_listing(listing: Listing) -> CachedBody:
+    """The full JSON body (by alias) of a listing, with its ETag."""
+    body = listing.model_dump_json(by_alias=True).encode("utf-8")
+    return CachedBody(body, make_etag(body))
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Evaluates an If-None-Match header against `etag` (weak comparison, as RFC 9110 requires for GET)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+def cached_json_response(request: Request, cached: CachedBody, headers: Optional[Dict[str, str]] = None) -> Response:
+    """
+    Serves cached JSON bytes, compressed as negotiated, or an empty 304 if the client already has this
+    version (in any encoding).
+    """
+    encoding = negotiate_encoding(request.headers.get("accept-encoding")) if len(cached.body) >= MIN_COMPRESS_SIZE else None
+    response_headers = {"ETag": representation_etag(cached.etag, encoding), "Vary": "Accept-Encoding", **(headers or {})}
+    if_none_match = request.headers.get("if-none-match")
+    if etag_matches(if_none_match, cached.etag) or (encoding and etag_matches(if_none_match, response_headers["ETag"])):
+        return Response(status_code=304, headers=response_headers)
+    body = cached.body if isinstance(cached.body, bytes) else bytes(cached.body)
+    if encoding is None:
+        return Response(content=body, media_type=JSON_MEDIA_TYPE, headers=response_headers)
+    if cached.compressed is not None:
+        encoded = cached.compressed.get(encoding)
+        if encoded is None:
+            # Concurrent first requests may both compress; either result is stored
+            encoded = cached.compressed[encoding] = compress(body, encoding, CACHED_LEVELS[encoding])
+    else:
+        encoded = compress(body, encoding)
+    response_headers["Content-Encoding"] = encoding
+    return Response(content=encoded, media_type=JSON_MEDIA_TYPE, headers=response_headers)
+
+def json_response(request: Request, body: bytes, headers: Optional[Dict[str, str]] = None) -> Response:
+    """Serves JSON bytes built for one response (no ETag), compressed as negotiated."""
+    encoding = negotiate_encoding(request.headers.get("accept-encoding")) if len(body) >= MIN_COMPRESS_SIZE else None
+    response_headers = {"Vary": "Accept-Encoding", **(headers or {})}
+    if encoding is not None:
+        body = compress(body, encoding)
+        response_headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type=JSON_MEDIA_TYPE, headers=response_headers)
+
+class ListingResponseCache:
+    """
+    Serialized listing bodies (full and summary view), invalidated per listing; the catalogue bodies are
+    rebuilt lazily.
+    """
+
+    def __init__(self):
+        self._listings: Dict[int, CachedBody] = {}
+        self._summaries: Dict[int, Union[bytes, memoryview]] = {}
+        self._catalogue: Optional[CachedBody] = None
+        self._summary_catalogue: Optional[CachedBody] = None
+
+    def __len__(self) -> int:
+        return len(self._listings)
+
+    def set_listing(self, listing: Listing, cached: Optional[CachedBody] = None, summary: Optional[bytes] = None):
+        """
+        (Re-)serializes one listing, or uses `cached` / `summary` if its full / summary body was already
+        serialized (e.g. by a loader worker). Invalidates the catalogue body.
+        """
+        if cached is None:
+            cached = serialize_listing(listing)
+        self.set_bodies(listing.id, cached, summary if summary is not None else project(listing, SUMMARY_FIELDS))
+
+    def set_bodies(self, listing_id: int, cached: CachedBody, summary: Union[bytes, memoryview]):
+        """Stores the serialized full and summary bodies of one listing (e.g. views onto a snapshot). Invalidates the catalogue body."""
+        self._summaries[listing_id] = summary
+        self._listings[listing_id] = cached
+        self._catalogue = self._summary_catalogue = None
+
+    def remove_listing(self, listing_id: int):
+        self._summaries.pop(listing_id, None)
+        if self._listings.pop(listing_id, None) is not None:
+            self._catalogue = self._summary_catalogue = None
+
+    def clear(self):
+        self._listings.clear()
+        self._summaries.clear()
+        self._catalogue = self._summary_catalogue = None
+
+    def listing(self, listing_id: int) -> Optional[CachedBody]:
+        return self._listings.get(listing_id)
+
+    def summary(self, listing_id: int) -> Optional[Union[bytes, memoryview]]:
+        return self._summaries.get(listing_id)
+
+    def listings(self, listing_ids: Iterable[int], summary: bool = False) -> CachedBody:
+        """Assembles a JSON array body from the cached (summary) bodies of `listing_ids` (in that order)."""
+        # Ids removed since they were looked up (a concurrent write) are skipped
+        if summary:
+            bodies = map(self._summaries.get, listing_ids)
+        else:
+            bodies = (cached.body if cached is not None else None for cached in map(self._listings.get, listing_ids))
+        body = b"[" + b",".join(body for body in bodies if body is not None) + b"]"
+        return CachedBody(body, make_etag(body))
+
+    def catalogue(self, summary: bool = False) -> CachedBody:
+        """The full catalogue ordered by id, built once per change of any listing (and compressed once per encoding)."""
+        if summary:
+            if self._summary_catalogue is None:
+                body, etag, _ = self.listings(sorted(self._summaries), summary=True)
+                self._summary_catalogue = CachedBody(body, etag, {})
+            return self._summary_catalogue
+        if self._catalogue is None:
+            body, etag, _ = self.listings(sorted(self._listings))
+            self._catalogue = CachedBody(body, etag, {})
+        return self._catalogue
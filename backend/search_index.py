@@ -0,0 +1,136 @@
+import heapq
+import re
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from typing import Dict, List, Optional, Tuple
+
+# In-process full-text search over listing titles, locations and descriptions.
+# An inverted index maps each term to the listings containing it (with a field-weighted score), and a
+# sorted vocabulary answers prefix lookups with two bisects, so autocomplete only touches the terms that
+# share the prefix. Listings are (re-)indexed one at a time as they are stored, so the index follows
+# every change without a rebuild.
+#
+# Tokenization matches SQLite FTS5's "unicode61 remove_diacritics 2" tokenizer used by the database
+# backend: lower case, diacritics removed, split on anything that is not a letter or digit.
+
+FIELD_WEIGHTS: Dict[str, int] = {"title": 3, "location": 2, "description": 1}
+MAX_PREFIX_EXPANSIONS = 50 # Most frequent completions of the last (prefix) query term used for matching
+
+_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+def tokenize(text: Optional[str]) -> List[str]:
+    """Lower-cased, accent-free terms of `text`."""
+    if not text:
+        return []
+    decomposed = unicodedata.normalize("NFKD", text.lower())
+    stripped = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _TOKEN_PATTERN.findall(stripped)
+
+class SearchIndex:
+    """Thread-safe inverted index with ranked search and prefix completion."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._postings: Dict[str, Dict[int, int]] = {} # term -> listing id -> weighted term frequency
+        self._terms_by_listing: Dict[int, Dict[str, int]] = {} # listing id -> its postings, for updates
+        self._vocabulary: List[str] = [] # Sorted terms, for prefix lookups
+
+    def __len__(self) -> int:
+        return len(self._terms_by_listing)
+
+    @staticmethod
+    def _weighted_terms(fields: Dict[str, Optional[str]]) -> Dict[str, int]:
+        weights: Dict[str, int] = {}
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for term in tokenize(text):
+                weights[term] = weights.get(term, 0) + weight
+        return weights
+
+    def add(self, listing_id: int, title: Optional[str], location: Optional[str], description: Optional[str]):
+        """Indexes (or re-indexes) one listing."""
+        weights = self._weighted_terms({"title": title, "location": location, "description": description})
+        with self._lock:
+            if self._terms_by_listing.get(listing_id) == weights:
+                return # Text unchanged (e.g. a re-scored listing)
+            self._remove_locked(listing_id)
+            for term, weight in weights.items():
+                postings = self._postings.get(term)
+                if postings is None:
+                    postings = self._postings[term] = {}
+                    insort(self._vocabulary, term)
+                postings[listing_id] = weight
+            self._terms_by_listing[listing_id] = weights
+
+    def remove(self, listing_id: int):
+        with self._lock:
+            self._remove_locked(listing_id)
+
+    def _remove_locked(self, listing_id: int):
+        for term in self._terms_by_listing.pop(listing_id, {}):
+            postings = self._postings[term]
+            del postings[listing_id]
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect_left(self._vocabulary, term)]
+
+    def clear(self):
+        with self._lock:
+            self._postings.clear()
+            self._terms_by_listing.clear()
+            self._vocabulary.clear()
+
+    def _completions_locked(self, prefix: str) -> List[str]:
+        """Vocabulary terms starting with `prefix` (a slice of the sorted vocabulary)."""
+        start = bisect_left(self._vocabulary, prefix)
+        end = bisect_left(self._vocabulary, prefix + "\U0010ffff", start)
+        return self._vocabulary[start:end]
+
+    def suggest(self, prefix: str, limit: int = 10) -> List[str]:
+        """Up to `limit` completions of the last term of `prefix`, most frequent first (ties alphabetically)."""
+        terms = tokenize(prefix)
+        if not terms:
+            return []
+        with self._lock:
+            completions = self._completions_locked(terms[-1])
+            return heapq.nsmallest(limit, completions, key=lambda term: (-len(self._postings[term]), term))
+
+    def search(self, query: str, limit: Optional[int] = None, offset: int = 0) -> Tuple[List[int], int]:
+        """
+        Listings matching every query term, the last term also as a prefix (search-as-you-type).
+        Ranked by the summed field weights of the matched terms, then by id.
+        Returns (listing ids of the requested page, total matches).
+        """
+        terms = tokenize(query)
+        if not terms:
+            return [], 0
+        with self._lock:
+            # Exact terms must all match
+            exact_postings = [self._postings.get(term, {}) for term in dict.fromkeys(terms[:-1])]
+            # Last term: union of its most frequent completions (the exact term included, if it exists)
+            completions = heapq.nlargest(MAX_PREFIX_EXPANSIONS, self._completions_locked(terms[-1]), key=lambda term: len(self._postings[term]))
+            prefix_scores: Dict[int, int] = {}
+            for term in completions:
+                for listing_id, weight in self._postings[term].items():
+                    if weight > prefix_scores.get(listing_id, 0):
+                        prefix_scores[listing_id] = weight
+
+            # Walk the smallest candidate set and look the listing up in all the others
+            exact_postings.sort(key=len)
+            candidates = exact_postings[0] if exact_postings and len(exact_postings[0]) < len(prefix_scores) else prefix_scores
+            scores: Dict[int, int] = {}
+            for listing_id in candidates:
+                score = prefix_scores.get(listing_id)
+                if score is None:
+                    continue
+                for postings in exact_postings:
+                    weight = postings.get(listing_id)
+                    if weight is None:
+                        break
+                    score += weight
+                else:
+                    scores[listing_id] = score
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+        page = ranked[offset:] if limit is None else ranked[offset:offset + limit]
+        return [listing_id for listing_id, _ in page], len(ranked)
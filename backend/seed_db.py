@@ -1,16 +1,499 @@
+import argparse
+import hashlib
 import json
+import logging
 import os
-from sqlalchemy.orm import Session
+import time
+from typing import Any, Dict, Iterator, List, NamedTuple, Optional, Sequence, Set, TextIO
+from sqlalchemy import and_, delete, insert, or_, select, update
+from sqlalchemy.orm import Session, selectinload
 
 # Import DATABASE_FILE_PATH from database.py
-from .database import SessionLocal, engine, create_db_and_tables, ListingORM, AmenityORM, WWSBreakdownItemORM, DATABASE_FILE_PATH
-from .models import WWSInputData, WWSDetails, WWSBreakdownItem # Corrected: WWSDetails and WWSBreakdownItem are from .models
-from .wws_calculator import get_wws_details # Corrected: WWSDetails is not imported from here
+from .database import SessionLocal, engine, create_db_and_tables, ListingORM, AmenityORM, WWSBreakdownItemORM, ImportCheckpointORM, DATABASE_FILE_PATH
+from .geo import get_location_table, listing_coordinates
+from .models import WWSInputData # WWSDetails and WWSBreakdownItem are built lazily by the batch result
+from .wws_calculator import calculate_wws_points_batch_from_inputs
+from .wws_rules import WWSRuleSet, get_active_rule_set
+
+logger = logging.getLogger(__name__)
 
 # Determine the correct path to the JSON file relative to this script
 # This script is in backend/, data is in backend/data/
 SEED_DATA_PATH = os.path.join(os.path.dirname(__file__), 'data', 'seed_listings.json')
 
+DEFAULT_CHUNK_SIZE = 5000 # Listings scored, inserted and committed together
+READ_BUFFER_SIZE = 1 << 16 # Bytes read at a time while parsing the source file
+# Largest JSON array element accepted (in characters). An element that is still incomplete after this much
+# text is malformed (or absurdly large): failing there keeps a broken file from being read into memory.
+MAX_ELEMENT_SIZE = 16 << 20
+
+# --- Streaming source parsing --- #
+# Sources are either a JSON array (the seed_listings.json format) or NDJSON (one listing object per line).
+# Both are parsed incrementally, so memory stays bounded by the read buffer and one chunk of listings.
+
+def _iter_json_array(f: TextIO, offset: int = 0, max_element_size: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+    """
+    Yields the elements of a top-level JSON array one at a time; `f` is positioned right after the '[', at
+    byte `offset` of the file. Raises ValueError for an element larger than `max_element_size` characters
+    (MAX_ELEMENT_SIZE by default).
+    """
+    max_element_size = max_element_size if max_element_size is not None else MAX_ELEMENT_SIZE
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    eof = False
+    while True:
+        # Skip whitespace and the separating commas
+        while position < len(buffer) and buffer[position] in " \t\r\n,":
+            position += 1
+        if position < len(buffer):
+            if buffer[position] == "]":
+                return
+            try:
+                element, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+            else:
+                # A value ending exactly at the buffer end may be cut off (e.g. a number); read more first
+                if end < len(buffer) or eof:
+                    yield element
+                    position = end
+                    continue
+        elif eof:
+            raise ValueError("Unexpected end of file: the JSON array is not closed.")
+        offset += len(buffer[:position].encode("utf-8")) # Byte offset of the first unparsed character
+        if len(buffer) - position > max_element_size:
+            raise ValueError(f"The JSON array element at byte {offset} is malformed or larger than {max_element_size} characters.")
+        chunk = f.read(READ_BUFFER_SIZE)
+        eof = not chunk
+        buffer = buffer[position:] + chunk
+        position = 0
+
+def _iter_ndjson(f: TextIO, first_line: str) -> Iterator[Dict[str, Any]]:
+    for line in ([first_line] if first_line.strip() else []):
+        yield json.loads(line)
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+def iter_source_listings(source_path: str) -> Iterator[Dict[str, Any]]:
+    """Streams listing dicts from a JSON array or NDJSON file (detected from the first character)."""
+    with open(source_path, 'r', encoding='utf-8') as f:
+        head = f.read(1)
+        skipped = 1 # Characters read so far; whitespace and '[' are one byte each
+        while head and head.isspace():
+            head = f.read(1)
+            skipped += 1
+        if head == "[":
+            yield from _iter_json_array(f, offset=skipped)
+        elif head:
+            yield from _iter_ndjson(f, head + f.readline())
+
+# --- Chunk scoring and bulk insert --- #
+
+def listing_content_hash(listing_data: Dict[str, Any]) -> str:
+    """Stable hash of a source listing, including its wws_input_data (key order does not matter)."""
+    canonical = json.dumps(listing_data, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def _validated_wws_input(listing_data: Dict[str, Any]) -> WWSInputData:
+    # Assuming 'wws_input_data' key is always present in each listing in seed_listings.json.
+    # If it could be missing, listing_data.get('wws_input_data', {}) would be safer.
+    raw_wws_inputs = listing_data['wws_input_data']
+
+    adapted_wws_input_dict = {
+        "size_m2": raw_wws_inputs.get("surface_area"),
+        "rooms": raw_wws_inputs.get("room_count"),
+        "energy_label": raw_wws_inputs.get("energy_label"),
+        "woz_value": raw_wws_inputs.get("woz_value"),
+    }
+
+    # WWSInputData will raise pydantic.ValidationError if required fields (size_m2, rooms)
+    # are None (e.g. "surface_area" missing in raw_wws_inputs) or of incorrect type.
+    # This error is not caught per-item, so it will stop the seeding process (fail-fast approach).
+    # This is acceptable for a seeder to enforce seed data quality.
+    return WWSInputData(**adapted_wws_input_dict)
+
+def insert_listings(db: Session, listings_data: List[Dict[str, Any]]):
+    """
+    Bulk-inserts listings in the seed_listings.json format, with WWS results and breakdown rows.
+    The chunk is scored in one vectorized batch and written with one executemany INSERT per table.
+    The caller commits.
+    """
+    validated_wws_inputs = [_validated_wws_input(listing_data) for listing_data in listings_data]
+    rules = get_active_rule_set() # Recorded with every row, so rows a rule switch overtook can be found
+    wws_batch = calculate_wws_points_batch_from_inputs(validated_wws_inputs, rules)
+
+    listing_rows: List[Dict[str, Any]] = []
+    amenity_rows: List[Dict[str, Any]] = []
+    breakdown_rows: List[Dict[str, Any]] = []
+    for row, listing_data in enumerate(listings_data):
+        validated_wws_input = validated_wws_inputs[row]
+        coordinates = listing_coordinates(listing_data)
+        listing_rows.append({
+            "id": listing_data['id'],
+            "title": listing_data['title'],
+            "location": listing_data['location'],
+            "images": listing_data['images'], # Stored as JSON by SQLAlchemy
+            "advertised_rent": listing_data['advertised_rent'],
+            "size_m2": listing_data['size'], # JSON 'size' maps to ORM 'size_m2'
+            "rooms": listing_data['rooms'],
+            "description": listing_data['description'],
+            "wws_points": int(wws_batch.points[row]),
+            "max_legal_rent": float(wws_batch.max_rent[row]),
+            "raw_wws_inputs": listing_data['wws_input_data'], # Store the original raw inputs as JSON
+            "energy_label": validated_wws_input.energy_label, # Store from validated input
+            "woz_value": validated_wws_input.woz_value, # Store from validated input
+            "content_hash": listing_content_hash(listing_data),
+            "rule_fingerprint": rules.fingerprint,
+            "latitude": coordinates[0] if coordinates else None,
+            "longitude": coordinates[1] if coordinates else None,
+        })
+        # Amenities, using .get for safety if 'amenities' key might be missing
+        for amenity_data in listing_data.get('amenities', []):
+            amenity_rows.append({"name": amenity_data['name'], "icon": amenity_data['icon'], "listing_id": listing_data['id']})
+        for item, points in wws_batch.breakdown_rows(row):
+            breakdown_rows.append({"item": item, "points": points, "listing_id": listing_data['id']})
+
+    if listing_rows:
+        db.execute(insert(ListingORM), listing_rows)
+    if amenity_rows:
+        db.execute(insert(AmenityORM), amenity_rows)
+    if breakdown_rows:
+        db.execute(insert(WWSBreakdownItemORM), breakdown_rows)
+
+def _delete_listings(db: Session, listing_ids: List[int]):
+    # Children first, then the listings themselves
+    db.execute(delete(AmenityORM).where(AmenityORM.listing_id.in_(listing_ids)))
+    db.execute(delete(WWSBreakdownItemORM).where(WWSBreakdownItemORM.listing_id.in_(listing_ids)))
+    db.execute(delete(ListingORM).where(ListingORM.id.in_(listing_ids)))
+
+def write_listing_changes(db: Session, upserts: List[Dict[str, Any]], deleted_ids: List[int]):
+    """
+    Inserts or replaces `upserts` (seed_listings.json format) and deletes `deleted_ids`, with one statement
+    per table and operation (see insert_listings). The caller commits, so a batch is one transaction.
+    """
+    replaced_ids = [listing_data['id'] for listing_data in upserts] + list(deleted_ids)
+    if replaced_ids:
+        _delete_listings(db, replaced_ids)
+    if upserts:
+        insert_listings(db, upserts)
+
+def _clear_listing_tables(db: Session):
+    # Delete order: dependent tables first, then principal table.
+    db.execute(delete(AmenityORM))
+    db.execute(delete(WWSBreakdownItemORM))
+    db.execute(delete(ListingORM))
+
+def _source_fingerprint(source_path: str) -> str:
+    stat = os.stat(source_path)
+    return f"{stat.st_size}:{stat.st_mtime_ns}"
+
+# --- Streaming import --- #
+
+def import_listings(source_path: str = SEED_DATA_PATH, chunk_size: int = DEFAULT_CHUNK_SIZE, resume: bool = True, replace: bool = False) -> int:
+    """
+    Streams listings from `source_path` (JSON array or NDJSON) into the database in chunks of `chunk_size`.
+    Each chunk is scored, bulk-inserted and committed together with a checkpoint, so an interrupted import
+    continues after the last committed chunk when run again with `resume=True` (and the file is unchanged).
+    By default the source's listings are added to the stored ones (a stored listing with the same id is
+    replaced); with `replace=True` a new (not resumed) import first deletes every stored listing, so the
+    catalogue ends up holding exactly the source's listings. Returns the number of listings imported by this run.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    source = os.path.abspath(source_path)
+    fingerprint = _source_fingerprint(source)
+    create_db_and_tables()
+
+    db: Session = SessionLocal()
+    try:
+        checkpoint: Optional[ImportCheckpointORM] = db.get(ImportCheckpointORM, source)
+        if resume and checkpoint is not None and checkpoint.fingerprint == fingerprint and not checkpoint.completed:
+            skip = checkpoint.rows_committed
+            print(f"Resuming import of {source} after {skip} already committed listings.")
+        else:
+            skip = 0
+            if replace:
+                _clear_listing_tables(db)
+            if checkpoint is None:
+                checkpoint = ImportCheckpointORM(source=source)
+                db.add(checkpoint)
+            checkpoint.fingerprint = fingerprint
+            checkpoint.rows_committed = 0
+            checkpoint.completed = 0
+            db.commit()
+            print(f"Importing {source} in chunks of {chunk_size} listings ({'replacing' if replace else 'adding to'} the stored listings).")
+
+        started = time.perf_counter()
+        imported = 0
+        chunk: List[Dict[str, Any]] = []
+
+        def commit_chunk():
+            nonlocal imported
+            chunk_started = time.perf_counter()
+            if replace:
+                insert_listings(db, chunk) # The tables were cleared: plain inserts
+            else:
+                write_listing_changes(db, chunk, []) # Replaces stored listings with the same ids
+            checkpoint.rows_committed += len(chunk)
+            db.commit()
+            imported += len(chunk)
+            chunk_seconds = time.perf_counter() - chunk_started
+            total_seconds = time.perf_counter() - started
+            print(
+                f"Committed {checkpoint.rows_committed} listings "
+                f"(chunk: {len(chunk) / chunk_seconds:,.0f}/s, overall: {imported / total_seconds:,.0f}/s)."
+            )
+            chunk.clear()
+
+        for position, listing_data in enumerate(iter_source_listings(source)):
+            if position < skip:
+                continue # Already committed by an earlier, interrupted run
+            chunk.append(listing_data)
+            if len(chunk) >= chunk_size:
+                commit_chunk()
+        if chunk:
+            commit_chunk()
+
+        checkpoint.completed = 1
+        db.commit()
+        elapsed = time.perf_counter() - started
+        rate = imported / elapsed if elapsed > 0 else 0.0
+        print(f"Import finished: {imported} listings in {elapsed:.2f}s ({rate:,.0f} listings/s), {checkpoint.rows_committed} in total.")
+        return imported
+    except Exception:
+        db.rollback() # The last, uncommitted chunk is discarded; its checkpoint was not advanced
+        raise
+    finally:
+        db.close()
+
+# --- Incremental sync --- #
+
+class SyncStats(NamedTuple):
+    inserted: int
+    updated: int
+    deleted: int
+    unchanged: int
+
+def sync_listings(source_path: str = SEED_DATA_PATH, chunk_size: int = DEFAULT_CHUNK_SIZE) -> SyncStats:
+    """
+    Brings the database in line with `source_path` without a full reload.
+    Each source listing's content hash is compared with the stored one: new listings are inserted, changed
+    ones are rewritten (WWS re-scored, breakdown and amenity rows replaced), unchanged ones are not touched,
+    and listings missing from the source are deleted. Changes are committed per chunk.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    create_db_and_tables()
+    started = time.perf_counter()
+    inserted = updated = unchanged = deleted = 0
+    seen_ids: Set[int] = set()
+
+    db: Session = SessionLocal()
+    try:
+        def sync_chunk(chunk: List[Dict[str, Any]]):
+            nonlocal inserted, updated, unchanged
+            chunk_ids = [listing_data['id'] for listing_data in chunk]
+            stored_hashes = dict(db.execute(
+                select(ListingORM.id, ListingORM.content_hash).where(ListingORM.id.in_(chunk_ids))
+            ).all())
+            new_listings, changed_listings = [], []
+            for listing_data in chunk:
+                listing_id = listing_data['id']
+                if listing_id not in stored_hashes:
+                    new_listings.append(listing_data)
+                elif stored_hashes[listing_id] != listing_content_hash(listing_data):
+                    changed_listings.append(listing_data)
+                else:
+                    unchanged += 1
+            if changed_listings:
+                # An update rewrites the listing row and its children with freshly computed WWS results
+                _delete_listings(db, [listing_data['id'] for listing_data in changed_listings])
+            if new_listings or changed_listings:
+                insert_listings(db, new_listings + changed_listings)
+                db.commit()
+            inserted += len(new_listings)
+            updated += len(changed_listings)
+
+        chunk: List[Dict[str, Any]] = []
+        for listing_data in iter_source_listings(source_path):
+            if listing_data['id'] in seen_ids:
+                continue # Duplicate in the source: the first occurrence wins
+            seen_ids.add(listing_data['id'])
+            chunk.append(listing_data)
+            if len(chunk) >= chunk_size:
+                sync_chunk(chunk)
+                chunk = []
+        if chunk:
+            sync_chunk(chunk)
+
+        stale_ids = [listing_id for listing_id in db.execute(select(ListingORM.id)).scalars() if listing_id not in seen_ids]
+        for start in range(0, len(stale_ids), chunk_size):
+            _delete_listings(db, stale_ids[start:start + chunk_size])
+            db.commit()
+        deleted = len(stale_ids)
+
+        stats = SyncStats(inserted=inserted, updated=updated, deleted=deleted, unchanged=unchanged)
+        print(
+            f"Sync finished in {time.perf_counter() - started:.2f}s: {stats.inserted} inserted, "
+            f"{stats.updated} updated, {stats.deleted} deleted, {stats.unchanged} unchanged."
+        )
+        return stats
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+# --- Re-scoring under new WWS rules --- #
+
+class RescoreStats(NamedTuple):
+    changed: int
+    skipped: int # Listings without valid stored WWS inputs (left as they are)
+
+def _scored_under_other_rules(rules: WWSRuleSet):
+    return or_(ListingORM.rule_fingerprint.is_(None), ListingORM.rule_fingerprint != rules.fingerprint)
+
+def _rescore_chunk(db: Session, listings: List[ListingORM], rules: WWSRuleSet, skipped_ids: Set[int]) -> int:
+    """Re-scores and commits one chunk of listings; returns the number whose results changed."""
+    scorable: List[ListingORM] = []
+    wws_inputs: List[WWSInputData] = []
+    for listing in listings:
+        if listing.id in skipped_ids:
+            continue # Already reported by an earlier pass
+        try:
+            wws_inputs.append(_validated_wws_input({'wws_input_data': listing.raw_wws_inputs}))
+        except (AttributeError, TypeError, ValueError) as e: # No inputs (None), or a ValidationError
+            logger.warning(f"Re-scoring skips listing {listing.id}: its stored WWS inputs are missing or invalid ({e}).")
+            skipped_ids.add(listing.id)
+            continue
+        scorable.append(listing)
+    if not scorable:
+        return 0
+    wws_batch = calculate_wws_points_batch_from_inputs(wws_inputs, rules)
+    changed_ids: List[int] = []
+    breakdown_rows: List[Dict[str, Any]] = []
+    for row, listing in enumerate(scorable):
+        listing.rule_fingerprint = rules.fingerprint # Also for unchanged results, so the sweep passes them by
+        points = int(wws_batch.points[row])
+        max_rent = float(wws_batch.max_rent[row])
+        rows = wws_batch.breakdown_rows(row)
+        stored_rows = [(item.item, item.points) for item in sorted(listing.wws_breakdown, key=lambda item: item.id)]
+        if listing.wws_points == points and listing.max_legal_rent == max_rent and stored_rows == rows:
+            continue
+        listing.wws_points = points
+        listing.max_legal_rent = max_rent
+        changed_ids.append(listing.id)
+        breakdown_rows.extend({"item": item, "points": item_points, "listing_id": listing.id} for item, item_points in rows)
+    db.flush() # Writes the updated listing rows
+    if changed_ids:
+        db.execute(delete(WWSBreakdownItemORM).where(WWSBreakdownItemORM.listing_id.in_(changed_ids)))
+        db.execute(insert(WWSBreakdownItemORM), breakdown_rows)
+    db.commit()
+    return len(changed_ids)
+
+def _rescore_pass(db: Session, rules: WWSRuleSet, chunk_size: int, condition, skipped_ids: Set[int]) -> int:
+    """Re-scores the listings matching `condition` (all if None) in id order, one chunk at a time."""
+    changed = 0
+    last_id: Optional[int] = None
+    while True:
+        statement = select(ListingORM).options(selectinload(ListingORM.wws_breakdown)).order_by(ListingORM.id).limit(chunk_size)
+        if condition is not None:
+            statement = statement.where(condition)
+        if last_id is not None:
+            statement = statement.where(ListingORM.id > last_id)
+        listings = db.execute(statement).scalars().all()
+        if not listings:
+            return changed
+        last_id = listings[-1].id
+        changed += _rescore_chunk(db, listings, rules, skipped_ids)
+        db.expunge_all() # Keep the session small between chunks
+
+def rescore_listings(rules: Optional[WWSRuleSet] = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> RescoreStats:
+    """
+    Re-scores the stored listings from their raw WWS inputs under `rules` (the active rule set by default).
+    Listings are processed in id order, one batch per chunk; only listings whose points, max rent or breakdown
+    changed are written (breakdown rows replaced), and every chunk is committed on its own. Every row records
+    the rule set fingerprint it was scored under; a final sweep re-scores the rows that still carry another
+    one (written by an ingestion batch scored under the previous rules after the walk had passed them).
+    A listing whose stored inputs are missing or invalid (e.g. a legacy row) is logged and skipped, so it
+    cannot stop the re-scoring halfway. Returns the number of changed and skipped listings.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    if rules is None:
+        rules = get_active_rule_set()
+    started = time.perf_counter()
+    skipped_ids: Set[int] = set()
+
+    db: Session = SessionLocal()
+    try:
+        changed = _rescore_pass(db, rules, chunk_size, None, skipped_ids)
+        changed += _rescore_pass(db, rules, chunk_size, _scored_under_other_rules(rules), skipped_ids)
+
+        logger.info(f"Re-scoring finished in {time.perf_counter() - started:.2f}s: {changed} listings changed, {len(skipped_ids)} skipped.")
+        return RescoreStats(changed=changed, skipped=len(skipped_ids))
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+def rescore_stale_listings(db: Session, listing_ids: Sequence[int], rules: Optional[WWSRuleSet] = None) -> RescoreStats:
+    """
+    Re-scores those of `listing_ids` that were scored under another rule set than `rules` (the active one by
+    default), e.g. rows of a write batch that a rule switch overtook. Uses (and commits) the caller's session.
+    """
+    if rules is None:
+        rules = get_active_rule_set()
+    skipped_ids: Set[int] = set()
+    condition = and_(ListingORM.id.in_(list(listing_ids)), _scored_under_other_rules(rules))
+    changed = _rescore_pass(db, rules, DEFAULT_CHUNK_SIZE, condition, skipped_ids)
+    return RescoreStats(changed=changed, skipped=len(skipped_ids))
+
+def geocode_listings(chunk_size: int = DEFAULT_CHUNK_SIZE) -> int:
+    """
+    Resolves the coordinates of the stored listings from their locations (e.g. after the lookup table in
+    data/locations.json was extended, or for a database created before listings had coordinates).
+    Listings with an unknown location keep their coordinates; only changed listings are written.
+    Returns their number.
+    """
+    if chunk_size < 1:
+        raise ValueError("chunk_size must be at least 1")
+    create_db_and_tables() # Adds the coordinate columns to an older database
+    table = get_location_table()
+    changed = 0
+    last_id: Optional[int] = None
+
+    db: Session = SessionLocal()
+    try:
+        while True:
+            statement = select(ListingORM.id, ListingORM.location, ListingORM.latitude, ListingORM.longitude).order_by(ListingORM.id).limit(chunk_size)
+            if last_id is not None:
+                statement = statement.where(ListingORM.id > last_id)
+            rows = db.execute(statement).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            updates = []
+            for listing_id, location, latitude, longitude in rows:
+                coordinates = table.resolve(location)
+                if coordinates is not None and coordinates != (latitude, longitude):
+                    updates.append({"id": listing_id, "latitude": coordinates[0], "longitude": coordinates[1]})
+            if updates:
+                db.execute(update(ListingORM), updates) # Bulk UPDATE by primary key
+                db.commit()
+                changed += len(updates)
+        print(f"Geocoding finished: {changed} listings changed.")
+        return changed
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
 def seed_database():
     # Remove existing database file to ensure a clean start if it exists
     # DATABASE_FILE_PATH is an absolute path defined in database.py
@@ -18,105 +501,52 @@ def seed_database():
         print(f"Found existing database file at {DATABASE_FILE_PATH}. Removing it to ensure fresh seeding.")
         try:
             os.remove(DATABASE_FILE_PATH)
+            # WAL mode (see database.SQLITE_PRAGMAS) keeps side files that belong to the old database
+            for side_file_suffix in ("-wal", "-shm"):
+                if os.path.exists(DATABASE_FILE_PATH + side_file_suffix):
+                    os.remove(DATABASE_FILE_PATH + side_file_suffix)
             print("Old database file removed.")
         except OSError as e:
             # If removal fails, print a warning. The subsequent create_db_and_tables might still fail if the file is problematic and locked.
             print(f"Warning: Could not remove existing database file {DATABASE_FILE_PATH}: {e}. Seeding might fail if the file is invalid or locked.")
 
-    print("Creating database tables...")
-    create_db_and_tables() # Ensures tables are created via database.py logic (idempotent)
-    print("Database tables created (if they didn't exist).")
-
-    db: Session = SessionLocal()
-
     try:
-        # Clearing data from tables is still a good practice after ensuring schema,
-        # even if the file was removed, to handle cases where removal failed.
-        # Delete order: dependent tables first, then principal table.
-        print("Clearing existing data from tables (if any)...")
-        db.query(AmenityORM).delete()
-        db.query(WWSBreakdownItemORM).delete()
-        db.query(ListingORM).delete()
-        db.commit()
-        print("Existing data cleared from tables.")
-
-        print(f"Loading seed data from: {SEED_DATA_PATH}")
-        with open(SEED_DATA_PATH, 'r', encoding='utf-8') as f:
-            listings_data = json.load(f)
-        print(f"Loaded {len(listings_data)} listings from JSON.")
-
-        for listing_data in listings_data:
-            print(f"Processing listing ID: {listing_data['id']}")
-            
-            # Assuming 'wws_input_data' key is always present in each listing in seed_listings.json.
-            # If it could be missing, listing_data.get('wws_input_data', {}) would be safer.
-            raw_wws_inputs = listing_data['wws_input_data']
-            
-            adapted_wws_input_dict = {
-                "size_m2": raw_wws_inputs.get("surface_area"),
-                "rooms": raw_wws_inputs.get("room_count"),
-                "energy_label": raw_wws_inputs.get("energy_label"),
-                "woz_value": raw_wws_inputs.get("woz_value"),
-            }
-            
-            # WWSInputData will raise pydantic.ValidationError if required fields (size_m2, rooms)
-            # are None (e.g. "surface_area" missing in raw_wws_inputs) or of incorrect type.
-            # This error is not caught per-item, so it will stop the entire seeding process (fail-fast approach).
-            # This is acceptable for a seeder to enforce seed data quality.
-            validated_wws_input = WWSInputData(**adapted_wws_input_dict)
-            
-            # get_wws_details expects a dictionary. validated_wws_input.model_dump() provides this.
-            # get_wws_details has internal error handling for parsing its input_data_dict;
-            # it returns a WWSDetails object with 0 points/rent if parsing fails.
-            wws_results: WWSDetails = get_wws_details(validated_wws_input.model_dump()) 
-
-            db_listing = ListingORM(
-                id=listing_data['id'],
-                title=listing_data['title'],
-                location=listing_data['location'],
-                images=listing_data['images'], # Stored as JSON by SQLAlchemy
-                advertised_rent=listing_data['advertised_rent'],
-                size_m2=listing_data['size'], # JSON 'size' maps to ORM 'size_m2'
-                rooms=listing_data['rooms'],
-                description=listing_data['description'],
-                wws_points=wws_results.points,
-                max_legal_rent=wws_results.max_rent,
-                raw_wws_inputs=raw_wws_inputs, # Store the original raw inputs as JSON
-                energy_label=validated_wws_input.energy_label, # Store from validated input
-                woz_value=validated_wws_input.woz_value    # Store from validated input
-            )
-
-            # Process amenities, using .get for safety if 'amenities' key might be missing
-            for amenity_data in listing_data.get('amenities', []):
-                db_amenity = AmenityORM(
-                    name=amenity_data['name'],
-                    icon=amenity_data['icon'],
-                    listing_id=db_listing.id # Foreign key; SQLAlchemy also infers from relationship append
-                )
-                db_listing.amenities.append(db_amenity) # Add to relationship collection
-            
-            # Process WWS breakdown items if available
-            if wws_results.breakdown: # wws_results.breakdown can be None or an empty list
-                for item_data_pydantic in wws_results.breakdown: # item_data_pydantic is a WWSBreakdownItem Pydantic model
-                    db_breakdown_item = WWSBreakdownItemORM(
-                        item=item_data_pydantic.item,
-                        points=item_data_pydantic.points,
-                        listing_id=db_listing.id # Foreign key
-                    )
-                    db_listing.wws_breakdown.append(db_breakdown_item) # Add to relationship collection
-            
-            db.add(db_listing) # Add the main listing object (and its cascaded children) to the session
-        
-        db.commit() # Commit all changes for all listings at once after the loop
-        print(f"Successfully seeded {len(listings_data)} listings into the database.")
-
+        imported = import_listings(SEED_DATA_PATH, resume=False, replace=True)
+        print(f"Successfully seeded {imported} listings into the database.")
     except Exception as e:
         print(f"An error occurred during seeding: {e}")
-        db.rollback() # Rollback in case of any error during the process
-    finally:
-        db.close() # Always close the session to free resources
 
 if __name__ == "__main__":
-    print("Starting database seeding process...")
-    seed_database()
-    print("Database seeding process finished.")
+    parser = argparse.ArgumentParser(description="Seed the listings database.")
+    parser.add_argument("--source", help="JSON array or NDJSON file to stream into the existing database (stored listings "
+                                         "with the same ids are replaced, the others are kept; see --replace). "
+                                         "Without it, the database is recreated from seed_listings.json.")
+    parser.add_argument("--replace", action="store_true", help="With --source: delete every stored listing before importing, "
+                                                               "so the catalogue holds exactly the source's listings.")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="Listings per batch/commit.")
+    parser.add_argument("--no-resume", action="store_true", help="Start over instead of resuming an interrupted import.")
+    parser.add_argument("--sync", action="store_true", help="Incrementally sync the database with the source "
+                                                            "(seed_listings.json unless --source is given) instead of reloading it.")
+    parser.add_argument("--rescore", action="store_true", help="Re-score the stored listings with the active WWS rule set "
+                                                               "(RENTRIGHT_WWS_RULES_VERSION or the newest data/wws_rules file).")
+    parser.add_argument("--geocode", action="store_true", help="Resolve the coordinates of the stored listings "
+                                                               "from their locations (data/locations.json).")
+    args = parser.parse_args()
+
+    if args.geocode:
+        print("Geocoding stored listings...")
+        geocode_listings(chunk_size=args.chunk_size)
+    elif args.rescore:
+        print("Re-scoring stored listings...")
+        stats = rescore_listings(chunk_size=args.chunk_size)
+        print(f"Re-scoring finished: {stats.changed} listings changed, {stats.skipped} skipped.")
+    elif args.sync:
+        print(f"Starting incremental sync from {args.source or SEED_DATA_PATH}...")
+        sync_listings(args.source or SEED_DATA_PATH, chunk_size=args.chunk_size)
+    elif args.source:
+        print(f"Starting streaming import from {args.source}...")
+        import_listings(args.source, chunk_size=args.chunk_size, resume=not args.no_resume, replace=args.replace)
+    else:
+        print("Starting database seeding process...")
+        seed_database()
+        print("Database seeding process finished.")
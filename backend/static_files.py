@@ -0,0 +1,273 @@
+import argparse
+import mimetypes
+import os
+import re
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+import anyio
+from fastapi.staticfiles import StaticFiles
+from starlette.exceptions import HTTPException
+from starlette.responses import FileResponse, Response
+from starlette.types import Scope
+
+from .compression import CACHED_LEVELS, MIN_COMPRESS_SIZE, compress, negotiate_encoding, supported_encodings
+from .response_cache import etag_matches, make_etag, representation_etag
+
+# Serving of the React build (build/, from `npm run build`).
+# The build is indexed once (at startup, or on the first request): every compressible file gets its gzip
+# and brotli variants, taken from the .gz/.br files written next to it at build time (`python -m
+# backend.static_files build`, see startup.sh) or compressed on the spot, and is then served in the
+# encoding the client prefers. Small files and the compressed variants are kept in memory.
+# Fingerprinted files (CRA names them like main.3f2a1b9c.js: the hash changes with the content) are cached
+# by browsers and CDNs for a year without revalidation; everything else, index.html above all, must be
+# revalidated (ETag / 304), so a new build is picked up on the next page load.
+# Paths that are not files and look like client-side routes (/listing/12) are answered with index.html,
+# so React Router can render them.
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+MAX_MEMORY_FILE_SIZE = 256 * 1024 # Larger files are streamed from disk
+# Total bytes (files and compressed variants) held in memory
+STATIC_MEMORY_BYTES = int(os.getenv("RENTRIGHT_STATIC_MEMORY_BYTES", str(64 * 1024 * 1024)))
+BUILD_LEVELS: Dict[str, int] = {"br": 11, "gzip": 9} # Build-time compression can afford the highest levels
+ENCODING_SUFFIXES: Dict[str, str] = {"br": ".br", "gzip": ".gz"}
+
+# A hex content hash of 8+ characters between the name and the extension(s): main.3f2a1b9c.js,
+# 453.8d4b3c2a.chunk.css, logo.6ce24c58023cc2f8fd88fe9d219db6c6.svg
+_FINGERPRINT = re.compile(r"\.[0-9a-f]{8,}\.")
+_COMPRESSIBLE_TYPES = {
+    "application/javascript", "application/json", "application/manifest+json", "application/xml",
+    "application/wasm", "image/svg+xml", "image/x-icon", "image/vnd.microsoft.icon",
+}
+
+class Variant(NamedTuple):
+    # One representation of a file: its bytes in memory, or a file to stream
+    body: Optional[bytes]
+    path: str
+    size: int
+
+class StaticAsset(NamedTuple):
+    path: str
+    media_type: str
+    etag: str
+    immutable: bool
+    mtime_ns: int
+    size: int
+    identity: Variant
+    encoded: Dict[str, Variant] # Content-Encoding -> variant; empty for incompressible (or tiny) files
+
+def is_fingerprinted(name: str) -> bool:
+    return _FINGERPRINT.search(os.path.basename(name)) is not None
+
+def is_compressible(media_type: str) -> bool:
+    return media_type.startswith("text/") or media_type in _COMPRESSIBLE_TYPES
+
+def guess_media_type(path: str) -> str:
+    if path.endswith(".map"):
+        return "application/json" # Source maps
+    return mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+def _is_encoded_copy(path: str) -> bool:
+    """Whether `path` is a build-time .gz/.br copy of a file next to it (served as a variant, not on its own)."""
+    for suffix in ENCODING_SUFFIXES.values():
+        if path.endswith(suffix) and os.path.isfile(path[: -len(suffix)]):
+            return True
+    return False
+
+def precompress_directory(directory: str, levels: Optional[Dict[str, int]] = None) -> int:
+    """
+    Writes .gz (and .br, with the Brotli package) copies of the compressible files of `directory` that are
+    large enough and worth it; returns the number of copies written. Up-to-date copies are kept.
+    """
+    levels = levels or BUILD_LEVELS
+    written = 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.join(root, name)
+            if _is_encoded_copy(path) or not is_compressible(guess_media_type(path)):
+                continue
+            stat_result = os.stat(path)
+            if stat_result.st_size < MIN_COMPRESS_SIZE:
+                continue
+            body = None
+            for encoding in supported_encodings():
+                target = path + ENCODING_SUFFIXES[encoding]
+                if os.path.isfile(target) and os.stat(target).st_mtime_ns >= stat_result.st_mtime_ns:
+                    continue
+                if body is None:
+                    with open(path, "rb") as f:
+                        body = f.read()
+                encoded = compress(body, encoding, levels[encoding])
+                if len(encoded) >= len(body):
+                    continue
+                with open(target, "wb") as f:
+                    f.write(encoded)
+                written += 1
+    return written
+
+class PrecompressedStaticFiles(StaticFiles):
+    """
+    StaticFiles for a single-page app build: precompressed variants negotiated by Accept-Encoding,
+    long-lived caching of fingerprinted files, small files served from memory and the index.html fallback
+    for client-side routes. Call `load` at startup to index the build before the first request.
+    """
+
+    def __init__(self, directory: str, memory_budget: int = STATIC_MEMORY_BYTES, max_memory_file_size: int = MAX_MEMORY_FILE_SIZE):
+        super().__init__(directory=directory, html=True)
+        self.memory_budget = memory_budget
+        self.max_memory_file_size = max_memory_file_size
+        self._assets: Dict[str, StaticAsset] = {} # Path relative to the directory ("/"-separated) -> asset
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+
+    def load(self):
+        """Indexes (and compresses) the files of the build; repeated calls are no-ops."""
+        with self._lock:
+            if self._loaded:
+                return
+            paths: List[str] = []
+            for root, _, names in os.walk(self.directory):
+                paths.extend(os.path.join(root, name) for name in names)
+            # Smallest first, so the memory budget holds as many files as possible
+            paths.sort(key=lambda path: os.path.getsize(path))
+            for path in paths:
+                if not _is_encoded_copy(path):
+                    self._index_locked(path)
+            self._loaded = True
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "files": len(self._assets),
+                "precompressed": sum(1 for asset in self._assets.values() if asset.encoded),
+                "memory_bytes": self._memory_bytes,
+            }
+
+    def _hold(self, body: bytes) -> Optional[bytes]:
+        # Keeps `body` in memory if it fits the budget
+        if self._memory_bytes + len(body) > self.memory_budget:
+            return None
+        self._memory_bytes += len(body)
+        return body
+
+    def _index_locked(self, path: str) -> Optional[StaticAsset]:
+        relative = os.path.relpath(path, self.directory).replace(os.sep, "/")
+        self._forget_locked(relative)
+        try:
+            stat_result = os.stat(path)
+            with open(path, "rb") as f:
+                body = f.read()
+        except OSError:
+            return None
+        media_type = guess_media_type(path)
+        in_memory = self._hold(body) if len(body) <= self.max_memory_file_size else None
+        encoded: Dict[str, Variant] = {}
+        if is_compressible(media_type) and len(body) >= MIN_COMPRESS_SIZE:
+            for encoding in supported_encodings():
+                copy_path = path + ENCODING_SUFFIXES[encoding]
+                if os.path.isfile(copy_path) and os.stat(copy_path).st_mtime_ns >= stat_result.st_mtime_ns:
+                    # Compressed at build time: read it into memory if small, stream it otherwise
+                    copy_size = os.path.getsize(copy_path)
+                    copy_body = None
+                    if copy_size <= self.max_memory_file_size:
+                        with open(copy_path, "rb") as f:
+                            copy_body = self._hold(f.read())
+                    encoded[encoding] = Variant(copy_body, copy_path, copy_size)
+                    continue
+                compressed = compress(body, encoding, CACHED_LEVELS[encoding])
+                if len(compressed) < len(body):
+                    held = self._hold(compressed) # Not on disk: offered only if it fits in memory
+                    if held is not None:
+                        encoded[encoding] = Variant(held, copy_path, len(held))
+        asset = StaticAsset(
+            path=path,
+            media_type=media_type,
+            etag=make_etag(body),
+            immutable=is_fingerprinted(relative),
+            mtime_ns=stat_result.st_mtime_ns,
+            size=stat_result.st_size,
+            identity=Variant(in_memory, path, len(body)),
+            encoded=encoded,
+        )
+        self._assets[relative] = asset
+        return asset
+
+    def _forget_locked(self, relative: str):
+        asset = self._assets.pop(relative, None)
+        if asset is None:
+            return
+        for variant in [asset.identity, *asset.encoded.values()]:
+            if variant.body is not None:
+                self._memory_bytes -= len(variant.body)
+
+    def _lookup(self, path: str) -> Optional[StaticAsset]:
+        relative = "index.html" if path in (".", "") else path.replace(os.sep, "/")
+        asset = self._assets.get(relative)
+        if asset is None or asset.immutable:
+            return asset
+        # Unfingerprinted files can change in place (a new build): re-index them when they did
+        try:
+            stat_result = os.stat(asset.path)
+        except OSError:
+            with self._lock:
+                self._forget_locked(relative)
+            return None
+        if stat_result.st_mtime_ns != asset.mtime_ns or stat_result.st_size != asset.size:
+            with self._lock:
+                return self._index_locked(asset.path)
+        return asset
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        if scope["method"] not in ("GET", "HEAD"):
+            raise HTTPException(status_code=405)
+        if not self._loaded:
+            await anyio.to_thread.run_sync(self.load)
+        asset = self._lookup(path)
+        if asset is None:
+            try:
+                # Files added since the build was indexed, directories (index.html, redirects), 404.html
+                return await super().get_response(path, scope)
+            except HTTPException as e:
+                if e.status_code != 404 or not _is_client_route(path):
+                    raise
+                asset = self._lookup("index.html")
+                if asset is None:
+                    raise
+        return self._asset_response(asset, scope)
+
+    def _asset_response(self, asset: StaticAsset, scope: Scope) -> Response:
+        request_headers = {key.decode("latin-1"): value.decode("latin-1") for key, value in scope["headers"]}
+        encoding = negotiate_encoding(request_headers.get("accept-encoding")) if asset.encoded else None
+        variant = asset.encoded.get(encoding) if encoding else None
+        if variant is None:
+            encoding, variant = None, asset.identity
+        headers = {
+            "ETag": representation_etag(asset.etag, encoding),
+            "Cache-Control": IMMUTABLE_CACHE_CONTROL if asset.immutable else REVALIDATE_CACHE_CONTROL,
+        }
+        if asset.encoded:
+            headers["Vary"] = "Accept-Encoding"
+        if_none_match = request_headers.get("if-none-match")
+        if etag_matches(if_none_match, asset.etag) or (encoding and etag_matches(if_none_match, headers["ETag"])):
+            return Response(status_code=304, headers=headers)
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        if variant.body is None:
+            return FileResponse(variant.path, headers=headers, media_type=asset.media_type)
+        headers["Content-Length"] = str(len(variant.body))
+        body = variant.body if scope["method"] == "GET" else b""
+        return Response(content=body, headers=headers, media_type=asset.media_type)
+
+def _is_client_route(path: str) -> bool:
+    """Whether a path that is not a file should get the app (index.html): no file extension, not under /api."""
+    parts = path.replace(os.sep, "/").split("/")
+    return parts[0] != "api" and "." not in parts[-1]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Writes .gz/.br copies of the compressible files of a React build.")
+    parser.add_argument("directory", nargs="?", default=os.path.join(os.path.dirname(__file__), "..", "build"))
+    arguments = parser.parse_args()
+    count = precompress_directory(arguments.directory)
+    print(f"Wrote {count} precompressed files to {os.path.abspath(arguments.directory)}.")
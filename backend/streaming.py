@@ -0,0 +1,64 @@
+from typing import Dict, Iterable, Iterator, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from .compression import StreamCompressor, negotiate_encoding
+from .response_cache import JSON_MEDIA_TYPE
+
+# Streamed list responses, for bulk consumers of the catalogue.
+# Listing bodies are written as they are produced - either as NDJSON (one listing per line) or as one
+# JSON array sent in chunks - and compressed incrementally as negotiated, so the server never holds more
+# than one chunk of the response. The first listing is sent right away (a short time-to-first-byte),
+# the rest in chunks of about STREAM_CHUNK_SIZE bytes.
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+STREAM_FORMATS = ("ndjson", "json-stream")
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def _framed_chunks(bodies: Iterable[bytes], stream_format: str) -> Iterator[bytes]:
+    """Frames listing bodies as NDJSON lines or as a JSON array, in chunks of about STREAM_CHUNK_SIZE bytes."""
+    as_array = stream_format == "json-stream"
+    buffer = bytearray(b"[" if as_array else b"")
+    first = True
+    for body in bodies:
+        if as_array:
+            if not first:
+                buffer += b","
+            buffer += body
+        else:
+            buffer += body
+            buffer += b"\n"
+        if first or len(buffer) >= STREAM_CHUNK_SIZE:
+            yield bytes(buffer)
+            buffer.clear()
+        first = False
+    if as_array:
+        buffer += b"]"
+    if buffer:
+        yield bytes(buffer)
+
+def _encoded_chunks(chunks: Iterator[bytes], encoding: str) -> Iterator[bytes]:
+    compressor = StreamCompressor(encoding)
+    for chunk in chunks:
+        yield compressor.compress(chunk)
+    yield compressor.flush()
+
+def streamed_json_response(
+    request: Request,
+    bodies: Iterable[bytes],
+    stream_format: str,
+    headers: Optional[Dict[str, str]] = None,
+) -> StreamingResponse:
+    """Streams serialized listings in `stream_format` ("ndjson" or "json-stream"), compressed as negotiated."""
+    if stream_format not in STREAM_FORMATS:
+        raise ValueError(f"Unknown stream format '{stream_format}'. Expected one of: {', '.join(STREAM_FORMATS)}.")
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+    chunks = _framed_chunks(bodies, stream_format)
+    response_headers = {"Vary": "Accept-Encoding", **(headers or {})}
+    if encoding is not None:
+        chunks = _encoded_chunks(chunks, encoding)
+        response_headers["Content-Encoding"] = encoding
+    media_type = NDJSON_MEDIA_TYPE if stream_format == "ndjson" else JSON_MEDIA_TYPE
+    # A plain iterator: Starlette consumes it in its threadpool, so a database-backed stream does not block the event loop
+    return StreamingResponse(chunks, media_type=media_type, headers=response_headers)
@@ -0,0 +1,75 @@
+from typing import Callable
+
+import pytest
+from backend.models import Amenity, Listing, ListingCreate, WWSBreakdownItem
+
+# Shared test data factories. Each fixture returns a function building one listing; keyword arguments
+# override the defaults (by field name for the models, by source key for the raw source listings).
+
+# Text with what JSON serialization and streaming parsers have to get right: quotes, commas, brackets, a tab, non-ASCII
+DESCRIPTION = "Bright\tapartment with \"quotes\", commas, ] brackets and ümlauts."
+IMAGE = "https://example.com/1.jpg"
+BALCONY = {"name": "Balcony", "icon": "fas fa-sun"}
+
+@pytest.fixture
+def make_source_listing() -> Callable[..., dict]:
+    """Raw listings as in seed_listings.json, with WWS inputs; rent and size grow with the id."""
+    def make(listing_id: int, **overrides) -> dict:
+        listing = {
+            "id": listing_id,
+            "title": f"Listing {listing_id}",
+            "location": "Utrecht Oost",
+            "images": [IMAGE],
+            "advertised_rent": 1000 + listing_id,
+            "size": 50 + listing_id,
+            "rooms": 2,
+            "description": DESCRIPTION,
+            "amenities": [BALCONY],
+            "wws_input_data": {"surface_area": 50 + listing_id, "energy_label": "B", "woz_value": 300000, "room_count": 2},
+        }
+        listing.update(overrides)
+        return listing
+    return make
+
+@pytest.fixture
+def make_listing() -> Callable[..., Listing]:
+    """Scored Listing models."""
+    def make(listing_id: int, **overrides) -> Listing:
+        fields = dict(
+            id=listing_id,
+            title=f"Listing {listing_id}",
+            location="Amsterdam Centrum",
+            images=[IMAGE],
+            advertised_rent=1500.0,
+            size_m2=60.0,
+            rooms=2,
+            description=DESCRIPTION,
+            energy_label="B",
+            wws_points=200,
+            max_legal_rent=1550.0,
+            amenities=[Amenity(**BALCONY)],
+            wws_breakdown=[WWSBreakdownItem(item="Surface Area (60 m\texttwosuperior)", points=60)],
+        )
+        fields.update(overrides)
+        return Listing(**fields)
+    return make
+
+@pytest.fixture
+def make_listing_create() -> Callable[..., ListingCreate]:
+    """Listing writes as accepted by POST/PUT /api/listings (scored when applied)."""
+    def make(**overrides) -> ListingCreate:
+        fields = dict(
+            title="Canal view",
+            location="Amsterdam Centrum",
+            images=[IMAGE],
+            advertised_rent=1500.0,
+            size_m2=60.0,
+            rooms=2,
+            description=DESCRIPTION,
+            energy_label="B",
+            woz_value=300000.0,
+            amenities=[Amenity(**BALCONY)],
+        )
+        fields.update(overrides)
+        return ListingCreate(**fields)
+    return make
@@ -0,0 +1,48 @@
+import json
+
+from backend.benchmarks.catalogue_generator import generate_source_listings, write_catalogue
+from backend.benchmarks.listing_store_memory import CATALOGUE_BODIES, COMPONENTS, measure_repository
+from backend.benchmarks.suite import compare, run_suite
+from backend.catalogue_loader import build_listings_chunk
+from backend.seed_db import iter_source_listings
+
+def test_generated_catalogue_is_deterministic_and_loadable(tmp_path):
+    listings = list(generate_source_listings(300, seed=7))
+    assert listings == list(generate_source_listings(300, seed=7))
+    assert listings != list(generate_source_listings(300, seed=8))
+    assert [listing["id"] for listing in listings] == list(range(1, 301))
+    built = build_listings_chunk(listings)
+    assert len(built) == 300
+    assert all(listing.wws_points and listing.latitude is not None for listing, _ in built)
+
+    for output_format in ("json", "ndjson"):
+        path = tmp_path / f"listings.{output_format}"
+        write_catalogue(str(path), 300, seed=7, output_format=output_format)
+        assert list(iter_source_listings(str(path))) == listings
+    assert json.loads((tmp_path / "listings.json").read_text()) == listings
+
+def test_compare_reports_regressions_by_metric_direction():
+    baseline = {"results": {"1000": {"load.source_s": 2.0, "seed.listings_per_s": 1000.0, "http.search.p95_ms": 10.0}}}
+    current = {"results": {
+        "1000": {"load.source_s": 2.2, "seed.listings_per_s": 700.0, "http.search.p95_ms": 5.0},
+        "5000": {"load.source_s": 9.0}, # No baseline for this scale
+    }}
+    regressions = compare(baseline, current, threshold=0.15)
+    assert [(r["scale"], r["metric"]) for r in regressions] == [(1000, "seed.listings_per_s")]
+    assert compare(baseline, current, threshold=0.05)[0]["metric"] == "load.source_s"
+
+def test_run_suite_small_scale():
+    document = run_suite([200], ["wws", "load"], repeat=1, log=lambda message: None)
+    metrics = document["results"]["200"]
+    assert document["parameters"]["scales"] == [200]
+    assert metrics["load.source_listings_per_s"] > 0 and metrics["load.snapshot_s"] > 0
+    assert metrics["wws.batch_us"] > 0
+    assert compare(document, document) == []
+
+def test_repository_memory_breakdown_covers_every_component():
+    breakdown = measure_repository(200)
+    for component in [*COMPONENTS.values(), CATALOGUE_BODIES]:
+        assert breakdown[component] > 0, component
+    assert breakdown["Total"] == sum(size for name, size in breakdown.items() if name != "Total")
+    # The listing store is only a part of what the repository holds per listing
+    assert breakdown["ColumnarListingStore"] < breakdown["Total"] / 2
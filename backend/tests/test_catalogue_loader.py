@@ -0,0 +1,156 @@
+import json
+import os
+import pytest
+from backend import catalogue_snapshot
+from backend.catalogue_loader import CatalogueLoader, build_listings_chunk, build_serialized_chunk
+from backend.models import Listing
+from backend.projection import SUMMARY_FIELDS, project
+from backend.repository import InMemoryListingRepository
+from backend.seed_db import SEED_DATA_PATH
+from backend.wws_calculator import get_wws_details
+from backend import wws_rules
+
+@pytest.fixture
+def source_path(tmp_path, make_source_listing) -> str:
+    # Odd ids in Utrecht Oost, even ids in Amsterdam Centrum
+    listings = [make_source_listing(listing_id, location="Utrecht Oost" if listing_id % 2 else "Amsterdam Centrum") for listing_id in range(1, 26)]
+    path = tmp_path / "listings.json"
+    path.write_text(json.dumps(listings), encoding="utf-8")
+    return str(path)
+
+def test_build_listings_chunk_scores_and_skips_invalid_inputs(make_source_listing):
+    with open(SEED_DATA_PATH, "r", encoding="utf-8") as f:
+        raw_listings = json.load(f)
+    raw_listings.append({**make_source_listing(99), "wws_input_data": {"energy_label": "A"}})
+    built = build_listings_chunk(raw_listings)
+    assert [listing.id for listing, _ in built] == [1, 2, 3, 99]
+    listing, wws_input = built[0]
+    details = get_wws_details(wws_input.model_dump())
+    assert (listing.wws_points, listing.max_legal_rent, listing.wws_breakdown) == (details.points, details.max_rent, details.breakdown)
+    assert built[-1][0].wws_points is None and built[-1][1] is None
+
+def test_build_serialized_chunk_returns_the_response_bodies(make_source_listing):
+    raw_listings = [make_source_listing(listing_id) for listing_id in range(1, 4)]
+    for (listing, wws_input, cached, summary), (built_listing, built_input) in zip(build_serialized_chunk(raw_listings), build_listings_chunk(raw_listings)):
+        assert (listing, wws_input) == (built_listing, built_input)
+        assert cached.body == listing.model_dump_json(by_alias=True).encode("utf-8")
+        assert summary == project(listing, SUMMARY_FIELDS)
+
+@pytest.mark.parametrize("workers", [0, 2])
+def test_catalogue_loader_loads_all_chunks(source_path: str, workers: int):
+    repository = InMemoryListingRepository()
+    loader = CatalogueLoader(repository, source_path, chunk_size=4, workers=workers, snapshot_dir=None)
+    loader.start()
+    assert loader.wait(timeout=60)
+    status = loader.progress.snapshot()
+    assert status["state"] == "ready"
+    assert (status["listings_read"], status["listings_loaded"], status["chunks_loaded"]) == (25, 25, 7)
+    assert sorted(repository.listings) == list(range(1, 26))
+    assert all(repository.listings.wws_input(listing_id) is not None for listing_id in repository.listings)
+    # The final index covers every chunk
+    ids, _, total = repository.index.query(location="amsterdam centrum", sort="-rent")
+    assert total == 12 and ids[0] == 24
+    # Bodies serialized by the workers are the ones the repository would have built itself
+    listing = repository.get(25)
+    assert repository.get_body(25).body == listing.model_dump_json(by_alias=True).encode("utf-8")
+    assert repository.response_cache.summary(25) == project(listing, SUMMARY_FIELDS)
+
+def test_catalogue_loader_missing_source(tmp_path):
+    repository = InMemoryListingRepository()
+    loader = CatalogueLoader(repository, str(tmp_path / "missing.json"), workers=0, snapshot_dir=str(tmp_path))
+    assert loader.run() == 0
+    status = loader.progress.snapshot()
+    assert status["state"] == "failed" and status["ready"] is False
+    assert "not found" in status["error"]
+    assert len(repository) == 0
+
+def test_catalogue_loader_restores_from_snapshot(source_path: str, tmp_path, make_source_listing):
+    snapshot_dir = str(tmp_path / "snapshots")
+    computed = InMemoryListingRepository()
+    first = CatalogueLoader(computed, source_path, chunk_size=10, workers=0, snapshot_dir=snapshot_dir)
+    assert first.run() == 25
+    assert first.progress.loaded_from == "source"
+    snapshots = os.listdir(snapshot_dir)
+    assert len(snapshots) == 1
+
+    restored = InMemoryListingRepository()
+    second = CatalogueLoader(restored, source_path, chunk_size=10, workers=0, snapshot_dir=snapshot_dir)
+    assert second.run() == 25
+    status = second.progress.snapshot()
+    assert (status["loaded_from"], status["chunks_loaded"]) == ("snapshot", 3)
+    for listing_id in computed.listings:
+        assert restored.get(listing_id) == computed.get(listing_id)
+        assert restored.listings.wws_input(listing_id) == computed.listings.wws_input(listing_id)
+    for listing_id in computed.listings:
+        assert bytes(restored.get_body(listing_id).body) == computed.get_body(listing_id).body
+        assert restored.get_body(listing_id).etag == computed.get_body(listing_id).etag
+    assert restored.query_body(sort="-rent", limit=3)[0].body == computed.query_body(sort="-rent", limit=3)[0].body
+    assert restored.response_cache.catalogue() == computed.response_cache.catalogue()
+
+    # A changed source gets a new snapshot, and the old one is removed
+    with open(source_path, "w", encoding="utf-8") as f:
+        json.dump([make_source_listing(listing_id) for listing_id in range(1, 5)], f)
+    third = CatalogueLoader(InMemoryListingRepository(), source_path, workers=0, snapshot_dir=snapshot_dir)
+    assert third.run() == 4
+    assert third.progress.loaded_from == "source"
+    assert len(os.listdir(snapshot_dir)) == 1 and os.listdir(snapshot_dir) != snapshots
+
+def test_snapshot_restore_maps_the_store_columns(source_path: str, tmp_path, monkeypatch):
+    computed = InMemoryListingRepository()
+    assert CatalogueLoader(computed, source_path, workers=0, snapshot_dir=str(tmp_path)).run() == 25
+
+    def no_validation(*args, **kwargs):
+        raise AssertionError("A snapshot restore must not validate listings")
+    monkeypatch.setattr(Listing, "model_validate_json", no_validation)
+    monkeypatch.setattr(Listing, "model_validate", no_validation)
+    restored = InMemoryListingRepository()
+    loader = CatalogueLoader(restored, source_path, chunk_size=10, workers=0, snapshot_dir=str(tmp_path))
+    assert loader.run() == 25 and loader.progress.loaded_from == "snapshot"
+    # Columns and bodies are read-only views onto the snapshot mapping
+    assert isinstance(restored.listings._advertised_rent, memoryview) and restored.listings._advertised_rent.readonly
+    assert isinstance(restored.get_body(7).body, memoryview)
+    assert restored.search("listing")[1] == computed.search("listing")[1] == 25
+    assert restored.market_stats() == computed.market_stats()
+    assert restored.top_overpriced(3) == computed.top_overpriced(3)
+    assert restored.batch_body([1, 2], SUMMARY_FIELDS)[0].body == computed.batch_body([1, 2], SUMMARY_FIELDS)[0].body
+    monkeypatch.undo()
+
+    # Writes after a restore go to arrays of this process
+    listing = computed.get(3).model_copy(update={"advertised_rent": 5000.0})
+    restored.apply_changes([(listing, computed.listings.wws_input(3))], [4])
+    assert restored.get(3) == listing and restored.get(4) is None and len(restored) == 24
+    assert restored.index.query(sort="-rent")[0][0] == 3
+
+def test_unreadable_snapshot_is_ignored(source_path: str, tmp_path):
+    key = catalogue_snapshot.snapshot_key(source_path, wws_rules.get_active_rule_set())
+    path = catalogue_snapshot.snapshot_path(key, str(tmp_path))
+    with open(path, "wb") as f:
+        f.write(catalogue_snapshot.MAGIC + b"garbage")
+    assert catalogue_snapshot.open_snapshot(key, str(tmp_path)) is None
+    loader = CatalogueLoader(InMemoryListingRepository(), source_path, workers=0, snapshot_dir=str(tmp_path))
+    assert loader.run() == 25
+    assert loader.progress.loaded_from == "source"
+    assert catalogue_snapshot.open_snapshot(key, str(tmp_path)) is not None # Replaced by a valid snapshot
+
+def test_rule_switch_while_writing_the_snapshot_is_rescored(source_path: str, tmp_path, monkeypatch):
+    base = wws_rules.get_active_rule_set()
+    rules = wws_rules.compile_rule_set({
+        "version": "test", "points_per_sq_meter": 2, "energy_label_points": dict(base.energy_label_points),
+        "woz_value_factor": 0.0003, "base_points_rooms": 5, "rent_factor_per_point": 7.5, "rent_base": 50.0,
+    })
+    monkeypatch.setattr(wws_rules, "_LISTENERS", []) # No app listeners: the loader alone must catch the switch
+    repository = InMemoryListingRepository()
+    loader = CatalogueLoader(repository, source_path, chunk_size=10, workers=0, snapshot_dir=str(tmp_path))
+    write_snapshot = loader._write_snapshot
+    def switching_write(key):
+        write_snapshot(key)
+        wws_rules.activate_rule_set(rules)
+    monkeypatch.setattr(loader, "_write_snapshot", switching_write)
+    try:
+        assert loader.run() == 25
+        assert loader.progress.ready
+        # Listing 1: 2 * 51 m² + 20 (B) + 89 (WOZ) + 5 (rooms)
+        assert repository.get(1).wws_points == 2 * 51 + 20 + 89 + 5
+        assert repository.query(sort="-wws_points", limit=1)[0][0].id == 25
+    finally:
+        wws_rules.activate_rule_set(base)
@@ -0,0 +1,179 @@
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+from backend.change_feed import ChangeFeed
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".."))
+
+class Recorder:
+    def __init__(self):
+        self.applied = {}
+        self.calls = []
+
+    def __call__(self, changes):
+        self.calls.append([change.key for change in changes])
+        for change in changes:
+            self.applied[change.key] = change.payload
+
+def test_changes_reach_other_processes_in_order(tmp_path):
+    path = str(tmp_path / "changes.db")
+    first, second = ChangeFeed(path, origin="first"), ChangeFeed(path, origin="second")
+    first_seen, second_seen = Recorder(), Recorder()
+    first.subscribe("listings", first_seen)
+    second.subscribe("listings", second_seen)
+    try:
+        assert first.publish_and_apply("listings", [("1", {"rent": 1000}), ("2", {"rent": 1200})]) == 2
+        second.publish("listings", [("1", {"rent": 1100})])
+        first.publish("listings", [("2", None)])
+        assert second.poll() == 2 # Only the latest change of listing 1 is left in the log
+        assert first.poll() == 2 # Another connection committed since the last poll
+        assert first.poll() == 0 and first.stats()["polls"] == 3
+        assert first_seen.applied == second_seen.applied == {"1": {"rent": 1100}, "2": None}
+        assert first.last_seq == second.last_seq
+    finally:
+        first.stop()
+        second.stop()
+
+def test_late_worker_replays_the_compacted_log(tmp_path):
+    path = str(tmp_path / "changes.db")
+    publisher = ChangeFeed(path)
+    for version in range(5):
+        publisher.publish("listings", [(str(listing_id), {"version": version}) for listing_id in range(100)])
+    publisher.publish("rules", [("active", {"version": "2099"})])
+    late = ChangeFeed(path)
+    listings, rules = Recorder(), Recorder()
+    late.subscribe("listings", listings)
+    late.subscribe("rules", rules)
+    try:
+        assert late.poll(force=True) == 101
+        assert listings.applied == {str(listing_id): {"version": 4} for listing_id in range(100)}
+        assert rules.applied == {"active": {"version": "2099"}}
+        assert len(listings.calls) == 1 # One batch per run of changes of one kind
+    finally:
+        publisher.stop()
+        late.stop()
+
+def test_failed_changes_do_not_stop_the_feed(tmp_path):
+    feed = ChangeFeed(str(tmp_path / "changes.db"))
+
+    def fail(changes):
+        raise RuntimeError("cannot apply")
+
+    feed.subscribe("rules", fail)
+    try:
+        feed.publish_and_apply("rules", [("active", {"version": "1999"})])
+        assert feed.stats()["failed"] == 1 and feed.last_seq == 1
+    finally:
+        feed.stop()
+
+def test_reserved_ids_are_unique_across_processes(tmp_path):
+    path = str(tmp_path / "changes.db")
+    feeds = [ChangeFeed(path) for _ in range(4)]
+    reserved = []
+    lock = threading.Lock()
+
+    def reserve(feed):
+        for _ in range(50):
+            last = feed.reserve("listing_id", 3, floor=10)
+            with lock:
+                reserved.extend(range(last + 1, last + 4))
+
+    threads = [threading.Thread(target=reserve, args=(feed,)) for feed in feeds]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(reserved) == list(range(11, 11 + 600))
+    assert feeds[0].reserve("listing_id", 0, floor=5000) == 5000 # An explicit id raises the counter
+    assert feeds[1].reserve("listing_id", 1) == 5000
+    for feed in feeds:
+        feed.stop()
+
+# --- Several workers on one box --- #
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def request(port: int, method: str, path: str, body=None):
+    data = json.dumps(body).encode("utf-8") if body is not None else None
+    req = urllib.request.Request(f"http://127.0.0.1:{port}{path}", data=data, method=method, headers={"Content-Type": "application/json"})
+    try:
+        with urllib.request.urlopen(req, timeout=5) as response:
+            return response.status, json.loads(response.read() or b"null")
+    except urllib.error.HTTPError as e:
+        return e.code, None
+
+def wait_until(condition, timeout: float = 20.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if condition():
+                return True
+        except OSError:
+            pass # Not listening yet
+        time.sleep(0.05)
+    return False
+
+@pytest.fixture
+def workers(tmp_path):
+    rules_dir = tmp_path / "wws_rules"
+    rules_dir.mkdir()
+    shipped = os.path.join(PROJECT_ROOT, "backend", "data", "wws_rules", "2024.json")
+    shutil.copy(shipped, rules_dir / "2024.json")
+    with open(shipped, encoding="utf-8") as f:
+        (rules_dir / "2099.json").write_text(json.dumps({**json.load(f), "version": "2099", "rent_base": 100.0}), encoding="utf-8")
+    env = {
+        **os.environ,
+        "RENTRIGHT_CHANGE_LOG_PATH": str(tmp_path / "changes.db"),
+        "RENTRIGHT_CHANGE_POLL_INTERVAL_SECONDS": "0.05",
+        "RENTRIGHT_SNAPSHOT_DIR": str(tmp_path / "snapshots"),
+        "RENTRIGHT_WWS_RULES_DIR": str(rules_dir),
+        "RENTRIGHT_WWS_RULES_VERSION": "2024",
+        "RENTRIGHT_LOAD_WORKERS": "0",
+        "RENTRIGHT_LISTINGS_BACKEND": "memory",
+    }
+    ports = [free_port() for _ in range(3)]
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "backend.main:app", "--host", "127.0.0.1", "--port", str(port), "--log-level", "warning"],
+            cwd=PROJECT_ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        for port in ports
+    ]
+    try:
+        for port in ports:
+            assert wait_until(lambda: request(port, "GET", "/api/ready")[0] == 200)
+        yield ports
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+def test_workers_see_each_others_changes(workers):
+    first, second, third = workers
+    listing = {"title": "Shared Studio", "location": "Utrecht", "advertisedRent": 1000, "size": 30, "rooms": 1, "description": "Studio."}
+    created = [request(port, "POST", "/api/listings", listing)[1]["ids"][0] for port in (first, second, third)]
+    assert len(set(created)) == 3 and min(created) > 3 # Ids are reserved from the shared counter
+
+    for port in workers:
+        assert wait_until(lambda: all(request(port, "GET", f"/api/listings/{listing_id}")[0] == 200 for listing_id in created), 5)
+    assert request(second, "DELETE", f"/api/listings/{created[0]}")[0] == 202
+    for port in workers:
+        assert wait_until(lambda: request(port, "GET", f"/api/listings/{created[0]}")[0] == 404, 5)
+
+    assert request(third, "PUT", "/api/wws/rules/active", {"version": "2099"})[0] == 202
+    for port in workers:
+        assert wait_until(lambda: request(port, "GET", "/api/listings/1")[1]["maxLegalRent"] == 235 * 7.5 + 100.0, 5)
+        assert request(port, "GET", "/api/wws/rules")[1]["activeVersion"] == "2099"
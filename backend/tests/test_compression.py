@@ -0,0 +1,42 @@
+import gzip
+import zlib
+import pytest
+from backend import compression
+from backend.compression import StreamCompressor, compress, negotiate_encoding
+
+@pytest.fixture
+def without_brotli(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", None)
+
+def test_negotiate_encoding(without_brotli):
+    assert negotiate_encoding(None) is None
+    assert negotiate_encoding("identity") is None
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("GZIP;q=0.5") == "gzip"
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding("*") == "gzip"
+    assert negotiate_encoding("*, gzip;q=0") is None
+    assert negotiate_encoding("br") is None # Not available without the Brotli package
+
+def test_negotiate_prefers_brotli_when_available(monkeypatch):
+    monkeypatch.setattr(compression, "brotli", object())
+    assert negotiate_encoding("gzip, br") == "br"
+    assert negotiate_encoding("gzip, br;q=0.5") == "gzip"
+
+def test_gzip_round_trip():
+    body = b'{"title":"Canal view"}' * 200
+    compressed = compress(body, "gzip")
+    assert gzip.decompress(compressed) == body
+    assert len(compressed) < len(body) // 10
+    with pytest.raises(ValueError):
+        compress(body, "zstd")
+
+def test_stream_compressor_chunks_are_decodable_as_they_arrive():
+    compressor = StreamCompressor("gzip")
+    decoder = zlib.decompressobj(31)
+    received = b""
+    for chunk in [b"first line\n", b"second line\n" * 50]:
+        received += decoder.decompress(compressor.compress(chunk))
+        assert received.endswith(chunk) # Sync-flushed: nothing held back
+    received += decoder.decompress(compressor.flush())
+    assert decoder.eof
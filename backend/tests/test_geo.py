@@ -0,0 +1,45 @@
+import random
+import pytest
+from backend.geo import GeoGrid, LocationTable, get_location_table, haversine_km, listing_coordinates, parse_near
+
+def test_haversine_km():
+    # One degree along a meridian is 1/360 of the Earth's circumference
+    assert haversine_km(52.0, 5.0, 53.0, 5.0) == pytest.approx(111.195, abs=0.001)
+    assert haversine_km(52.3791, 4.9003, 51.9244, 4.4690) == pytest.approx(58.5, abs=0.1) # Amsterdam -> Rotterdam Centraal
+    assert haversine_km(52.0, 5.0, 52.0, 5.0) == 0
+
+def test_parse_near():
+    assert parse_near("52.37, 4.89") == (52.37, 4.89)
+    for value in ["52.37", "a,b", "91,4", "52,181", "1,2,3"]:
+        with pytest.raises(ValueError):
+            parse_near(value)
+
+def test_location_table_resolution_order():
+    table = LocationTable({
+        "places": {"Amsterdam": [52.37, 4.89], "Amsterdam Oud-West": [52.365, 4.868], "Utrecht": [52.09, 5.12]},
+        "postcodes": {"1012": [52.374, 4.896]},
+    })
+    assert table.resolve("amsterdam oud west") == (52.365, 4.868) # Case and punctuation insensitive
+    assert table.resolve("Amsterdam Bos en Lommer") == (52.37, 4.89) # Falls back to the city
+    assert table.resolve("Damrak 1, 1012 LG Amsterdam") == (52.374, 4.896) # Postcode wins
+    assert table.resolve("Oudegracht 10, Utrecht") == (52.09, 5.12)
+    assert table.resolve("Amsterdam", postcode="9999") == (52.37, 4.89) # Unknown postcode
+    assert table.resolve("Atlantis") is None
+    assert table.resolve(None) is None
+
+def test_shipped_table_resolves_seed_locations():
+    table = get_location_table()
+    for location in ["Amsterdam Centrum", "Amsterdam De Pijp", "Utrecht Oost"]:
+        assert table.resolve(location) is not None
+    assert listing_coordinates({"location": "Atlantis", "latitude": 1.5, "longitude": 2.5}) == (1.5, 2.5)
+
+def test_grid_matches_brute_force():
+    rng = random.Random(14)
+    points = [(listing_id, rng.uniform(50.7, 53.5), rng.uniform(3.3, 7.2)) for listing_id in range(5000)]
+    grid = GeoGrid(points)
+    assert len(grid) == 5000
+    for latitude, longitude, radius_km in [(52.37, 4.89, 3), (51.92, 4.48, 25), (52.1, 5.1, 300), (0.0, 0.0, 10)]:
+        expected = {listing_id for listing_id, lat, lon in points if haversine_km(latitude, longitude, lat, lon) <= radius_km}
+        within = grid.within(latitude, longitude, radius_km)
+        assert set(within) == expected
+        assert all(distance <= radius_km for distance in within.values())
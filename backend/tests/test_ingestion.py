@@ -0,0 +1,113 @@
+import threading
+
+import pytest
+from backend import database, seed_db, wws_rules
+from backend.database import ListingORM
+from backend.ingestion import (
+    IngestionQueue, IngestionQueueFullError, ListingChange, apply_to_database, apply_to_memory, coalesce, max_database_listing_id, to_source_listing,
+)
+from backend.repository import InMemoryListingRepository
+
+@pytest.fixture
+def in_memory_database():
+    database.configure_database(database.IN_MEMORY_DATABASE_URL)
+    database.create_db_and_tables()
+    yield
+    database.configure_database(database.DATABASE_URL)
+
+def test_coalesce_keeps_the_last_change_per_listing():
+    changes = [ListingChange(1, {"v": 1}), ListingChange(2, {"v": 1}), ListingChange(1, None), ListingChange(3, {"v": 1}), ListingChange(2, {"v": 2})]
+    assert coalesce(changes) == [ListingChange(1, None), ListingChange(3, {"v": 1}), ListingChange(2, {"v": 2})]
+
+def test_queue_applies_changes_in_batches_and_in_order_per_listing():
+    applied = []
+    queue = IngestionQueue(applied.append, capacity=1000, workers=2, batch_size=50, batch_window_ms=20)
+    for version in range(3):
+        queue.submit([ListingChange(listing_id, {"version": version}) for listing_id in range(100)])
+    assert queue.flush(timeout=10)
+    latest = {}
+    for batch in applied:
+        assert len(batch) <= 50
+        for change in batch:
+            assert change.listing["version"] >= latest.get(change.listing_id, -1)
+            latest[change.listing_id] = change.listing["version"]
+    assert latest == {listing_id: 2 for listing_id in range(100)}
+    stats = queue.stats()
+    assert stats["accepted"] == stats["applied"] == 300 and stats["depth"] == 0
+    assert stats["batches"] == len(applied) < 300 # Coalesced into batches
+
+def test_queue_rejects_submissions_that_do_not_fit():
+    release = threading.Event()
+    queue = IngestionQueue(lambda changes: release.wait(10), capacity=10, workers=1, batch_size=5, batch_window_ms=0)
+    assert queue.submit([ListingChange(i, None) for i in range(8)]) == 8
+    with pytest.raises(IngestionQueueFullError):
+        queue.submit([ListingChange(i, None) for i in range(3)]) # All or nothing
+    assert queue.submit([ListingChange(8, None), ListingChange(9, None)]) == 10
+    release.set()
+    assert queue.flush(timeout=10)
+    stats = queue.stats()
+    assert stats["rejected"] == 3 and stats["applied"] == 10
+    assert queue.submit([ListingChange(1, None)]) >= 1 # Capacity is free again
+    assert queue.flush(timeout=10)
+
+def test_queue_counts_failed_batches_and_keeps_working():
+    calls = []
+
+    def apply(changes):
+        calls.append(changes)
+        if len(calls) == 1:
+            raise RuntimeError("database is locked")
+
+    queue = IngestionQueue(apply, workers=1, batch_window_ms=0)
+    queue.submit([ListingChange(1, None)])
+    assert queue.flush(timeout=10)
+    queue.submit([ListingChange(2, None)])
+    assert queue.flush(timeout=10)
+    stats = queue.stats()
+    assert stats["failed"] == 1 and stats["applied"] == 1
+
+def test_apply_to_memory_scores_and_indexes_the_batch(make_listing_create):
+    repository = InMemoryListingRepository()
+    apply_to_memory(repository, [ListingChange(7, to_source_listing(7, make_listing_create())), ListingChange(8, to_source_listing(8, make_listing_create(title="Loft", size_m2=80)))])
+    listing = repository.get(7)
+    # 60 (surface) + 20 (B) + 89 (WOZ: int(300000 * 0.0003) truncates 89.99...) + 5 (rooms)
+    assert listing.wws_points == 174 and listing.energy_label == "B"
+    assert [amenity.name for amenity in listing.amenities] == ["Balcony"]
+    assert listing.latitude is not None # Resolved from the location
+    assert repository.query(min_size=70)[2] == 1
+    apply_to_memory(repository, [ListingChange(7, None), ListingChange(8, to_source_listing(8, make_listing_create(title="Loft", size_m2=90)))])
+    assert repository.get(7) is None and repository.get(8).size_m2 == 90
+    assert [l.id for l in repository.query()[0]] == [8]
+    assert repository.listings.max_id == 8
+
+def test_apply_to_database_writes_one_transaction(in_memory_database, make_listing_create):
+    db = database.SessionLocal()
+    try:
+        assert max_database_listing_id(db) == 0
+        apply_to_database(db, [ListingChange(1, to_source_listing(1, make_listing_create())), ListingChange(2, to_source_listing(2, make_listing_create(title="Loft")))])
+        apply_to_database(db, [ListingChange(1, to_source_listing(1, make_listing_create(title="Renamed", size_m2=70))), ListingChange(2, None)])
+        listings = db.query(ListingORM).all()
+        assert [(listing.id, listing.title, listing.wws_points) for listing in listings] == [(1, "Renamed", 184)]
+        assert len(listings[0].amenities) == 1 and len(listings[0].wws_breakdown) == 4
+        assert max_database_listing_id(db) == 1
+    finally:
+        db.close()
+
+def test_apply_to_database_rescores_a_batch_overtaken_by_a_rule_switch(in_memory_database, monkeypatch, make_listing_create):
+    base = wws_rules.get_active_rule_set()
+    rules = wws_rules.compile_rule_set({
+        "version": "test", "points_per_sq_meter": 2, "energy_label_points": dict(base.energy_label_points),
+        "woz_value_factor": 0.0003, "base_points_rooms": 5, "rent_factor_per_point": 7.5, "rent_base": 50.0,
+    })
+    # The batch is scored under the base rules; the rule set is switched before it is committed
+    active = iter([base])
+    monkeypatch.setattr(seed_db, "get_active_rule_set", lambda: next(active, rules))
+    db = database.SessionLocal()
+    try:
+        apply_to_database(db, [ListingChange(1, to_source_listing(1, make_listing_create()))])
+        listing = db.get(ListingORM, 1)
+        # 2 * 60 (surface) + 20 (B) + 89 (WOZ) + 5 (rooms)
+        assert listing.wws_points == 2 * 60 + 20 + 89 + 5
+        assert listing.rule_fingerprint == rules.fingerprint
+    finally:
+        db.close()
@@ -0,0 +1,169 @@
+import random
+from typing import List
+
+import pytest
+from backend.geo import listing_coordinates
+from backend.listing_index import ListingIndex, encode_cursor, decode_cursor
+from backend.models import Listing
+
+def indexed_listings(make_listing, rows: list) -> List[Listing]:
+    """Listings of (id, rent, size, rooms, location, energy label, WWS points, max legal rent) rows."""
+    return [
+        make_listing(listing_id, advertised_rent=rent, size_m2=size, rooms=rooms, location=location,
+                     energy_label=energy_label, wws_points=wws_points, max_legal_rent=max_legal_rent)
+        for listing_id, rent, size, rooms, location, energy_label, wws_points, max_legal_rent in rows
+    ]
+
+@pytest.fixture
+def index(make_listing) -> ListingIndex:
+    return ListingIndex(indexed_listings(make_listing, [
+        (1, 1850, 75, 2, "Amsterdam Centrum", "B", 235, 1812.5),
+        (2, 2200, 90, 3, "Amsterdam De Pijp", "A", 289, 2217.5),
+        (3, 2400, 120, 4, "Utrecht Oost", "A+", 339, 2592.5),
+        (4, 1100, 45, 1, "Rotterdam Centraal", "C", 125, 987.5),
+        (5, 1500, 60, 2, "amsterdam centrum", None, None, None), # No WWS result
+    ]))
+
+def test_query_without_filters_returns_everything_sorted_by_id(index: ListingIndex):
+    ids, next_cursor, total = index.query()
+    assert ids == [1, 2, 3, 4, 5]
+    assert next_cursor is None
+    assert total == 5
+
+def test_query_range_filters(index: ListingIndex):
+    ids, _, total = index.query(min_rent=1500, max_rent=2200)
+    assert ids == [1, 2, 5]
+    assert total == 3
+    ids, _, _ = index.query(min_size=60, max_rooms=2)
+    assert ids == [1, 5]
+
+def test_query_location_and_label_are_case_insensitive(index: ListingIndex):
+    ids, _, _ = index.query(location="AMSTERDAM CENTRUM")
+    assert ids == [1, 5]
+    ids, _, _ = index.query(energy_label="a+")
+    assert ids == [3]
+    ids, _, _ = index.query(location="Nowhere")
+    assert ids == []
+
+def test_query_sort_keys(index: ListingIndex):
+    assert index.query(sort="rent")[0] == [4, 5, 1, 2, 3]
+    assert index.query(sort="-rent")[0] == [3, 2, 1, 5, 4]
+    # Listings without WWS results come last in both directions
+    assert index.query(sort="wws_points")[0] == [4, 1, 2, 3, 5]
+    assert index.query(sort="-wws_points")[0] == [3, 2, 1, 4, 5]
+    # Overcharge: 1: 37.5, 2: -17.5, 3: -192.5, 4: 112.5
+    assert index.query(sort="-overpriced")[0] == [4, 1, 2, 3, 5]
+    # Price per m2: 1: 24.67, 2: 24.44, 3: 20.0, 4: 24.44, 5: 25.0
+    assert index.query(sort="price_per_m2")[0] == [3, 2, 4, 1, 5]
+
+def test_query_unknown_sort_key_raises(index: ListingIndex):
+    with pytest.raises(ValueError):
+        index.query(sort="colour")
+
+@pytest.mark.parametrize("sort", ["id", "rent", "-rent", "wws_points", "-overpriced"])
+def test_cursor_pagination_walks_the_full_order(index: ListingIndex, sort: str):
+    expected, _, _ = index.query(sort=sort)
+    collected, cursor = [], None
+    while True:
+        ids, cursor, _ = index.query(sort=sort, limit=2, cursor=cursor)
+        collected.extend(ids)
+        if cursor is None:
+            break
+    assert collected == expected
+
+def test_cursor_pagination_with_filters(index: ListingIndex):
+    first, cursor, total = index.query(location="amsterdam centrum", sort="-wws_points", limit=1)
+    assert first == [1]
+    assert total == 2
+    second, cursor, _ = index.query(location="amsterdam centrum", sort="-wws_points", limit=1, cursor=cursor)
+    assert second == [5]
+    assert cursor is None
+
+def test_cursor_round_trip_and_invalid_cursor():
+    assert decode_cursor(encode_cursor(1812.5, 7)) == (1812.5, 7)
+    assert decode_cursor(encode_cursor(None, 7)) == (None, 7)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+# --- Distance queries --- #
+# Coordinates of the fixture locations come from data/locations.json via geo.listing_coordinates
+
+@pytest.fixture
+def geo_index(make_listing) -> ListingIndex:
+    listings = []
+    for listing in indexed_listings(make_listing, [
+        (1, 1850, 75, 2, "Amsterdam Centrum", "B", 235, 1812.5),
+        (2, 2200, 90, 3, "Amsterdam De Pijp", "A", 289, 2217.5),
+        (3, 2400, 120, 4, "Utrecht Oost", "A+", 339, 2592.5),
+        (4, 1100, 45, 1, "Amsterdam Oost", "C", 125, 987.5),
+        (5, 1500, 60, 2, "Atlantis", None, None, None), # Unknown location: no coordinates
+    ]):
+        coordinates = listing_coordinates({"location": listing.location})
+        if coordinates is not None:
+            listing = listing.model_copy(update={"latitude": coordinates[0], "longitude": coordinates[1]})
+        listings.append(listing)
+    return ListingIndex(listings)
+
+DAM_SQUARE = (52.3731, 4.8926)
+
+def test_radius_query_sorted_by_distance(geo_index: ListingIndex):
+    ids, _, total = geo_index.query(near=DAM_SQUARE, radius_km=5, sort="distance")
+    assert ids == [1, 2, 4] # Centrum ~0 km, De Pijp ~2.2 km, Oost ~2.8 km
+    assert total == 3
+    assert geo_index.query(near=DAM_SQUARE, radius_km=2.5, sort="distance")[0] == [1, 2]
+    assert geo_index.query(near=DAM_SQUARE, radius_km=5, sort="-distance")[0] == [4, 2, 1]
+
+def test_radius_query_combines_with_filters_and_other_sorts(geo_index: ListingIndex):
+    assert geo_index.query(near=DAM_SQUARE, radius_km=5, max_rent=2000, sort="distance")[0] == [1, 4]
+    assert geo_index.query(near=DAM_SQUARE, radius_km=5, min_wws_points=200, sort="-rent")[0] == [2, 1]
+    assert geo_index.query(min_wws_points=250, max_wws_points=300)[0] == [2]
+
+def test_distance_sort_without_radius_puts_unresolved_listings_last(geo_index: ListingIndex):
+    ids, _, total = geo_index.query(near=DAM_SQUARE, sort="distance")
+    assert ids == [1, 2, 4, 3, 5]
+    assert total == 5
+    page, cursor, _ = geo_index.query(near=DAM_SQUARE, sort="distance", limit=3)
+    assert page == [1, 2, 4]
+    assert geo_index.query(near=DAM_SQUARE, sort="distance", cursor=cursor)[0] == [3, 5]
+
+def test_distance_arguments_require_near(geo_index: ListingIndex):
+    with pytest.raises(ValueError):
+        geo_index.query(radius_km=5)
+    with pytest.raises(ValueError):
+        geo_index.query(sort="distance")
+
+def test_incremental_updates_match_a_rebuilt_index(make_listing):
+    rng = random.Random(22)
+    locations = ["Amsterdam Centrum", "Amsterdam De Pijp", "Utrecht Oost", "Atlantis"]
+    def random_listing(listing_id: int) -> Listing:
+        location = rng.choice(locations)
+        listing = make_listing(
+            listing_id, advertised_rent=rng.randint(800, 2500), size_m2=rng.randint(30, 120), rooms=rng.randint(1, 4), location=location,
+            energy_label=rng.choice(["A", "B", None]), wws_points=rng.choice([None, rng.randint(100, 300)]),
+            max_legal_rent=rng.choice([None, rng.randint(800, 2500)]),
+        )
+        coordinates = listing_coordinates({"location": location})
+        if coordinates is not None:
+            listing = listing.model_copy(update={"latitude": coordinates[0], "longitude": coordinates[1]})
+        return listing
+
+    current = {listing_id: random_listing(listing_id) for listing_id in range(1, 41)}
+    incremental = ListingIndex(current.values())
+    for _ in range(200):
+        listing_id = rng.randint(1, 60)
+        if listing_id in current and rng.random() < 0.4:
+            assert incremental.remove(listing_id)
+            del current[listing_id]
+        else:
+            current[listing_id] = random_listing(listing_id)
+            incremental.upsert(current[listing_id])
+    assert not incremental.remove(999)
+
+    rebuilt = ListingIndex(sorted(current.values(), key=lambda listing: listing.id))
+    assert len(incremental) == len(rebuilt) == len(current)
+    for filters in [
+        {}, {"sort": "-rent"}, {"sort": "overpriced"}, {"sort": "-price_per_m2", "limit": 7}, {"min_rent": 1200, "max_size": 90},
+        {"location": "amsterdam centrum", "sort": "wws_points"}, {"energy_label": "a", "sort": "-rooms"},
+        {"near": DAM_SQUARE, "radius_km": 5, "sort": "distance"}, {"near": DAM_SQUARE, "sort": "-distance"},
+    ]:
+        assert incremental.query(**filters) == rebuilt.query(**filters)
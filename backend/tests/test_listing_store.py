@@ -0,0 +1,115 @@
+import pytest
+from backend.listing_store import ColumnarListingStore, ListingRow
+from backend.models import Amenity, Listing, WWSBreakdownItem, WWSInputData
+
+@pytest.fixture
+def make_stored_listing(make_listing):
+    """Listings using every column: coordinates, a WOZ value, shared and per-listing images, several amenities."""
+    def make(listing_id: int, **overrides) -> Listing:
+        fields = dict(
+            title=f"Appartement {listing_id} – grachtzicht",
+            images=["https://example.com/shared.jpg", f"https://example.com/{listing_id}.jpg"],
+            advertised_rent=1850.0 + listing_id,
+            size_m2=75.5,
+            rooms=3,
+            woz_value=450000.0,
+            latitude=52.3731,
+            longitude=4.8922,
+            wws_points=235,
+            max_legal_rent=1812.5,
+            amenities=[Amenity(name="Balcony", icon="fas fa-sun"), Amenity(name="Elevator", icon="fas fa-elevator")],
+            wws_breakdown=[WWSBreakdownItem(item="Surface Area (75.5 m\texttwosuperior)", points=75), WWSBreakdownItem(item="Energy Label (B)", points=20)],
+        )
+        fields.update(overrides)
+        return make_listing(listing_id, **fields)
+    return make
+
+def test_store_round_trips_listings(make_stored_listing):
+    store = ColumnarListingStore()
+    listings = [
+        make_stored_listing(1),
+        make_stored_listing(2, location="Utrecht Oost", images=[], amenities=[], wws_breakdown=[]),
+        make_stored_listing(3, energy_label=None, woz_value=None, latitude=None, longitude=None, wws_points=None, max_legal_rent=None),
+    ]
+    wws_input = WWSInputData(size_m2=75.5, rooms=3, energy_label="B", woz_value=450000.0)
+    for listing in listings:
+        store.put(listing, wws_input if listing.id == 1 else None)
+
+    assert len(store) == 3 and 2 in store and 4 not in store
+    assert list(store) == [1, 2, 3]
+    for listing in listings:
+        materialized = store[listing.id]
+        assert materialized == listing
+        assert materialized.model_dump_json(by_alias=True) == listing.model_dump_json(by_alias=True)
+    assert store.get(4) is None
+    with pytest.raises(KeyError):
+        store[4]
+
+    assert store.wws_input(1) == wws_input
+    assert store.wws_input(2) is None
+    assert store.wws_result(3) == (None, None)
+    assert store.breakdown_rows(1) == [("Surface Area (75.5 m\texttwosuperior)", 75), ("Energy Label (B)", 20)]
+    assert store.row(1) == ListingRow(1, 1851.0, 75.5, 3, 235, 1812.5, "Amsterdam Centrum", "B", 52.3731, 4.8922)
+
+def test_store_interns_repeated_strings(make_stored_listing):
+    store = ColumnarListingStore()
+    for listing_id in range(1, 101):
+        store.put(make_stored_listing(listing_id))
+    assert len(store._locations) == 1
+    assert len(store._amenities) == 2
+    assert len(store._images) == 101 # One shared URL plus one per listing
+    assert len(store._breakdown_items) == 2
+
+def test_store_replace_and_remove(make_stored_listing):
+    store = ColumnarListingStore()
+    store.put(make_stored_listing(1), WWSInputData(size_m2=75.5, rooms=3))
+    store.put(make_stored_listing(2))
+    store.put(make_stored_listing(1, title="Renovated", wws_points=240), None)
+    assert store[1].title == "Renovated" and store[1].wws_points == 240
+    assert store.wws_input(1) is None
+    assert list(store) == [1, 2]
+    assert store.remove(2) and not store.remove(2)
+    assert store.dead_rows == 2
+
+    compacted = store.compacted()
+    assert compacted.dead_rows == 0
+    assert list(compacted) == [1]
+    assert compacted[1] == store[1]
+
+def test_wws_input_columns(make_stored_listing):
+    store = ColumnarListingStore()
+    store.put(make_stored_listing(1), WWSInputData(size_m2=60, rooms=2, energy_label=None, woz_value=None))
+    store.put(make_stored_listing(2))
+    store.put(make_stored_listing(3), WWSInputData(size_m2=80, rooms=3, energy_label="A", woz_value=300000))
+    ids, size_m2, rooms, energy_label, woz_value = store.wws_input_columns()
+    assert (ids, size_m2, rooms, energy_label, woz_value) == ([1, 3], [60.0, 80.0], [2, 3], [None, "A"], [None, 300000.0])
+
+def test_store_nbytes_grows_with_rows(make_stored_listing):
+    store = ColumnarListingStore()
+    store.put(make_stored_listing(1))
+    one = store.nbytes()
+    store.put(make_stored_listing(2))
+    assert one < store.nbytes() < 2 * one # Shared strings are stored once
+
+def test_store_from_exported_columns_reads_views_until_written(make_stored_listing):
+    store = ColumnarListingStore()
+    wws_input = WWSInputData(size_m2=75.5, rooms=3, energy_label="B", woz_value=450000.0)
+    for listing_id in range(1, 4):
+        store.put(make_stored_listing(listing_id), wws_input)
+    store.put(make_stored_listing(2, advertised_rent=999.0)) # Leaves a dead row, which is not exported
+    store.remove(3)
+
+    columns, tables = store.export_columns()
+    views = {name: memoryview(bytes(column)).cast(column.typecode if hasattr(column, "typecode") else "B") for name, column in columns.items()}
+    restored = ColumnarListingStore.from_columns(views, tables, store.max_id)
+    assert list(restored) == [1, 2] and restored.max_id == 3 and restored.dead_rows == 0
+    assert restored[1] == store[1] and restored[2] == store[2]
+    assert restored.wws_input(1) == wws_input and restored.wws_input(2) is None
+    assert restored.text_fields(1) == (store[1].title, "Amsterdam Centrum", store[1].description)
+    assert restored._advertised_rent is views["_advertised_rent"] # Not copied
+
+    # The first write copies the views into arrays; the views are left as they were
+    restored.put(make_stored_listing(4, location="Utrecht Oost"))
+    assert restored._advertised_rent is not views["_advertised_rent"] and len(views["_advertised_rent"]) == 2
+    assert restored[4] == make_stored_listing(4, location="Utrecht Oost") and restored[1] == store[1]
+    assert len(restored._locations) == 2
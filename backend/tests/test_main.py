@@ -1,5 +1,6 @@
 from fastapi.testclient import TestClient
 from backend.main import app # app should now have WWS data calculated in its mock DB
+import json
 import os
 import shutil
 import pytest
@@ -91,3 +92,255 @@ def test_read_listings_check_advertised_rent():
         assert first_listing is not None, "Listing with ID 1 not found for advertised rent check"
         assert "advertisedRent" in first_listing
         assert isinstance(first_listing["advertisedRent"], (int, float))
+
+# --- Filtering, sorting and pagination --- #
+# These tests use TestClient as a context manager so the startup event loads the seed data.
+
+@pytest.fixture(scope="module")
+def loaded_client():
+    from backend.main import _CATALOGUE_LOADER
+    with TestClient(app) as test_client:
+        assert _CATALOGUE_LOADER.wait(timeout=30) # Startup loads the catalogue in the background
+        yield test_client
+
+def test_readiness_reports_load_progress(loaded_client):
+    response = loaded_client.get("/api/ready")
+    assert response.status_code == 200
+    status = response.json()
+    assert status["ready"] is True
+    assert status["state"] == "ready"
+    assert status["listings_loaded"] == status["listings_read"] == 3
+
+def test_read_listings_filtered_by_rent_and_location(loaded_client):
+    response = loaded_client.get("/api/listings", params={"min_rent": 2000, "location": "amsterdam de pijp"})
+    assert response.status_code == 200
+    assert [l["id"] for l in response.json()] == [2]
+    assert response.headers["X-Total-Count"] == "1"
+
+def test_read_listings_sorted_by_overcharge(loaded_client):
+    # Overcharge = advertisedRent - maxLegalRent: 1: 37.5, 2: -17.5, 3: -192.5
+    response = loaded_client.get("/api/listings", params={"sort": "-overpriced"})
+    assert response.status_code == 200
+    assert [l["id"] for l in response.json()] == [1, 2, 3]
+
+def test_read_listings_cursor_pagination(loaded_client):
+    first = loaded_client.get("/api/listings", params={"sort": "rent", "limit": 2})
+    assert [l["id"] for l in first.json()] == [1, 2]
+    cursor = first.headers["X-Next-Cursor"]
+    second = loaded_client.get("/api/listings", params={"sort": "rent", "limit": 2, "cursor": cursor})
+    assert [l["id"] for l in second.json()] == [3]
+    assert "X-Next-Cursor" not in second.headers
+
+def test_read_listings_invalid_sort_or_cursor(loaded_client):
+    assert loaded_client.get("/api/listings", params={"sort": "colour"}).status_code == 400
+    assert loaded_client.get("/api/listings", params={"cursor": "garbage"}).status_code == 400
+
+def test_read_overpriced_listings(loaded_client):
+    # Only listing 1 is overpriced: 1850 advertised vs. 1812.50 max legal rent
+    response = loaded_client.get("/api/listings/overpriced", params={"limit": 5})
+    assert response.status_code == 200
+    listings = response.json()
+    assert [l["id"] for l in listings] == [1]
+    assert listings[0]["overcharge"] == 37.5
+    assert loaded_client.get("/api/listings/overpriced", params={"location": "Utrecht Oost"}).json() == []
+
+def test_read_listings_etag_and_not_modified(loaded_client):
+    response = loaded_client.get("/api/listings")
+    etag = response.headers["ETag"]
+    assert response.headers["content-type"] == "application/json"
+    not_modified = loaded_client.get("/api/listings", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.content == b""
+
+    listing = loaded_client.get("/api/listings/1")
+    assert listing.json()["wwsPoints"] == 235
+    assert loaded_client.get("/api/listings/1", headers={"If-None-Match": listing.headers["ETag"]}).status_code == 304
+    assert loaded_client.get("/api/listings/1", headers={"If-None-Match": etag}).status_code == 200
+
+def test_read_listings_near_a_point(loaded_client):
+    # Dam Square: Amsterdam Centrum ~0 km, Amsterdam De Pijp ~2.2 km, Utrecht Oost ~35 km
+    response = loaded_client.get("/api/listings", params={"near": "52.3731,4.8926", "radius_km": 5})
+    assert response.status_code == 200
+    assert [l["id"] for l in response.json()] == [1, 2] # Sorted by distance by default
+    assert response.json()[0]["latitude"] == pytest.approx(52.3731)
+    combined = loaded_client.get("/api/listings", params={"near": "52.3731,4.8926", "radius_km": 50, "min_rent": 2000, "min_wws_points": 250})
+    assert [l["id"] for l in combined.json()] == [2, 3]
+    assert loaded_client.get("/api/listings", params={"near": "52.3731"}).status_code == 400
+    assert loaded_client.get("/api/listings", params={"radius_km": 5}).status_code == 400
+    assert loaded_client.get("/api/listings", params={"sort": "distance"}).status_code == 400
+
+def test_read_listings_streamed(loaded_client):
+    response = loaded_client.get("/api/listings", params={"format": "ndjson", "sort": "-rent"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert response.headers["X-Total-Count"] == "3"
+    assert [json.loads(line)["id"] for line in response.text.splitlines()] == [3, 2, 1]
+    assert "ETag" not in response.headers
+
+    by_accept = loaded_client.get("/api/listings", headers={"Accept": "application/x-ndjson"})
+    assert by_accept.headers["content-type"] == "application/x-ndjson"
+    array = loaded_client.get("/api/listings", params={"format": "json-stream", "max_rent": 2200}, headers={"Accept-Encoding": "gzip"})
+    assert array.headers["Content-Encoding"] == "gzip"
+    assert [l["id"] for l in array.json()] == [1, 2]
+    assert loaded_client.get("/api/listings", params={"format": "xml"}).status_code == 422
+
+def test_read_listings_compressed(loaded_client):
+    identity = loaded_client.get("/api/listings", headers={"Accept-Encoding": "identity"})
+    compressed = loaded_client.get("/api/listings", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert compressed.content == identity.content # Decoded by the client
+    assert int(compressed.headers["content-length"]) < len(identity.content)
+
+def test_read_listings_summary_view_and_fields(loaded_client):
+    summary = loaded_client.get("/api/listings", params={"view": "summary"}, headers={"Accept-Encoding": "identity"})
+    assert summary.status_code == 200
+    listings = summary.json()
+    assert [l["id"] for l in listings] == [1, 2, 3]
+    assert set(listings[0]) == {"id", "title", "location", "image", "advertisedRent", "size", "rooms", "wwsPoints", "maxLegalRent"}
+    full = loaded_client.get("/api/listings", headers={"Accept-Encoding": "identity"})
+    assert len(summary.content) * 2 < len(full.content)
+
+    projected = loaded_client.get("/api/listings", params={"fields": "title,wwsPoints", "sort": "-rent"}).json()
+    assert projected == [{"id": l["id"], "title": l["title"], "wwsPoints": l["wwsPoints"]} for l in sorted(full.json(), key=lambda l: -l["advertisedRent"])]
+    assert loaded_client.get("/api/search", params={"q": "utrecht", "view": "summary"}).json()[0]["image"] is not None
+    assert loaded_client.get("/api/listings", params={"fields": "secret"}).status_code == 400
+    assert loaded_client.get("/api/search", params={"q": "utrecht", "view": "tiny"}).status_code == 400
+
+def test_read_listings_batch(loaded_client):
+    response = loaded_client.get("/api/listings/batch", params={"ids": "3,404,1,3"})
+    assert response.status_code == 200
+    batch = response.json()
+    assert [l["id"] for l in batch["listings"]] == [3, 1]
+    assert batch["notFound"] == [404]
+    assert batch["listings"][1] == loaded_client.get("/api/listings/1").json()
+    assert loaded_client.get("/api/listings/batch", params={"ids": "3,404,1"}, headers={"If-None-Match": response.headers["etag"]}).status_code == 304
+
+    posted = loaded_client.post("/api/listings/batch", params={"view": "summary"}, json={"ids": [2, 7]}).json()
+    assert posted["notFound"] == [7] and set(posted["listings"][0]) >= {"id", "image"} and "description" not in posted["listings"][0]
+    assert loaded_client.get("/api/listings/batch", params={"ids": "1,two"}).status_code == 400
+    assert loaded_client.get("/api/listings/batch", params={"ids": ","}).status_code == 400
+    assert loaded_client.post("/api/listings/batch", json={"ids": list(range(1002))}).status_code == 400
+
+def test_calculate_wws():
+    response = client.post("/api/wws/calculate", json={"size_m2": 75, "rooms": 3, "energy_label": "B", "woz_value": 300000})
+    assert response.status_code == 200
+    details = response.json()
+    assert details["points"] > 0 and details["max_rent"] > 0 and len(details["breakdown"]) == 4
+    assert client.post("/api/wws/calculate", json={"rooms": 3}).status_code == 422
+
+def test_calculate_wws_batch_reports_errors_per_item():
+    inputs = [{"size_m2": 75, "rooms": 3, "energy_label": "B", "woz_value": 300000}, {"size_m2": "big", "rooms": 1}] * 600
+    response = client.post("/api/wws/calculate-batch", json={"inputs": inputs})
+    assert response.status_code == 200
+    assert response.headers["x-error-count"] == "600"
+    assert response.headers["content-encoding"] == "gzip"
+    results = response.json()
+    assert len(results) == 1200
+    assert results[0]["details"] == client.post("/api/wws/calculate", json=inputs[0]).json()
+    assert results[1]["details"] is None and results[1]["errors"][0]["loc"] == ["size_m2"]
+    assert client.post("/api/wws/calculate-batch", json={"inputs": [{}] * 10001}).status_code == 400
+
+def test_search_listings_and_suggestions(loaded_client):
+    response = loaded_client.get("/api/search", params={"q": "amsterdam apart"})
+    assert response.status_code == 200
+    assert [l["id"] for l in response.json()] == [1, 2]
+    assert response.headers["X-Total-Count"] == "2"
+    assert loaded_client.get("/api/search", params={"q": "amsterdam", "limit": 1}).headers["X-Total-Count"] == "2"
+    assert loaded_client.get("/api/search", params={"q": "zzz"}).json() == []
+    assert loaded_client.get("/api/search").status_code == 422
+
+    suggestions = loaded_client.get("/api/search/suggest", params={"q": "Ams"})
+    assert suggestions.status_code == 200
+    assert suggestions.json() == ["amsterdam"]
+
+def test_read_market_stats(loaded_client):
+    response = loaded_client.get("/api/stats")
+    assert response.status_code == 200
+    stats = response.json()
+    assert stats["overall"]["listingCount"] == 3
+    assert sum(location["listingCount"] for location in stats["locations"]) == 3
+    assert {"rent", "rentPerM2", "averageWwsPoints", "overchargedShare"} <= set(stats["overall"])
+    assert set(stats["overall"]["rent"]["percentiles"]) == {"p10", "p25", "p50", "p75", "p90"}
+    selected = loaded_client.get("/api/stats", params={"location": "amsterdam centrum,Atlantis"}).json()
+    assert [location["location"] for location in selected["locations"]] == ["Amsterdam Centrum"]
+    assert selected["overall"]["listingCount"] == selected["locations"][0]["listingCount"]
+    assert loaded_client.get("/api/stats", params={"min_listings": 0}).status_code == 422
+
+# --- Listing writes --- #
+
+NEW_LISTING = {
+    "title": "Scraped Studio", "location": "Utrecht", "advertisedRent": 1100, "size": 30, "rooms": 1,
+    "description": "Compact studio.", "energy_label": "C", "amenities": [{"name": "Elevator", "icon": "fas fa-elevator"}],
+}
+
+def flush_writes():
+    from backend.main import _INGESTION_QUEUE
+    assert _INGESTION_QUEUE.flush(timeout=10)
+
+def test_write_listings(loaded_client):
+    response = loaded_client.post("/api/listings", json=NEW_LISTING)
+    assert response.status_code == 202
+    created_id = response.json()["ids"][0]
+    assert created_id > 3 and response.headers["Location"] == f"/api/listings/{created_id}"
+    flush_writes()
+    created = loaded_client.get(f"/api/listings/{created_id}").json()
+    assert created["title"] == "Scraped Studio" and created["wwsPoints"] is not None
+    assert created_id in [l["id"] for l in loaded_client.get("/api/listings", params={"location": "Utrecht"}).json()]
+    assert loaded_client.get("/api/stats", params={"location": "Utrecht"}).json()["overall"]["listingCount"] == 1
+
+    assert loaded_client.put(f"/api/listings/{created_id}", json={**NEW_LISTING, "advertisedRent": 999}).status_code == 202
+    bulk = loaded_client.post("/api/listings/bulk", json={"upserts": [NEW_LISTING, {**NEW_LISTING, "id": 500}], "deletes": []})
+    assert bulk.status_code == 202
+    bulk_ids = bulk.json()["ids"]
+    assert bulk_ids[0] > created_id and bulk_ids[1] == 500
+    flush_writes()
+    assert loaded_client.get(f"/api/listings/{created_id}").json()["advertisedRent"] == 999
+    assert loaded_client.get("/api/listings/500").status_code == 200
+
+    assert loaded_client.post("/api/listings", json={**NEW_LISTING, "rooms": "many"}).status_code == 422
+    assert loaded_client.post("/api/listings/bulk", json={}).status_code == 400
+    assert loaded_client.delete(f"/api/listings/{created_id}").status_code == 202
+    response = loaded_client.post("/api/listings/bulk", json={"deletes": bulk_ids})
+    assert response.status_code == 202 and response.json()["deleted"] == bulk_ids
+    flush_writes()
+    for listing_id in [created_id, *bulk_ids]:
+        assert loaded_client.get(f"/api/listings/{listing_id}").status_code == 404
+    assert [l["id"] for l in loaded_client.get("/api/listings").json()] == [1, 2, 3]
+
+def test_write_listings_backpressure(loaded_client, monkeypatch):
+    from backend.main import _INGESTION_QUEUE
+    monkeypatch.setattr(_INGESTION_QUEUE, "capacity", 0)
+    response = loaded_client.delete("/api/listings/12345")
+    assert response.status_code == 503
+    assert response.headers["Retry-After"] == "1"
+
+# --- WWS rule set switching --- #
+
+def wait_for_rescoring():
+    from backend.main import _RESCORE_EXECUTOR
+    _RESCORE_EXECUTOR.submit(lambda: None).result(timeout=10) # Jobs run in submission order
+
+def test_switch_wws_rules_rescores_listings(loaded_client, tmp_path, monkeypatch):
+    from backend import wws_rules
+    shipped = json.loads(open(os.path.join(wws_rules.RULES_DIR, "2024.json"), encoding="utf-8").read())
+    (tmp_path / "2024.json").write_text(json.dumps(shipped), encoding="utf-8")
+    (tmp_path / "2099.json").write_text(json.dumps({**shipped, "version": "2099", "rent_base": 100.0}), encoding="utf-8")
+    monkeypatch.setattr(wws_rules, "RULES_DIR", str(tmp_path))
+
+    status = loaded_client.get("/api/wws/rules").json()
+    assert status["activeVersion"] == "2024"
+    assert status["availableVersions"] == ["2024", "2099"]
+    assert loaded_client.put("/api/wws/rules/active", json={"version": "1999"}).status_code == 404
+
+    try:
+        response = loaded_client.put("/api/wws/rules/active", json={"version": "2099"})
+        assert response.status_code == 202
+        assert response.json()["activeVersion"] == "2099"
+        wait_for_rescoring()
+        assert loaded_client.get("/api/listings/1").json()["maxLegalRent"] == 235 * 7.5 + 100.0
+        assert loaded_client.get("/api/listings/overpriced").json() == []
+    finally:
+        loaded_client.put("/api/wws/rules/active", json={"version": "2024"})
+        wait_for_rescoring()
+    assert loaded_client.get("/api/listings/1").json()["maxLegalRent"] == 1812.5
+    assert loaded_client.get("/api/wws/rules").json()["rescoring"] is False
@@ -0,0 +1,92 @@
+import random
+
+import pytest
+from backend.market_stats import MarketStats, QuantileSketch, RELATIVE_ACCURACY
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+def test_sketch_quantiles_are_within_relative_accuracy():
+    rng = random.Random(7)
+    values = [rng.lognormvariate(7.3, 0.4) for _ in range(20000)]
+    sketch = QuantileSketch()
+    for value in values:
+        sketch.add(value)
+    qs = [0.01, 0.1, 0.5, 0.9, 0.99]
+    for q, estimate in zip(qs, sketch.quantiles(qs)):
+        assert abs(estimate - exact_quantile(values, q)) <= RELATIVE_ACCURACY * exact_quantile(values, q) * 1.0001
+    assert QuantileSketch().quantiles([0.5]) == [None]
+
+def test_sketch_removal_and_merge():
+    rng = random.Random(3)
+    first = [rng.uniform(500, 3000) for _ in range(1000)]
+    second = [rng.uniform(1000, 5000) for _ in range(1000)]
+    merged, left, right = QuantileSketch(), QuantileSketch(), QuantileSketch()
+    for value in first + second:
+        merged.add(value)
+    for value in first:
+        left.add(value)
+    for value in second:
+        right.add(value)
+    left.merge(right)
+    assert left.quantiles([0.25, 0.5, 0.75]) == merged.quantiles([0.25, 0.5, 0.75])
+    for value in second:
+        merged.remove(value)
+    only_first = QuantileSketch()
+    for value in first:
+        only_first.add(value)
+    assert merged.count == 1000 and merged.quantiles([0.5]) == only_first.quantiles([0.5])
+    assert QuantileSketch(0.02).relative_accuracy == 0.02
+    with pytest.raises(ValueError):
+        merged.merge(QuantileSketch(0.02))
+
+def test_market_stats_follow_inserts_updates_and_deletes():
+    stats = MarketStats()
+    stats.upsert(1, "Amsterdam Centrum", 2000, 50, 200, 1800) # Overcharged
+    stats.upsert(2, " amsterdam centrum", 1500, 60, 180, 1600)
+    stats.upsert(3, "Utrecht", 1000, 40, None, None) # Not scored
+    centrum = stats.summary("AMSTERDAM CENTRUM")
+    assert centrum["location"] == "Amsterdam Centrum" and centrum["listing_count"] == 2
+    assert centrum["rent"]["mean"] == 1750 and centrum["rent_per_m2"]["mean"] == 32.5
+    assert centrum["average_wws_points"] == 190 and centrum["overcharged_share"] == 0.5
+    assert set(centrum["rent"]["percentiles"]) == {"p10", "p25", "p50", "p75", "p90"}
+    assert stats.summary("Utrecht")["overcharged_share"] is None
+
+    stats.upsert(1, "Utrecht", 900, 45, 150, 1200) # Moves location, no longer overcharged
+    assert stats.summary("Amsterdam Centrum")["listing_count"] == 1
+    assert stats.summary("Amsterdam Centrum")["overcharged_share"] == 0
+    stats.remove(2)
+    stats.remove(99) # Unknown ids are ignored
+    assert stats.summary("Amsterdam Centrum") is None
+    assert [s["location"] for s in stats.summaries()] == ["Utrecht"]
+    overall = stats.summary()
+    assert overall["listing_count"] == 2 and overall["rent"]["mean"] == 950
+    assert abs(overall["rent"]["median"] - 900) <= 900 * RELATIVE_ACCURACY
+    assert len(stats) == 2
+
+def test_market_stats_incremental_matches_rebuilt_and_combines_locations():
+    rng = random.Random(11)
+    locations = ["Amsterdam", "Rotterdam", "Utrecht", "Delft"]
+    incremental = MarketStats()
+    current = {}
+    for _ in range(3000):
+        listing_id = rng.randint(1, 500)
+        if rng.random() < 0.2:
+            incremental.remove(listing_id)
+            current.pop(listing_id, None)
+        else:
+            row = (listing_id, rng.choice(locations), rng.randint(600, 3000), rng.randint(20, 120), rng.randint(80, 300), rng.randint(900, 2500))
+            incremental.upsert(*row)
+            current[listing_id] = row
+    rebuilt = MarketStats()
+    for row in current.values():
+        rebuilt.upsert(*row)
+    for location in [None, *locations]:
+        expected, actual = rebuilt.summary(location), incremental.summary(location)
+        assert actual["listing_count"] == expected["listing_count"]
+        assert actual["rent"]["percentiles"] == expected["rent"]["percentiles"]
+        assert actual["rent"]["mean"] == pytest.approx(expected["rent"]["mean"], abs=0.01)
+    assert [s["location"] for s in incremental.summaries(min_listings=10**6)] == []
+    combined = incremental.combined(["amsterdam", "Delft", "Atlantis"])
+    assert combined["listing_count"] == sum(1 for row in current.values() if row[1] in ("Amsterdam", "Delft"))
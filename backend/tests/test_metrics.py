@@ -0,0 +1,90 @@
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from backend import metrics
+from backend.metrics import MetricsMiddleware, MetricsRegistry, route_template
+from backend.main import app
+
+def test_registry_renders_prometheus_text():
+    registry = MetricsRegistry()
+    requests = registry.counter("demo_requests", "Requests.", ("route",))
+    in_flight = registry.gauge("demo_in_flight", "In flight.")
+    latency = registry.histogram("demo_seconds", "Latency.", buckets=(0.1, 1.0))
+    requests.inc(("/a",))
+    requests.inc(("/a",), 2)
+    in_flight.set(3)
+    for value in (0.05, 0.1, 0.5, 4.0):
+        latency.observe(value)
+    registry.add_collector(lambda: [("demo_cache_entries", "gauge", "Entries.", [("demo_cache_entries", {"cache": 'a"b'}, 7)])])
+    text = registry.render()
+    assert "# TYPE demo_requests counter" in text
+    assert 'demo_requests_total{route="/a"} 3' in text
+    assert "demo_in_flight 3" in text
+    # Buckets are cumulative upper bounds; 0.1 falls into le="0.1"
+    assert 'demo_seconds_bucket{le="0.1"} 2' in text
+    assert 'demo_seconds_bucket{le="1"} 3' in text
+    assert 'demo_seconds_bucket{le="+Inf"} 4' in text
+    assert "demo_seconds_count 4" in text and "demo_seconds_sum 4.65" in text
+    assert 'demo_cache_entries{cache="a\\"b"} 7' in text
+    assert latency.count() == 4
+
+def test_registry_reregistration_returns_existing_metric():
+    registry = MetricsRegistry()
+    counter = registry.counter("demo_total", "Demo.", ("a",))
+    assert registry.counter("demo_total", "Demo.", ("a",)) is counter
+    with pytest.raises(ValueError):
+        registry.gauge("demo_total", "Demo.")
+    counter.inc(("a", "b")) # Label counts are checked when the samples are rendered
+    with pytest.raises(ValueError):
+        registry.render()
+
+def test_route_template_labels_by_path_template():
+    demo = FastAPI()
+
+    @demo.get("/items/{item_id}")
+    def read_item(item_id: int):
+        return {"id": item_id}
+
+    scope = {"type": "http", "method": "GET", "path": "/items/42", "root_path": ""}
+    assert route_template(demo, scope) == "/items/{item_id}"
+    assert route_template(demo, {**scope, "method": "DELETE"}) == "/items/{item_id}" # 405: path matches
+    assert route_template(demo, {**scope, "path": "/elsewhere"}) == "unmatched"
+
+def test_middleware_records_requests_by_route():
+    demo = FastAPI()
+
+    @demo.get("/items/{item_id}")
+    def read_item(item_id: int):
+        return {"id": item_id}
+
+    demo.add_middleware(MetricsMiddleware)
+    client = TestClient(demo)
+    before = metrics.HTTP_REQUESTS.value(("GET", "/items/{item_id}", "200"))
+    count_before = metrics.HTTP_REQUEST_SECONDS.count(("GET", "/items/{item_id}"))
+    for item_id in range(3):
+        assert client.get(f"/items/{item_id}").status_code == 200
+    assert client.get("/items/not-a-number").status_code == 422
+    assert metrics.HTTP_REQUESTS.value(("GET", "/items/{item_id}", "200")) == before + 3
+    assert metrics.HTTP_REQUESTS.value(("GET", "/items/{item_id}", "422")) >= 1
+    assert metrics.HTTP_REQUEST_SECONDS.count(("GET", "/items/{item_id}")) == count_before + 4
+    assert metrics.HTTP_IN_FLIGHT.value() == 0
+
+def test_metrics_endpoint_exposes_http_wws_and_catalogue_metrics():
+    client = TestClient(app)
+    assert client.post("/api/wws/calculate", json={"size_m2": 50, "rooms": 2, "energy_label": "B"}).status_code == 200
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'rentright_http_requests_total{method="POST",route="/api/wws/calculate",status="200"}' in text
+    assert "rentright_http_request_duration_seconds_bucket" in text
+    assert "rentright_http_response_size_bytes_bucket" in text
+    assert "rentright_http_requests_in_flight" in text
+    assert 'rentright_wws_scoring_duration_seconds_count{path="batch"}' in text
+    assert "rentright_wws_cache_hits_total" in text
+    assert "rentright_wws_micro_batches_total" in text
+    assert "rentright_catalogue_ready" in text
+
+def test_profile_endpoint_is_disabled_by_default():
+    client = TestClient(app)
+    assert client.get("/api/debug/profile?seconds=0.01").status_code == 404
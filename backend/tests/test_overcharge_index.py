@@ -0,0 +1,35 @@
+from backend.overcharge_index import OverchargeIndex
+
+def test_top_returns_largest_overcharge_first():
+    index = OverchargeIndex()
+    index.upsert(1, "Amsterdam Centrum", 1850, 1812.5) # +37.5
+    index.upsert(2, "Amsterdam De Pijp", 2200, 2217.5) # not overpriced
+    index.upsert(3, "Utrecht Oost", 2400, 2000.0)      # +400
+    index.upsert(4, "amsterdam centrum", 1100, 987.5)  # +112.5
+    index.upsert(5, "Utrecht Oost", 1500, None)        # no WWS result
+    assert len(index) == 3
+    assert index.top(10) == [(3, 400.0), (4, 112.5), (1, 37.5)]
+    assert index.top(1) == [(3, 400.0)]
+    assert index.top(10, location="AMSTERDAM CENTRUM") == [(4, 112.5), (1, 37.5)]
+    assert index.top(10, location="Rotterdam") == []
+
+def test_upsert_updates_and_removes_entries():
+    index = OverchargeIndex()
+    index.upsert(1, "Amsterdam Centrum", 1850, 1812.5)
+    index.upsert(2, "Amsterdam Centrum", 1900, 1812.5)
+    assert [listing_id for listing_id, _ in index.top(10)] == [2, 1]
+
+    # Listing 1 becomes the worst offender and moves to another location
+    index.upsert(1, "Utrecht Oost", 2500, 1812.5)
+    assert [listing_id for listing_id, _ in index.top(10)] == [1, 2]
+    assert index.top(10, location="Amsterdam Centrum") == [(2, 87.5)]
+    assert index.top(10, location="Utrecht Oost") == [(1, 687.5)]
+
+    # Rent lowered below the legal maximum: no longer ranked
+    index.upsert(2, "Amsterdam Centrum", 1500, 1812.5)
+    assert index.top(10, location="Amsterdam Centrum") == []
+
+    index.remove(1)
+    index.remove(42) # Unknown ids are ignored
+    assert index.top(10) == []
+    assert len(index) == 0
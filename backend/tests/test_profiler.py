@@ -0,0 +1,50 @@
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+from backend import main
+from backend.profiler import ProfilerBusyError, SamplingProfiler, folded
+
+def busy_work(stop: threading.Event):
+    total = 0
+    while not stop.is_set():
+        total += sum(range(200))
+    return total
+
+def test_profile_samples_busy_threads_in_folded_format():
+    stop = threading.Event()
+    worker = threading.Thread(target=busy_work, args=(stop,), name="busy-worker")
+    worker.start()
+    try:
+        counts = SamplingProfiler().profile(0.2, interval=0.002)
+    finally:
+        stop.set()
+        worker.join()
+    busy = {stack: count for stack, count in counts.items() if stack.startswith("busy-worker;")}
+    assert busy and any("busy_work (test_profiler.py:" in stack for stack in busy)
+    text = folded(counts, limit=3)
+    lines = text.splitlines()
+    assert 0 < len(lines) <= 3
+    stack, count = lines[0].rsplit(" ", 1)
+    assert counts[stack] == int(count) == max(counts.values())
+
+def test_only_one_profile_at_a_time():
+    sampler = SamplingProfiler()
+    started = threading.Thread(target=sampler.profile, args=(0.3,))
+    started.start()
+    try:
+        while not sampler.running:
+            pass
+        with pytest.raises(ProfilerBusyError):
+            sampler.profile(0.01)
+    finally:
+        started.join()
+    assert not sampler.running
+    assert isinstance(sampler.profile(0.0), dict)
+
+def test_profile_endpoint_when_enabled(monkeypatch):
+    monkeypatch.setattr(main, "PROFILING_ENABLED", True)
+    response = TestClient(main.app).get("/api/debug/profile", params={"seconds": 0.05, "interval_ms": 2, "include_idle": True})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert all(line.rsplit(" ", 1)[1].isdigit() for line in response.text.splitlines())
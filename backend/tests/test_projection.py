@@ -0,0 +1,28 @@
+import json
+import pytest
+from backend.models import ListingSummary
+from backend.projection import PROJECTABLE_FIELDS, SUMMARY_FIELDS, parse_projection, project
+
+def test_parse_projection():
+    assert parse_projection() is None
+    assert parse_projection(view="full") is None
+    assert parse_projection(view="summary") == SUMMARY_FIELDS
+    assert parse_projection(fields="wwsPoints, title") == ("id", "title", "wwsPoints") # Listing order, id added
+    with pytest.raises(ValueError):
+        parse_projection(fields="title,colour")
+    with pytest.raises(ValueError):
+        parse_projection(view="compact")
+    with pytest.raises(ValueError):
+        parse_projection(fields="title", view="summary")
+
+def test_projection_of_every_field_matches_the_full_body(make_listing):
+    listing = make_listing(7)
+    full_fields = [name for name in PROJECTABLE_FIELDS if name != "image"]
+    assert json.loads(project(listing, full_fields)) == json.loads(listing.model_dump_json(by_alias=True))
+
+def test_summary_projection(make_listing):
+    summary = json.loads(project(make_listing(7), SUMMARY_FIELDS))
+    assert list(summary) == list(SUMMARY_FIELDS)
+    assert summary["image"] == "https://example.com/1.jpg"
+    assert ListingSummary.model_validate(summary).model_dump(by_alias=True) == summary
+    assert json.loads(project(make_listing(7, images=[]), SUMMARY_FIELDS))["image"] is None
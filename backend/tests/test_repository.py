@@ -0,0 +1,295 @@
+import json
+import pytest
+from sqlalchemy import event, text
+from sqlalchemy.orm import sessionmaker
+from backend.database import Base, IN_MEMORY_DATABASE_URL, ListingORM, create_change_log, create_engine_for_url, create_search_index
+from backend.repository import InMemoryListingRepository, SqlListingRepository
+from backend.seed_db import SEED_DATA_PATH, insert_listings
+from backend.models import WWSInputData
+from backend.wws_calculator import calculate_wws_points
+from backend import wws_rules
+
+@pytest.fixture
+def sql_repository():
+    # In-memory SQLite database, seeded from seed_listings.json
+    engine = create_engine_for_url(IN_MEMORY_DATABASE_URL)
+    Base.metadata.create_all(bind=engine)
+    create_search_index(engine)
+    create_change_log(engine)
+    session = sessionmaker(bind=engine)()
+    with open(SEED_DATA_PATH, "r", encoding="utf-8") as f:
+        insert_listings(session, json.load(f))
+    session.commit()
+    yield SqlListingRepository(session)
+    session.close()
+    engine.dispose()
+
+@pytest.fixture
+def memory_repository(sql_repository: SqlListingRepository) -> InMemoryListingRepository:
+    repository = InMemoryListingRepository()
+    for listing in sql_repository.query()[0]:
+        repository.store(listing)
+    repository.rebuild_index()
+    return repository
+
+def test_sql_get_eager_loads_children(sql_repository: SqlListingRepository):
+    listing = sql_repository.get(1)
+    assert listing.title == "Charming Canal View Apartment"
+    assert listing.wws_points == 235
+    assert listing.max_legal_rent == 1812.5
+    assert len(listing.amenities) > 0
+    assert len(listing.wws_breakdown) == 4
+    assert sql_repository.get(999) is None
+
+@pytest.mark.parametrize("filters", [
+    {},
+    {"min_rent": 2000},
+    {"max_size": 90, "sort": "-rent"},
+    {"location": "amsterdam centrum"},
+    {"energy_label": "a+"},
+    {"sort": "price_per_m2"},
+    {"sort": "-overpriced"},
+    {"sort": "-wws_points", "min_rooms": 3},
+    {"min_wws_points": 240, "max_wws_points": 300},
+    {"near": (52.3731, 4.8926), "radius_km": 3, "sort": "distance"},
+    {"near": (52.3731, 4.8926), "radius_km": 3, "sort": "-rent", "max_rent": 2500},
+    {"near": (52.0860, 5.1420), "sort": "distance"},
+    {"near": (52.0860, 5.1420), "sort": "-distance", "limit": 2},
+])
+def test_sql_query_matches_in_memory_index(sql_repository, memory_repository, filters: dict):
+    sql_listings, _, sql_total = sql_repository.query(**filters)
+    memory_listings, _, memory_total = memory_repository.query(**filters)
+    assert [l.id for l in sql_listings] == [l.id for l in memory_listings]
+    assert sql_total == memory_total
+
+@pytest.mark.parametrize("sort", ["id", "rent", "-rent", "-overpriced"])
+def test_sql_cursor_pagination(sql_repository, memory_repository, sort: str):
+    collected, cursor = [], None
+    while True:
+        listings, cursor, _ = sql_repository.query(sort=sort, limit=2, cursor=cursor)
+        collected.extend(l.id for l in listings)
+        if cursor is None:
+            break
+    assert collected == [l.id for l in memory_repository.query(sort=sort)[0]]
+
+def test_sql_top_overpriced(sql_repository, memory_repository):
+    sql_top = [(l.id, overcharge) for l, overcharge in sql_repository.top_overpriced(5)]
+    assert sql_top == [(l.id, overcharge) for l, overcharge in memory_repository.top_overpriced(5)]
+    assert sql_top == [(1, 37.5)]
+    assert sql_repository.top_overpriced(5, location="Utrecht Oost") == []
+
+def ordered_query_plans(repository: SqlListingRepository, run) -> list:
+    """EXPLAIN QUERY PLAN details of the ORDER BY statements `run` executes on `repository`."""
+    engine = repository.db.get_bind()
+    statements = []
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        if "ORDER BY" in statement:
+            statements.append((statement, parameters))
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        run()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+    with engine.connect() as connection:
+        return [[row[-1] for row in connection.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)] for statement, parameters in statements]
+
+@pytest.mark.parametrize("sort, index", [
+    ("overpriced", "ix_listings_overcharge_sort"),
+    ("-overpriced", "ix_listings_overcharge_sort_desc"),
+    ("price_per_m2", "ix_listings_price_per_m2_sort"),
+    ("-price_per_m2", "ix_listings_price_per_m2_sort_desc"),
+])
+def test_sql_derived_sort_keys_are_read_in_index_order(sql_repository, sort: str, index: str):
+    plans = ordered_query_plans(sql_repository, lambda: sql_repository.query(sort=sort, limit=2))
+    assert len(plans) == 1
+    assert f"SCAN listings USING INDEX {index}" in plans[0]
+    assert "USE TEMP B-TREE FOR ORDER BY" not in plans[0] # At most ties are sorted ("RIGHT PART OF ORDER BY")
+
+def test_sql_top_overpriced_uses_overcharge_index(sql_repository):
+    plans = ordered_query_plans(sql_repository, lambda: sql_repository.top_overpriced(5))
+    assert any(detail.startswith("SEARCH listings USING INDEX ix_listings_overcharge (overcharge>?)") for detail in plans[0])
+    assert "USE TEMP B-TREE FOR ORDER BY" not in plans[0]
+
+def test_sql_bodies_match_memory_bodies(sql_repository, memory_repository):
+    assert sql_repository.get_body(1).body == memory_repository.get_body(1).body
+    assert sql_repository.query_body()[0].body == memory_repository.query_body()[0].body
+
+def test_api_served_from_sql_repository(sql_repository):
+    from fastapi.testclient import TestClient
+    from backend.main import app, get_listing_repository
+
+    app.dependency_overrides[get_listing_repository] = lambda: sql_repository
+    try:
+        client = TestClient(app)
+        response = client.get("/api/listings/1")
+        assert response.status_code == 200
+        assert response.json()["wwsPoints"] == 235
+        assert client.get("/api/listings/1", headers={"If-None-Match": response.headers["ETag"]}).status_code == 304
+        page = client.get("/api/listings", params={"sort": "-rent", "limit": 1})
+        assert [l["id"] for l in page.json()] == [3]
+        assert "X-Next-Cursor" in page.headers
+        assert [l["id"] for l in client.get("/api/listings/overpriced").json()] == [1]
+    finally:
+        app.dependency_overrides.clear()
+
+@pytest.mark.parametrize("locations", [None, ["amsterdam centrum", "Utrecht Oost"], ["Nowhere"]])
+def test_sql_market_stats_match_memory(sql_repository, memory_repository, locations):
+    assert sql_repository.market_stats(locations) == memory_repository.market_stats(locations)
+    overall = memory_repository.market_stats()["overall"]
+    assert overall["listing_count"] == 3 and overall["overcharged_share"] == round(1 / 3, 4)
+
+def test_sql_market_stats_replay_changes_instead_of_scanning(sql_repository):
+    db = sql_repository.db
+    statements = []
+    def capture(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(db.get_bind(), "before_cursor_execute", capture)
+    try:
+        sql_repository.market_stats() # Built once
+        statements.clear()
+        before = sql_repository.market_stats()
+        assert not [statement for statement in statements if "FROM listings" in statement]
+
+        # Updates, inserts and deletes through any path reach the aggregates through the change log
+        db.get(ListingORM, 1).advertised_rent = 4000.0
+        db.add(ListingORM(id=90, title="New", location="Utrecht Oost", images=[], advertised_rent=1200.0, size_m2=40.0, rooms=1, description=""))
+        db.delete(db.get(ListingORM, 2))
+        db.commit()
+        statements.clear()
+        after = sql_repository.market_stats()
+        assert not [statement for statement in statements if "FROM listings" in statement]
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", capture)
+    assert after != before
+    rebuilt = InMemoryListingRepository()
+    for listing in sql_repository.query()[0]:
+        rebuilt.store(listing)
+    assert after == rebuilt.market_stats()
+
+    # A reader that fell behind the pruned log rebuilds from the table
+    db.get(ListingORM, 3).advertised_rent = 100.0
+    db.commit()
+    db.execute(text("DELETE FROM listing_changes WHERE seq < (SELECT max(seq) FROM listing_changes)"))
+    db.commit()
+    rebuilt.store(sql_repository.get(3))
+    assert sql_repository.market_stats() == rebuilt.market_stats()
+
+def test_memory_rescore_updates_only_changed_listings(make_listing):
+    repository = InMemoryListingRepository()
+    base = wws_rules.get_active_rule_set()
+    inputs = {
+        1: WWSInputData(size_m2=75.0, rooms=2, energy_label="B", woz_value=450000.0),
+        2: WWSInputData(size_m2=60.0, rooms=2, energy_label="C", woz_value=None),
+    }
+    for listing_id, wws_input in inputs.items():
+        points, breakdown = calculate_wws_points(wws_input)
+        repository.store(make_listing(
+            listing_id, location="Utrecht", size_m2=wws_input.size_m2, rooms=wws_input.rooms,
+            wws_points=points, max_legal_rent=base.max_legal_rent(points), wws_breakdown=breakdown,
+        ), wws_input)
+    repository.rebuild_index()
+    assert repository.rescore(base) == 0
+
+    # Only the label B points change
+    labels = {**base.energy_label_points, "B": 25}
+    rules = wws_rules.compile_rule_set({
+        "version": "test", "points_per_sq_meter": base.points_per_sq_meter, "energy_label_points": labels,
+        "woz_value_factor": base.woz_value_factor, "base_points_rooms": base.base_points_rooms,
+        "rent_factor_per_point": base.rent_factor_per_point, "rent_base": base.rent_base,
+    })
+    unchanged_body = repository.get_body(2)
+    assert repository.rescore(rules) == 1
+    assert repository.get(1).wws_points == 240
+    assert repository.get(1).max_legal_rent == rules.max_legal_rent(240)
+    assert repository.get_body(2) is unchanged_body
+    assert repository.query(sort="-wws_points")[0][0].id == 1
+    assert b'"wwsPoints":240' in repository.get_body(1).body
+
+def test_memory_apply_changes_updates_indexes_in_place(memory_repository, monkeypatch):
+    index = memory_repository.index
+    catalogue_before = memory_repository.response_cache.catalogue()
+    monkeypatch.setattr(memory_repository, "rebuild_index", lambda: pytest.fail("apply_changes must not rebuild the index"))
+    changed = memory_repository.get(2).model_copy(update={"advertised_rent": 9999.0, "location": "Den Haag"})
+    added = changed.model_copy(update={"id": 50, "advertised_rent": 10.0, "energy_label": "G"})
+    assert memory_repository.apply_changes([(changed, None), (added, None)], [3]) == 3
+    assert memory_repository.index is index
+    assert memory_repository.response_cache._catalogue is None # Invalidated, rebuilt lazily
+    assert memory_repository.response_cache.catalogue() is not catalogue_before
+
+    rebuilt = InMemoryListingRepository()
+    for listing_id in sorted(memory_repository.listings):
+        rebuilt.store(memory_repository.get(listing_id))
+    rebuilt.rebuild_index()
+    for filters in [{}, {"sort": "-rent"}, {"location": "den haag"}, {"energy_label": "G"}, {"sort": "overpriced", "limit": 2}]:
+        assert memory_repository.index.query(**filters) == rebuilt.index.query(**filters)
+    assert [l.id for l in memory_repository.query(sort="-rent", limit=1)[0]] == [2]
+
+@pytest.mark.parametrize("query", ["amsterdam", "amster", "canal view", "apartment amst", "utrecht pijp", "xyz"])
+def test_sql_search_matches_in_memory_search(sql_repository, memory_repository, query: str):
+    sql_listings, sql_total = sql_repository.search(query)
+    memory_listings, memory_total = memory_repository.search(query)
+    assert {l.id for l in sql_listings} == {l.id for l in memory_listings}
+    assert sql_total == memory_total
+
+def test_sql_search_pages_and_suggestions(sql_repository, memory_repository):
+    listings, total = sql_repository.search("amsterdam", limit=1, offset=1)
+    assert total == 2 and len(listings) == 1
+    assert sql_repository.suggest("amst") == memory_repository.suggest("amst") == ["amsterdam"]
+    assert sql_repository.suggest("") == []
+
+def test_sql_search_index_follows_updates(sql_repository):
+    from backend.database import ListingORM
+    listing_orm = sql_repository.db.get(ListingORM, 3)
+    listing_orm.title = "Canal side family home"
+    sql_repository.db.commit()
+    assert {l.id for l in sql_repository.search("canal")[0]} == {1, 3}
+    sql_repository.db.delete(listing_orm)
+    sql_repository.db.commit()
+    assert [l.id for l in sql_repository.search("family")[0]] == []
+
+def test_memory_search_follows_store(make_listing):
+    repository = InMemoryListingRepository()
+    listing = make_listing(1, title="Garden flat", location="Leiden")
+    repository.store(listing)
+    assert [l.id for l in repository.search("gard")[0]] == [1]
+    repository.store(listing.model_copy(update={"title": "Roof terrace flat"}))
+    assert repository.search("garden") == ([], 0)
+    assert json.loads(bytes(repository.search_body("roof")[0].body))[0]["title"] == "Roof terrace flat"
+
+def test_sql_distance_arguments_require_near(sql_repository):
+    with pytest.raises(ValueError):
+        sql_repository.query(radius_km=5)
+    with pytest.raises(ValueError):
+        sql_repository.query(sort="distance")
+
+@pytest.mark.parametrize("filters", [{}, {"sort": "-rent"}, {"min_rent": 2000}, {"sort": "rent", "limit": 2}])
+def test_streamed_bodies_match_queries(sql_repository, memory_repository, monkeypatch, filters: dict):
+    from backend import repository
+    monkeypatch.setattr(repository, "STREAM_BATCH_SIZE", 1) # One query per listing from the database
+    expected_ids = [l.id for l in memory_repository.query(**filters)[0]]
+    for store in (sql_repository, memory_repository):
+        bodies, total = store.stream_bodies(**filters)
+        assert [json.loads(body)["id"] for body in bodies] == expected_ids
+        assert total == memory_repository.query(**filters)[2]
+
+@pytest.mark.parametrize("fields", ["summary", ("id", "title", "image", "amenities", "wwsBreakdown"), ("id", "description")])
+def test_sql_projected_bodies_match_memory(sql_repository, memory_repository, fields):
+    from backend.projection import SUMMARY_FIELDS
+    fields = SUMMARY_FIELDS if fields == "summary" else fields
+    for filters in [{}, {"sort": "-rent", "limit": 2}, {"near": (52.3731, 4.8926), "radius_km": 5}]:
+        assert sql_repository.query_body(fields, **filters)[0].body == memory_repository.query_body(fields, **filters)[0].body
+    assert sql_repository.search_body("amsterdam", fields=fields)[0].body == memory_repository.search_body("amsterdam", fields=fields)[0].body
+    assert [json.loads(body) for body in memory_repository.stream_bodies(fields)[0]] == json.loads(memory_repository.query_body(fields)[0].body)
+
+@pytest.mark.parametrize("fields", [None, "summary", ("id", "title", "amenities")])
+def test_batch_body_returns_partial_results_in_request_order(sql_repository, memory_repository, fields):
+    from backend.projection import SUMMARY_FIELDS
+    fields = SUMMARY_FIELDS if fields == "summary" else fields
+    ids = [3, 999, 1, -5]
+    for repository in (sql_repository, memory_repository):
+        cached, not_found = repository.batch_body(ids, fields)
+        batch = json.loads(cached.body)
+        assert [l["id"] for l in batch["listings"]] == [3, 1]
+        assert batch["notFound"] == not_found == [999, -5]
+    assert sql_repository.batch_body(ids, fields)[0].body == memory_repository.batch_body(ids, fields)[0].body
+    assert [l.id for l in sql_repository.get_many([2, 42, 1])] == [l.id for l in memory_repository.get_many([2, 42, 1])] == [2, 1]
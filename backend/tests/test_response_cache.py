@@ -0,0 +1,74 @@
+import json
+from fastapi.encoders import jsonable_encoder
+from backend.response_cache import ListingResponseCache, etag_matches
+
+def test_cached_body_matches_fastapi_serialization(make_listing):
+    cache = ListingResponseCache()
+    listing = make_listing(1)
+    cache.set_listing(listing)
+    assert json.loads(cache.listing(1).body) == jsonable_encoder(listing, by_alias=True)
+
+def test_catalogue_is_rebuilt_after_a_listing_changes(make_listing):
+    cache = ListingResponseCache()
+    cache.set_listing(make_listing(2))
+    cache.set_listing(make_listing(1))
+    catalogue = cache.catalogue()
+    assert [l["id"] for l in json.loads(catalogue.body)] == [1, 2]
+    assert cache.catalogue() is catalogue # Cached until something changes
+
+    unchanged_etag = cache.listing(2).etag
+    cache.set_listing(make_listing(1, advertised_rent=1600.0))
+    assert cache.listing(2).etag == unchanged_etag
+    assert cache.catalogue().etag != catalogue.etag
+
+    cache.remove_listing(1)
+    assert cache.listing(1) is None
+    assert [l["id"] for l in json.loads(cache.catalogue().body)] == [2]
+
+def test_summary_catalogue_follows_listing_changes(make_listing):
+    cache = ListingResponseCache()
+    cache.set_listing(make_listing(1))
+    cache.set_listing(make_listing(2))
+    summaries = json.loads(cache.catalogue(summary=True).body)
+    assert [l["id"] for l in summaries] == [1, 2]
+    assert "description" not in summaries[0] and "image" in summaries[0]
+    assert json.loads(cache.summary(2)) == summaries[1]
+
+    cache.set_listing(make_listing(1, advertised_rent=1600.0))
+    assert json.loads(cache.catalogue(summary=True).body)[0]["advertisedRent"] == 1600.0
+    cache.remove_listing(1)
+    assert cache.summary(1) is None
+    assert [l["id"] for l in json.loads(cache.catalogue(summary=True).body)] == [2]
+
+def test_etag_matches():
+    etag = '"abc"'
+    assert etag_matches('"abc"', etag)
+    assert etag_matches('"xyz", W/"abc"', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"xyz"', etag)
+    assert not etag_matches(None, etag)
+
+def test_catalogue_keeps_its_compressed_variants(make_listing):
+    from fastapi.testclient import TestClient
+    from fastapi import FastAPI, Request
+    from backend.response_cache import cached_json_response
+    cache = ListingResponseCache()
+    for listing_id in range(1, 20):
+        cache.set_listing(make_listing(listing_id))
+    app = FastAPI()
+
+    @app.get("/catalogue")
+    def catalogue(request: Request):
+        return cached_json_response(request, cache.catalogue())
+
+    client = TestClient(app)
+    response = client.get("/catalogue", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert response.headers["ETag"] == cache.catalogue().etag[:-1] + '-gzip"'
+    assert len(response.json()) == 19
+    assert set(cache.catalogue().compressed) == {"gzip"} # Compressed once, reused by later requests
+    assert client.get("/catalogue", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["ETag"]}).status_code == 304
+    identity = client.get("/catalogue", headers={"Accept-Encoding": "identity"})
+    assert "Content-Encoding" not in identity.headers
+    assert identity.headers["ETag"] == cache.catalogue().etag
@@ -0,0 +1,66 @@
+import random
+import time
+from backend.search_index import SearchIndex, tokenize
+
+def test_tokenize_folds_case_and_diacritics():
+    assert tokenize("Café near the Vondelpark, 2-room!") == ["cafe", "near", "the", "vondelpark", "2", "room"]
+    assert tokenize("  ") == []
+    assert tokenize(None) == []
+
+def test_search_ranks_by_field_weight():
+    index = SearchIndex()
+    index.add(1, "Quiet studio", "Utrecht", "Close to the canal")
+    index.add(2, "Canal view apartment", "Amsterdam", "Bright")
+    index.add(3, "Loft", "Canal district", "Spacious")
+    # Title (3) > location (2) > description (1)
+    assert index.search("canal") == ([2, 3, 1], 3)
+    assert index.search("canal", limit=1, offset=1) == ([3], 3)
+    assert index.search("") == ([], 0)
+
+def test_search_requires_every_term_and_treats_the_last_as_prefix():
+    index = SearchIndex()
+    index.add(1, "Canal view apartment", "Amsterdam Centrum", "")
+    index.add(2, "Modern loft", "Amsterdam De Pijp", "")
+    index.add(3, "Family home", "Utrecht Oost", "Close to Amsterdam")
+    assert index.search("amster")[0] == [1, 2, 3]
+    assert index.search("amsterdam pij")[0] == [2]
+    assert index.search("pij amsterdam")[0] == [] # Only the last term matches as a prefix
+    assert index.search("utrecht amsterdam")[0] == [3]
+
+def test_updates_and_removals_are_incremental():
+    index = SearchIndex()
+    index.add(1, "Canal view", "Amsterdam", "")
+    index.add(2, "Canal house", "Haarlem", "")
+    index.add(1, "Garden flat", "Amsterdam", "") # Re-indexed with a new title
+    assert index.search("canal")[0] == [2]
+    assert index.search("garden")[0] == [1]
+    index.remove(2)
+    assert index.search("canal") == ([], 0)
+    assert index.suggest("ca") == []
+    assert len(index) == 1
+    index.clear()
+    assert index.search("garden") == ([], 0)
+
+def test_suggest_orders_by_document_frequency():
+    index = SearchIndex()
+    index.add(1, "Amsterdam loft", "Amsterdam", "")
+    index.add(2, "Amstelveen flat", "Amstelveen", "")
+    index.add(3, "Amsterdam canal", "Amsterdam", "")
+    assert index.suggest("ams") == ["amsterdam", "amstelveen"]
+    assert index.suggest("new amste", limit=1) == ["amsterdam"] # Completes the last word
+    assert index.suggest("xyz") == []
+
+def test_suggest_is_fast_at_100k_listings():
+    rng = random.Random(13)
+    syllables = ["am", "ster", "dam", "rot", "ter", "ut", "recht", "haar", "lem", "del", "ft", "lei", "den", "oost", "west", "zuid"]
+    vocabulary = ["".join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) for _ in range(5000)]
+    index = SearchIndex()
+    for listing_id in range(100_000):
+        index.add(listing_id, " ".join(rng.sample(vocabulary, 3)), rng.choice(vocabulary), " ".join(rng.sample(vocabulary, 8)))
+
+    prefixes = ["a", "am", "ams", "rot", "utre", "haarl", "zu", "westd"]
+    start = time.perf_counter()
+    for prefix in prefixes:
+        suggestions = index.suggest(prefix)
+        assert all(term.startswith(prefix) for term in suggestions)
+    assert (time.perf_counter() - start) / len(prefixes) < 0.005
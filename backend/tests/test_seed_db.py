@@ -0,0 +1,235 @@
+import json
+import pytest
+from backend import database, seed_db, wws_rules
+from backend.database import ListingORM, AmenityORM, WWSBreakdownItemORM, ImportCheckpointORM
+
+@pytest.fixture
+def source_listings(make_source_listing) -> list:
+    return [make_source_listing(listing_id) for listing_id in range(1, 24)]
+
+@pytest.fixture
+def in_memory_database():
+    database.configure_database(database.IN_MEMORY_DATABASE_URL)
+    yield
+    database.configure_database(database.DATABASE_URL)
+
+def test_iter_source_listings_json_array(tmp_path, monkeypatch, source_listings: list):
+    monkeypatch.setattr(seed_db, "READ_BUFFER_SIZE", 7) # Force elements to span many reads
+    path = tmp_path / "listings.json"
+    path.write_text(json.dumps(source_listings, indent=2), encoding="utf-8")
+    assert list(seed_db.iter_source_listings(str(path))) == source_listings
+
+def test_iter_source_listings_ndjson(tmp_path, source_listings: list):
+    path = tmp_path / "listings.ndjson"
+    path.write_text("\n".join(json.dumps(l) for l in source_listings) + "\n\n", encoding="utf-8")
+    assert list(seed_db.iter_source_listings(str(path))) == source_listings
+
+def test_iter_source_listings_unclosed_array(tmp_path):
+    path = tmp_path / "broken.json"
+    path.write_text('[{"id": 1},', encoding="utf-8")
+    with pytest.raises(ValueError):
+        list(seed_db.iter_source_listings(str(path)))
+
+def test_iter_source_listings_caps_malformed_elements(tmp_path, monkeypatch, source_listings: list):
+    monkeypatch.setattr(seed_db, "READ_BUFFER_SIZE", 64)
+    monkeypatch.setattr(seed_db, "MAX_ELEMENT_SIZE", 1024)
+    path = tmp_path / "broken.json"
+    valid = json.dumps(source_listings[0])
+    # The second element never closes: without the cap the rest of the file would be buffered
+    path.write_text(f'[{valid}, {{"id": 2, "title": "unterminated' + " x" * 20000 + '"]', encoding="utf-8")
+    listings = seed_db.iter_source_listings(str(path))
+    assert next(listings) == source_listings[0]
+    with pytest.raises(ValueError, match=f"at byte {len(valid) + 3} "):
+        next(listings)
+
+def test_import_listings_in_chunks(tmp_path, in_memory_database, source_listings: list):
+    path = tmp_path / "listings.json"
+    path.write_text(json.dumps(source_listings), encoding="utf-8")
+    assert seed_db.import_listings(str(path), chunk_size=5) == len(source_listings)
+
+    db = database.SessionLocal()
+    try:
+        assert db.query(ListingORM).count() == len(source_listings)
+        assert db.query(AmenityORM).count() == len(source_listings)
+        assert db.query(WWSBreakdownItemORM).count() == 4 * len(source_listings)
+        # Listing 1: 51 (surface) + 20 (B) + 89 (WOZ: int(300000 * 0.0003) truncates 89.99...) + 5 (rooms) = 165 points
+        listing = db.get(ListingORM, 1)
+        assert listing.wws_points == 165
+        assert listing.max_legal_rent == 165 * 7.5 + 50
+        checkpoint = db.get(ImportCheckpointORM, str(path))
+        assert checkpoint.completed == 1
+        assert checkpoint.rows_committed == len(source_listings)
+    finally:
+        db.close()
+
+def test_import_listings_resumes_after_interruption(tmp_path, monkeypatch, in_memory_database, source_listings: list):
+    path = tmp_path / "listings.ndjson"
+    path.write_text("\n".join(json.dumps(l) for l in source_listings), encoding="utf-8")
+
+    original_insert = seed_db.insert_listings
+    calls = {"count": 0}
+    def failing_insert(db, chunk):
+        calls["count"] += 1
+        if calls["count"] == 3:
+            raise RuntimeError("Simulated crash")
+        original_insert(db, chunk)
+    monkeypatch.setattr(seed_db, "insert_listings", failing_insert)
+    with pytest.raises(RuntimeError):
+        seed_db.import_listings(str(path), chunk_size=5)
+    monkeypatch.setattr(seed_db, "insert_listings", original_insert)
+
+    # Two chunks (10 listings) were committed before the crash; the rest is imported on resume
+    assert seed_db.import_listings(str(path), chunk_size=5) == len(source_listings) - 10
+    db = database.SessionLocal()
+    try:
+        assert db.query(ListingORM).count() == len(source_listings)
+    finally:
+        db.close()
+
+    # A completed import is not resumed: running again starts over
+    assert seed_db.import_listings(str(path), chunk_size=5) == len(source_listings)
+
+def test_import_listings_adds_unless_replacing(tmp_path, in_memory_database, source_listings: list):
+    first = tmp_path / "first.json"
+    first.write_text(json.dumps(source_listings[:10]), encoding="utf-8")
+    second = tmp_path / "second.json"
+    second.write_text(json.dumps([{**source_listings[0], "advertised_rent": 999}] + source_listings[10:]), encoding="utf-8")
+    seed_db.import_listings(str(first), chunk_size=5)
+    # Added to the stored listings; listing 1 is replaced
+    assert seed_db.import_listings(str(second), chunk_size=5) == len(source_listings) - 9
+    db = database.SessionLocal()
+    try:
+        assert db.query(ListingORM).count() == len(source_listings)
+        assert db.get(ListingORM, 1).advertised_rent == 999
+        assert db.query(AmenityORM).count() == len(source_listings)
+    finally:
+        db.close()
+
+    seed_db.import_listings(str(first), chunk_size=5, replace=True)
+    db = database.SessionLocal()
+    try:
+        assert sorted(listing_id for (listing_id,) in db.query(ListingORM.id)) == list(range(1, 11))
+    finally:
+        db.close()
+
+def test_sync_listings_only_touches_changed_listings(tmp_path, in_memory_database, source_listings: list, make_source_listing):
+    path = tmp_path / "listings.json"
+    path.write_text(json.dumps(source_listings), encoding="utf-8")
+    first = seed_db.sync_listings(str(path), chunk_size=5)
+    assert first == seed_db.SyncStats(inserted=len(source_listings), updated=0, deleted=0, unchanged=0)
+
+    # Change the WWS inputs of one listing, the rent of another, drop a third and add a new one
+    changed = [dict(l) for l in source_listings]
+    changed[0] = {**changed[0], "wws_input_data": {**changed[0]["wws_input_data"], "energy_label": "A++"}}
+    changed[1] = {**changed[1], "advertised_rent": 999}
+    removed_id = changed.pop(2)["id"]
+    changed.append(make_source_listing(100))
+    path.write_text(json.dumps(changed), encoding="utf-8")
+
+    second = seed_db.sync_listings(str(path), chunk_size=5)
+    assert second == seed_db.SyncStats(inserted=1, updated=2, deleted=1, unchanged=len(source_listings) - 3)
+
+    db = database.SessionLocal()
+    try:
+        assert db.get(ListingORM, removed_id) is None
+        # Listing 1 re-scored: label B (20) -> A++ (40)
+        assert db.get(ListingORM, 1).wws_points == 165 + 20
+        assert any(b.item == "Energy Label (A++)" for b in db.get(ListingORM, 1).wws_breakdown)
+        assert len(db.get(ListingORM, 1).wws_breakdown) == 4
+        assert db.get(ListingORM, 2).advertised_rent == 999
+        assert db.query(AmenityORM).count() == len(changed)
+    finally:
+        db.close()
+
+    assert seed_db.sync_listings(str(path), chunk_size=5) == seed_db.SyncStats(0, 0, 0, len(changed))
+
+def test_listing_content_hash_ignores_key_order(make_source_listing):
+    listing = make_source_listing(1)
+    reordered = dict(reversed(list(listing.items())))
+    assert seed_db.listing_content_hash(listing) == seed_db.listing_content_hash(reordered)
+    assert seed_db.listing_content_hash(listing) != seed_db.listing_content_hash({**listing, "rooms": 3})
+
+def test_rescore_listings_only_rewrites_changed_listings(tmp_path, in_memory_database, source_listings: list):
+    source_listings[2]["wws_input_data"]["energy_label"] = "C"
+    path = tmp_path / "listings.json"
+    path.write_text(json.dumps(source_listings), encoding="utf-8")
+    seed_db.import_listings(str(path), chunk_size=5, resume=False)
+    base = wws_rules.get_active_rule_set()
+    assert seed_db.rescore_listings(base, chunk_size=5) == seed_db.RescoreStats(changed=0, skipped=0)
+
+    rules = wws_rules.compile_rule_set({
+        "version": "test", "points_per_sq_meter": 1, "energy_label_points": {**base.energy_label_points, "C": 12},
+        "woz_value_factor": 0.0003, "base_points_rooms": 5, "rent_factor_per_point": 7.5, "rent_base": 50.0,
+    })
+    assert seed_db.rescore_listings(rules, chunk_size=5).changed == 1
+
+    db = database.SessionLocal()
+    try:
+        # Listing 3: 53 m² + C (10 -> 12) + 89 WOZ + 5 rooms
+        assert db.get(ListingORM, 3).wws_points == 53 + 12 + 89 + 5
+        assert db.get(ListingORM, 3).max_legal_rent == rules.max_legal_rent(53 + 12 + 89 + 5)
+        assert sorted((b.item, b.points) for b in db.get(ListingORM, 3).wws_breakdown if b.item.startswith("Energy")) == [("Energy Label (C)", 12)]
+        assert db.query(WWSBreakdownItemORM).count() == 4 * len(source_listings)
+        assert db.get(ListingORM, 4).wws_points == 54 + 20 + 89 + 5
+    finally:
+        db.close()
+    assert seed_db.rescore_listings(rules, chunk_size=5).changed == 0
+
+def test_rescore_listings_skips_rows_without_valid_inputs(tmp_path, in_memory_database, source_listings: list):
+    path = tmp_path / "listings.json"
+    path.write_text(json.dumps(source_listings), encoding="utf-8")
+    seed_db.import_listings(str(path), chunk_size=5)
+    db = database.SessionLocal()
+    try:
+        # Listing 8 is in the middle of the second chunk (ids 6-10); a legacy row without inputs
+        db.get(ListingORM, 8).raw_wws_inputs = None
+        db.get(ListingORM, 9).raw_wws_inputs = {"surface_area": "unknown", "room_count": 2}
+        db.commit()
+    finally:
+        db.close()
+
+    base = wws_rules.get_active_rule_set()
+    rules = wws_rules.compile_rule_set({
+        "version": "test", "points_per_sq_meter": 2, "energy_label_points": dict(base.energy_label_points),
+        "woz_value_factor": 0.0003, "base_points_rooms": 5, "rent_factor_per_point": 7.5, "rent_base": 50.0,
+    })
+    assert seed_db.rescore_listings(rules, chunk_size=5) == seed_db.RescoreStats(changed=len(source_listings) - 2, skipped=2)
+    db = database.SessionLocal()
+    try:
+        # The rows around the bad ones (and the later chunks) are re-scored; the bad ones keep their scores
+        assert db.get(ListingORM, 7).wws_points == 2 * 57 + 20 + 89 + 5
+        assert db.get(ListingORM, 10).wws_points == 2 * 60 + 20 + 89 + 5
+        assert db.get(ListingORM, 23).wws_points == 2 * 73 + 20 + 89 + 5
+        assert db.get(ListingORM, 8).wws_points == 58 + 20 + 89 + 5
+    finally:
+        db.close()
+
+def test_rescore_listings_sweeps_rows_written_under_previous_rules(tmp_path, monkeypatch, in_memory_database, source_listings: list, make_source_listing):
+    path = tmp_path / "listings.json"
+    path.write_text(json.dumps(source_listings), encoding="utf-8")
+    seed_db.import_listings(str(path), chunk_size=5)
+    base = wws_rules.get_active_rule_set()
+    rules = wws_rules.compile_rule_set({
+        "version": "test", "points_per_sq_meter": 2, "energy_label_points": dict(base.energy_label_points),
+        "woz_value_factor": 0.0003, "base_points_rooms": 5, "rent_factor_per_point": 7.5, "rent_base": 50.0,
+    })
+
+    # An ingestion batch scored under the previous (still active) rules commits listing 3 after the walk passed it
+    walk = seed_db._rescore_pass
+    def racing_pass(db, pass_rules, chunk_size, condition, skipped_ids):
+        changed = walk(db, pass_rules, chunk_size, condition, skipped_ids)
+        if condition is None:
+            writer = database.SessionLocal()
+            seed_db.write_listing_changes(writer, [make_source_listing(3)], [])
+            writer.commit()
+            writer.close()
+        return changed
+    monkeypatch.setattr(seed_db, "_rescore_pass", racing_pass)
+
+    assert seed_db.rescore_listings(rules, chunk_size=5).changed == len(source_listings) + 1
+    db = database.SessionLocal()
+    try:
+        assert db.get(ListingORM, 3).wws_points == 2 * 53 + 20 + 89 + 5
+        assert {listing.rule_fingerprint for listing in db.query(ListingORM)} == {rules.fingerprint}
+    finally:
+        db.close()
@@ -0,0 +1,119 @@
+import gzip
+import os
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.static_files import (
+    IMMUTABLE_CACHE_CONTROL, PrecompressedStaticFiles, is_fingerprinted, precompress_directory,
+)
+
+INDEX_HTML = "<html><head><title>Test SPA</title></head><body>" + "App " * 400 + "</body></html>"
+MAIN_JS = "console.log('listing');\n" * 2000
+
+@pytest.fixture
+def build_dir(tmp_path):
+    (tmp_path / "static" / "js").mkdir(parents=True)
+    (tmp_path / "index.html").write_text(INDEX_HTML)
+    (tmp_path / "static" / "js" / "main.3f2a1b9c.js").write_text(MAIN_JS)
+    (tmp_path / "static" / "js" / "tiny.0a1b2c3d.js").write_text("let a = 1;")
+    (tmp_path / "favicon.png").write_bytes(os.urandom(4096))
+    return tmp_path
+
+def make_client(directory, **kwargs):
+    static_files = PrecompressedStaticFiles(directory=str(directory), **kwargs)
+    app = FastAPI()
+
+    @app.get("/api/ping")
+    def ping():
+        return {"ok": True}
+
+    app.mount("/", static_files, name="spa")
+    return TestClient(app), static_files
+
+def test_fingerprinted_names():
+    assert is_fingerprinted("static/js/main.3f2a1b9c.js")
+    assert is_fingerprinted("static/css/453.8d4b3c2a.chunk.css")
+    assert is_fingerprinted("static/media/logo.6ce24c58023cc2f8fd88fe9d219db6c6.svg")
+    assert not is_fingerprinted("index.html")
+    assert not is_fingerprinted("manifest.json")
+
+def test_serves_negotiated_encoding_with_immutable_caching(build_dir):
+    client, _ = make_client(build_dir)
+    response = client.get("/static/js/main.3f2a1b9c.js", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.text == MAIN_JS # Decoded by the client
+    assert int(response.headers["content-length"]) < len(MAIN_JS) / 10
+
+    identity = client.get("/static/js/main.3f2a1b9c.js", headers={"Accept-Encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert identity.content == MAIN_JS.encode()
+    assert identity.headers["etag"] != response.headers["etag"]
+
+    # Too small to compress, still fingerprinted
+    tiny = client.get("/static/js/tiny.0a1b2c3d.js", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in tiny.headers and "vary" not in tiny.headers
+    assert tiny.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+
+def test_index_and_client_routes_revalidate(build_dir):
+    client, _ = make_client(build_dir)
+    root = client.get("/")
+    assert root.status_code == 200
+    assert "Test SPA" in root.text
+    assert root.headers["cache-control"] == "no-cache"
+    assert root.headers["content-type"].startswith("text/html")
+
+    # Client-side routes get the app; missing files and API paths do not
+    route = client.get("/listing/12")
+    assert route.status_code == 200 and route.text == root.text
+    assert client.get("/static/js/missing.js").status_code == 404
+    assert client.get("/api/unknown").status_code == 404
+    assert client.get("/api/ping").json() == {"ok": True}
+
+    assert client.head("/").status_code == 200
+    assert client.post("/").status_code == 405
+
+def test_conditional_requests(build_dir):
+    client, _ = make_client(build_dir)
+    response = client.get("/", headers={"Accept-Encoding": "gzip"})
+    not_modified = client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": response.headers["etag"]})
+    assert not_modified.status_code == 304
+    assert not_modified.headers["etag"] == response.headers["etag"]
+    # The identity ETag validates every encoding
+    identity_etag = client.get("/", headers={"Accept-Encoding": "identity"}).headers["etag"]
+    assert client.get("/", headers={"Accept-Encoding": "gzip", "If-None-Match": identity_etag}).status_code == 304
+
+def test_uses_build_time_copies_and_streams_large_files(build_dir):
+    assert precompress_directory(str(build_dir)) >= 2 # index.html and main.js (the image is not compressible)
+    assert precompress_directory(str(build_dir)) == 0 # Up to date
+    marker = gzip.compress(MAIN_JS.encode(), compresslevel=1)
+    gz_path = build_dir / "static" / "js" / "main.3f2a1b9c.js.gz"
+    gz_path.write_bytes(marker)
+
+    client, static_files = make_client(build_dir, max_memory_file_size=1024)
+    response = client.get("/static/js/main.3f2a1b9c.js", headers={"Accept-Encoding": "gzip"})
+    assert response.text == MAIN_JS
+    assert int(response.headers["content-length"]) == len(marker) # The build-time copy, streamed from disk
+    assert response.headers["cache-control"] == IMMUTABLE_CACHE_CONTROL
+    identity = client.get("/static/js/main.3f2a1b9c.js", headers={"Accept-Encoding": "identity"})
+    assert identity.content == MAIN_JS.encode()
+    # The copies are variants, not files of their own
+    assert static_files.stats()["files"] == 4
+
+def test_memory_budget_and_changed_files(build_dir):
+    client, static_files = make_client(build_dir, memory_budget=2048)
+    static_files.load()
+    assert static_files.stats()["memory_bytes"] <= 2048
+    # Without an on-disk copy, a variant that does not fit in memory is not offered
+    response = client.get("/static/js/main.3f2a1b9c.js", headers={"Accept-Encoding": "gzip"})
+    assert response.content == MAIN_JS.encode()
+
+    # A rebuilt index.html is picked up without a restart
+    index_path = build_dir / "index.html"
+    index_path.write_text("<html>new build</html>")
+    os.utime(index_path, ns=(os.stat(index_path).st_mtime_ns + 10**9,) * 2)
+    assert client.get("/").text == "<html>new build</html>"
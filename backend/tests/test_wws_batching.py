@@ -0,0 +1,58 @@
+import threading
+
+import pytest
+from backend.models import WWSDetails, WWSInputData
+from backend.wws_batching import WWSMicroBatcher, calculate_wws_rows
+from backend.wws_calculator import calculate_max_legal_rent, calculate_wws_points
+from backend import wws_batching
+
+def scalar_details(row: dict) -> dict:
+    points, breakdown = calculate_wws_points(WWSInputData(**row))
+    return WWSDetails(points=points, max_rent=calculate_max_legal_rent(points), breakdown=breakdown).model_dump()
+
+def test_calculate_wws_rows_matches_scalar_and_reports_invalid_rows():
+    rows = [
+        {"size_m2": 75.0, "rooms": 3, "energy_label": "a", "woz_value": 300000},
+        {"size_m2": "large", "rooms": 2},
+        {"size_m2": 40, "rooms": 1},
+        "not an object",
+    ]
+    results = calculate_wws_rows(rows)
+    assert [result["index"] for result in results] == [0, 1, 2, 3]
+    assert results[0]["details"] == scalar_details(rows[0]) and results[0]["errors"] is None
+    assert results[2]["details"] == scalar_details(rows[2])
+    assert results[1]["details"] is None
+    assert [error["loc"] for error in results[1]["errors"]] == [["size_m2"]]
+    assert results[3]["errors"][0]["type"] == "model_type"
+    assert calculate_wws_rows([]) == []
+
+def test_micro_batcher_coalesces_concurrent_calculations():
+    batcher = WWSMicroBatcher(window_ms=100)
+    rows = [{"size_m2": 30 + i, "rooms": 1 + i % 4, "energy_label": "ABC"[i % 3]} for i in range(16)]
+    results = [None] * len(rows)
+    start = threading.Barrier(len(rows))
+
+    def calculate(i):
+        start.wait()
+        results[i] = batcher.calculate(WWSInputData(**rows[i])).to_details().model_dump()
+
+    threads = [threading.Thread(target=calculate, args=(i,)) for i in range(len(rows))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert results == [scalar_details(row) for row in rows]
+    stats = batcher.stats()
+    assert stats["calculations"] == len(rows)
+    assert stats["batches"] < len(rows)
+
+def test_micro_batcher_flushes_a_full_batch_without_waiting():
+    batcher = WWSMicroBatcher(window_ms=60_000, max_batch_size=1)
+    assert batcher.calculate(WWSInputData(size_m2=50, rooms=2)).points == scalar_details({"size_m2": 50, "rooms": 2})["points"]
+
+def test_micro_batcher_propagates_failures(monkeypatch):
+    def failing_batch(inputs, rules=None):
+        raise RuntimeError("rule set unavailable")
+    monkeypatch.setattr(wws_batching, "calculate_wws_points_batch_from_inputs", failing_batch)
+    with pytest.raises(RuntimeError):
+        WWSMicroBatcher(window_ms=0).calculate(WWSInputData(size_m2=50, rooms=2))
@@ -2,8 +2,16 @@ import pytest
 from backend.wws_calculator import (
     calculate_wws_points,
     calculate_max_legal_rent,
-    get_wws_details
+    get_wws_details,
+    calculate_wws_points_batch,
+    calculate_wws_points_batch_from_inputs,
+    clear_wws_cache,
+    wws_cache_stats,
+    WWSScoreCache,
+    score_wws,
+    score_wws_input,
 )
+from backend import wws_calculator, wws_rules
 from backend.models import WWSInputData, WWSDetails, WWSBreakdownItem
 
 @pytest.fixture
@@ -87,3 +95,134 @@ def test_get_wws_details_unknown_label(sample_input_data_dict: dict):
     wws_details_obj = get_wws_details(data)
     assert wws_details_obj.points == 120
     assert wws_details_obj.max_rent == 950.0
+
+# --- Batch (columnar) scoring --- #
+
+@pytest.fixture
+def batch_input_rows() -> list:
+    # Mix of valid, missing and invalid labels / WOZ values, including zero rooms
+    return [
+        WWSInputData(size_m2=75.0, rooms=2, energy_label="B", woz_value=450000.0),
+        WWSInputData(size_m2=90.5, rooms=3, energy_label="a+", woz_value=None),
+        WWSInputData(size_m2=120.0, rooms=0, energy_label="Z", woz_value=0.0),
+        WWSInputData(size_m2=45.9, rooms=1, energy_label=None, woz_value=123456.7),
+        WWSInputData(size_m2=0.0, rooms=0, energy_label="", woz_value=-10.0),
+    ]
+
+def test_calculate_wws_points_batch_matches_scalar(batch_input_rows: list):
+    batch = calculate_wws_points_batch_from_inputs(batch_input_rows)
+    assert len(batch) == len(batch_input_rows)
+    for i, row in enumerate(batch_input_rows):
+        points, breakdown = calculate_wws_points(row)
+        assert int(batch.points[i]) == points
+        assert float(batch.max_rent[i]) == calculate_max_legal_rent(points)
+        assert batch.breakdown(i) == breakdown
+        assert batch.details(i) == get_wws_details(row.model_dump())
+
+def test_calculate_wws_points_batch_category_arrays(batch_input_rows: list):
+    batch = calculate_wws_points_batch(
+        [r.size_m2 for r in batch_input_rows],
+        [r.rooms for r in batch_input_rows],
+        [r.energy_label for r in batch_input_rows],
+        [r.woz_value for r in batch_input_rows],
+    )
+    # First row: 75 (surface) + 20 (B) + 135 (WOZ 450k) + 5 (rooms) = 235
+    assert batch.surface_points[0] == 75
+    assert batch.energy_label_points[0] == 20
+    assert batch.woz_points[0] == 135
+    assert batch.room_points[0] == 5
+    assert batch.points[0] == 235
+    assert (batch.points == batch.surface_points + batch.energy_label_points + batch.woz_points + batch.room_points).all()
+
+def test_calculate_wws_points_batch_empty_and_mismatched():
+    empty = calculate_wws_points_batch([], [], [], [])
+    assert len(empty) == 0
+    with pytest.raises(ValueError):
+        calculate_wws_points_batch([75.0], [2, 3], ["A"], [None])
+
+# --- Memoized scoring --- #
+
+@pytest.fixture
+def empty_wws_cache():
+    clear_wws_cache()
+    yield
+    clear_wws_cache()
+
+def test_get_wws_details_is_memoized(empty_wws_cache):
+    data = {"size_m2": 75.0, "rooms": 2, "energy_label": "B", "woz_value": 450000.0}
+    first = get_wws_details(data)
+    assert wws_cache_stats()["misses"] == 1
+    # Same inputs with a different label case normalize to the same cache entry
+    second = get_wws_details({"size_m2": 75.0, "rooms": 2, "energy_label": "b", "woz_value": 450000.0})
+    assert second is first
+    assert wws_cache_stats()["hits"] == 1
+    assert first.points == 235
+
+def test_get_wws_details_cache_matches_uncached_results(empty_wws_cache):
+    for data in [
+        {"size_m2": 60, "rooms": 1, "energy_label": "z", "woz_value": -1},
+        {"size_m2": 60, "rooms": 1, "energy_label": None, "woz_value": None},
+        {"size_m2": "60", "rooms": 1},
+    ]:
+        cached_twice = [get_wws_details(data) for _ in range(2)]
+        points, breakdown = calculate_wws_points(WWSInputData(**data))
+        assert cached_twice[0] == cached_twice[1]
+        assert cached_twice[1].points == points
+        assert cached_twice[1].breakdown == breakdown
+
+def test_get_wws_details_logs_invalid_input(empty_wws_cache, caplog, capsys):
+    with caplog.at_level("WARNING", logger="backend.wws_calculator"):
+        details = get_wws_details({"size_m2": "not a number", "rooms": 2})
+    assert details.points == 0 and details.breakdown[0].item.startswith("Error in input data")
+    assert any("Validation Error" in record.getMessage() for record in caplog.records)
+    assert capsys.readouterr().out == ""
+
+def test_get_wws_details_cache_invalidated_when_tables_change(empty_wws_cache):
+    data = {"size_m2": 75.0, "rooms": 2, "energy_label": "B", "woz_value": 450000.0}
+    assert get_wws_details(data).points == 235
+    base = wws_rules.get_active_rule_set()
+    document = {
+        "version": "test", "points_per_sq_meter": 1, "energy_label_points": {**base.energy_label_points, "B": 25},
+        "woz_value_factor": 0.0003, "base_points_rooms": 5, "rent_factor_per_point": 7.5, "rent_base": 50.0,
+    }
+    try:
+        wws_rules.activate_rule_set(wws_rules.compile_rule_set(document))
+        assert get_wws_details(data).points == 240
+        wws_rules.activate_rule_set(wws_rules.compile_rule_set({**document, "rent_base": 100.0}))
+        assert get_wws_details(data).max_rent == 240 * 7.5 + 100.0
+    finally:
+        wws_rules.activate_rule_set(base)
+    assert get_wws_details(data).points == 235
+
+def test_wws_score_cache_evicts_least_recently_used():
+    cache = WWSScoreCache(max_size=2)
+    fingerprint = wws_calculator.rule_tables_fingerprint()
+    details = WWSDetails(points=1, max_rent=57.5, breakdown=[])
+    assert cache.get("a", fingerprint) is None
+    cache.put("a", fingerprint, details)
+    cache.put("b", fingerprint, details)
+    cache.get("a", fingerprint) # "b" is now the least recently used entry
+    cache.put("c", fingerprint, details)
+    assert cache.get("b", fingerprint) is None
+    assert cache.get("a", fingerprint) is details
+    assert cache.stats() == {"size": 2, "max_size": 2, "hits": 2, "misses": 2, "evictions": 1}
+
+# --- Fast scoring --- #
+
+def test_score_wws_matches_scalar_and_batch(batch_input_rows: list):
+    batch = calculate_wws_points_batch_from_inputs(batch_input_rows)
+    for i, row in enumerate(batch_input_rows):
+        score = score_wws_input(row)
+        points, breakdown = calculate_wws_points(row)
+        assert score.points == points
+        assert score.max_rent == calculate_max_legal_rent(points)
+        assert [WWSBreakdownItem(item=item, points=item_points) for item, item_points in score.breakdown] == breakdown
+        assert score == batch.score(i)
+        assert score.to_details() == batch.details(i) == get_wws_details(row)
+
+def test_score_wws_results_are_compact_and_share_labels():
+    first = score_wws(75.0, 2, "b", 450000.0)
+    second = score_wws(75.0, 2, "B", 450000.0)
+    assert not hasattr(first, "__dict__")
+    assert all(a[0] is b[0] for a, b in zip(first.breakdown, second.breakdown))
+    assert first.to_details() == get_wws_details({"size_m2": 75.0, "rooms": 2, "energy_label": "B", "woz_value": 450000.0})
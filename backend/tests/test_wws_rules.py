@@ -0,0 +1,74 @@
+import json
+import pytest
+from backend import wws_rules
+from backend.wws_calculator import calculate_max_legal_rent, calculate_wws_points, get_wws_details
+from backend.models import WWSInputData
+
+def rule_document(**overrides) -> dict:
+    document = {
+        "version": "2099",
+        "points_per_sq_meter": 1,
+        "energy_label_points": {"A": 30, "B": 20},
+        "woz_value_factor": 0.0003,
+        "base_points_rooms": 5,
+        "rent_factor_per_point": 8.0,
+        "rent_base": 60.0,
+    }
+    document.update(overrides)
+    return document
+
+@pytest.fixture
+def restore_active_rule_set():
+    active = wws_rules.get_active_rule_set()
+    yield active
+    wws_rules.activate_rule_set(active)
+
+def test_shipped_rule_set_matches_original_tables():
+    rules = wws_rules.load_rule_set("2024")
+    assert "2024" in wws_rules.available_rule_versions()
+    assert dict(rules.energy_label_points) == {"A++": 40, "A+": 35, "A": 30, "B": 20, "C": 10, "D": 5}
+    assert rules.max_legal_rent(235) == 1812.5
+    assert rules.max_legal_rent(0) == 0.0
+
+def test_compile_rule_set_rejects_invalid_documents():
+    with pytest.raises(ValueError, match="missing: rent_base"):
+        wws_rules.compile_rule_set({k: v for k, v in rule_document().items() if k != "rent_base"})
+    with pytest.raises(ValueError):
+        wws_rules.compile_rule_set(rule_document(energy_label_points=["A"]))
+    with pytest.raises(ValueError):
+        wws_rules.compile_rule_set(rule_document(rent_base="cheap"))
+
+def test_load_rule_set_unknown_or_mismatched_version(tmp_path):
+    with pytest.raises(wws_rules.UnknownRuleSetError):
+        wws_rules.load_rule_set("1999", str(tmp_path))
+    with pytest.raises(wws_rules.UnknownRuleSetError):
+        wws_rules.load_rule_set("../2024")
+    (tmp_path / "2030.json").write_text(json.dumps(rule_document()), encoding="utf-8")
+    with pytest.raises(ValueError, match="declares version '2099'"):
+        wws_rules.load_rule_set("2030", str(tmp_path))
+
+def test_compiled_tables():
+    rules = wws_rules.compile_rule_set(rule_document(energy_label_points={"a+": 35}))
+    assert rules.energy_label_points == {"A+": 35}
+    assert all(rules.max_rent_table[points] == rules.max_legal_rent(points) for points in (0, 1, 235, 2047))
+    # The fingerprint covers the contents, not only the version name
+    assert rules.fingerprint != wws_rules.compile_rule_set(rule_document(rent_base=61.0)).fingerprint
+    assert rules.fingerprint == wws_rules.compile_rule_set(rule_document(energy_label_points={"A+": 35})).fingerprint
+
+def test_activate_rule_set_switches_calculations_and_notifies(restore_active_rule_set):
+    data = WWSInputData(size_m2=75.0, rooms=2, energy_label="B", woz_value=450000.0)
+    assert calculate_wws_points(data)[0] == 235
+    notifications = []
+    listener = lambda old, new: notifications.append((old.version, new.version))
+    wws_rules.add_rule_set_listener(listener)
+    try:
+        new_rules = wws_rules.compile_rule_set(rule_document())
+        assert wws_rules.activate_rule_set(new_rules) is restore_active_rule_set
+        assert calculate_max_legal_rent(235) == 235 * 8.0 + 60.0
+        assert get_wws_details(data.model_dump()).max_rent == 235 * 8.0 + 60.0
+        wws_rules.activate_rule_set(wws_rules.compile_rule_set(rule_document())) # Same tables: no notification
+    finally:
+        wws_rules.remove_rule_set_listener(listener)
+    assert notifications == [("2024", "2099")]
+    # An explicit rule set overrides the active one
+    assert calculate_max_legal_rent(235, restore_active_rule_set) == 1812.5
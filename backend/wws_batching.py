@@ -0,0 +1,100 @@
+import os
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from pydantic import ValidationError
+
+from .models import WWSInputData
+from .wws_calculator import WWSScore, calculate_wws_points_batch_from_inputs
+from .wws_rules import WWSRuleSet, get_active_rule_set
+
+# On-demand WWS calculations for the /api/wws endpoints.
+# calculate_wws_rows scores a whole request of raw input rows with one vectorized evaluation and reports
+# invalid rows individually (the load-time get_wws_details collapses them into a zero-point result).
+# WWSMicroBatcher does the same for concurrent single calculations: the first caller of a batch waits up
+# to WWS_BATCH_WINDOW_MS for others to join, then scores every input of the batch in one evaluation.
+
+WWS_BATCH_WINDOW_MS = float(os.getenv("RENTRIGHT_WWS_BATCH_WINDOW_MS", "2"))
+WWS_MICRO_BATCH_MAX_SIZE = 512
+
+def _input_errors(error: ValidationError) -> List[Dict[str, Any]]:
+    """Validation errors of one input row in the shape of WWSInputError."""
+    return [{"loc": list(item["loc"]), "msg": item["msg"], "type": item["type"]} for item in error.errors(include_url=False)]
+
+def validate_wws_rows(rows: Sequence[Any]) -> Tuple[List[Tuple[int, WWSInputData]], Dict[int, List[Dict[str, Any]]]]:
+    """Splits raw input rows into (index, WWSInputData) pairs of the valid ones and index -> errors of the others."""
+    valid: List[Tuple[int, WWSInputData]] = []
+    errors: Dict[int, List[Dict[str, Any]]] = {}
+    for index, row in enumerate(rows):
+        try:
+            valid.append((index, WWSInputData.model_validate(row)))
+        except ValidationError as e:
+            errors[index] = _input_errors(e)
+    return valid, errors
+
+def calculate_wws_rows(rows: Sequence[Any], rules: Optional[WWSRuleSet] = None) -> List[Dict[str, Any]]:
+    """
+    Scores raw input rows (dicts parsable by WWSInputData) in one batch under one rule set.
+    Returns one WWSCalculationResult-shaped dict per row, in order: `details` for valid rows, `errors` otherwise.
+    """
+    rules = rules or get_active_rule_set()
+    valid, errors = validate_wws_rows(rows)
+    results: List[Dict[str, Any]] = [{"index": index, "details": None, "errors": errors.get(index)} for index in range(len(rows))]
+    if valid:
+        batch = calculate_wws_points_batch_from_inputs([data for _, data in valid], rules)
+        for position, (index, _) in enumerate(valid):
+            results[index]["details"] = {
+                "points": int(batch.points[position]),
+                "max_rent": float(batch.max_rent[position]),
+                "breakdown": [{"item": item, "points": points} for item, points in batch.breakdown_rows(position)],
+            }
+    return results
+
+class WWSMicroBatcher:
+    """
+    Coalesces concurrent single WWS calculations into vectorized batches.
+    `calculate` blocks the calling thread (FastAPI runs the endpoint in its threadpool) until the batch
+    it joined has been scored.
+    """
+
+    def __init__(self, window_ms: float = WWS_BATCH_WINDOW_MS, max_batch_size: int = WWS_MICRO_BATCH_MAX_SIZE):
+        self.window_seconds = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._lock = threading.Lock()
+        self._pending: List[Tuple[WWSInputData, "Future[WWSScore]"]] = []
+        self._batch_full = threading.Event()
+        self.batches = 0
+        self.calculations = 0
+
+    def calculate(self, data: WWSInputData) -> WWSScore:
+        future: "Future[WWSScore]" = Future()
+        with self._lock:
+            self._pending.append((data, future))
+            leader = len(self._pending) == 1 # The first caller of a batch scores it
+            if len(self._pending) >= self.max_batch_size:
+                self._batch_full.set()
+        if leader:
+            self._batch_full.wait(self.window_seconds)
+            with self._lock:
+                batch, self._pending = self._pending, []
+                self._batch_full.clear()
+            self._score(batch)
+        return future.result()
+
+    def _score(self, batch: List[Tuple[WWSInputData, "Future[WWSScore]"]]):
+        try:
+            result = calculate_wws_points_batch_from_inputs([data for data, _ in batch], get_active_rule_set())
+        except Exception as e: # Every caller of the batch sees the failure
+            for _, future in batch:
+                future.set_exception(e)
+            return
+        with self._lock:
+            self.batches += 1
+            self.calculations += len(batch)
+        for position, (_, future) in enumerate(batch):
+            future.set_result(result.score(position))
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"batches": self.batches, "calculations": self.calculations}
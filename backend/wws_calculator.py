@@ -1,63 +1,90 @@
-from typing import List, Tuple, Dict, Any, Optional
+from typing import List, Tuple, Dict, Any, Optional, Sequence, Hashable, Union
+from collections import OrderedDict
+from functools import lru_cache
+import logging
+import os
+import threading
+import time
+import numpy as np
 from pydantic import ValidationError # For specific Pydantic error handling
+from .metrics import REGISTRY
 from .models import WWSBreakdownItem, WWSInputData, WWSDetails # Added WWSDetails
+from .wws_rules import WWSRuleSet, get_active_rule_set
+
+logger = logging.getLogger(__name__)
 
 # This is a simplified placeholder for the Woningwaarderingsstelsel (WWS) calculation.
 # A real implementation would require detailed rules and point tables from the Dutch government.
 
-# Example point assignments (highly simplified)
-POINTS_PER_SQ_METER = 1
-ENERGY_LABEL_POINTS = {
-    "A++": 40,
-    "A+": 35,
-    "A": 30,
-    "B": 20,
-    "C": 10,
-    "D": 5,
-}
-WOZ_VALUE_FACTOR = 0.0003 # Example: 1 point per ~3333 EUR of WOZ value. For 300k, this is 90 points.
-BASE_POINTS_ROOMS = 5 # Base points for having rooms, not per room.
-
-# Example mapping of points to max legal rent (highly simplified)
-# In reality, this is a table updated annually by the government.
-# Rent = Points * Factor + Base (example linear model)
-RENT_FACTOR_PER_POINT = 7.50
-RENT_BASE = 50.00
-
-def calculate_wws_points(data: WWSInputData) -> Tuple[int, List[WWSBreakdownItem]]:
+# The point tables and the rent formula are versioned rule sets in data/wws_rules/<version>.json,
+# compiled by wws_rules.py. Every calculation reads the active rule set once (or takes an explicit
+# one), so a version switch never mixes tables within one result.
+
+# Breakdown labels are shared by the scalar and batch paths so both produce identical items.
+# They are memoized: equal inputs get the same (immutable) string object, so results built by the
+# fast path below share their labels instead of formatting a copy per listing.
+_LABEL_CACHE_SIZE = 4096
+_INVALID_ENERGY_LABEL_LABEL = "Energy Label (Not specified or invalid)"
+_MISSING_WOZ_VALUE_LABEL = "WOZ Value (Not specified)"
+
+@lru_cache(maxsize=_LABEL_CACHE_SIZE, typed=True) # typed: 75 and 75.0 render differently
+def _surface_area_label(size_m2: float) -> str:
+    return f"Surface Area ({size_m2} m\texttwosuperior)"
+
+@lru_cache(maxsize=_LABEL_CACHE_SIZE)
+def _known_energy_label_label(label: str) -> str:
+    return f"Energy Label ({label})"
+
+def _energy_label_label(energy_label: Optional[str], rules: WWSRuleSet) -> str:
+    if energy_label and energy_label.upper() in rules.energy_label_points:
+        return _known_energy_label_label(energy_label.upper())
+    return _INVALID_ENERGY_LABEL_LABEL
+
+@lru_cache(maxsize=_LABEL_CACHE_SIZE, typed=True)
+def _woz_value_label(woz_value: Optional[float]) -> str:
+    if woz_value and woz_value > 0:
+        return f"WOZ Value (\texteuro{woz_value:,.0f})"
+    return _MISSING_WOZ_VALUE_LABEL
+
+@lru_cache(maxsize=_LABEL_CACHE_SIZE)
+def _rooms_label(rooms: int) -> str:
+    return f"Number of Rooms ({rooms})"
+
+def calculate_wws_points(data: WWSInputData, rules: Optional[WWSRuleSet] = None) -> Tuple[int, List[WWSBreakdownItem]]:
     """
-    Calculates WWS points based on input data.
+    Calculates WWS points based on input data (with the active rule set unless `rules` is given).
     Returns total points and a breakdown of points per category.
     """
+    rules = rules or get_active_rule_set()
     total_points = 0
     breakdown: List[WWSBreakdownItem] = []
 
     # 1. Surface Area
-    surface_points = int(data.size_m2 * POINTS_PER_SQ_METER)
+    surface_points = int(data.size_m2 * rules.points_per_sq_meter)
     total_points += surface_points
-    breakdown.append(WWSBreakdownItem(item=f"Surface Area ({data.size_m2} m\texttwosuperior)", points=surface_points))
+    breakdown.append(WWSBreakdownItem(item=_surface_area_label(data.size_m2), points=surface_points))
 
     # 2. Energy Label
-    if data.energy_label and data.energy_label.upper() in ENERGY_LABEL_POINTS:
-        label_points = ENERGY_LABEL_POINTS[data.energy_label.upper()]
+    if data.energy_label and data.energy_label.upper() in rules.energy_label_points:
+        label_points = rules.energy_label_points[data.energy_label.upper()]
         total_points += label_points
-        breakdown.append(WWSBreakdownItem(item=f"Energy Label ({data.energy_label.upper()})", points=label_points))
     else:
-        breakdown.append(WWSBreakdownItem(item="Energy Label (Not specified or invalid)", points=0))
+        label_points = 0
+    breakdown.append(WWSBreakdownItem(item=_energy_label_label(data.energy_label, rules), points=label_points))
 
     # 3. WOZ Value
     if data.woz_value and data.woz_value > 0:
-        woz_points = int(data.woz_value * WOZ_VALUE_FACTOR)
+        woz_points = int(data.woz_value * rules.woz_value_factor)
         total_points += woz_points
-        breakdown.append(WWSBreakdownItem(item=f"WOZ Value (\texteuro{data.woz_value:,.0f})", points=woz_points))
     else:
-        breakdown.append(WWSBreakdownItem(item="WOZ Value (Not specified)", points=0))
+        woz_points = 0
+    breakdown.append(WWSBreakdownItem(item=_woz_value_label(data.woz_value), points=woz_points))
     
     # 4. Rooms (very basic)
     # A real calculation would consider heating, size of rooms etc.
-    room_points = BASE_POINTS_ROOMS if data.rooms > 0 else 0
+    room_points = rules.base_points_rooms if data.rooms > 0 else 0
     total_points += room_points
-    breakdown.append(WWSBreakdownItem(item=f"Number of Rooms ({data.rooms})", points=room_points))
+    breakdown.append(WWSBreakdownItem(item=_rooms_label(data.rooms), points=room_points))
 
     # Add other categories here: kitchen, bathroom, outdoor space, etc.
     # For example:
@@ -67,35 +94,358 @@ def calculate_wws_points(data: WWSInputData) -> Tuple[int, List[WWSBreakdownItem
 
     return total_points, breakdown
 
-def calculate_max_legal_rent(points: int) -> float:
+def calculate_max_legal_rent(points: int, rules: Optional[WWSRuleSet] = None) -> float:
     """
     Calculates the maximum legal rent based on WWS points.
     """
-    if points <= 0:
-        return 0.0
-    max_rent = (points * RENT_FACTOR_PER_POINT) + RENT_BASE
-    return round(max_rent, 2)
+    return (rules or get_active_rule_set()).max_legal_rent(points)
+
+# --- Fast scoring --- #
+# Internal scoring path for inputs that are already validated (WWSInputData) or plain typed values:
+# no pydantic validation and no model allocation per call. WWSScore is a compact __slots__ object with
+# the breakdown as a tuple of (label, points) pairs sharing the memoized label strings; it is converted
+# to the WWSDetails model (to_details) only where a result leaves the API.
+
+class WWSScore:
+    """Total points, maximum legal rent and (label, points) breakdown of one unit. Treat as immutable."""
+
+    __slots__ = ("points", "max_rent", "breakdown")
+
+    def __init__(self, points: int, max_rent: float, breakdown: Tuple[Tuple[str, int], ...]):
+        self.points = points
+        self.max_rent = max_rent
+        self.breakdown = breakdown
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, WWSScore):
+            return NotImplemented
+        return (self.points, self.max_rent, self.breakdown) == (other.points, other.max_rent, other.breakdown)
+
+    def __repr__(self) -> str:
+        return f"WWSScore(points={self.points}, max_rent={self.max_rent}, breakdown={self.breakdown!r})"
+
+    def to_details(self) -> WWSDetails:
+        """The WWSDetails model of this score."""
+        # Validating plain dicts in pydantic-core is cheaper than model_construct per breakdown item
+        return WWSDetails(points=self.points, max_rent=self.max_rent, breakdown=[{"item": item, "points": points} for item, points in self.breakdown])
+
+def score_wws(
+    size_m2: float,
+    rooms: int,
+    energy_label: Optional[str] = None,
+    woz_value: Optional[float] = None,
+    rules: Optional[WWSRuleSet] = None,
+) -> WWSScore:
+    """
+    Scores plain typed inputs (as WWSInputData would hold them: float size and WOZ value, int rooms)
+    without validation. Results match calculate_wws_points + calculate_max_legal_rent exactly.
+    """
+    rules = rules or get_active_rule_set()
+    surface_points = int(size_m2 * rules.points_per_sq_meter)
+    label = energy_label.upper() if energy_label else None
+    if label is not None and label in rules.energy_label_points:
+        label_points = rules.energy_label_points[label]
+        label_label = _known_energy_label_label(label)
+    else:
+        label_points = 0
+        label_label = _INVALID_ENERGY_LABEL_LABEL
+    woz_points = int(woz_value * rules.woz_value_factor) if woz_value and woz_value > 0 else 0
+    room_points = rules.base_points_rooms if rooms > 0 else 0
+    points = surface_points + label_points + woz_points + room_points
+    return WWSScore(points, rules.max_legal_rent(points), (
+        (_surface_area_label(size_m2), surface_points),
+        (label_label, label_points),
+        (_woz_value_label(woz_value), woz_points),
+        (_rooms_label(rooms), room_points),
+    ))
+
+def score_wws_input(data: WWSInputData, rules: Optional[WWSRuleSet] = None) -> WWSScore:
+    """Scores an already-validated WWSInputData (no re-validation)."""
+    return score_wws(data.size_m2, data.rooms, data.energy_label, data.woz_value, rules)
+
+# --- Memoized scoring --- #
+# Many listings share identical WWS inputs (e.g. hundreds of identical units in one new-build complex).
+# get_wws_details memoizes its result per normalized input in a bounded LRU cache. The cache key also
+# contains the fingerprint of the active rule set, so activating another rule set makes earlier entries
+# unreachable (and the cache is cleared) without a restart.
+
+WWS_CACHE_MAX_SIZE = int(os.getenv("RENTRIGHT_WWS_CACHE_SIZE", "10000"))
+
+def rule_tables_fingerprint() -> str:
+    """Fingerprint (version + content hash) of the active rule set."""
+    return get_active_rule_set().fingerprint
+
+class WWSScoreCache:
+    """Thread-safe LRU cache of WWSDetails with hit/miss/eviction counters."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, WWSDetails]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._fingerprint: Optional[str] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, fingerprint: str) -> Optional[WWSDetails]:
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                # Point tables changed: every cached result is stale
+                self._entries.clear()
+                self._fingerprint = fingerprint
+            details = self._entries.get(key)
+            if details is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return details
+
+    def put(self, key: Hashable, fingerprint: str, details: WWSDetails):
+        with self._lock:
+            if fingerprint != self._fingerprint:
+                return # Computed under tables that changed meanwhile
+            self._entries[key] = details
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"size": len(self._entries), "max_size": self.max_size, "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+_WWS_SCORE_CACHE = WWSScoreCache(WWS_CACHE_MAX_SIZE)
+
+# --- Metrics --- #
+# Scoring time and volume per path ("batch": calculate_wws_points_batch, "single": a get_wws_details cache miss).
+# The fast path (score_wws) is not timed: it is cheaper than the measurement would be.
+_SCORING_SECONDS = REGISTRY.histogram("rentright_wws_scoring_duration_seconds", "Duration of WWS scoring calls.", ("path",))
+_SCORED_UNITS = REGISTRY.counter("rentright_wws_scored_units", "Units scored.", ("path",))
+
+def _cache_metrics():
+    stats = _WWS_SCORE_CACHE.stats()
+    return [
+        ("rentright_wws_cache_hits", "counter", "get_wws_details cache hits.", [("rentright_wws_cache_hits_total", {}, stats["hits"])]),
+        ("rentright_wws_cache_misses", "counter", "get_wws_details cache misses.", [("rentright_wws_cache_misses_total", {}, stats["misses"])]),
+        ("rentright_wws_cache_evictions", "counter", "get_wws_details cache evictions.", [("rentright_wws_cache_evictions_total", {}, stats["evictions"])]),
+        ("rentright_wws_cache_entries", "gauge", "Entries in the get_wws_details cache.", [("rentright_wws_cache_entries", {}, stats["size"])]),
+    ]
+
+REGISTRY.add_collector(_cache_metrics)
+
+_PLAIN_INPUT_TYPES = (int, float, str, type(None))
+
+def _wws_cache_key(input_data_dict: Dict[str, Any], rules: WWSRuleSet) -> Optional[Tuple[Any, ...]]:
+    """
+    Normalized cache key for a raw input dict, or None if it holds anything but plain values
+    (those inputs bypass the cache). Inputs with the same key yield identical WWSDetails:
+    label case and invalid labels are normalized the way calculate_wws_points treats them,
+    and a missing or non-positive WOZ value counts as not specified.
+    """
+    size_m2 = input_data_dict.get("size_m2")
+    rooms = input_data_dict.get("rooms")
+    energy_label = input_data_dict.get("energy_label")
+    woz_value = input_data_dict.get("woz_value")
+    if not all(isinstance(value, _PLAIN_INPUT_TYPES) for value in (size_m2, rooms, energy_label, woz_value)):
+        return None
+    if isinstance(energy_label, str):
+        energy_label = energy_label.upper() if energy_label.upper() in rules.energy_label_points else None
+    if isinstance(woz_value, (int, float)) and woz_value <= 0:
+        woz_value = None
+    # The type tags keep e.g. "75" (validated as 75.0) and 75 apart, so a cached result is only
+    # reused for inputs that went through the same validation.
+    return (type(size_m2), size_m2, type(rooms), rooms, energy_label, type(woz_value), woz_value)
+
+def wws_cache_stats() -> Dict[str, int]:
+    """Size and hit/miss/eviction counters of the get_wws_details cache."""
+    return _WWS_SCORE_CACHE.stats()
+
+def clear_wws_cache():
+    _WWS_SCORE_CACHE.clear()
 
-def get_wws_details(input_data_dict: Dict[str, Any]) -> WWSDetails:
+def get_wws_details(input_data_dict: Union[Dict[str, Any], WWSInputData]) -> WWSDetails:
     """
     Provides a full WWS assessment: total points, max legal rent, and breakdown.
-    Takes a dictionary that can be parsed by WWSInputData.
-    Returns a WWSDetails Pydantic model instance.
+    Takes a dictionary that can be parsed by WWSInputData, or a WWSInputData (used as is, without re-validation).
+    Returns a WWSDetails Pydantic model instance. Results are memoized (see WWSScoreCache) and shared
+    between callers, so they must not be mutated.
     """
+    rules = get_active_rule_set() # One rule set for the lookup, the calculation and the cache entry
+    if isinstance(input_data_dict, WWSInputData):
+        return score_wws_input(input_data_dict, rules).to_details()
+    fingerprint = rules.fingerprint
+    cache_key = _wws_cache_key(input_data_dict, rules)
+    if cache_key is not None:
+        cached = _WWS_SCORE_CACHE.get(cache_key, fingerprint)
+        if cached is not None:
+            return cached
+
     # Validate and parse input data
     try:
         wws_input_data = WWSInputData(**input_data_dict)
     except ValidationError as ve: # Specific Pydantic validation error
-        print(f"Error parsing WWS input data (Validation Error): {ve}")
+        logger.warning(f"Error parsing WWS input data (Validation Error): {ve}")
         # Return a WWSDetails object with error indication
         return WWSDetails(points=0, max_rent=0.0, breakdown=[WWSBreakdownItem(item=f"Error in input data: {ve.errors()}", points=0)])
     except Exception as e: # Other unexpected errors
-        print(f"Error parsing WWS input data (General Error): {e}")
+        logger.warning(f"Error parsing WWS input data (General Error): {e}")
         return WWSDetails(points=0, max_rent=0.0, breakdown=[WWSBreakdownItem(item="General error in input data processing", points=0)])
 
-    points, breakdown_list = calculate_wws_points(wws_input_data)
-    max_rent_val = calculate_max_legal_rent(points)
-    return WWSDetails(points=points, max_rent=max_rent_val, breakdown=breakdown_list)
+    started = time.perf_counter()
+    details = score_wws_input(wws_input_data, rules).to_details()
+    _SCORING_SECONDS.observe(time.perf_counter() - started, ("single",))
+    _SCORED_UNITS.inc(("single",))
+    if cache_key is not None:
+        _WWS_SCORE_CACHE.put(cache_key, fingerprint, details) # Error results above are never cached
+    return details
+
+# --- Batch (columnar) scoring --- #
+
+class WWSBatchResult:
+    """
+    Columnar result of `calculate_wws_points_batch`.
+    Holds NumPy arrays of total points, max rent and points per category.
+    Breakdown items / WWSDetails models are only built when `breakdown(i)` or `details(i)` is called.
+    """
+
+    def __init__(
+        self,
+        size_m2: np.ndarray,
+        rooms: np.ndarray,
+        energy_label: np.ndarray,
+        woz_value: np.ndarray,
+        surface_points: np.ndarray,
+        energy_label_points: np.ndarray,
+        woz_points: np.ndarray,
+        room_points: np.ndarray,
+        points: np.ndarray,
+        max_rent: np.ndarray,
+        rules: WWSRuleSet,
+    ):
+        # Inputs (and the rule set) are kept only to render breakdown labels on demand
+        self.size_m2 = size_m2
+        self.rooms = rooms
+        self.energy_label = energy_label
+        self.woz_value = woz_value
+        self.surface_points = surface_points
+        self.energy_label_points = energy_label_points
+        self.woz_points = woz_points
+        self.room_points = room_points
+        self.points = points
+        self.max_rent = max_rent
+        self.rules = rules
+
+    def __len__(self) -> int:
+        return len(self.points)
+
+    def breakdown_rows(self, index: int) -> List[Tuple[str, int]]:
+        """(label, points) pairs of row `index` without building models, e.g. for bulk database inserts."""
+        woz = self.woz_value[index]
+        woz_value = None if np.isnan(woz) else float(woz)
+        return [
+            (_surface_area_label(float(self.size_m2[index])), int(self.surface_points[index])),
+            (_energy_label_label(self.energy_label[index], self.rules), int(self.energy_label_points[index])),
+            (_woz_value_label(woz_value), int(self.woz_points[index])),
+            (_rooms_label(int(self.rooms[index])), int(self.room_points[index])),
+        ]
+
+    def score(self, index: int) -> WWSScore:
+        """Compact result of row `index` (see WWSScore)."""
+        return WWSScore(int(self.points[index]), float(self.max_rent[index]), tuple(self.breakdown_rows(index)))
+
+    def breakdown(self, index: int) -> List[WWSBreakdownItem]:
+        """Builds the breakdown items for row `index`, identical to the scalar path."""
+        return [WWSBreakdownItem(item=item, points=points) for item, points in self.breakdown_rows(index)]
+
+    def details(self, index: int) -> WWSDetails:
+        """Builds a WWSDetails model for row `index`."""
+        return self.score(index).to_details()
+
+def calculate_wws_points_batch(
+    size_m2: Sequence[float],
+    rooms: Sequence[int],
+    energy_label: Sequence[Optional[str]],
+    woz_value: Sequence[Optional[float]],
+    rules: Optional[WWSRuleSet] = None,
+) -> WWSBatchResult:
+    """
+    Vectorized counterpart of `calculate_wws_points` + `calculate_max_legal_rent`.
+    Takes equally long columns (lists or NumPy arrays; None is allowed for label and WOZ value)
+    and scores every row in one pass. Results match the scalar path exactly.
+    """
+    started = time.perf_counter()
+    rules = rules or get_active_rule_set()
+    size_arr = np.asarray(size_m2, dtype=np.float64)
+    rooms_arr = np.asarray(rooms, dtype=np.int64)
+    label_arr = np.asarray(energy_label, dtype=object)
+    # None (missing WOZ value) becomes NaN so the column stays float64
+    woz_arr = np.array([np.nan if v is None else v for v in woz_value], dtype=np.float64)
+
+    n = len(size_arr)
+    if not (len(rooms_arr) == len(label_arr) == len(woz_arr) == n):
+        raise ValueError("All input columns must have the same length.")
+
+    # 1. Surface Area (int() truncates towards zero, so does np.trunc)
+    surface_points = np.trunc(size_arr * rules.points_per_sq_meter).astype(np.int64)
+
+    # 2. Energy Label: factorize the labels, then look up points once per distinct label
+    label_keys = np.array([l.upper() if l else "" for l in label_arr], dtype=str)
+    unique_labels, label_codes = np.unique(label_keys, return_inverse=True)
+    label_lookup = np.array([rules.energy_label_points.get(l, 0) for l in unique_labels], dtype=np.int64)
+    energy_label_points = label_lookup[label_codes]
+
+    # 3. WOZ Value (missing values are NaN, and NaN > 0 is False)
+    with np.errstate(invalid="ignore"):
+        woz_valid = woz_arr > 0
+    woz_points = np.where(woz_valid, np.trunc(np.nan_to_num(woz_arr) * rules.woz_value_factor), 0).astype(np.int64)
+
+    # 4. Rooms
+    room_points = np.where(rooms_arr > 0, rules.base_points_rooms, 0).astype(np.int64)
+
+    points = surface_points + energy_label_points + woz_points + room_points
+
+    # Max rent comes from the rule set's precomputed table (built with the scalar formula, so Python's
+    # rounding is kept exactly); totals outside the table are evaluated once per distinct value.
+    table = rules.max_rent_table
+    in_table = (points >= 0) & (points < len(table))
+    max_rent = table[np.where(in_table, points, 0)]
+    if not in_table.all():
+        outside = ~in_table
+        unique_points, point_codes = np.unique(points[outside], return_inverse=True)
+        rent_lookup = np.array([rules.max_legal_rent(int(p)) for p in unique_points], dtype=np.float64)
+        max_rent[outside] = rent_lookup[point_codes]
+
+    _SCORING_SECONDS.observe(time.perf_counter() - started, ("batch",))
+    _SCORED_UNITS.inc(("batch",), n)
+    return WWSBatchResult(
+        size_m2=size_arr,
+        rooms=rooms_arr,
+        energy_label=label_arr,
+        woz_value=woz_arr,
+        surface_points=surface_points,
+        energy_label_points=energy_label_points,
+        woz_points=woz_points,
+        room_points=room_points,
+        points=points,
+        max_rent=max_rent,
+        rules=rules,
+    )
+
+def calculate_wws_points_batch_from_inputs(inputs: Sequence[WWSInputData], rules: Optional[WWSRuleSet] = None) -> WWSBatchResult:
+    """Convenience wrapper: scores a sequence of validated WWSInputData models in one batch."""
+    return calculate_wws_points_batch(
+        [d.size_m2 for d in inputs],
+        [d.rooms for d in inputs],
+        [d.energy_label for d in inputs],
+        [d.woz_value for d in inputs],
+        rules,
+    )
 
 # Example Usage (for testing)
 if __name__ == '__main__':
@@ -0,0 +1,154 @@
+import hashlib
+import json
+import os
+import threading
+from types import MappingProxyType
+from typing import Any, Callable, Dict, List, Mapping, Optional
+
+import numpy as np
+
+# Versioned WWS rule tables.
+# Each version is a JSON file in data/wws_rules/ (or RENTRIGHT_WWS_RULES_DIR; e.g. 2024.json) holding the point tables and the
+# rent formula. A file is compiled into an immutable WWSRuleSet with ready-to-use lookup structures,
+# and the active rule set is a single module reference, so switching versions is one atomic
+# assignment: a calculation always sees either the old or the new tables, never a mix.
+
+RULES_DIR = os.getenv("RENTRIGHT_WWS_RULES_DIR", os.path.join(os.path.dirname(__file__), "data", "wws_rules"))
+# Max legal rents are precomputed for point totals below this bound (see WWSRuleSet.max_rent_table)
+MAX_PRECOMPUTED_POINTS = 2048
+
+class UnknownRuleSetError(ValueError):
+    """No rule-set file exists for the requested version."""
+
+class WWSRuleSet:
+    """Compiled, read-only WWS point tables of one version."""
+
+    def __init__(
+        self,
+        version: str,
+        points_per_sq_meter: float,
+        energy_label_points: Mapping[str, int],
+        woz_value_factor: float,
+        base_points_rooms: int,
+        rent_factor_per_point: float,
+        rent_base: float,
+    ):
+        self.version = version
+        self.points_per_sq_meter = points_per_sq_meter
+        # Keys are upper-cased once here, so lookups only need label.upper()
+        self.energy_label_points: Mapping[str, int] = MappingProxyType({label.upper(): int(points) for label, points in energy_label_points.items()})
+        self.woz_value_factor = woz_value_factor
+        self.base_points_rooms = base_points_rooms
+        self.rent_factor_per_point = rent_factor_per_point
+        self.rent_base = rent_base
+
+        tables = self.to_document()
+        del tables["version"]
+        # Identifies the table contents (not just the version name); used as cache key component
+        self.fingerprint = f"{version}:{hashlib.sha256(json.dumps(tables, sort_keys=True).encode('utf-8')).hexdigest()[:16]}"
+        # Max legal rent per point total, computed once with the scalar formula (same rounding)
+        self.max_rent_table = np.array([self.max_legal_rent(points) for points in range(MAX_PRECOMPUTED_POINTS)], dtype=np.float64)
+        self.max_rent_table.flags.writeable = False
+
+    def to_document(self) -> Dict[str, Any]:
+        """The rule set in the data/wws_rules/*.json format."""
+        return {
+            "version": self.version,
+            "points_per_sq_meter": self.points_per_sq_meter,
+            "energy_label_points": dict(sorted(self.energy_label_points.items())),
+            "woz_value_factor": self.woz_value_factor,
+            "base_points_rooms": self.base_points_rooms,
+            "rent_factor_per_point": self.rent_factor_per_point,
+            "rent_base": self.rent_base,
+        }
+
+    def __reduce__(self):
+        # Pickled as its document (e.g. for process pool workers) and recompiled on load
+        return compile_rule_set, (self.to_document(),)
+
+    def max_legal_rent(self, points: int) -> float:
+        """Maximum legal rent for a point total (rent = points * factor + base, 0 for no points)."""
+        if points <= 0:
+            return 0.0
+        return round((points * self.rent_factor_per_point) + self.rent_base, 2)
+
+    def __repr__(self) -> str:
+        return f"WWSRuleSet(version={self.version!r}, fingerprint={self.fingerprint!r})"
+
+def compile_rule_set(data: Dict[str, Any]) -> WWSRuleSet:
+    """Validates a rule-set document (as stored in data/wws_rules/*.json) and compiles it. Raises ValueError."""
+    required = ("version", "points_per_sq_meter", "energy_label_points", "woz_value_factor",
+                "base_points_rooms", "rent_factor_per_point", "rent_base")
+    missing = [key for key in required if key not in data]
+    if missing:
+        raise ValueError(f"WWS rule set is missing: {', '.join(missing)}")
+    if not isinstance(data["energy_label_points"], dict):
+        raise ValueError("energy_label_points must be an object mapping labels to points")
+    try:
+        return WWSRuleSet(
+            version=str(data["version"]),
+            points_per_sq_meter=float(data["points_per_sq_meter"]),
+            energy_label_points={str(label): int(points) for label, points in data["energy_label_points"].items()},
+            woz_value_factor=float(data["woz_value_factor"]),
+            base_points_rooms=int(data["base_points_rooms"]),
+            rent_factor_per_point=float(data["rent_factor_per_point"]),
+            rent_base=float(data["rent_base"]),
+        )
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid WWS rule set: {e}") from e
+
+def load_rule_set(version: str, rules_dir: Optional[str] = None) -> WWSRuleSet:
+    """Loads and compiles data/wws_rules/<version>.json. Raises ValueError for unknown or invalid versions."""
+    rules_dir = rules_dir or RULES_DIR
+    path = os.path.join(rules_dir, f"{version}.json")
+    if os.path.basename(path) != f"{version}.json" or not os.path.isfile(path):
+        raise UnknownRuleSetError(f"Unknown WWS rule set version '{version}'")
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if str(data.get("version")) != version:
+        raise ValueError(f"Rule set file {path} declares version '{data.get('version')}', expected '{version}'")
+    return compile_rule_set(data)
+
+def available_rule_versions(rules_dir: Optional[str] = None) -> List[str]:
+    """Versions with a rule-set file, sorted (the last one is the newest)."""
+    rules_dir = rules_dir or RULES_DIR
+    if not os.path.isdir(rules_dir):
+        return []
+    return sorted(name[:-len(".json")] for name in os.listdir(rules_dir) if name.endswith(".json"))
+
+def _initial_rule_set() -> WWSRuleSet:
+    # RENTRIGHT_WWS_RULES_VERSION pins a version; otherwise the newest file is used
+    version = os.getenv("RENTRIGHT_WWS_RULES_VERSION") or available_rule_versions()[-1]
+    return load_rule_set(version)
+
+_ACTIVE_RULE_SET: WWSRuleSet = _initial_rule_set()
+_ACTIVATION_LOCK = threading.Lock()
+_LISTENERS: List[Callable[[WWSRuleSet, WWSRuleSet], None]] = []
+
+def get_active_rule_set() -> WWSRuleSet:
+    """The rule set calculations should use. Read it once per calculation."""
+    return _ACTIVE_RULE_SET
+
+def add_rule_set_listener(listener: Callable[[WWSRuleSet, WWSRuleSet], None]):
+    """Registers `listener(old, new)`, called after every switch to a different rule set."""
+    _LISTENERS.append(listener)
+
+def remove_rule_set_listener(listener: Callable[[WWSRuleSet, WWSRuleSet], None]):
+    if listener in _LISTENERS:
+        _LISTENERS.remove(listener)
+
+def activate_rule_set(rule_set_or_version) -> WWSRuleSet:
+    """
+    Makes a rule set (or the version loaded from data/wws_rules/) the active one.
+    The swap is a single reference assignment; listeners are notified afterwards if the tables changed.
+    Returns the previously active rule set.
+    """
+    global _ACTIVE_RULE_SET
+    new_rule_set = rule_set_or_version if isinstance(rule_set_or_version, WWSRuleSet) else load_rule_set(rule_set_or_version)
+    with _ACTIVATION_LOCK:
+        old_rule_set = _ACTIVE_RULE_SET
+        _ACTIVE_RULE_SET = new_rule_set
+    if new_rule_set.fingerprint != old_rule_set.fingerprint:
+        for listener in list(_LISTENERS):
+            listener(old_rule_set, new_rule_set)
+    return old_rule_set
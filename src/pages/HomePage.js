@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import { FontAwesomeIcon } from '@fortawesome/react-fontawesome';
 import { faSearch, faMapMarkerAlt, faEuroSign, faRulerCombined, faDoorOpen, faArrowRight, faDollarSign } from '@fortawesome/free-solid-svg-icons';
+import { searchListings } from '../services/api';
 
 // Placeholder for ListingCard component - will be created in a later batch
 const ListingCard = ({ listing }) => {
@@ -107,9 +108,19 @@ const HomePage = () => {
         setListings(listingsData);
     }, []);
 
-    const handleSearch = (e) => {
+    const handleSearch = async (e) => {
         e.preventDefault();
-        alert(`Search functionality for "${searchTerm}" is for demonstration and not implemented in this prototype.`);
+        if (!searchTerm.trim()) {
+            setListings(listingsData);
+            return;
+        }
+        try {
+            // The summary view carries exactly what a listing card shows, including its first `image`
+            const { listings: results } = await searchListings(searchTerm.trim(), { view: 'summary' });
+            setListings(results);
+        } catch (error) {
+            alert(`Search for "${searchTerm}" failed. Please try again later.`);
+        }
     };
 
     const handleFilterClick = (filterName) => {
@@ -10,12 +10,18 @@ import axios from 'axios';
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:9000/api';
 
 /**
- * Fetches all listings from the backend.
+ * Fetches listings from the backend, optionally filtered and sorted server-side.
+ * @param {Object} [params] Optional query parameters: min_rent, max_rent, min_size, max_size,
+ *   min_rooms, max_rooms, location, energy_label, min_wws_points, max_wws_points,
+ *   near ('lat,lon') with radius_km, and sort (e.g. 'rent', '-overpriced' or 'distance';
+ *   results are sorted by distance by default when `near` is given).
+ *   Pass `view: 'summary'` for card-sized listings (id, title, location, image, rent, size, rooms,
+ *   WWS points and maximum legal rent) or `fields` (e.g. 'title,wwsPoints') for a custom subset.
  * @returns {Promise<Array<Object>>} A promise that resolves to an array of listing objects.
  */
-export const getListings = async () => {
+export const getListings = async (params = {}) => {
   try {
-    const response = await axios.get(`${API_BASE_URL}/listings`);
+    const response = await axios.get(`${API_BASE_URL}/listings`, { params });
     return response.data;
   } catch (error) {
     console.error('Error fetching listings:', error);
@@ -26,21 +32,194 @@ export const getListings = async () => {
   }
 };
 
+/**
+ * Fetches one page of listings using cursor pagination.
+ * @param {Object} [params] Same filters as getListings, plus `limit` and `cursor`
+ *   (the `nextCursor` of the previous page).
+ * @returns {Promise<{listings: Array<Object>, nextCursor: (string|null), totalCount: number}>}
+ */
+export const getListingsPage = async (params = {}) => {
+  try {
+    const response = await axios.get(`${API_BASE_URL}/listings`, { params });
+    return {
+      listings: response.data,
+      nextCursor: response.headers['x-next-cursor'] || null,
+      totalCount: Number(response.headers['x-total-count'] ?? response.data.length),
+    };
+  } catch (error) {
+    console.error('Error fetching listings page:', error);
+    throw error;
+  }
+};
+
+/**
+ * Fetches many listings by ID in one request.
+ * @param {Array<string|number>} ids The IDs of the listings to fetch (at most 1000).
+ * @param {Object} [params] Optional `view` or `fields`, as for getListings.
+ * @returns {Promise<{listings: Array<Object>, notFound: Array<number>}>} The listings found, in the
+ *   order of `ids`, and the IDs that do not exist.
+ */
+export const getListingsByIds = async (ids, params = {}) => {
+  try {
+    const response = await axios.get(`${API_BASE_URL}/listings/batch`, { params: { ...params, ids: ids.join(',') } });
+    return response.data;
+  } catch (error) {
+    console.error(`Error fetching listings with IDs ${ids.join(', ')}:`, error);
+    throw error;
+  }
+};
+
+// getListingById calls made within BATCH_WINDOW_MS of each other are coalesced into getListingsByIds
+// requests of up to MAX_BATCH_SIZE IDs, so a page rendering dozens of listings makes one round-trip.
+const BATCH_WINDOW_MS = 10;
+const MAX_BATCH_SIZE = 100;
+let pendingLookups = new Map(); // String(id) -> [{ resolve, reject }] of the callers waiting for it
+let batchTimer = null;
+// Listing IDs are non-negative integers. Anything else (e.g. from a mistyped /listing/abc URL) can never be found,
+// and the backend rejects a whole batch with a 400 if one of its IDs does not parse, so it must not join one
+const LISTING_ID_PATTERN = /^\d+$/;
+
+// Rejection for an ID missing from a batch, shaped like the axios error of a 404 from /listings/{id}
+const listingNotFoundError = (id) => {
+  const error = new Error(`Listing ${id} not found`);
+  error.response = { status: 404, data: { detail: 'Listing not found' } };
+  return error;
+};
+
+const flushListingLookups = () => {
+  const lookups = pendingLookups;
+  pendingLookups = new Map();
+  batchTimer = null;
+  const ids = [...lookups.keys()];
+  for (let start = 0; start < ids.length; start += MAX_BATCH_SIZE) {
+    const batchIds = ids.slice(start, start + MAX_BATCH_SIZE);
+    getListingsByIds(batchIds)
+      .then(({ listings }) => {
+        const listingsById = new Map(listings.map(listing => [String(listing.id), listing]));
+        batchIds.forEach(id => {
+          const listing = listingsById.get(id);
+          lookups.get(id).forEach(({ resolve, reject }) => (listing ? resolve(listing) : reject(listingNotFoundError(id))));
+        });
+      })
+      .catch(error => batchIds.forEach(id => lookups.get(id).forEach(({ reject }) => reject(error))));
+  }
+};
+
 /**
  * Fetches a single listing by its ID from the backend.
+ * Concurrent calls are coalesced into batch requests (see getListingsByIds).
  * @param {string|number} id The ID of the listing to fetch.
- * @returns {Promise<Object>} A promise that resolves to a single listing object.
+ * @returns {Promise<Object>} A promise that resolves to a single listing object
+ *   (rejected with `error.response.status` 404 if it does not exist or `id` is not an integer ID; such an
+ *   ID is rejected without a request, so it cannot fail the batch of concurrent lookups).
  */
 export const getListingById = async (id) => {
   if (!id && id !== 0) { // Allow ID 0 if it's a valid identifier
     console.error('Error: Listing ID is required.');
     throw new Error('Listing ID is required.');
   }
+  const trimmed = String(id).trim();
+  if (!LISTING_ID_PATTERN.test(trimmed)) {
+    throw listingNotFoundError(id);
+  }
+  return new Promise((resolve, reject) => {
+    const key = trimmed.replace(/^0+(?=\d)/, ''); // The form the backend echoes back ("007" -> "7")
+    if (!pendingLookups.has(key)) {
+      pendingLookups.set(key, []);
+    }
+    pendingLookups.get(key).push({ resolve, reject });
+    if (pendingLookups.size >= MAX_BATCH_SIZE) {
+      clearTimeout(batchTimer);
+      flushListingLookups();
+    } else if (batchTimer === null) {
+      batchTimer = setTimeout(flushListingLookups, BATCH_WINDOW_MS);
+    }
+  });
+};
+
+/**
+ * Full-text search over listing titles, locations and descriptions, best matches first.
+ * The last word also matches as a prefix, so partially typed queries work.
+ * @param {string} query The search terms.
+ * @param {Object} [params] Optional `limit` and `offset`, and `view` or `fields` as for getListings.
+ * @returns {Promise<{listings: Array<Object>, totalCount: number}>}
+ */
+export const searchListings = async (query, params = {}) => {
+  try {
+    const response = await axios.get(`${API_BASE_URL}/search`, { params: { ...params, q: query } });
+    return {
+      listings: response.data,
+      totalCount: Number(response.headers['x-total-count'] ?? response.data.length),
+    };
+  } catch (error) {
+    console.error(`Error searching listings for "${query}":`, error);
+    throw error;
+  }
+};
+
+/**
+ * Autocomplete suggestions for the last word of the text typed so far.
+ * @param {string} prefix The text typed so far.
+ * @param {number} [limit=10] Maximum number of suggestions.
+ * @returns {Promise<Array<string>>} Suggested terms, most frequent first.
+ */
+export const suggestSearchTerms = async (prefix, limit = 10) => {
+  try {
+    const response = await axios.get(`${API_BASE_URL}/search/suggest`, { params: { q: prefix, limit } });
+    return response.data;
+  } catch (error) {
+    console.error(`Error fetching search suggestions for "${prefix}":`, error);
+    throw error;
+  }
+};
+
+/**
+ * Calculates the WWS points, maximum legal rent and breakdown of a (hypothetical) unit.
+ * @param {Object} input `size_m2` and `rooms`, optionally `energy_label` and `woz_value`.
+ * @returns {Promise<{points: number, max_rent: number, breakdown: Array<{item: string, points: number}>}>}
+ */
+export const calculateWws = async (input) => {
+  try {
+    const response = await axios.post(`${API_BASE_URL}/wws/calculate`, input);
+    return response.data;
+  } catch (error) {
+    console.error('Error calculating WWS points:', error);
+    throw error;
+  }
+};
+
+/**
+ * Calculates WWS points for many units in one request (at most 10000).
+ * @param {Array<Object>} inputs Inputs as for calculateWws.
+ * @returns {Promise<{results: Array<{index: number, details: (Object|null), errors: (Array<Object>|null)}>, errorCount: number}>}
+ *   One result per input, in order; invalid inputs carry their validation `errors` instead of `details`.
+ */
+export const calculateWwsBatch = async (inputs) => {
+  try {
+    const response = await axios.post(`${API_BASE_URL}/wws/calculate-batch`, { inputs });
+    return {
+      results: response.data,
+      errorCount: Number(response.headers['x-error-count'] ?? 0),
+    };
+  } catch (error) {
+    console.error('Error calculating WWS points for a batch:', error);
+    throw error;
+  }
+};
+
+/**
+ * Fetches market statistics per location: listing count, rent and rent per m² (mean, median and
+ * percentiles p10-p90), average WWS points and the share of listings above their maximum legal rent.
+ * @param {Object} [params] Optional `location` (comma-separated; `overall` then covers these locations
+ *   together) and `min_listings`.
+ * @returns {Promise<{overall: Object, locations: Array<Object>}>} Locations are ordered by listing count.
+ */
+export const getMarketStats = async (params = {}) => {
   try {
-    const response = await axios.get(`${API_BASE_URL}/listings/${id}`);
+    const response = await axios.get(`${API_BASE_URL}/stats`, { params });
     return response.data;
   } catch (error) {
-    console.error(`Error fetching listing with ID ${id}:`, error);
+    console.error('Error fetching market statistics:', error);
     throw error;
   }
 };
@@ -78,6 +78,9 @@ echo "Frontend dependencies installed."
 # Build the frontend application.
 echo "Building frontend application (npm run build)..."
 npm run build
+# Write .gz/.br copies of the build's JS, CSS and HTML at the highest levels; the backend serves them as
+# negotiated (see backend/static_files.py) instead of compressing at startup.
+(cd "$SCRIPT_DIR" && python -m backend.static_files build)
 echo "Frontend application built."
 
 # --- Final Checks (Placeholder) ---
@@ -105,6 +108,10 @@ echo "Press Ctrl+C to stop the server and trigger cleanup."
 # Using --reload for development. For production, consider removing --reload 
 # and using a more robust process manager (e.g., Gunicorn with Uvicorn workers).
 # Uvicorn is run from the 'backend' directory, so the ASGI app module is 'main:app'.
+# With several workers (--workers N), set RENTRIGHT_CHANGE_LOG_PATH (e.g. to data/changes.db) so that rule set
+# switches and listing writes reach every worker (see backend/change_feed.py).
+# The database was seeded above, so serve listings from it instead of re-reading the JSON file.
+export RENTRIGHT_LISTINGS_BACKEND=database
 uvicorn main:app --host 0.0.0.0 --port 9000 --reload
 
 # Script will block here until Uvicorn exits.